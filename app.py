@@ -32,6 +32,10 @@ def create_app():
     app = Flask(__name__)
     logger = logging.getLogger(__name__)
     
+    # Registrar filtros de template personalizados (strftime, utc_to_colombia)
+    from utils.template_filters import register_template_filters
+    register_template_filters(app)
+    
     # Variable para evitar logs duplicados
     is_production = os.getenv('ENV') == 'production' or os.getenv('GAE_ENV') == 'standard'
     
@@ -92,19 +96,27 @@ def create_app():
         # Importar rutas
         from routes.health import health_bp
         from routes.productos import productos_bp
+        from routes.catalogo import catalogo_bp
         from routes.clientes import clientes_bp, api_clientes_bp
         from routes.pedidos import pedidos_bp
         from routes.reportes import reportes_bp
         from routes.indicadores import indicadores_bp
+        from routes.trabajos import trabajos_bp
         
         # Registrar blueprints
         app.register_blueprint(health_bp)
         app.register_blueprint(productos_bp, url_prefix='/productos')
+        app.register_blueprint(catalogo_bp)
         app.register_blueprint(clientes_bp, url_prefix='/clientes')
         app.register_blueprint(api_clientes_bp)
         app.register_blueprint(pedidos_bp, url_prefix='/pedidos')
         app.register_blueprint(reportes_bp, url_prefix='/reportes')
         app.register_blueprint(indicadores_bp)
+        app.register_blueprint(trabajos_bp)
+        
+        # Perfil de SQL por petición (solo con PERFIL_SQL=1)
+        from utils.perfil_sql import instalar_perfil_sql
+        instalar_perfil_sql(app)
         
         # Solo log en desarrollo
         if not is_production:
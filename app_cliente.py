@@ -84,20 +84,20 @@ def create_cliente_app():
         from routes.pedidos import pedidos_bp
         from routes.clientes import api_clientes_bp, clientes_bp  # API y gestión básica de clientes
         from routes.productos import productos_bp  # Solo para API de búsqueda de productos
+        from routes.catalogo import catalogo_bp  # Catálogo del formulario de pedido
         
         # Registrar blueprints limitados
         app.register_blueprint(pedidos_bp, url_prefix='/pedidos')
         app.register_blueprint(api_clientes_bp)  # API de clientes
         app.register_blueprint(clientes_bp, url_prefix='/clientes')  # Gestión básica de clientes
+        app.register_blueprint(catalogo_bp)  # Catálogo del formulario de pedido
         
         # Registrar solo la ruta API de productos (no la gestión completa)
         @app.route('/productos/api/buscar')
         def buscar_productos_api():
             """Permite a los clientes buscar productos para sus pedidos"""
-            from routes.productos import productos_bp
             from flask import request, jsonify
-            from config.database import db_config
-            from models import Producto
+            from utils.busqueda_productos import buscar_productos
             
             termino = request.args.get('q', '').strip()
             limit = int(request.args.get('limit', 10))
@@ -105,28 +105,12 @@ def create_cliente_app():
             if len(termino) < 1:
                 return jsonify([])
             
-            db = db_config.get_session()
-            try:
-                # Buscar productos por código, referencia o línea
-                productos = db.query(Producto).filter(
-                    (Producto.codigo.ilike(f'%{termino}%')) |
-                    (Producto.referencia_de_producto.ilike(f'%{termino}%')) |
-                    (Producto.categoria_linea.ilike(f'%{termino}%'))
-                ).limit(limit).all()
-                
-                return jsonify([{
-                    'id': p.id,
-                    'codigo': p.codigo,
-                    'referencia': p.referencia_de_producto,
-                    'display': f"{p.codigo} - {p.referencia_de_producto} - {p.categoria_linea or 'Sin línea'}",
-                    'gramaje_g': p.gramaje_g,
-                    'formulacion_grupo': p.formulacion_grupo or '',
-                    'categoria_linea': p.categoria_linea or '',
-                    'presentacion1': p.presentacion1 or '',
-                    'presentacion2': p.presentacion2 or ''
-                } for p in productos])
-            finally:
-                db.close()
+            # Buscar productos por código, referencia o línea en el índice en memoria
+            return jsonify(buscar_productos(termino, limit))
+        
+        # Perfil de SQL por petición (solo con PERFIL_SQL=1)
+        from utils.perfil_sql import instalar_perfil_sql
+        instalar_perfil_sql(app)
         
         if not is_production:
             logger.info("✅ Rutas de cliente registradas correctamente")
@@ -0,0 +1 @@
+"""Micro-benchmarks y pruebas de carga de FlorezCook (se ejecutan con python -m benchmarks.<modulo>)"""
@@ -0,0 +1,108 @@
+"""
+Benchmark del arranque en frío de las aplicaciones.
+
+Cada medición se hace en un proceso nuevo de Python (como una instancia nueva
+de App Engine) y registra el tiempo de importar el módulo de entrada, el de la
+primera petición (que crea el engine y toma la primera conexión) y si pandas u
+openpyxl quedaron cargados. Se compara el arranque normal con el arranque
+rápido (ARRANQUE_RAPIDO=1).
+
+Uso:
+    python -m benchmarks.arranque [--repeticiones 5] [--salida resultados.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Módulo de entrada y ruta de la primera petición (usa la base de datos)
+APLICACIONES = {
+    'main:app': '/readiness',
+    'main_cliente:app': '/health',
+}
+
+MODOS = {
+    'normal': {'ARRANQUE_RAPIDO': '0'},
+    'rapido': {'ARRANQUE_RAPIDO': '1'},
+}
+
+# Se ejecuta en el proceso hijo: imprime una línea JSON con las mediciones
+_SCRIPT_MEDICION = '''
+import importlib, json, sys, time
+inicio = time.perf_counter()
+modulo, atributo = sys.argv[1].split(':')
+app = getattr(importlib.import_module(modulo), atributo)
+importacion = time.perf_counter() - inicio
+cliente = app.test_client()
+inicio = time.perf_counter()
+estado = cliente.get(sys.argv[2]).status_code
+primera = time.perf_counter() - inicio
+inicio = time.perf_counter()
+cliente.get(sys.argv[2])
+segunda = time.perf_counter() - inicio
+print(json.dumps({
+    'importacion_ms': importacion * 1000,
+    'primera_peticion_ms': primera * 1000,
+    'segunda_peticion_ms': segunda * 1000,
+    'estado': estado,
+    'pandas_cargado': 'pandas' in sys.modules,
+    'openpyxl_cargado': 'openpyxl' in sys.modules,
+}))
+'''
+
+
+def medir_arranque(aplicacion, ruta, entorno):
+    """Mide un arranque en un proceso nuevo y devuelve el diccionario de mediciones"""
+    env = dict(os.environ, **entorno)
+    salida = subprocess.run(
+        [sys.executable, '-c', _SCRIPT_MEDICION, aplicacion, ruta],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    # Los logs de la aplicación van a stderr; la última línea de stdout es el JSON
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def medir(repeticiones=5):
+    """Devuelve {aplicacion: {modo: mediciones}} con la mediana de las repeticiones"""
+    resultados = {}
+    for aplicacion, ruta in APLICACIONES.items():
+        resultados[aplicacion] = {}
+        for modo, entorno in MODOS.items():
+            corridas = [medir_arranque(aplicacion, ruta, entorno) for _ in range(repeticiones)]
+            resumen = {
+                clave: round(statistics.median(c[clave] for c in corridas), 1)
+                for clave in ('importacion_ms', 'primera_peticion_ms', 'segunda_peticion_ms')
+            }
+            resumen['estado'] = corridas[-1]['estado']
+            resumen['pandas_cargado'] = corridas[-1]['pandas_cargado']
+            resumen['openpyxl_cargado'] = corridas[-1]['openpyxl_cargado']
+            resultados[aplicacion][modo] = resumen
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--salida', help='Archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    resultados = medir(args.repeticiones)
+    print(f"Arranque en frío (mediana de {args.repeticiones} procesos)")
+    for aplicacion, modos in resultados.items():
+        print(f"  {aplicacion} ({APLICACIONES[aplicacion]})")
+        for modo, r in modos.items():
+            print(f"    {modo:<7} importación {r['importacion_ms']:8.1f} ms   "
+                  f"primera petición {r['primera_peticion_ms']:7.1f} ms   "
+                  f"segunda {r['segunda_peticion_ms']:6.1f} ms   "
+                  f"HTTP {r['estado']}   pandas={r['pandas_cargado']} openpyxl={r['openpyxl_cargado']}")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, indent=2)
+        print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == '__main__':
+    main()
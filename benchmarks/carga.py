@@ -0,0 +1,106 @@
+"""
+Escenarios de carga sobre los endpoints más usados.
+
+Cada escenario arma una petición con el cliente de pruebas de Flask contra
+la base de datos configurada (SQLite local o DATABASE_URL, p. ej. el MySQL de
+docker-compose). Los mide benchmarks/test_carga.py con pytest-benchmark, que
+guarda cada corrida en benchmarks/resultados/ y la compara con una base
+guardada (ver los objetivos benchmark y benchmark-base del Makefile).
+
+Los datos se generan antes con:
+    python generar_datos_prueba.py --masivo [--items 1000000]
+"""
+import random
+from datetime import datetime, timedelta
+
+# Prefijos para el autocompletado (lo que escribe el usuario en el formulario)
+TERMINOS_PRODUCTOS = ['pan', 'ho', 'masa', 'choux', 'empa', 'ref', 'bizc', 'sal', 'BM-P00', 'alm']
+TERMINOS_CLIENTES = ['cliente', 'prueba 0', 'BM-C', 'rest', 'hotel', '000']
+
+
+class Contexto:
+    """Datos de la base usados para armar las peticiones (ids existentes, rango de fechas)"""
+
+    def __init__(self, semilla):
+        from sqlalchemy import func, select
+        from config.database import db_config
+        from models import Cliente, Pedido, PedidoProducto, Producto
+
+        self.aleatorio = random.Random(semilla)
+        with db_config.engine.connect() as conn:
+            self.clientes = conn.execute(
+                select(Cliente.id, Cliente.numero_identificacion, Cliente.nombre_comercial)
+                .order_by(Cliente.id).limit(500)).all()
+            self.productos = conn.execute(
+                select(Producto.id, Producto.gramaje_g, Producto.formulacion_grupo,
+                       Producto.categoria_linea, Producto.presentacion1)
+                .order_by(Producto.id).limit(500)).all()
+            self.filas = {
+                'clientes': conn.execute(select(func.count(Cliente.id))).scalar(),
+                'productos': conn.execute(select(func.count(Producto.id))).scalar(),
+                'pedidos': conn.execute(select(func.count(Pedido.id))).scalar(),
+                'items': conn.execute(select(func.count(PedidoProducto.id))).scalar(),
+            }
+        self.dialecto = db_config.engine.dialect.name
+        self.hasta = datetime.utcnow().date()
+
+    def rango(self, dias):
+        return {'fecha_desde': (self.hasta - timedelta(days=dias)).isoformat(),
+                'fecha_hasta': self.hasta.isoformat()}
+
+
+def _crear_pedido(cliente, ctx):
+    """POST del formulario de pedido con 3 ítems (el flujo de pedido del portal)"""
+    _, nit, nombre = ctx.aleatorio.choice(ctx.clientes)
+    datos = {
+        'numero_identificacion_cliente_ingresado': nit,
+        'nombre_cliente_ingresado': nombre,
+        'despacho_tipo': 'Punto de venta',
+        'despacho_sede': 'Sede Principal',
+        'observaciones_despacho': 'benchmark',
+    }
+    entrega = (ctx.hasta + timedelta(days=3)).isoformat()
+    for i, (producto_id, gramaje, grupo, linea, presentacion) in enumerate(ctx.aleatorio.sample(ctx.productos, 3)):
+        cantidad = ctx.aleatorio.randint(1, 10)
+        datos.update({
+            f'producto_id_{i}': producto_id,
+            f'cantidad_{i}': cantidad,
+            f'gramaje_g_item_{i}': gramaje,
+            f'peso_total_g_item_{i}': gramaje * cantidad,
+            f'grupo_item_{i}': grupo or '',
+            f'linea_item_{i}': linea or '',
+            f'fecha_de_entrega_item_{i}': entrega,
+            f'presentacion_item_{i}': presentacion or '',
+        })
+    return cliente.post('/pedidos/form', data=datos)
+
+
+def _indicadores(categoria):
+    return lambda cliente, ctx: cliente.get(f'/indicadores/api/{categoria}')
+
+
+# nombre: (función(cliente, contexto) -> respuesta, rondas relativas)
+ESCENARIOS = {
+    'crear_pedido': (_crear_pedido, 1.0),
+    'autocompletar_productos': (
+        lambda cliente, ctx: cliente.get('/productos/api/buscar',
+                                         query_string={'q': ctx.aleatorio.choice(TERMINOS_PRODUCTOS)}), 1.0),
+    'autocompletar_clientes': (
+        lambda cliente, ctx: cliente.get('/api/clientes/sugerencias',
+                                         query_string={'q': ctx.aleatorio.choice(TERMINOS_CLIENTES)}), 1.0),
+    'buscar_cliente_nit': (
+        lambda cliente, ctx: cliente.get('/api/clientes/buscar',
+                                         query_string={'nit': ctx.aleatorio.choice(ctx.clientes)[1]}), 1.0),
+    'reporte_pedidos': (lambda cliente, ctx: cliente.get('/reportes/pedidos', query_string=ctx.rango(30)), 1.0),
+    'consolidado_productos': (
+        lambda cliente, ctx: cliente.get('/reportes/consolidado', query_string=ctx.rango(30)), 1.0),
+    'indicadores_ventas': (_indicadores('ventas'), 1.0),
+    'indicadores_clientes': (_indicadores('clientes'), 1.0),
+    'indicadores_productos': (_indicadores('productos'), 1.0),
+    'indicadores_operaciones': (_indicadores('operaciones'), 1.0),
+    'indicadores_geograficos': (_indicadores('geograficos'), 1.0),
+    'exportar_pedidos_excel': (
+        lambda cliente, ctx: cliente.get('/reportes/exportar-pedidos-excel', query_string=ctx.rango(30)), 0.2),
+    'exportar_consolidado_excel': (
+        lambda cliente, ctx: cliente.get('/reportes/exportar-consolidado-excel', query_string=ctx.rango(30)), 0.2),
+}
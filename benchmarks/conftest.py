@@ -0,0 +1,43 @@
+"""
+Configuración de los benchmarks de carga (benchmarks/test_carga.py).
+
+Se ejecutan contra la base configurada (DATABASE_URL o la SQLite local), no
+contra la base temporal de tests/. Opciones:
+    --rondas N      Peticiones medidas por escenario (por defecto 20)
+    --semilla N     Semilla de los datos de cada petición (por defecto 42)
+    --con-cache     No desactivar la caché de respuestas
+"""
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+
+def pytest_addoption(parser):
+    grupo = parser.getgroup('carga', 'Benchmarks de carga de FlorezCook')
+    grupo.addoption('--rondas', type=int, default=20, help='Peticiones medidas por escenario')
+    grupo.addoption('--semilla', type=int, default=42, help='Semilla de los datos de las peticiones')
+    grupo.addoption('--con-cache', action='store_true', help='No desactivar la caché de respuestas')
+
+
+@pytest.fixture(scope='session')
+def app_carga(pytestconfig):
+    # Antes de importar la aplicación: la caché de respuestas lee la variable al cargarse
+    if not pytestconfig.getoption('con_cache'):
+        os.environ['CACHE_RESPUESTAS'] = '0'
+    from app import app
+    return app
+
+
+@pytest.fixture(scope='session')
+def contexto_carga(app_carga, pytestconfig):
+    from benchmarks.carga import Contexto
+
+    ctx = Contexto(pytestconfig.getoption('semilla'))
+    if not ctx.clientes or not ctx.productos:
+        pytest.skip('No hay clientes o productos: ejecutar antes python generar_datos_prueba.py --masivo')
+    return ctx
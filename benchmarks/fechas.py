@@ -0,0 +1,65 @@
+"""
+Micro-benchmark de la conversión de fechas UTC a hora de Colombia.
+
+Compara el costo por fila de la conversión anterior (pytz.timezone +
+localize por valor) con la conversión de desfase fijo de utils.fechas y con
+el formateo en lote que usan las exportaciones.
+
+Uso:
+    python -m benchmarks.fechas [--filas 20000] [--repeticiones 5]
+"""
+import argparse
+import datetime
+import random
+import timeit
+
+import pytz
+
+from utils.fechas import a_hora_colombia, formatear_fechas_colombia
+
+
+def _conversion_pytz(utc_dt):
+    """Implementación anterior de utc_to_colombia, como referencia"""
+    colombia_tz = pytz.timezone('America/Bogota')
+    if utc_dt.tzinfo is None:
+        utc_dt = pytz.UTC.localize(utc_dt)
+    return utc_dt.astimezone(colombia_tz)
+
+
+def _fechas_de_prueba(filas, semilla=42):
+    """Fechas de creación repartidas en un año, como las de la tabla de pedidos"""
+    aleatorio = random.Random(semilla)
+    base = datetime.datetime(2025, 1, 1)
+    return [base + datetime.timedelta(seconds=aleatorio.randint(0, 365 * 86400)) for _ in range(filas)]
+
+
+def medir(filas=20000, repeticiones=5):
+    """Devuelve {caso: microsegundos por fila} (mejor de las repeticiones)"""
+    fechas = _fechas_de_prueba(filas)
+    casos = {
+        'pytz_fila_a_fila': lambda: [_conversion_pytz(f).strftime('%d/%m/%Y %H:%M') for f in fechas],
+        'desfase_fijo_fila_a_fila': lambda: [a_hora_colombia(f).strftime('%d/%m/%Y %H:%M') for f in fechas],
+        'lote_fecha_y_hora': lambda: formatear_fechas_colombia(fechas, '%d/%m/%Y %H:%M'),
+        'lote_solo_fecha': lambda: formatear_fechas_colombia(fechas, '%d/%m/%Y'),
+    }
+    return {
+        nombre: min(timeit.repeat(funcion, number=1, repeat=repeticiones)) / filas * 1e6
+        for nombre, funcion in casos.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=20000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    resultados = medir(args.filas, args.repeticiones)
+    referencia = resultados['pytz_fila_a_fila']
+    print(f"Conversión a hora de Colombia ({args.filas} filas)")
+    for nombre, microsegundos in resultados.items():
+        print(f"  {nombre:<26} {microsegundos:8.3f} µs/fila  (x{referencia / microsegundos:.1f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Latencia de los escenarios de benchmarks.carga con pytest-benchmark.
+
+Cada ronda es una petición completa (incluido el cuerpo de las exportaciones,
+que se envían por partes). El dialecto, el volumen de datos y los códigos de
+estado quedan en extra_info de cada corrida guardada.
+"""
+import pytest
+
+from benchmarks.carga import ESCENARIOS
+
+
+@pytest.mark.parametrize('nombre', list(ESCENARIOS))
+def test_escenario(benchmark, app_carga, contexto_carga, pytestconfig, nombre):
+    funcion, rondas_relativas = ESCENARIOS[nombre]
+    cliente = app_carga.test_client()
+    estados = {}
+
+    def una_peticion():
+        respuesta = funcion(cliente, contexto_carga)
+        respuesta.get_data()  # Consumir el cuerpo (las exportaciones se envían por partes)
+        respuesta.close()
+        estados[str(respuesta.status_code)] = estados.get(str(respuesta.status_code), 0) + 1
+        return respuesta.status_code
+
+    benchmark.group = 'carga'
+    benchmark.extra_info.update(dialecto=contexto_carga.dialecto, filas=contexto_carga.filas, estados=estados)
+    benchmark.pedantic(una_peticion, rounds=max(1, int(pytestconfig.getoption('rondas') * rondas_relativas)),
+                       warmup_rounds=1)
+
+    # Una respuesta de error mide otra cosa que el escenario
+    assert all(int(estado) < 400 for estado in estados), estados
@@ -1,8 +1,13 @@
-import os
 import logging
+from types import SimpleNamespace
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 # Corregir el import de models para que funcione en App Engine Standard
 from models import Cliente, Producto, Pedido, PedidoProducto
+from utils.resumen_diario import aportes_pedido, aportes_pedidos, cambiar_estado_aportes, registrar_cambio_pedido
+from utils.plan_produccion import ESTADOS_FUERA_DEL_PLAN, aportes_plan, aportes_plan_pedidos, registrar_cambio_plan
+from utils.versiones import incrementar_version
 import datetime
 from datetime import date, timedelta
 
@@ -305,11 +310,56 @@ def validar_datos_pedido(form_data: dict) -> list:
 
     return errors
 
+def _fecha_o_none(valor):
+    """Convierte 'YYYY-MM-DD' en date; None si está vacía o no es válida"""
+    if not valor:
+        return None
+    try:
+        return datetime.date.fromisoformat(valor)
+    except ValueError:
+        return None
+
+def _insertar_cliente_pedido(db: Session, form_data: dict, numero_identificacion: str) -> int:
+    """
+    Inserta el cliente del formulario de registro y devuelve su id, sin releerlo.
+
+    El INSERT va en un savepoint: si otro pedido registró el mismo número de
+    identificación al mismo tiempo, se usa el cliente que ya existe.
+    """
+    direccion = ' '.join(filter(None, (form_data.get('direccion_r_linea1'), form_data.get('direccion_r_linea2'))))
+    valores = dict(
+        nombre_comercial=form_data.get('nombre_comercial_r'),
+        razon_social=form_data.get('razon_social_r'),
+        tipo_identificacion=form_data.get('tipo_identificacion_r'),
+        numero_identificacion=numero_identificacion,
+        email=form_data.get('email_r'),
+        telefono=form_data.get('telefono_r'),
+        direccion=direccion or None,
+        ciudad=form_data.get('direccion_r_ciudad'),
+        departamento=form_data.get('direccion_r_departamento'),
+    )
+    try:
+        with db.begin_nested():
+            cliente_id = db.execute(insert(Cliente).values(**valores)).inserted_primary_key[0]
+    except IntegrityError:
+        cliente_id = db.execute(
+            select(Cliente.id).where(Cliente.numero_identificacion == numero_identificacion)
+        ).scalar()
+        if cliente_id is None:
+            raise
+        return cliente_id
+    incrementar_version(db, 'clientes')
+    return cliente_id
+
 def guardar_pedido_completo(db: Session, form_data: dict) -> tuple:
     """
     Valida y guarda un nuevo pedido, creando un cliente si es necesario.
     Combina la lógica de 'Paso 3. Crear Nuevo Client' y el guardado del pedido.
 
+    El cliente nuevo, el encabezado, los ítems (un solo INSERT por lotes) y el
+    resumen diario se escriben en una única transacción, sin volver a leer lo
+    insertado: si algo falla no queda ni el cliente ni el pedido a medias.
+
     Args:
         db: Sesión de SQLAlchemy.
         form_data: Diccionario con los datos del formulario.
@@ -323,11 +373,13 @@ def guardar_pedido_completo(db: Session, form_data: dict) -> tuple:
     if validation_errors:
         return False, validation_errors
 
-    cliente_id_para_pedido = None
     numero_identificacion_cliente = form_data.get('numero_identificacion_cliente_ingresado')
 
-    # Buscar cliente por número de identificación ingresado
-    cliente_existente = db.query(Cliente).filter(Cliente.numero_identificacion == numero_identificacion_cliente).first()
+    # Buscar cliente por número de identificación ingresado (solo las columnas necesarias)
+    cliente_existente = db.execute(
+        select(Cliente.id, Cliente.nombre_comercial)
+        .where(Cliente.numero_identificacion == numero_identificacion_cliente)
+    ).first()
 
     # PASO 1: CREAR O UBICAR CLIENTE (si es necesario)
     if form_data.get('show_seccion_registro') and not cliente_existente:
@@ -335,55 +387,27 @@ def guardar_pedido_completo(db: Session, form_data: dict) -> tuple:
         # Primero verificamos que tengamos los campos obligatorios
         if not form_data.get('nombre_comercial_r') or not form_data.get('tipo_identificacion_r'):
             return False, ["Información de cliente incompleta. Por favor complete todos los campos requeridos."]
-        
+
         # Usar el número de identificación del formulario principal si el campo de registro está vacío
-        numero_identificacion_registro = form_data.get('numero_identificacion_r')
-        if not numero_identificacion_registro:
-            numero_identificacion_registro = numero_identificacion_cliente
-            
+        numero_identificacion_registro = form_data.get('numero_identificacion_r') or numero_identificacion_cliente
         try:
-            # Crear nuevo cliente en una transacción independiente
-            nuevo_cliente = Cliente(
-                nombre_comercial=form_data.get('nombre_comercial_r'),
-                razon_social=form_data.get('razon_social_r'),
-                tipo_identificacion=form_data.get('tipo_identificacion_r'),
-                numero_identificacion=numero_identificacion_registro,
-                email=form_data.get('email_r'),
-                telefono=form_data.get('telefono_r'),
-                direccion_linea1=form_data.get('direccion_r_linea1'),
-                direccion_linea2=form_data.get('direccion_r_linea2'),
-                direccion_ciudad=form_data.get('direccion_r_ciudad'),
-                direccion_departamento=form_data.get('direccion_r_departamento'),
-                direccion_codigo_postal=form_data.get('direccion_r_codigo_postal'),
-                direccion_pais=form_data.get('direccion_r_pais')
-            )
-            db.add(nuevo_cliente)
-            db.commit()
-            db.refresh(nuevo_cliente)
-            cliente_id_para_pedido = nuevo_cliente.id
-            
-            # Verificar que efectivamente se guardó el cliente
-            cliente_guardado = db.query(Cliente).get(nuevo_cliente.id)
-            if not cliente_guardado:
-                return False, ["Error: El cliente se creó pero no se pudo recuperar de la base de datos."]
-                
-            # Ahora que tenemos el cliente guardado, lo asignamos a cliente_existente
-            cliente_existente = cliente_guardado
-            
+            cliente_id_para_pedido = _insertar_cliente_pedido(db, form_data, numero_identificacion_registro)
         except Exception as e:
             db.rollback()
             return False, [f"Error al crear el cliente: {str(e)}"]
+        nombre_cliente = form_data.get('nombre_comercial_r')
     elif cliente_existente:
         cliente_id_para_pedido = cliente_existente.id
+        nombre_cliente = cliente_existente.nombre_comercial
     else:
         return False, ["Error: No se pudo determinar el cliente para el pedido. Verifique el número de identificación."]
 
-    # PASO 2: CREAR PEDIDO (usando el cliente ya confirmado)
+    # PASO 2: CREAR PEDIDO (en la misma transacción que el cliente)
     try:
-        # Crear el Pedido en una nueva transacción
-        nuevo_pedido = Pedido(
+        cabecera = dict(
+            fecha_creacion=datetime.datetime.utcnow(),
             numero_identificacion_cliente_ingresado=numero_identificacion_cliente,
-            nombre_cliente_ingresado=form_data.get('nombre_cliente_ingresado') if form_data.get('nombre_cliente_ingresado') else cliente_existente.nombre_comercial,
+            nombre_cliente_ingresado=form_data.get('nombre_cliente_ingresado') or nombre_cliente,
             cliente_id=cliente_id_para_pedido,
             alerta=form_data.get('alerta_value'),
             despacho_tipo=form_data.get('despacho_tipo'),
@@ -395,49 +419,125 @@ def guardar_pedido_completo(db: Session, form_data: dict) -> tuple:
             observaciones_despacho=form_data.get('despacho_observaciones'),
             estado_pedido_general=form_data.get('estado_pedido_general', 'En Proceso')
         )
+        pedido_id = db.execute(insert(Pedido).values(**cabecera)).inserted_primary_key[0]
 
-        # Crear los PedidoProducto (items del pedido)
-        for item_data in form_data.get('pedido_items', []):
-            # Convertir fecha de string a objeto date si no está vacía
-            fecha_entrega_obj = None
-            if item_data.get('fecha_de_entrega_item'):
-                try:
-                    fecha_entrega_obj = datetime.date.fromisoformat(item_data.get('fecha_de_entrega_item'))
-                except ValueError:
-                    # Si la fecha no es válida, dejarla como None
-                    fecha_entrega_obj = None
-            
-            # AGREGADO: Calcular fecha_pedido_item (fecha cuando se hace el pedido - hoy)
-            fecha_pedido_item = datetime.date.today()
-            
-            pedido_producto = PedidoProducto(
+        # fecha_pedido_item: fecha cuando se hace el pedido (hoy)
+        fecha_pedido_item = datetime.date.today()
+        items = [
+            dict(
+                pedido_id=pedido_id,
                 producto_id=item_data.get('producto_id'),
-                fecha_pedido_item=fecha_pedido_item,  # AGREGADO: Columna faltante
-                cantidad=int(item_data.get('cantidad')),  # CAMBIADO: De float a int
+                fecha_pedido_item=fecha_pedido_item,
+                cantidad=int(item_data.get('cantidad')),
                 gramaje_g_item=float(item_data.get('gramaje_g_item') or 0),
                 peso_total_g_item=float(item_data.get('peso_total_g_item') or 0),
                 grupo_item=item_data.get('grupo_item'),
                 linea_item=item_data.get('linea_item'),
-                comentarios_item=item_data.get('comentarios_item'),  # CAMBIADO: De observaciones_item a comentarios_item
-                fecha_de_entrega_item=fecha_entrega_obj,
-                estado_del_pedido_item=item_data.get('estado_del_pedido_item', 'Pendiente')
+                comentarios_item=item_data.get('comentarios_item'),
+                fecha_de_entrega_item=_fecha_o_none(item_data.get('fecha_de_entrega_item')),
+                estado_del_pedido_item=item_data.get('estado_del_pedido_item', 'Pendiente'),
+                fecha_creacion=cabecera['fecha_creacion'],
+                fecha_modificacion=cabecera['fecha_creacion'],
             )
-            nuevo_pedido.items.append(pedido_producto)
-        
-        db.add(nuevo_pedido)
+            for item_data in form_data.get('pedido_items', [])
+        ]
+        if items:
+            db.execute(insert(PedidoProducto), items)
+
+        # Sumar el pedido al resumen diario y al plan de producción en la misma transacción
+        pedido_nuevo = SimpleNamespace(**cabecera)
+        items_nuevos = [SimpleNamespace(**item) for item in items]
+        registrar_cambio_pedido(db, despues=aportes_pedido(pedido_nuevo, items_nuevos))
+        registrar_cambio_plan(db, despues=aportes_plan(pedido_nuevo, items_nuevos))
         db.commit()
-        db.refresh(nuevo_pedido)
-        return True, nuevo_pedido.id
+        return True, pedido_id
     except Exception as e:
         db.rollback()
         return False, [f"Error al guardar el pedido: {str(e)}"]
 
+# Estados del pedido que se pueden asignar desde la edición o el cambio masivo
+ESTADOS_PEDIDO = ['En Proceso', 'Programado', 'Cancelado', 'Entregado']
+
+# Pedidos por sentencia en los cambios masivos (límite del IN (...))
+TAMANO_BLOQUE_PEDIDOS = 500
+
+
+def actualizar_estado_pedidos(db: Session, pedido_ids, nuevo_estado: str,
+                              estado_items: str = None, actualizar_pedidos: bool = True) -> dict:
+    """
+    Cambia el estado de muchos pedidos y de sus ítems con sentencias por conjunto.
+
+    Por cada bloque de hasta TAMANO_BLOQUE_PEDIDOS pedidos se ejecuta una
+    consulta agrupada con su aporte actual al resumen diario, un UPDATE sobre
+    pedidos y otro sobre pedido_productos (WHERE pedido_id IN (...)), y una
+    sola escritura de las diferencias en el resumen. Si cambia el estado
+    general, el plan de producción se ajusta igual (cancelar un pedido lo
+    retira del plan). No se carga ningún pedido ni ítem en la sesión. No
+    confirma la transacción.
+
+    Args:
+        db: Sesión de SQLAlchemy.
+        pedido_ids: IDs de los pedidos a actualizar.
+        nuevo_estado: Estado general que se asigna a los pedidos.
+        estado_items: Estado de los ítems; por defecto el mismo estado general
+            (la propagación de 'Estado_del_Pedido_Cambio_' en Deluge).
+        actualizar_pedidos: False para cambiar solo los ítems.
+
+    Returns:
+        dict: {'pedidos': filas actualizadas, 'items': filas actualizadas}
+    """
+    estado_items = nuevo_estado if estado_items is None else estado_items
+    ids = sorted({int(pedido_id) for pedido_id in pedido_ids})
+    actualizados = {'pedidos': 0, 'items': 0}
+
+    for inicio in range(0, len(ids), TAMANO_BLOQUE_PEDIDOS):
+        bloque = ids[inicio:inicio + TAMANO_BLOQUE_PEDIDOS]
+        antes = aportes_pedidos(db, bloque)
+        if actualizar_pedidos:
+            plan_antes = aportes_plan_pedidos(db, bloque)
+            plan_despues = {} if nuevo_estado in ESTADOS_FUERA_DEL_PLAN else \
+                aportes_plan_pedidos(db, bloque, incluir_fuera=True)
+
+        if actualizar_pedidos:
+            actualizados['pedidos'] += db.execute(
+                update(Pedido).where(Pedido.id.in_(bloque)).values(estado_pedido_general=nuevo_estado)
+            ).rowcount
+        actualizados['items'] += db.execute(
+            update(PedidoProducto).where(PedidoProducto.pedido_id.in_(bloque))
+            .values(estado_del_pedido_item=estado_items)
+        ).rowcount
+
+        despues = cambiar_estado_aportes(
+            antes, estado_pedido=nuevo_estado if actualizar_pedidos else None, estado_item=estado_items
+        )
+        registrar_cambio_pedido(db, antes, despues)
+        if actualizar_pedidos:
+            registrar_cambio_plan(db, plan_antes, plan_despues)
+
+    return actualizados
+
+
+def pedidos_con_entrega(db: Session, fecha_entrega, estado_actual: str = None) -> list:
+    """IDs de los pedidos con algún ítem para entregar en la fecha (opcionalmente en un estado)"""
+    consulta = select(PedidoProducto.pedido_id).where(
+        PedidoProducto.fecha_de_entrega_item == fecha_entrega
+    ).distinct()
+    if estado_actual:
+        consulta = consulta.join(Pedido, PedidoProducto.pedido_id == Pedido.id).where(
+            Pedido.estado_pedido_general == estado_actual
+        )
+    return list(db.scalars(consulta))
+
+
 def actualizar_estado_items_pedido(db: Session, pedido_id: int, nuevo_estado_general: str) -> bool:
     """
     Actualiza el campo 'estado_del_pedido_item' de todos los ítems de un pedido
     cuando el 'estado_pedido_general' del pedido cambia.
     Corresponde a la lógica de 'Estado_del_Pedido_Cambio_' en Deluge.
 
+    El estado general lo asigna quien llama (la UI/controlador); aquí solo se
+    propaga a los ítems con un único UPDATE.
+
     Args:
         db: Sesión de SQLAlchemy.
         pedido_id: El ID del pedido cuyo estado general ha cambiado.
@@ -447,21 +547,11 @@ def actualizar_estado_items_pedido(db: Session, pedido_id: int, nuevo_estado_gen
         bool: True si la actualización fue exitosa, False en caso contrario.
     """
     try:
-        pedido = db.query(Pedido).filter(Pedido.id == pedido_id).first()
-        if not pedido:
+        if db.get(Pedido, pedido_id) is None:
             print(f"Error: Pedido con ID {pedido_id} no encontrado.")
             return False
 
-        for item in pedido.items: # type: ignore
-            item.estado_del_pedido_item = nuevo_estado_general
-        
-        # Es importante también actualizar el estado general del pedido mismo.
-        # La lógica de Deluge parece implicar que el cambio en el campo del formulario Pedidos
-        # es lo que dispara esta acción, por lo que el estado del Pedido principal ya estaría
-        # siendo actualizado por la UI/controlador antes de llamar a esta función específica para los items.
-        # Si esta función es el ÚNICO lugar donde se actualiza el estado, entonces también deberías hacer:
-        # pedido.estado_pedido_general = nuevo_estado_general
-        
+        actualizar_estado_pedidos(db, [pedido_id], nuevo_estado_general, actualizar_pedidos=False)
         db.commit()
         return True
     except Exception as e:
@@ -470,14 +560,15 @@ def actualizar_estado_items_pedido(db: Session, pedido_id: int, nuevo_estado_gen
         return False
 
 # --- Lógica para importar productos desde Excel ---
-# Necesitarás instalar la librería openpyxl: pip install openpyxl
-import openpyxl
+# La lectura, validación y escritura por lotes están en utils.importacion_productos
+# (se importa al usarla para no cargar pandas al iniciar la aplicación)
 
 def importar_productos_desde_excel(db: Session, archivo_excel_path: str) -> tuple:
     """
     Importa productos a la base de datos desde un archivo Excel.
     Espera columnas específicas en el archivo Excel:
     'Codigo', 'Referencia de Producto', 'Gramaje (g)', 'Formulacion/Grupo', 'Categoria/Linea'
+    (también se aceptan los nombres de la plantilla: codigo, referencia_de_producto, ...)
 
     Args:
         db: Sesión de SQLAlchemy.
@@ -486,151 +577,22 @@ def importar_productos_desde_excel(db: Session, archivo_excel_path: str) -> tupl
     Returns:
         tuple: (success: bool, message: str, importados: int, actualizados: int, errores: list)
     """
-    importados_count = 0
-    actualizados_count = 0
-    errores_list = []
+    from utils.importacion_productos import importar_productos
 
     try:
-        workbook = openpyxl.load_workbook(archivo_excel_path)
-        sheet = workbook.active # Asume que los datos están en la primera hoja activa
-
-        # Asumir que la primera fila es de encabezados
-        headers = [cell.value for cell in sheet[1]]
-        # Mapeo esperado de encabezados (sensible a mayúsculas/minúsculas tal como está)
-        # Podrías hacerlo insensible a mayúsculas/minúsculas y normalizar espacios si es necesario
-        expected_headers = {
-            'Codigo': 'codigo',
-            'Referencia de Producto': 'referencia_de_producto',
-            'Gramaje (g)': 'gramaje_g',
-            'Formulacion/Grupo': 'formulacion_grupo',
-            'Categoria/Linea': 'categoria_linea'
-        }
-        
-        # Validar encabezados
-        column_map = {}
-        for expected_header, model_field in expected_headers.items():
-            try:
-                column_map[model_field] = headers.index(expected_header)
-            except ValueError:
-                errores_list.append(f"Encabezado esperado no encontrado: '{expected_header}'")
-        
-        if errores_list: # Si faltan encabezados cruciales, no continuar
-            return False, "Error en encabezados del Excel.", 0, 0, errores_list
-
-        for row_idx, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
-            if not any(row): # Omitir filas completamente vacías
-                continue
-
-            try:
-                codigo = row[column_map['codigo']]
-                if not codigo:
-                    errores_list.append(f"Fila {row_idx}: El campo 'Codigo' es obligatorio.")
-                    continue
-                
-                referencia = row[column_map['referencia_de_producto']]
-                if not referencia:
-                    errores_list.append(f"Fila {row_idx}, Código '{codigo}': El campo 'Referencia de Producto' es obligatorio.")
-                    continue
-
-                try:
-                    gramaje_str = str(row[column_map['gramaje_g']])
-                    if not gramaje_str:
-                         errores_list.append(f"Fila {row_idx}, Código '{codigo}': El campo 'Gramaje (g)' es obligatorio.")
-                         continue
-                    gramaje = float(gramaje_str)
-                    if gramaje <= 0:
-                        errores_list.append(f"Fila {row_idx}, Código '{codigo}': El gramaje debe ser un número positivo.")
-                        continue
-                except (ValueError, TypeError):
-                    errores_list.append(f"Fila {row_idx}, Código '{codigo}': Valor inválido para 'Gramaje (g)'. Debe ser un número.")
-                    continue
-
-                formulacion = row[column_map['formulacion_grupo']]
-                categoria = row[column_map['categoria_linea']]
-
-                # Buscar si el producto ya existe por código
-                producto_existente = db.query(Producto).filter(Producto.codigo == str(codigo)).first()
-
-                if producto_existente:
-                    # Actualizar producto existente
-                    producto_existente.referencia_de_producto = referencia
-                    producto_existente.gramaje_g = gramaje
-                    producto_existente.formulacion_grupo = formulacion
-                    producto_existente.categoria_linea = categoria
-                    actualizados_count += 1
-                else:
-                    # Crear nuevo producto
-                    nuevo_producto = Producto(
-                        codigo=str(codigo),
-                        referencia_de_producto=referencia,
-                        gramaje_g=gramaje,
-                        formulacion_grupo=formulacion,
-                        categoria_linea=categoria
-                    )
-                    db.add(nuevo_producto)
-                    importados_count += 1
-            
-            except IndexError:
-                 errores_list.append(f"Fila {row_idx}: Número incorrecto de columnas o datos faltantes.")
-                 continue # Saltar a la siguiente fila
-            except Exception as e:
-                errores_list.append(f"Fila {row_idx}, Código '{codigo if 'codigo' in locals() else 'desconocido'}': Error inesperado - {str(e)}")
-                continue
-
-        db.commit()
-        if not errores_list:
-            return True, "Importación completada exitosamente.", importados_count, actualizados_count, []
-        else:
-            return True, f"Importación completada con {len(errores_list)} errores.", importados_count, actualizados_count, errores_list
-
+        resultado = importar_productos(db, archivo_excel_path)
     except FileNotFoundError:
         return False, f"Archivo no encontrado: {archivo_excel_path}", 0, 0, [f"Archivo no encontrado: {archivo_excel_path}"]
+    except ValueError as e:
+        return False, "Error en encabezados del Excel.", 0, 0, [str(e)]
     except Exception as e:
         db.rollback()
         return False, f"Error durante la importación: {str(e)}", 0, 0, [f"Error general: {str(e)}"]
 
-# Caché simple para productos (evita consultas repetitivas)
-_productos_cache = None
-_cache_timestamp = None
-CACHE_DURATION = 300  # 5 minutos en segundos
-
-def get_productos_cached(db):
-    """Obtiene productos desde caché o base de datos"""
-    global _productos_cache, _cache_timestamp
-    import time
-    
-    current_time = time.time()
-    
-    # Verificar si el caché es válido
-    if (_productos_cache is None or 
-        _cache_timestamp is None or 
-        (current_time - _cache_timestamp) > CACHE_DURATION):
-        
-        # Actualizar caché
-        productos = db.query(Producto).all()
-        _productos_cache = [
-            {
-                "id": p.id,
-                "codigo": p.codigo,
-                "referencia_de_producto": p.referencia_de_producto,
-                "gramaje_g": p.gramaje_g,
-                "formulacion_grupo": p.formulacion_grupo,
-                "categoria_linea": p.categoria_linea
-            }
-            for p in productos
-        ]
-        _cache_timestamp = current_time
-        
-        if os.getenv('FLASK_ENV') != 'production':
-            logger.info(f"Caché de productos actualizado: {len(_productos_cache)} productos")
-    
-    return _productos_cache
-
-def invalidate_productos_cache():
-    """Invalida el caché de productos"""
-    global _productos_cache, _cache_timestamp
-    _productos_cache = None
-    _cache_timestamp = None
+    errores_list = resultado.mensajes_error()
+    if not errores_list:
+        return True, "Importación completada exitosamente.", resultado.insertados, resultado.actualizados, []
+    return True, f"Importación completada con {len(errores_list)} errores.", resultado.insertados, resultado.actualizados, errores_list
 
 def calcular_fecha_minima_entrega(fecha_base=None):
     """
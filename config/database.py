@@ -1,8 +1,12 @@
 import os
 import logging
+import threading
 from sqlalchemy import create_engine, text, inspect
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.orm import sessionmaker, scoped_session, Session
+from flask import g, has_app_context, has_request_context
 from models import Base
+from config.pool_bd import configuracion_pool
+from utils.metricas_bd import MetricasPool, clase_pool_medido, instrumentar_engine
 from dotenv import load_dotenv
 import pymysql
 
@@ -26,12 +30,64 @@ else:
 # Variable global para evitar múltiples inicializaciones
 _DATABASE_INITIALIZED = False
 
+# Arranque rápido (App Engine): el engine se crea con la primera consulta y no
+# se verifica el esquema al iniciar; se aplica con `python gestionar_bd.py migrar`
+ARRANQUE_RAPIDO = os.getenv('ARRANQUE_RAPIDO', '0') == '1'
+# Con arranque rápido, 'segundo_plano' verifica el esquema una vez por proceso en un hilo aparte;
+# mientras no termine, /readiness responde 503. Los yaml de despliegue no lo usan: el esquema
+# se migra antes de desplegar (migrar-bd.sh)
+VERIFICAR_ESQUEMA = os.getenv('VERIFICAR_ESQUEMA', '')
+
+class SesionPeticion(Session):
+    """
+    Sesión de una petición HTTP (unidad de trabajo de la petición).
+
+    Toma una sola conexión del pool la primera vez que se usa y la conserva
+    entre commits hasta el final de la petición, de modo que la ruta y todas
+    las funciones auxiliares que llaman a db_config.get_session() comparten
+    la misma conexión. Los close() que se hagan durante la petición no la
+    cierran: la cierra DatabaseConfig.remove_session() en el teardown, también
+    cuando la petición termina con una excepción.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._conexion = None
+        self._en_peticion = True
+
+    def get_bind(self, mapper=None, **kwargs):
+        if self._conexion is None or self._conexion.closed:
+            self._conexion = super().get_bind(mapper, **kwargs).connect()
+        return self._conexion
+
+    def close(self):
+        if self._en_peticion:
+            return  # Se cierra al terminar la petición
+        super().close()
+
+    def finalizar(self):
+        """Revierte lo no confirmado, cierra la sesión y devuelve la conexión al pool"""
+        self._en_peticion = False
+        try:
+            super().close()
+        finally:
+            if self._conexion is not None:
+                self._conexion.close()
+                self._conexion = None
+
 class DatabaseConfig:
     """Configuración de la base de datos para la aplicación"""
     
     def __init__(self):
-        self.engine = None
+        self._engine = None
+        self._lock_engine = threading.Lock()
         self.SessionLocal = None
+        self.SesionPeticionLocal = None
+        self.metricas = MetricasPool()
+        # Verificación de esquema en segundo plano aún sin terminar con éxito
+        self.esquema_pendiente = False
+        if ARRANQUE_RAPIDO:
+            return  # El engine se crea en el primer uso (ver engine)
         # Solo inicializar si no se ha hecho antes
         global _DATABASE_INITIALIZED
         if not _DATABASE_INITIALIZED:
@@ -41,20 +97,75 @@ class DatabaseConfig:
             # Si ya se inicializó, solo configurar el engine y session
             self._setup_existing_connection()
         
+    @property
+    def engine(self):
+        """Engine de SQLAlchemy; con arranque rápido se crea la primera vez que se usa"""
+        if self._engine is None and ARRANQUE_RAPIDO:
+            self._crear_engine_diferido()
+        return self._engine
+
+    @engine.setter
+    def engine(self, valor):
+        self._engine = valor
+
+    def _crear_engine_diferido(self):
+        """Crea el engine y las sesiones sin conectarse ni verificar el esquema"""
+        with self._lock_engine:
+            if self._engine is not None:
+                return
+            engine = self._get_database_url()
+            self._configurar_sesiones(engine)
+            # Se publica al final: quien vea el engine ya tiene las sesiones listas
+            self._engine = engine
+        if VERIFICAR_ESQUEMA == 'segundo_plano':
+            self.esquema_pendiente = True
+            threading.Thread(target=self._verificar_esquema_seguro, name='verificar-esquema', daemon=True).start()
+
+    def _verificar_esquema_seguro(self):
+        try:
+            self.verificar_esquema()
+            self.esquema_pendiente = False
+        except Exception as e:
+            logger.error(f"Error verificando el esquema en segundo plano: {e}")
+
+    def verificar_esquema(self):
+        """Crea tablas, índices y columnas faltantes (ver config/migraciones.py)"""
+        from config.migraciones import verificar_esquema
+        return verificar_esquema(self.engine)
+
     def _setup_existing_connection(self):
         """Configura la conexión usando la configuración existente"""
         try:
             self.engine = self._get_database_url()
-            self.SessionLocal = scoped_session(
-                sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
-            )
+            self._configurar_sesiones()
         except Exception as e:
             if os.getenv('ENV') != 'production':
                 logger.error(f"Error configurando conexión existente: {e}")
             raise
         
+    def _parametros_pool(self):
+        """Parámetros del pool (tamaño según instancia y gunicorn) y clase de pool instrumentada"""
+        configuracion = configuracion_pool()
+        self.metricas.configuracion = configuracion
+        parametros = {clave: valor for clave, valor in configuracion.items() if clave != 'calculo'}
+        if os.getenv('FLASK_ENV') != 'production':
+            logger.info(f"Pool de conexiones: {parametros} ({configuracion['calculo']})")
+        return dict(parametros, poolclass=clase_pool_medido(self.metricas), pool_pre_ping=True)
+
     def _get_database_url(self):
         """Obtiene la URL de conexión a la base de datos según el entorno"""
+        database_url = os.getenv('DATABASE_URL')
+        if database_url:
+            # URL explícita: docker-compose, MySQL local en un contenedor, benchmarks
+            if os.getenv('FLASK_ENV') != 'production':
+                logger.info(f"Usando DATABASE_URL ({database_url.split('://', 1)[0]})")
+            if database_url.startswith('sqlite'):
+                connect_args = {"check_same_thread": False}
+            elif database_url.startswith('mysql'):
+                connect_args = {"charset": "utf8mb4"}
+            else:
+                connect_args = {}
+            return create_engine(database_url, **self._parametros_pool(), connect_args=connect_args, echo=False)
         if os.getenv('ENV') == 'production' or os.getenv('GAE_ENV') == 'standard':
             # Configuración para Cloud SQL en App Engine
             db_user = os.getenv('DB_USER')
@@ -77,12 +188,8 @@ class DatabaseConfig:
             try:
                 return create_engine(
                     f'mysql+pymysql://{db_user}:{db_pass}@/{db_name}?unix_socket={unix_socket_path}',
-                    # OPTIMIZACIONES DE RENDIMIENTO:
-                    pool_size=10,           # Aumentado de 5 a 10
-                    max_overflow=20,        # Aumentado de 2 a 20
-                    pool_timeout=60,        # Aumentado de 30 a 60
-                    pool_recycle=3600,      # Aumentado de 1800 a 3600 (1 hora)
-                    pool_pre_ping=True,
+                    # Tamaño del pool según clase de instancia, workers y threads (config/pool_bd.py)
+                    **self._parametros_pool(),
                     # Configuraciones adicionales para mejor rendimiento
                     connect_args={
                         "charset": "utf8mb4",
@@ -106,7 +213,7 @@ class DatabaseConfig:
                 logger.info(f"Usando SQLite en modo desarrollo: {db_path}")
             return create_engine(
                 f"sqlite:///{db_path}",
-                pool_pre_ping=True,
+                **self._parametros_pool(),
                 connect_args={"check_same_thread": False},
                 echo=False
             )
@@ -125,44 +232,10 @@ class DatabaseConfig:
             # Solo log si es necesario
             if os.getenv('FLASK_ENV') != 'production':
                 logger.info("Verificando estructura de la tabla productos...")
-            
-            # Obtener columnas existentes
-            with self.engine.connect() as conn:
-                result = conn.execute(text("""
-                    SELECT COLUMN_NAME 
-                    FROM INFORMATION_SCHEMA.COLUMNS 
-                    WHERE TABLE_SCHEMA = DATABASE() 
-                    AND TABLE_NAME = 'productos'
-                """))
-                existing_columns = [row[0] for row in result.fetchall()]
-            
-            # Definir columnas requeridas
-            required_columns = {
-                'descripcion': "ALTER TABLE productos ADD COLUMN descripcion TEXT",
-                'precio_unitario': "ALTER TABLE productos ADD COLUMN precio_unitario DECIMAL(10,2) DEFAULT 0",
-                'unidad_medida': "ALTER TABLE productos ADD COLUMN unidad_medida VARCHAR(20) DEFAULT 'unidad'",
-                'estado': "ALTER TABLE productos ADD COLUMN estado VARCHAR(20) DEFAULT 'activo'",
-                'fecha_creacion': "ALTER TABLE productos ADD COLUMN fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP",
-                'fecha_modificacion': "ALTER TABLE productos ADD COLUMN fecha_modificacion DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
-            }
-            
+
             # Agregar columnas faltantes SILENCIOSAMENTE
-            missing_columns = []
-            with self.engine.begin() as conn:
-                for column_name, alter_sql in required_columns.items():
-                    if column_name not in existing_columns:
-                        try:
-                            conn.execute(text(alter_sql))
-                            missing_columns.append(column_name)
-                        except Exception as e:
-                            # SILENCIAR logs duplicados - solo log de errores reales
-                            if "Duplicate column name" not in str(e):
-                                if os.getenv('FLASK_ENV') != 'production':
-                                    logger.error(f"❌ Error agregando columna '{column_name}': {e}")
-            
-            # Log final SOLO si hubo cambios
-            if missing_columns and os.getenv('FLASK_ENV') != 'production':
-                logger.info(f"Se agregaron {len(missing_columns)} columnas faltantes: {missing_columns}")
+            from config.migraciones import reparar_columnas_productos
+            reparar_columnas_productos(self.engine)
                 
         except Exception as e:
             if os.getenv('ENV') != 'production':
@@ -190,9 +263,7 @@ class DatabaseConfig:
             self._verify_and_fix_productos_table()
             
             # Configurar la sesión de SQLAlchemy
-            self.SessionLocal = scoped_session(
-                sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
-            )
+            self._configurar_sesiones()
             
         except Exception as e:
             if os.getenv('ENV') != 'production':
@@ -234,16 +305,48 @@ class DatabaseConfig:
                 # Si ambos métodos fallan, asumir que las tablas ya existen
                 pass
         
+    def _configurar_sesiones(self, engine=None):
+        """Crea las fábricas de sesiones e instrumenta el pool del engine"""
+        engine = engine or self._engine
+        instrumentar_engine(engine, self.metricas)
+        self.SessionLocal = scoped_session(
+            sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        )
+        self.SesionPeticionLocal = sessionmaker(
+            class_=SesionPeticion, autocommit=False, autoflush=False, bind=engine
+        )
+        
     def get_session(self):
-        """Obtiene una nueva sesión de base de datos"""
+        """
+        Obtiene la sesión de base de datos.
+
+        Dentro de una petición HTTP devuelve siempre la misma SesionPeticion
+        (se crea la primera vez y no toma conexión hasta la primera consulta).
+        Fuera de una petición (trabajos en segundo plano, scripts) devuelve la
+        sesión del hilo actual.
+        """
+        if self._engine is None and ARRANQUE_RAPIDO:
+            self._crear_engine_diferido()
         if not self.SessionLocal:
             if os.getenv('ENV') != 'production':
                 logger.error("Se intentó obtener una sesión sin inicializar la base de datos")
             raise RuntimeError("Base de datos no inicializada")
+        if has_request_context():
+            sesion = g.get('_sesion_bd')
+            if sesion is None:
+                sesion = g._sesion_bd = self.SesionPeticionLocal()
+            return sesion
         return self.SessionLocal()
     
     def remove_session(self):
-        """Remueve las sesiones del scope actual"""
+        """Cierra la sesión de la petición (si la hay) y remueve las sesiones del scope actual"""
+        if has_app_context():
+            sesion = g.pop('_sesion_bd', None)
+            try:
+                if sesion is not None:
+                    sesion.finalizar()
+            finally:
+                self.metricas.registrar_fin_peticion()
         if self.SessionLocal:
             self.SessionLocal.remove()
     
@@ -253,6 +356,8 @@ class DatabaseConfig:
             db = self.get_session()
             try:
                 result = db.execute(text('SELECT 1')).fetchone()
+                if self.esquema_pendiente:
+                    return False, "Schema verification pending"
                 if result[0] == 1:
                     return True, "Database connection healthy"
                 else:
@@ -0,0 +1,183 @@
+"""
+Migraciones de esquema idempotentes.
+
+Crea las tablas, columnas e índices declarados en models.py que todavía no
+existen en la base de datos y agrega a la tabla productos de MySQL las
+columnas que le faltan a las instalaciones antiguas. También construye desde
+los pedidos las tablas derivadas (resumen diario y plan de producción) la
+primera vez. Se puede ejecutar las veces que sea necesario:
+
+    python gestionar_bd.py migrar
+"""
+import logging
+
+from sqlalchemy import inspect, text
+
+from models import Base
+
+logger = logging.getLogger(__name__)
+
+# Columnas agregadas a productos después de las primeras instalaciones (solo MySQL)
+COLUMNAS_PRODUCTOS = {
+    'descripcion': "ALTER TABLE productos ADD COLUMN descripcion TEXT",
+    'precio_unitario': "ALTER TABLE productos ADD COLUMN precio_unitario DECIMAL(10,2) DEFAULT 0",
+    'unidad_medida': "ALTER TABLE productos ADD COLUMN unidad_medida VARCHAR(20) DEFAULT 'unidad'",
+    'estado': "ALTER TABLE productos ADD COLUMN estado VARCHAR(20) DEFAULT 'activo'",
+    'fecha_creacion': "ALTER TABLE productos ADD COLUMN fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP",
+    'fecha_modificacion': "ALTER TABLE productos ADD COLUMN fecha_modificacion DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+}
+
+
+def _columnas_indexadas(inspector, tabla):
+    """Listas de columnas ya cubiertas por un índice o una restricción única"""
+    existentes = set()
+    for indice in inspector.get_indexes(tabla):
+        existentes.add(tuple(indice['column_names']))
+    for unica in inspector.get_unique_constraints(tabla):
+        existentes.add(tuple(unica['column_names']))
+    pk = inspector.get_pk_constraint(tabla).get('constrained_columns') or []
+    if pk:
+        existentes.add(tuple(pk))
+    return existentes
+
+
+def aplicar_migraciones(engine):
+    """
+    Crea las tablas e índices faltantes.
+
+    Un índice se considera existente si hay otro con las mismas columnas en el
+    mismo orden, aunque tenga un nombre distinto.
+
+    Returns:
+        tuple: (tablas_creadas, indices_creados) con los nombres de cada uno.
+    """
+    inspector = inspect(engine)
+    tablas_existentes = set(inspector.get_table_names())
+
+    faltantes = [tabla for nombre, tabla in Base.metadata.tables.items() if nombre not in tablas_existentes]
+    if faltantes:
+        # create_all crea también los índices de las tablas nuevas
+        Base.metadata.create_all(bind=engine, tables=faltantes)
+
+    indices_creados = []
+    for tabla in Base.metadata.sorted_tables:
+        if tabla.name not in tablas_existentes:
+            continue
+        existentes = _columnas_indexadas(inspector, tabla.name)
+        for indice in sorted(tabla.indexes, key=lambda i: i.name):
+            columnas = tuple(columna.name for columna in indice.columns)
+            if columnas in existentes:
+                continue
+            indice.create(bind=engine)
+            existentes.add(columnas)
+            indices_creados.append(indice.name)
+            logger.info(f"Índice creado: {indice.name} en {tabla.name}{columnas}")
+
+    return [tabla.name for tabla in faltantes], indices_creados
+
+
+def reparar_columnas_productos(engine):
+    """
+    Agrega a la tabla productos de MySQL las columnas de COLUMNAS_PRODUCTOS que falten.
+
+    Returns:
+        list: Nombres de las columnas agregadas.
+    """
+    if engine.dialect.name != 'mysql':
+        return []
+
+    with engine.connect() as conn:
+        existentes = {fila[0] for fila in conn.execute(text("""
+            SELECT COLUMN_NAME
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = 'productos'
+        """))}
+
+    agregadas = []
+    with engine.begin() as conn:
+        for columna, alter_sql in COLUMNAS_PRODUCTOS.items():
+            if columna in existentes:
+                continue
+            try:
+                conn.execute(text(alter_sql))
+                agregadas.append(columna)
+            except Exception as e:
+                # Otra instancia pudo agregarla al mismo tiempo
+                if "Duplicate column name" not in str(e):
+                    logger.error(f"Error agregando la columna '{columna}' a productos: {e}")
+    if agregadas:
+        logger.info(f"Columnas agregadas a productos: {agregadas}")
+    return agregadas
+
+
+def agregar_columnas_faltantes(engine):
+    """
+    Agrega las columnas nulables de models.py que falten en tablas existentes.
+
+    Las columnas NOT NULL sin valor por defecto no se pueden agregar a una
+    tabla con filas y se omiten.
+
+    Returns:
+        list: Columnas agregadas como "tabla.columna".
+    """
+    inspector = inspect(engine)
+    tablas_existentes = set(inspector.get_table_names())
+    agregadas = []
+    for tabla in Base.metadata.sorted_tables:
+        if tabla.name not in tablas_existentes:
+            continue
+        existentes = {columna['name'] for columna in inspector.get_columns(tabla.name)}
+        for columna in tabla.columns:
+            if columna.name in existentes or not columna.nullable:
+                continue
+            tipo = columna.type.compile(dialect=engine.dialect)
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {tabla.name} ADD COLUMN {columna.name} {tipo}"))
+                agregadas.append(f"{tabla.name}.{columna.name}")
+            except Exception as e:
+                # Otra instancia pudo agregarla al mismo tiempo
+                if 'duplicate column' not in str(e).lower():
+                    logger.error(f"Error agregando la columna '{columna.name}' a {tabla.name}: {e}")
+    if agregadas:
+        logger.info(f"Columnas agregadas: {agregadas}")
+    return agregadas
+
+
+def construir_tablas_derivadas(engine):
+    """
+    Construye desde los pedidos las tablas derivadas que todavía no están marcadas como construidas.
+
+    Returns:
+        list: Nombres de las tablas construidas.
+    """
+    from utils.plan_produccion import construir_plan_produccion
+    from utils.resumen_diario import construir_resumen_diario
+
+    construidas = []
+    for nombre, construir in (('resumen_diario_productos', construir_resumen_diario),
+                              ('plan_produccion', construir_plan_produccion)):
+        filas = construir(engine)
+        if filas is not None:
+            construidas.append(nombre)
+            logger.info(f"Tabla {nombre} construida: {filas} filas")
+    return construidas
+
+
+def verificar_esquema(engine):
+    """
+    Aplica todas las migraciones (tablas, columnas, índices, claves de búsqueda,
+    índices de texto completo y tablas derivadas).
+
+    Returns:
+        tuple: (tablas_creadas, indices_creados, columnas_agregadas)
+    """
+    from utils.busqueda_texto import crear_indices_texto, rellenar_claves_busqueda
+
+    columnas = reparar_columnas_productos(engine) + agregar_columnas_faltantes(engine)
+    tablas, indices = aplicar_migraciones(engine)
+    rellenar_claves_busqueda(engine)
+    indices += crear_indices_texto(engine)
+    construir_tablas_derivadas(engine)
+    return tablas, indices, columnas
@@ -0,0 +1,118 @@
+"""
+Dimensionamiento del pool de conexiones a la base de datos.
+
+Cada proceso de gunicorn (worker) tiene su propio pool, así que el número de
+conexiones que abre una instancia es workers × (pool_size + max_overflow).
+Los valores se calculan a partir de:
+
+- La clase de instancia de App Engine (INSTANCE_CLASS: F1, F2, F4, F4_1G),
+  que fija el presupuesto de conexiones de la instancia y los workers por
+  defecto del entrypoint de App Engine.
+- Los workers y threads reales de gunicorn (argumentos de la línea de
+  comandos, GUNICORN_CMD_ARGS, WEB_CONCURRENCY o GUNICORN_THREADS).
+- Los hilos de trabajos en segundo plano (TRABAJOS_MAX_HILOS), que también
+  toman conexiones del pool.
+
+Las variables MYSQL_POOL_SIZE, MYSQL_MAX_OVERFLOW, MYSQL_POOL_TIMEOUT y
+MYSQL_POOL_RECYCLE (app.yaml) tienen prioridad sobre lo calculado.
+"""
+import logging
+import os
+import shlex
+import sys
+
+logger = logging.getLogger(__name__)
+
+# Por clase de instancia: conexiones totales que puede abrir la instancia,
+# workers del entrypoint por defecto de App Engine, timeout y reciclado
+PERFILES_INSTANCIA = {
+    'F1': {'conexiones': 6, 'workers': 2, 'pool_timeout': 15, 'pool_recycle': 900},
+    'F2': {'conexiones': 12, 'workers': 4, 'pool_timeout': 30, 'pool_recycle': 1800},
+    'F4': {'conexiones': 24, 'workers': 8, 'pool_timeout': 30, 'pool_recycle': 3600},
+    'F4_1G': {'conexiones': 24, 'workers': 8, 'pool_timeout': 30, 'pool_recycle': 3600},
+}
+# Fuera de App Engine (desarrollo local, Procfile) sin clase de instancia declarada
+PERFIL_LOCAL = {'conexiones': 30, 'workers': 1, 'pool_timeout': 30, 'pool_recycle': 3600}
+
+
+def _entero_env(nombre, predeterminado=None):
+    valor = os.getenv(nombre)
+    if valor in (None, ''):
+        return predeterminado
+    try:
+        return int(valor)
+    except ValueError:
+        logger.warning(f"Valor inválido para {nombre}: {valor!r}, se ignora")
+        return predeterminado
+
+
+def _argumento_gunicorn(opciones):
+    """Valor de una opción de gunicorn (--workers / -w ...) en la línea de comandos o GUNICORN_CMD_ARGS"""
+    argumentos = shlex.split(os.getenv('GUNICORN_CMD_ARGS', ''))
+    if 'gunicorn' in os.path.basename(sys.argv[0]):
+        argumentos += sys.argv[1:]
+    valor = None
+    for i, argumento in enumerate(argumentos):
+        for opcion in opciones:
+            if argumento == opcion and i + 1 < len(argumentos):
+                valor = argumentos[i + 1]
+            elif argumento.startswith(opcion + '='):
+                valor = argumento.split('=', 1)[1]
+    try:
+        return int(valor) if valor is not None else None
+    except ValueError:
+        return None
+
+
+def concurrencia_gunicorn(perfil):
+    """(workers, threads) de gunicorn para esta instancia"""
+    workers = (_argumento_gunicorn(('--workers', '-w'))
+               or _entero_env('WEB_CONCURRENCY')
+               or _entero_env('GUNICORN_WORKERS')
+               or perfil['workers'])
+    threads = (_argumento_gunicorn(('--threads',))
+               or _entero_env('GUNICORN_THREADS')
+               or _entero_env('PYTHON_THREADS')
+               or 1)
+    return max(1, workers), max(1, threads)
+
+
+def configuracion_pool():
+    """
+    Parámetros del pool para create_engine.
+
+    pool_size cubre las peticiones simultáneas de un worker (threads) más
+    los hilos de trabajos en segundo plano; max_overflow usa lo que quede del
+    presupuesto de conexiones de la instancia repartido entre los workers.
+
+    Returns:
+        dict con pool_size, max_overflow, pool_timeout y pool_recycle, más
+        'calculo' con los datos usados (se muestra en /metricas/bd).
+    """
+    clase = (os.getenv('INSTANCE_CLASS') or '').upper()
+    perfil = PERFILES_INSTANCIA.get(clase, PERFIL_LOCAL)
+    workers, threads = concurrencia_gunicorn(perfil)
+    hilos_trabajos = _entero_env('TRABAJOS_MAX_HILOS', 2)
+
+    presupuesto = _entero_env('MYSQL_CONEXIONES_INSTANCIA', perfil['conexiones'])
+    por_worker = max(2, presupuesto // workers)
+    demanda = threads + hilos_trabajos
+
+    pool_size = min(demanda, por_worker)
+    max_overflow = max(0, por_worker - pool_size)
+
+    configuracion = {
+        'pool_size': _entero_env('MYSQL_POOL_SIZE', pool_size),
+        'max_overflow': _entero_env('MYSQL_MAX_OVERFLOW', max_overflow),
+        'pool_timeout': _entero_env('MYSQL_POOL_TIMEOUT', perfil['pool_timeout']),
+        'pool_recycle': _entero_env('MYSQL_POOL_RECYCLE', perfil['pool_recycle']),
+    }
+    configuracion['calculo'] = {
+        'clase_instancia': clase or None,
+        'workers': workers,
+        'threads': threads,
+        'hilos_trabajos': hilos_trabajos,
+        'presupuesto_instancia': presupuesto,
+        'conexiones_maximas_instancia': workers * (configuracion['pool_size'] + configuracion['max_overflow']),
+    }
+    return configuracion
@@ -42,6 +42,9 @@ echo ""
 echo "🚀 Iniciando despliegue del Portal de Clientes..."
 echo ""
 
+# Migrar el esquema antes de desplegar (las instancias no lo modifican al arrancar)
+./migrar-bd.sh app-cliente.yaml || { echo "❌ Las migraciones fallaron; no se despliega."; exit 1; }
+
 # Desplegar la aplicación
 gcloud app deploy app-cliente.yaml --quiet
 
@@ -32,6 +32,10 @@ echo ""
 echo "📤 Subiendo cambios a Git..."
 git push origin main
 
+# Migrar el esquema antes de desplegar (las instancias no lo modifican al arrancar)
+echo ""
+./migrar-bd.sh app-f1.yaml || { echo "❌ Las migraciones fallaron; no se despliega."; exit 1; }
+
 # Desplegar a App Engine
 echo ""
 echo "☁️  Desplegando a Google App Engine..."
@@ -44,6 +44,9 @@ if ! gcloud app describe >/dev/null 2>&1; then
     gcloud app create --region=$REGION
 fi
 
+# Migrar el esquema antes de desplegar (las instancias no lo modifican al arrancar)
+./migrar-bd.sh app-indunnova.yaml || { echo "❌ Las migraciones fallaron; no se despliega."; exit 1; }
+
 echo "📦 Desplegando aplicación como servicio '$SERVICE_NAME'..."
 
 # Desplegar usando el archivo de configuración específico
@@ -129,6 +129,10 @@ if [[ ! "$response" =~ ^[Yy]$ ]]; then
     exit 0
 fi
 
+# Migrar el esquema antes de desplegar (las instancias no lo modifican al arrancar)
+log "Aplicando migraciones de esquema..."
+./migrar-bd.sh app.yaml || error "Las migraciones fallaron; no se despliega."
+
 # Desplegar la aplicación
 log "Desplegando aplicación a App Engine (servicio: $SERVICE_NAME)..."
 gcloud app deploy app.yaml --quiet --promote --stop-previous-version
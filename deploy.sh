@@ -118,6 +118,9 @@ fi
 echo "Instalando dependencias..."
 pip3 install -r requirements.txt
 
+# Migrar el esquema antes de desplegar (las instancias no lo modifican al arrancar)
+./migrar-bd.sh app.yaml || error "Las migraciones fallaron; no se despliega."
+
 # Desplegar la aplicación con tiempo de espera extendido
 echo "Iniciando despliegue en Google App Engine..."
 gcloud app deploy app.yaml --quiet --timeout=20m
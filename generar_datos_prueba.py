@@ -2,19 +2,35 @@
 """
 Script para generar datos de prueba para FlorezCook
 Genera clientes, productos y pedidos de prueba realistas
+
+Uso:
+    python generar_datos_prueba.py [--pedidos 25] [--semilla 42]
+    python generar_datos_prueba.py --masivo [--clientes 10000] [--productos 5000] [--items 1000000]
+
+El modo masivo genera el volumen de los benchmarks (make benchmark)
+con inserciones por lotes; con la misma semilla produce los mismos datos.
+Usa la base de datos configurada (DATABASE_URL para un MySQL local).
 """
 
+import argparse
 import sys
 import os
 import random
+import time
 from datetime import datetime, timedelta
 from decimal import Decimal
 
+from sqlalchemy import func, insert, select
+
 # Agregar el directorio del proyecto al path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from models import Cliente, Producto, Pedido, PedidoProducto
 from config import database as db_config
+from utils.catalogo_productos import registrar_cambio_catalogo
+from utils.resumen_diario import reconstruir_resumen_diario
+from utils.plan_produccion import reconstruir_plan_produccion
+from utils.versiones import incrementar_version
 
 # Datos de prueba realistas para el sector alimentario
 CLIENTES_DATOS = [
@@ -281,6 +297,8 @@ def generar_clientes(db, cantidad=None):
         else:
             print(f"⚠ Cliente ya existe: {cliente_data['nombre_comercial']}")
     
+    if clientes_creados:
+        incrementar_version(db, 'clientes')
     return clientes_creados
 
 def generar_productos(db, cantidad=None):
@@ -302,6 +320,8 @@ def generar_productos(db, cantidad=None):
         else:
             print(f"⚠ Producto ya existe: {producto_data['referencia_de_producto']}")
     
+    if productos_creados:
+        registrar_cambio_catalogo(db)
     return productos_creados
 
 def generar_pedidos(db, clientes, productos, cantidad_pedidos=20):
@@ -371,13 +391,260 @@ def generar_pedidos(db, clientes, productos, cantidad_pedidos=20):
     
     return pedidos_creados
 
-def main():
+# --- Generación masiva para benchmarks ---
+
+# Prefijos de los códigos generados, para reconocer (y limpiar) los datos masivos
+PREFIJO_PRODUCTO_MASIVO = 'BM-P'
+PREFIJO_CLIENTE_MASIVO = 'BM-C'
+
+CATEGORIAS_MASIVAS = {
+    'Panadería': ['Masa Madre', 'Hojaldre', 'Masa Dulce', 'Integral'],
+    'Repostería Individual': ['Choux', 'Bizcocho', 'Mousse', 'Galletería'],
+    'Congelados': ['Empanadas', 'Pandebonos', 'Almojábanas', 'Buñuelos'],
+    'Salsas y Bases': ['Salsas Frías', 'Salsas Calientes', 'Fondos'],
+}
+PRESENTACIONES_MASIVAS = ['Unidad', 'Docena', 'Media docena', 'Caja x6', 'Paquete x12', 'Bolsa x25']
+CIUDADES_MASIVAS = [('Bogotá', 'Cundinamarca'), ('Medellín', 'Antioquia'), ('Cali', 'Valle del Cauca'),
+                    ('Barranquilla', 'Atlántico'), ('Bucaramanga', 'Santander'), ('Pereira', 'Risaralda')]
+ESTADOS_PEDIDO = ["En Proceso", "Completado", "Pendiente", "Cancelado"]
+ESTADOS_ITEM = ["Pendiente", "En preparación", "Listo", "Entregado"]
+TIPOS_DESPACHO = ["Domicilio", "Punto de venta", "Recogida en tienda"]
+SEDES = ["Sede Principal", "Sede Norte", "Sede Sur", "Sede Centro"]
+
+
+def _insertar_por_lotes(engine, tabla, filas, tamano_lote):
+    """Inserta las filas (iterable de dicts) en lotes de executemany, cada lote en su transacción"""
+    total = 0
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano_lote:
+            with engine.begin() as conn:
+                conn.execute(insert(tabla), lote)
+            total += len(lote)
+            lote = []
+    if lote:
+        with engine.begin() as conn:
+            conn.execute(insert(tabla), lote)
+        total += len(lote)
+    return total
+
+
+def _codigos_existentes(engine, columna, prefijo):
+    with engine.connect() as conn:
+        return set(conn.execute(select(columna).where(columna.like(f'{prefijo}%'))).scalars())
+
+
+def _filas_clientes(aleatorio, cantidad, existentes, ahora):
+    for n in range(1, cantidad + 1):
+        nit = f'{PREFIJO_CLIENTE_MASIVO}{n:07d}'
+        if nit in existentes:
+            continue
+        ciudad, departamento = aleatorio.choice(CIUDADES_MASIVAS)
+        yield {
+            'nombre_comercial': f'Cliente Prueba {n:05d}',
+            'razon_social': f'Cliente Prueba {n:05d} S.A.S.',
+            'tipo_identificacion': 'NIT',
+            'numero_identificacion': nit,
+            'email': f'cliente{n:05d}@prueba.florezcook.com',
+            'telefono': f'3{aleatorio.randint(100000000, 199999999)}',
+            'direccion': f'Calle {aleatorio.randint(1, 200)} #{aleatorio.randint(1, 99)}-{aleatorio.randint(1, 99)}',
+            'ciudad': ciudad,
+            'departamento': departamento,
+            'fecha_creacion': ahora,
+            'fecha_modificacion': ahora,
+        }
+
+
+def _filas_productos(aleatorio, cantidad, existentes, ahora):
+    categorias = list(CATEGORIAS_MASIVAS)
+    for n in range(1, cantidad + 1):
+        codigo = f'{PREFIJO_PRODUCTO_MASIVO}{n:06d}'
+        if codigo in existentes:
+            continue
+        categoria = aleatorio.choice(categorias)
+        presentacion1, presentacion2 = aleatorio.sample(PRESENTACIONES_MASIVAS, 2)
+        yield {
+            'codigo': codigo,
+            'referencia_de_producto': f'{aleatorio.choice(CATEGORIAS_MASIVAS[categoria])} Referencia {n:05d}',
+            'gramaje_g': float(aleatorio.choice([25, 40, 60, 80, 100, 120, 250, 500, 1000])),
+            'formulacion_grupo': aleatorio.choice(CATEGORIAS_MASIVAS[categoria]),
+            'categoria_linea': categoria,
+            'descripcion': f'Producto de prueba {n}',
+            'presentacion1': presentacion1,
+            'presentacion2': presentacion2,
+            'precio_unitario': Decimal(aleatorio.randint(500, 50000)),
+            'unidad_medida': 'unidad',
+            'estado': 'activo',
+            'fecha_creacion': ahora,
+            'fecha_modificacion': ahora,
+        }
+
+
+def _pedidos_e_items(aleatorio, clientes, productos, items, primer_id, dias):
+    """Genera (pedido, [items]) hasta completar la cantidad de ítems pedida"""
+    ahora = datetime.utcnow().replace(microsecond=0)
+    generados = 0
+    pedido_id = primer_id
+    while generados < items:
+        cliente_id, nit, nombre, direccion, ciudad, departamento = aleatorio.choice(clientes)
+        fecha = ahora - timedelta(days=aleatorio.randint(0, dias), seconds=aleatorio.randint(0, 86399))
+        entrega = (fecha + timedelta(days=aleatorio.randint(1, 7))).date()
+        pedido = {
+            'id': pedido_id,
+            'fecha_creacion': fecha,
+            'numero_identificacion_cliente_ingresado': nit,
+            'nombre_cliente_ingresado': nombre,
+            'cliente_id': cliente_id,
+            'despacho_tipo': aleatorio.choice(TIPOS_DESPACHO),
+            'despacho_sede': aleatorio.choice(SEDES),
+            'direccion_entrega': direccion,
+            'ciudad_entrega': ciudad,
+            'departamento_entrega': departamento,
+            'despacho_horario_atencion': "8:00 AM - 6:00 PM",
+            'observaciones_despacho': None,
+            'alerta': None,
+            'estado_pedido_general': aleatorio.choice(ESTADOS_PEDIDO),
+        }
+        cantidad_items = min(aleatorio.randint(1, 9), items - generados)
+        filas = []
+        for producto_id, gramaje, grupo, linea, presentacion1, presentacion2 in aleatorio.sample(productos, cantidad_items):
+            cantidad = aleatorio.randint(1, 20)
+            filas.append({
+                'pedido_id': pedido_id,
+                'producto_id': producto_id,
+                'fecha_pedido_item': fecha.date(),
+                'cantidad': cantidad,
+                'gramaje_g_item': gramaje,
+                'peso_total_g_item': gramaje * cantidad,
+                'grupo_item': grupo,
+                'linea_item': linea,
+                'comentarios_item': aleatorio.choice([presentacion1, presentacion2]),
+                'fecha_de_entrega_item': entrega,
+                'estado_del_pedido_item': aleatorio.choice(ESTADOS_ITEM),
+                'fecha_creacion': fecha,
+                'fecha_modificacion': fecha,
+            })
+        generados += cantidad_items
+        pedido_id += 1
+        yield pedido, filas
+
+
+def generar_datos_masivos(db_instance, clientes=10000, productos=5000, items=1000000,
+                          semilla=42, tamano_lote=5000, dias=365):
+    """
+    Genera el volumen de datos de los benchmarks con inserciones por lotes.
+
+    Los clientes y productos llevan códigos fijos (BM-C0000001, BM-P000001...) y
+    solo se insertan los que falten; los pedidos se agregan siempre, con ids
+    asignados a partir del mayor existente. Con la misma semilla y la misma
+    base de partida los datos generados son los mismos.
+
+    Returns:
+        dict: Cantidad de filas insertadas por tabla y segundos empleados.
+    """
+    aleatorio = random.Random(semilla)
+    engine = db_instance.engine
+    ahora = datetime.utcnow().replace(microsecond=0)
+    inicio = time.perf_counter()
+    resultado = {}
+
+    existentes = _codigos_existentes(engine, Cliente.numero_identificacion, PREFIJO_CLIENTE_MASIVO)
+    resultado['clientes'] = _insertar_por_lotes(
+        engine, Cliente.__table__, _filas_clientes(aleatorio, clientes, existentes, ahora), tamano_lote)
+    print(f"✓ Clientes insertados: {resultado['clientes']}")
+
+    existentes = _codigos_existentes(engine, Producto.codigo, PREFIJO_PRODUCTO_MASIVO)
+    resultado['productos'] = _insertar_por_lotes(
+        engine, Producto.__table__, _filas_productos(aleatorio, productos, existentes, ahora), tamano_lote)
+    print(f"✓ Productos insertados: {resultado['productos']}")
+
+    with engine.connect() as conn:
+        lista_clientes = conn.execute(
+            select(Cliente.id, Cliente.numero_identificacion, Cliente.nombre_comercial,
+                   Cliente.direccion, Cliente.ciudad, Cliente.departamento)
+            .where(Cliente.numero_identificacion.like(f'{PREFIJO_CLIENTE_MASIVO}%'))
+            .order_by(Cliente.id)
+        ).all()
+        lista_productos = conn.execute(
+            select(Producto.id, Producto.gramaje_g, Producto.formulacion_grupo, Producto.categoria_linea,
+                   Producto.presentacion1, Producto.presentacion2)
+            .where(Producto.codigo.like(f'{PREFIJO_PRODUCTO_MASIVO}%'))
+            .order_by(Producto.id)
+        ).all()
+        primer_id = (conn.execute(select(func.max(Pedido.id))).scalar() or 0) + 1
+
+    resultado['pedidos'] = resultado['items'] = 0
+    if items and lista_clientes and lista_productos:
+        lote_pedidos, lote_items = [], []
+        for pedido, filas in _pedidos_e_items(aleatorio, lista_clientes, lista_productos, items, primer_id, dias):
+            lote_pedidos.append(pedido)
+            lote_items.extend(filas)
+            if len(lote_items) >= tamano_lote:
+                _insertar_pedidos(engine, lote_pedidos, lote_items)
+                resultado['pedidos'] += len(lote_pedidos)
+                resultado['items'] += len(lote_items)
+                lote_pedidos, lote_items = [], []
+                print(f"  … {resultado['items']} ítems", end='\r')
+        if lote_pedidos:
+            _insertar_pedidos(engine, lote_pedidos, lote_items)
+            resultado['pedidos'] += len(lote_pedidos)
+            resultado['items'] += len(lote_items)
+    print(f"✓ Pedidos insertados: {resultado['pedidos']} con {resultado['items']} ítems")
+
+    # Las inserciones directas no pasan por las rutas: recalcular el resumen y
+    # avisar a las cachés de los demás procesos
+    db = db_instance.get_session()
+    try:
+        if resultado['clientes']:
+            incrementar_version(db, 'clientes')
+        if resultado['productos']:
+            registrar_cambio_catalogo(db)
+        if resultado['pedidos']:
+            reconstruir_resumen_diario(db)
+            reconstruir_plan_produccion(db)
+        db.commit()
+    finally:
+        db.close()
+
+    resultado['segundos'] = round(time.perf_counter() - inicio, 1)
+    return resultado
+
+
+def _insertar_pedidos(engine, pedidos, items):
+    """Inserta un lote de pedidos con sus ítems en una sola transacción"""
+    with engine.begin() as conn:
+        conn.execute(insert(Pedido.__table__), pedidos)
+        conn.execute(insert(PedidoProducto.__table__), items)
+
+
+def main(argv=None):
     """Función principal para generar todos los datos de prueba"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--semilla', type=int, default=42, help='Semilla aleatoria (datos reproducibles)')
+    parser.add_argument('--pedidos', type=int, default=25, help='Pedidos a generar en el modo normal')
+    parser.add_argument('--masivo', action='store_true', help='Genera el volumen de los benchmarks')
+    parser.add_argument('--clientes', type=int, default=10000)
+    parser.add_argument('--productos', type=int, default=5000)
+    parser.add_argument('--items', type=int, default=1000000, help='Ítems de pedido a generar')
+    parser.add_argument('--dias', type=int, default=365, help='Días hacia atrás en que se reparten los pedidos')
+    parser.add_argument('--lote', type=int, default=5000, help='Filas por inserción')
+    args = parser.parse_args(argv)
+
+    random.seed(args.semilla)
     print("🎯 Iniciando generación de datos de prueba para FlorezCook")
     print("=" * 60)
     
     # Conectar a la base de datos
     db_instance = db_config.DatabaseConfig()
+
+    if args.masivo:
+        resultado = generar_datos_masivos(db_instance, args.clientes, args.productos, args.items,
+                                          semilla=args.semilla, tamano_lote=args.lote, dias=args.dias)
+        print("\n" + "=" * 60)
+        print(f"✅ GENERACIÓN MASIVA COMPLETADA en {resultado['segundos']} s: {resultado}")
+        return
+
     db = db_instance.get_session()
     
     try:
@@ -403,7 +670,11 @@ def main():
         
         # 4. Generar pedidos
         print(f"\n📋 Generando pedidos con {len(todos_clientes)} clientes y {len(todos_productos)} productos...")
-        pedidos = generar_pedidos(db, todos_clientes, todos_productos, 25)
+        pedidos = generar_pedidos(db, todos_clientes, todos_productos, args.pedidos)
+        
+        # Los pedidos se insertan directamente: recalcular el resumen diario y el plan
+        reconstruir_resumen_diario(db)
+        reconstruir_plan_produccion(db)
         
         # Confirmar todos los cambios
         db.commit()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Comandos de mantenimiento de la base de datos de FlorezCook.
+
+Uso:
+    python gestionar_bd.py migrar
+    python gestionar_bd.py reconstruir-resumen [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD]
+    python gestionar_bd.py reconstruir-plan [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD]
+    python gestionar_bd.py explicar-consultas [--dias N]
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Fecha inválida: {valor} (usar AAAA-MM-DD)")
+
+
+def migrar(args):
+    """Crea las tablas e índices que falten en la base de datos y construye las tablas derivadas"""
+    from config.database import db_config
+    from config.migraciones import verificar_esquema
+
+    try:
+        tablas, indices, columnas = verificar_esquema(db_config.engine)
+    except Exception as e:
+        print(f"❌ Error aplicando migraciones: {e}")
+        return 1
+    print(f"✅ Migraciones aplicadas: {len(tablas)} tablas y {len(indices)} índices creados, "
+          f"{len(columnas)} columnas agregadas")
+    for nombre in tablas:
+        print(f"   • tabla {nombre}")
+    for nombre in indices:
+        print(f"   • índice {nombre}")
+    for nombre in columnas:
+        print(f"   • columna productos.{nombre}")
+    return 0
+
+
+def _consultas_reportes(db, dias):
+    """
+    Consultas de los reportes filtrados por fecha, construidas con las mismas
+    funciones que usan las rutas (reporte de pedidos, exportaciones a Excel,
+    consolidado y plan de producción).
+    """
+    from utils.consolidado_productos import consulta_consolidado
+    from utils.consultas import ordenar_keyset
+    from utils.fechas import hoy_colombia, inicio_dia_utc
+    from utils.plan_produccion import consulta_plan
+    from utils.reporte_pedidos import (
+        LOTE_EXPORTACION_PEDIDOS,
+        ORDEN_REPORTE_PEDIDOS,
+        POR_PAGINA_REPORTE_PEDIDOS,
+        GrupoCliente,
+        consulta_clientes_exportacion,
+        consulta_pagina_pedidos,
+        consulta_pedidos_exportacion,
+        consulta_pedidos_filtrada,
+    )
+
+    hasta = hoy_colombia()
+    desde = hasta - timedelta(days=dias)
+    filtros = {'fecha_desde': desde.isoformat(), 'fecha_hasta': hasta.isoformat()}
+    pedidos, _ = consulta_pedidos_filtrada(db, filtros)
+    por_estado, _ = consulta_pedidos_filtrada(db, dict(filtros, estado='En Proceso'))
+    por_cliente, _ = consulta_pedidos_filtrada(db, dict(filtros, cliente_id='1'))
+    # Un cursor a mitad del rango y un cliente cualquiera
+    cursor = (inicio_dia_utc(hasta - timedelta(days=dias // 2)), 1)
+    cliente = GrupoCliente('Cliente', (1,), False, LOTE_EXPORTACION_PEDIDOS)
+    limite = POR_PAGINA_REPORTE_PEDIDOS + 1
+    return {
+        'reporte de pedidos por rango': consulta_pagina_pedidos(pedidos, limite),
+        'reporte de pedidos por rango, página siguiente': consulta_pagina_pedidos(pedidos, limite, cursor),
+        'reporte de pedidos por rango, página anterior':
+            consulta_pagina_pedidos(pedidos, limite, cursor, hacia_atras=True),
+        'reporte de pedidos por rango y estado': consulta_pagina_pedidos(por_estado, limite),
+        'reporte de pedidos de un cliente por rango': consulta_pagina_pedidos(por_cliente, limite),
+        'exportación de pedidos: clientes del rango': consulta_clientes_exportacion(pedidos),
+        'exportación de pedidos: pedidos de un cliente': ordenar_keyset(
+            consulta_pedidos_exportacion(pedidos, [cliente]), ORDEN_REPORTE_PEDIDOS
+        ).limit(LOTE_EXPORTACION_PEDIDOS),
+        'consolidado y su exportación': consulta_consolidado(db, filtros)[0],
+        'plan de producción de la semana': consulta_plan(hasta, hasta + timedelta(days=6)),
+    }
+
+
+def _sql_consulta(consulta, dialecto):
+    """SQL con los valores incluidos de una consulta (Query del ORM o select)"""
+    consulta = getattr(consulta, 'statement', consulta)
+    return str(consulta.compile(dialect=dialecto, compile_kwargs={'literal_binds': True}))
+
+
+def _recorrido_completo(dialecto, fila):
+    """Indica si una fila del plan es un recorrido completo de una tabla"""
+    if dialecto == 'sqlite':
+        detalle = fila[-1]
+        return detalle.startswith('SCAN') and 'USING' not in detalle
+    return fila._mapping.get('type') == 'ALL'
+
+
+def explicar_consultas(args):
+    """Muestra el plan de ejecución de las consultas de reportes y marca los recorridos completos"""
+    from sqlalchemy import text
+    from sqlalchemy.orm import Session
+    from config.database import db_config
+
+    engine = db_config.engine
+    dialecto = engine.dialect.name
+    prefijo = 'EXPLAIN QUERY PLAN ' if dialecto == 'sqlite' else 'EXPLAIN '
+
+    recorridos = 0
+    with Session(engine) as db, engine.connect() as conn:
+        for nombre, consulta in _consultas_reportes(db, args.dias).items():
+            sql = _sql_consulta(consulta, engine.dialect)
+            print(f"\n▶ {nombre}")
+            for fila in conn.execute(text(prefijo + sql)):
+                completo = _recorrido_completo(dialecto, fila)
+                recorridos += completo
+                marca = '⚠' if completo else '✓'
+                print(f"   {marca} {' | '.join(str(valor) for valor in fila)}")
+
+    print(f"\n{'⚠' if recorridos else '✅'} {recorridos} recorridos completos de tabla ({dialecto})")
+    return 1 if recorridos and args.estricto else 0
+
+
+def reconstruir_resumen(args):
+    """Recalcula el resumen diario de productos desde los ítems de pedido"""
+    from config.database import db_config
+    from utils.resumen_diario import reconstruir_resumen_diario
+
+    db = db_config.get_session()
+    try:
+        inicio = time.time()
+        filas = reconstruir_resumen_diario(db, args.desde, args.hasta)
+        db.commit()
+        rango = f" ({args.desde or 'inicio'} a {args.hasta or 'hoy'})" if args.desde or args.hasta else ''
+        print(f"✅ Resumen diario reconstruido{rango}: {filas} filas en {time.time() - inicio:.2f} s")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error reconstruyendo el resumen diario: {e}")
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+def reconstruir_plan(args):
+    """Recalcula el plan de producción por día de entrega desde los ítems de pedido"""
+    from config.database import db_config
+    from utils.plan_produccion import reconstruir_plan_produccion
+
+    db = db_config.get_session()
+    try:
+        inicio = time.time()
+        filas = reconstruir_plan_produccion(db, args.desde, args.hasta)
+        db.commit()
+        rango = f" ({args.desde or 'inicio'} a {args.hasta or 'fin'})" if args.desde or args.hasta else ''
+        print(f"✅ Plan de producción reconstruido{rango}: {filas} filas en {time.time() - inicio:.2f} s")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error reconstruyendo el plan de producción: {e}")
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mantenimiento de la base de datos de FlorezCook')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    subparsers.add_parser('migrar', help='Crea las tablas, índices y columnas faltantes').set_defaults(funcion=migrar)
+
+    resumen = subparsers.add_parser('reconstruir-resumen',
+                                    help='Recalcula el resumen diario de productos (completo o por rango de días)')
+    resumen.add_argument('--desde', type=_fecha, help='Primer día a reconstruir (AAAA-MM-DD)')
+    resumen.add_argument('--hasta', type=_fecha, help='Último día a reconstruir (AAAA-MM-DD)')
+    resumen.set_defaults(funcion=reconstruir_resumen)
+
+    plan = subparsers.add_parser('reconstruir-plan',
+                                 help='Recalcula el plan de producción (completo o por rango de días de entrega)')
+    plan.add_argument('--desde', type=_fecha, help='Primer día de entrega a reconstruir (AAAA-MM-DD)')
+    plan.add_argument('--hasta', type=_fecha, help='Último día de entrega a reconstruir (AAAA-MM-DD)')
+    plan.set_defaults(funcion=reconstruir_plan)
+
+    explicar = subparsers.add_parser('explicar-consultas',
+                                     help='Muestra el plan de ejecución (EXPLAIN) de las consultas de reportes')
+    explicar.add_argument('--dias', type=int, default=30, help='Tamaño del rango de fechas consultado')
+    explicar.add_argument('--estricto', action='store_true',
+                          help='Termina con error si alguna consulta recorre una tabla completa')
+    explicar.set_defaults(funcion=explicar_consultas)
+
+    args = parser.parse_args(argv)
+    return args.funcion(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
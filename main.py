@@ -4,10 +4,9 @@ FlorezCook - Aplicación Principal
 Entry point para la aplicación completa de FlorezCook en App Engine
 """
 
-from app import create_app
-
-# Crear la aplicación usando la factory function
-app = create_app()
+# app.py ya crea la aplicación con create_app() al importarse; se reutiliza
+# esa instancia en lugar de crear (y configurar) una segunda al arrancar
+from app import app
 
 if __name__ == '__main__':
     # Para desarrollo local
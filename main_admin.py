@@ -3,11 +3,8 @@
 FlorezCook - App Engine Main Entry Point (Aplicación Principal)
 """
 
-# Para la aplicación principal, usar el create_app pattern
-from app import create_app
-
-# Crear la instancia de la aplicación principal
-app = create_app()
+# Instancia creada por app.py con create_app() (no se crea una segunda al arrancar)
+from app import app
 
 if __name__ == '__main__':
     import os
@@ -0,0 +1,42 @@
+#!/bin/bash
+# Aplica las migraciones de esquema de FlorezCook en Cloud SQL (paso obligatorio antes de desplegar)
+#
+# Uso: ./migrar-bd.sh [app.yaml]
+#
+# Toma DB_USER, DB_PASS, DB_NAME y CLOUD_SQL_CONNECTION_NAME del yaml que se va
+# a desplegar (o del entorno, si ya están definidas) y ejecuta
+# `python gestionar_bd.py migrar` a través del Cloud SQL Auth Proxy, que debe
+# estar escuchando en /tmp/cloudsql:
+#
+#   cloud-sql-proxy --unix-socket /tmp/cloudsql $CLOUD_SQL_CONNECTION_NAME
+#
+# Las instancias nuevas no modifican el esquema al arrancar: si las columnas,
+# tablas e índices de la versión no existen, sus consultas fallan. Por eso los
+# scripts deploy*.sh y `make deploy` ejecutan este paso antes de
+# `gcloud app deploy` y se detienen si falla.
+
+set -e
+
+YAML=${1:-app.yaml}
+
+if [ ! -f "$YAML" ]; then
+    echo "❌ No se encontró $YAML"
+    exit 1
+fi
+
+for clave in DB_USER DB_PASS DB_NAME CLOUD_SQL_CONNECTION_NAME; do
+    if [ -z "${!clave}" ]; then
+        valor=$(sed -n "s/^ *$clave: *['\"]\{0,1\}\([^'\"]*\)['\"]\{0,1\} *$/\1/p" "$YAML" | head -1)
+        export "$clave=$valor"
+    fi
+done
+
+if [ -z "$DATABASE_URL" ] && [ ! -S "/tmp/cloudsql/$CLOUD_SQL_CONNECTION_NAME" ]; then
+    echo "❌ El Cloud SQL Auth Proxy no está escuchando en /tmp/cloudsql/$CLOUD_SQL_CONNECTION_NAME"
+    echo "   Inícielo en otra terminal con:"
+    echo "   cloud-sql-proxy --unix-socket /tmp/cloudsql $CLOUD_SQL_CONNECTION_NAME"
+    exit 1
+fi
+
+echo "🗄️  Aplicando migraciones de esquema ($DB_NAME en $CLOUD_SQL_CONNECTION_NAME)..."
+ENV=production python3 gestionar_bd.py migrar
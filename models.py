@@ -1,14 +1,32 @@
 import os
 import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, Text, ForeignKey, DateTime, Numeric
+from sqlalchemy import event, create_engine, Column, Integer, String, Float, Date, Text, ForeignKey, DateTime, Numeric, UniqueConstraint, Index, LargeBinary
 from sqlalchemy.orm import relationship, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from flask_login import UserMixin
+from utils.helpers import clave_busqueda, claves_busqueda_producto
 
 Base = declarative_base()
 
+def _busqueda_cliente_insertado(contexto):
+    """Valor de Cliente.busqueda al insertar (también en los INSERT por lotes de Core)"""
+    valores = contexto.get_current_parameters()
+    return clave_busqueda(valores.get('nombre_comercial'), valores.get('razon_social'),
+                          valores.get('numero_identificacion'))
+
+def _clave_producto_insertado(columna):
+    """Valor por defecto de una clave de búsqueda de Producto calculado de la fila insertada"""
+    def calcular(contexto):
+        return claves_busqueda_producto(contexto.get_current_parameters()).get(columna)
+    return calcular
+
 class Cliente(Base):
     __tablename__ = "clientes"
+    __table_args__ = (
+        # Listado paginado: orden por nombre y filtro por ubicación
+        Index('ix_clientes_nombre', 'nombre_comercial'),
+        Index('ix_clientes_departamento_ciudad', 'departamento', 'ciudad'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     nombre_comercial = Column(String(255), nullable=False)
@@ -20,6 +38,8 @@ class Cliente(Base):
     direccion = Column(String(255))
     ciudad = Column(String(100))
     departamento = Column(String(100))
+    # Nombre comercial, razón social y NIT normalizados (minúsculas, sin tildes) para las búsquedas
+    busqueda = Column(String(600), index=True, default=_busqueda_cliente_insertado)
     fecha_creacion = Column(DateTime, default=datetime.datetime.utcnow)
     fecha_modificacion = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
@@ -29,8 +49,18 @@ class Cliente(Base):
     def __repr__(self):
         return f"<Cliente(id={self.id}, nombre='{self.nombre_comercial}', nit='{self.numero_identificacion}')>"
 
+@event.listens_for(Cliente, 'before_update')
+def _actualizar_busqueda_cliente(mapper, connection, cliente):
+    """Recalcula la clave de búsqueda cuando se edita un cliente desde el ORM"""
+    cliente.busqueda = clave_busqueda(cliente.nombre_comercial, cliente.razon_social,
+                                      cliente.numero_identificacion)
+
 class Producto(Base):
     __tablename__ = "productos"
+    __table_args__ = (
+        # Filtros y conteos por grupo y línea del listado de productos
+        Index('ix_productos_grupo_linea', 'formulacion_grupo', 'categoria_linea'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     codigo = Column(String(100), unique=True, nullable=False)
@@ -44,6 +74,10 @@ class Producto(Base):
     precio_unitario = Column(Numeric(10, 2), default=0)  # Cambio de Float a Numeric para coincidir con DECIMAL(10,2)
     unidad_medida = Column(String(20), default='unidad')  # Ajustado a VARCHAR(20)
     estado = Column(String(20), default='activo')  # Ajustado a VARCHAR(20) y valor por defecto
+    # Claves normalizadas (minúsculas, sin tildes) para búsquedas y filtros (ver utils/busqueda_texto.py)
+    busqueda = Column(String(400), index=True, default=_clave_producto_insertado('busqueda'))
+    linea_busqueda = Column(String(100), index=True, default=_clave_producto_insertado('linea_busqueda'))
+    grupo_busqueda = Column(String(100), index=True, default=_clave_producto_insertado('grupo_busqueda'))
     fecha_creacion = Column(DateTime, default=datetime.datetime.utcnow)
     fecha_modificacion = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
@@ -53,8 +87,19 @@ class Producto(Base):
     def __repr__(self):
         return f"<Producto(id={self.id}, codigo='{self.codigo}', referencia='{self.referencia_de_producto}')>"
 
+@event.listens_for(Producto, 'before_update')
+def _actualizar_busqueda_producto(mapper, connection, producto):
+    """Recalcula las claves de búsqueda cuando se edita un producto desde el ORM"""
+    for columna, valor in claves_busqueda_producto(producto).items():
+        setattr(producto, columna, valor)
+
 class Pedido(Base):
     __tablename__ = "pedidos"
+    __table_args__ = (
+        # Reportes por rango de fechas (y estado) e historial de pedidos por cliente
+        Index('ix_pedidos_fecha_estado', 'fecha_creacion', 'estado_pedido_general'),
+        Index('ix_pedidos_cliente_fecha', 'cliente_id', 'fecha_creacion'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     fecha_creacion = Column(DateTime, default=datetime.datetime.utcnow)
@@ -86,6 +131,11 @@ class Pedido(Base):
 
 class PedidoProducto(Base):
     __tablename__ = "pedido_productos"
+    __table_args__ = (
+        Index('ix_pedido_productos_pedido_producto', 'pedido_id', 'producto_id'),
+        # Pedidos con entregas en un día (cambio de estado masivo del despacho)
+        Index('ix_pedido_productos_entrega_pedido', 'fecha_de_entrega_item', 'pedido_id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     pedido_id = Column(Integer, ForeignKey("pedidos.id", ondelete="CASCADE"))
@@ -109,6 +159,96 @@ class PedidoProducto(Base):
     def __repr__(self):
         return f"<PedidoProducto(id={self.id}, pedido_id={self.pedido_id}, producto_id={self.producto_id})>"
 
+class ResumenDiarioProducto(Base):
+    """Acumulado diario de ítems de pedido, mantenido al guardar, editar y eliminar pedidos"""
+    __tablename__ = "resumen_diario_productos"
+    __table_args__ = (
+        UniqueConstraint('fecha', 'producto_id', 'presentacion', 'estado_pedido', 'estado_item', 'departamento',
+                         name='uq_resumen_diario_clave'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # Clave: día de creación del pedido (hora de Colombia) x producto x presentación x estados x departamento
+    fecha = Column(Date, nullable=False, index=True)
+    producto_id = Column(Integer, nullable=False, index=True)
+    presentacion = Column(String(150), nullable=False, default='')
+    estado_pedido = Column(String(50), nullable=False, default='')
+    estado_item = Column(String(50), nullable=False, default='')
+    departamento = Column(String(100), nullable=False, default='')
+
+    # Medidas acumuladas
+    cantidad = Column(Integer, nullable=False, default=0)
+    peso_total_g = Column(Float, nullable=False, default=0)
+    lineas = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ResumenDiarioProducto(fecha={self.fecha}, producto_id={self.producto_id}, cantidad={self.cantidad})>"
+
+class PlanProduccion(Base):
+    """Cantidades por día de entrega, mantenidas al guardar, editar, cancelar y eliminar pedidos"""
+    __tablename__ = "plan_produccion"
+    __table_args__ = (
+        # La clave empieza por la fecha: una ventana de días se lee como un rango del índice
+        UniqueConstraint('fecha_entrega', 'producto_id', 'presentacion', name='uq_plan_produccion_clave'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # Clave: día de entrega del ítem x producto x presentación
+    fecha_entrega = Column(Date, nullable=False)
+    producto_id = Column(Integer, nullable=False, index=True)
+    presentacion = Column(String(150), nullable=False, default='')
+
+    # Medidas acumuladas de los pedidos no cancelados
+    cantidad = Column(Integer, nullable=False, default=0)
+    peso_total_g = Column(Float, nullable=False, default=0)
+    lineas = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<PlanProduccion(fecha_entrega={self.fecha_entrega}, producto_id={self.producto_id}, cantidad={self.cantidad})>"
+
+class VersionTabla(Base):
+    """Versión de los datos de una tabla; se incrementa en la misma transacción que cada escritura"""
+    __tablename__ = "versiones_tablas"
+
+    nombre = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    fecha_modificacion = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<VersionTabla(nombre='{self.nombre}', version={self.version})>"
+
+class Trabajo(Base):
+    """Trabajo en segundo plano (importaciones y exportaciones) con su progreso y resultado"""
+    __tablename__ = "trabajos"
+
+    id = Column(String(32), primary_key=True)  # uuid4 en hexadecimal
+    tipo = Column(String(50), nullable=False)
+    estado = Column(String(20), nullable=False, default='pendiente', index=True)  # pendiente, en_proceso, completado, error
+    progreso = Column(Integer, nullable=False, default=0)  # 0 a 100
+    mensaje = Column(String(255))
+    resultado = Column(Text)  # JSON con el resultado del trabajo
+    ruta_archivo = Column(String(500))  # Archivo generado en la instancia que ejecutó el trabajo (copia en trabajos_archivos)
+    nombre_archivo = Column(String(255))
+    proceso = Column(String(100))  # host:pid del worker que ejecuta el trabajo
+    fecha_creacion = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+    fecha_inicio = Column(DateTime)
+    fecha_fin = Column(DateTime)
+    fecha_latido = Column(DateTime)  # Última señal del proceso mientras el trabajo está activo
+
+    def __repr__(self):
+        return f"<Trabajo(id={self.id}, tipo='{self.tipo}', estado='{self.estado}', progreso={self.progreso})>"
+
+class ParteArchivoTrabajo(Base):
+    """Parte del archivo generado por un trabajo, guardado en la base para descargarlo desde cualquier instancia"""
+    __tablename__ = "trabajos_archivos"
+
+    trabajo_id = Column(String(32), ForeignKey("trabajos.id", ondelete="CASCADE"), primary_key=True)
+    numero = Column(Integer, primary_key=True)
+    contenido = Column(LargeBinary(length=2 ** 24 - 1), nullable=False)  # MEDIUMBLOB en MySQL
+
+    def __repr__(self):
+        return f"<ParteArchivoTrabajo(trabajo_id={self.trabajo_id}, numero={self.numero})>"
+
 class User(UserMixin):
     def __init__(self, id, role='user'):
         self.id = id
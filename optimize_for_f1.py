@@ -31,20 +31,18 @@ if os.getenv('INSTANCE_CLASS', 'F2') == 'F1':
 
 def optimize_database_config():
     """Optimizaciones para la configuración de base de datos"""
-    optimizations = """
-# En config/database.py - Ajustar pool para F1
-if os.getenv('INSTANCE_CLASS', 'F2') == 'F1':
-    pool_size = 2  # Menos conexiones
-    max_overflow = 3
-    pool_timeout = 15
-    pool_recycle = 900  # 15 minutos
-else:
-    pool_size = 5
-    max_overflow = 10
-    pool_timeout = 30
-    pool_recycle = 3600
+    from config.pool_bd import configuracion_pool
+    configuracion = configuracion_pool()
+    optimizations = f"""
+# config/pool_bd.py calcula el pool según INSTANCE_CLASS y workers × threads de gunicorn
+# Configuración resultante en este entorno:
+#   pool_size={configuracion['pool_size']} max_overflow={configuracion['max_overflow']}
+#   pool_timeout={configuracion['pool_timeout']} pool_recycle={configuracion['pool_recycle']}
+#   {configuracion['calculo']}
+# Para fijar valores manualmente: MYSQL_POOL_SIZE, MYSQL_MAX_OVERFLOW,
+# MYSQL_POOL_TIMEOUT y MYSQL_POOL_RECYCLE en app.yaml
 """
-    print("✅ Optimizaciones para database.py generadas")
+    print("✅ Configuración del pool calculada")
     return optimizations
 
 def create_cache_config():
@@ -0,0 +1,36 @@
+from flask import Blueprint, request, current_app
+from utils.catalogo_productos import obtener_catalogo
+
+# Compartido por la aplicación de administración y el portal de clientes:
+# los dos formularios de pedido cargan el catálogo desde esta ruta
+catalogo_bp = Blueprint('catalogo', __name__)
+
+@catalogo_bp.route('/productos/api/catalogo')
+def api_catalogo():
+    """
+    Catálogo completo en JSON para el formulario de pedidos.
+
+    Se sirve con ETag (hash del contenido) y comprimido con gzip si el
+    navegador lo acepta. El formulario pide la URL con la huella del contenido
+    en ?v=, así que esas respuestas se pueden cachear indefinidamente.
+    """
+    catalogo = obtener_catalogo()
+    cuerpo, cuerpo_gzip, huella = catalogo.contenido_json()
+
+    if request.if_none_match.contains(huella):
+        respuesta = current_app.response_class(status=304)
+    elif 'gzip' in request.accept_encodings:
+        respuesta = current_app.response_class(cuerpo_gzip, mimetype='application/json')
+        respuesta.headers['Content-Encoding'] = 'gzip'
+    else:
+        respuesta = current_app.response_class(cuerpo, mimetype='application/json')
+
+    respuesta.set_etag(huella)
+    respuesta.vary.add('Accept-Encoding')
+    if request.args.get('v') == huella:
+        respuesta.cache_control.public = True
+        respuesta.cache_control.max_age = 31536000
+        respuesta.cache_control.immutable = True
+    else:
+        respuesta.cache_control.no_cache = True
+    return respuesta
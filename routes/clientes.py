@@ -2,7 +2,12 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from config.database import db_config
 from models import Cliente
 from utils.helpers import get_current_year, DEPARTAMENTOS_CIUDADES
-import pandas as pd
+from utils.versiones import incrementar_version
+from utils.busqueda_texto import filtro_texto
+from utils.busqueda_clientes import pagina_clientes, ORDENES_CLIENTES, POR_PAGINA_CLIENTES
+from utils.cache_respuestas import cache_respuesta
+from utils.trabajos import encolar_trabajo, nuevo_id_trabajo, guardar_archivo_subido
+from routes.trabajos import solicita_segundo_plano, respuesta_trabajo_encolado
 from sqlalchemy.exc import IntegrityError
 import io
 from datetime import datetime
@@ -13,6 +18,7 @@ clientes_bp = Blueprint('clientes', __name__, url_prefix='/clientes')  # Restore
 api_clientes_bp = Blueprint('api_clientes', __name__, url_prefix='/api/clientes')
 
 @api_clientes_bp.route('/buscar', methods=['GET'])
+@cache_respuesta(['clientes'], ttl=300)
 def buscar_api():
     """API para buscar cliente por NIT"""
     nit = request.args.get('nit')
@@ -41,16 +47,80 @@ def buscar_api():
     finally:
         db.close()
 
+@api_clientes_bp.route('/sugerencias', methods=['GET'])
+def sugerencias_api():
+    """API de autocompletado de clientes por nombre o NIT (resultados limitados)"""
+    termino = request.args.get('q', '').strip()
+    limite = min(max(request.args.get('limite', 20, type=int) or 20, 1), 50)
+    if len(termino) < 2:
+        return jsonify([])
+
+    db = db_config.get_session()
+    try:
+        # Nombre, razón social o NIT sobre la clave normalizada (ver utils.busqueda_texto)
+        clientes = db.query(
+            Cliente.id, Cliente.nombre_comercial, Cliente.numero_identificacion
+        ).filter(
+            *filtro_texto(db, Cliente, termino)
+        ).order_by(Cliente.nombre_comercial).limit(limite).all()
+        return jsonify([
+            {'id': c.id, 'nombre_comercial': c.nombre_comercial, 'numero_identificacion': c.numero_identificacion}
+            for c in clientes
+        ])
+    finally:
+        db.close()
+
+def _filtros_lista():
+    """Filtros y orden del listado leídos de la URL"""
+    return {
+        'q': request.args.get('q', '').strip(),
+        'nit': request.args.get('nit', '').strip(),
+        'ciudad': request.args.get('ciudad', '').strip(),
+        'departamento': request.args.get('departamento', '').strip(),
+        'orden': request.args.get('orden', 'nombre'),
+        'descendente': request.args.get('dir') == 'desc',
+    }
+
+@api_clientes_bp.route('/pagina', methods=['GET'])
+@cache_respuesta(['clientes'], ttl=60)
+def pagina_api():
+    """API del listado de clientes: página por cursor (?despues=) con filtros y orden"""
+    db = db_config.get_session()
+    try:
+        pagina = pagina_clientes(
+            db, **_filtros_lista(),
+            despues=request.args.get('despues'),
+            limite=request.args.get('limite', POR_PAGINA_CLIENTES, type=int),
+            contar=request.args.get('total') == '1'
+        )
+        return jsonify(pagina)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        db.close()
+
 # Ruta específica para manejar /clientes sin barra final (evita redirect 308)
 @clientes_bp.route('', methods=['GET'], strict_slashes=False)
 @clientes_bp.route('/')
 def lista():
-    """Lista de clientes"""
+    """Lista de clientes: primera página en el servidor, las siguientes desde /api/clientes/pagina"""
     db = db_config.get_session()
     try:
-        clientes = db.query(Cliente).all()
+        filtros = _filtros_lista()
+        try:
+            pagina = pagina_clientes(db, **filtros, contar=True)
+        except ValueError:
+            filtros['orden'] = 'nombre'
+            pagina = pagina_clientes(db, **filtros, contar=True)
         current_year = get_current_year()
-        return render_template('clientes_list.html', clientes=clientes, current_year=current_year)
+        return render_template('clientes_list.html',
+                               clientes=pagina['clientes'],
+                               siguiente=pagina['siguiente'],
+                               total=pagina['total'],
+                               filtros=filtros,
+                               ordenes=list(ORDENES_CLIENTES),
+                               departamentos_ciudades=DEPARTAMENTOS_CIUDADES,
+                               current_year=current_year)
     finally:
         db.close()
 
@@ -126,6 +196,7 @@ def agregar():
                     departamento=departamento
                 )
                 db.add(cli)
+                incrementar_version(db, 'clientes')
                 db.commit()
                 
                 flash('Cliente agregado correctamente.', 'success')
@@ -206,6 +277,7 @@ def editar(cliente_id):
                 cli.direccion = request.form.get('direccion')
                 cli.ciudad = request.form.get('ciudad')
                 cli.departamento = request.form.get('departamento')
+                incrementar_version(db, 'clientes')
                 db.commit()
                 flash('Cliente actualizado correctamente.', 'success')
                 return redirect(url_for('clientes.lista'))
@@ -236,6 +308,7 @@ def eliminar(cliente_id):
         cli = db.query(Cliente).get(cliente_id)
         if cli:
             db.delete(cli)
+            incrementar_version(db, 'clientes')
             db.commit()
             flash('Cliente eliminado.', 'success')
         else:
@@ -257,6 +330,11 @@ def ver(cliente_id):
     finally:
         db.close()
 
+def _trabajo_importar_clientes(db, contexto, ruta):
+    """Trabajo en segundo plano: importa el Excel de clientes guardado"""
+    from utils.importacion_clientes import importar_clientes  # pandas se carga solo al importar
+    return importar_clientes(db, ruta, progreso=contexto.progreso).to_dict()
+
 @clientes_bp.route('/importar', methods=['GET', 'POST'])
 def importar():
     """Importar clientes desde Excel"""
@@ -272,129 +350,29 @@ def importar():
             if archivo.filename == '':
                 return redirect(request.url)
                 
+            if archivo and solicita_segundo_plano():
+                # El archivo se guarda en disco y la importación sigue en un hilo aparte
+                trabajo_id = nuevo_id_trabajo()
+                ruta = guardar_archivo_subido(archivo, trabajo_id)
+                encolar_trabajo('importar_clientes', _trabajo_importar_clientes, ruta, trabajo_id=trabajo_id)
+                return respuesta_trabajo_encolado(trabajo_id)
+
             if archivo:
                 try:
-                    # Leer el archivo Excel
-                    df = pd.read_excel(archivo)
-                    
-                    # Limpiar nombres de columnas (remover espacios extra y caracteres especiales)
-                    df.columns = df.columns.str.strip().str.lower()
-                    
-                    # Mapeo de columnas permitidas (sin el asterisco para requeridas)
-                    column_mapping = {
-                        'nombre comercial': 'nombre_comercial',
-                        'nombre comercial *': 'nombre_comercial',
-                        'razón social': 'razon_social',
-                        'razon social': 'razon_social',
-                        'tipo identificación': 'tipo_identificacion',
-                        'tipo identificacion': 'tipo_identificacion',
-                        'número identificación': 'numero_identificacion',
-                        'numero identificacion': 'numero_identificacion',
-                        'email': 'email',
-                        'teléfono': 'telefono',
-                        'telefono': 'telefono',
-                        'dirección': 'direccion',
-                        'direccion': 'direccion',
-                        'ciudad': 'ciudad',
-                        'departamento': 'departamento'
-                    }
-                    
-                    # Renombrar columnas según el mapeo
-                    df = df.rename(columns=column_mapping)
-                    
-                    # Validar que al menos existe la columna requerida
-                    if 'nombre_comercial' not in df.columns:
-                        raise ValueError('La columna "Nombre Comercial" es obligatoria')
-                    
-                    # Procesar cada fila
+                    # Validación por columnas, NIT existentes en una consulta por bloque e inserción por lotes
+                    from utils.importacion_clientes import importar_clientes
+                    resultado = importar_clientes(db, archivo)
+
                     resultados = {
-                        'exito': True, 
-                        'mensaje': 'Clientes importados correctamente', 
-                        'errores': [],
-                        'procesados': 0,
-                        'exitosos': 0
+                        'exito': not resultado.errores,
+                        'mensaje': '',
+                        'errores': resultado.mensajes_error(),
+                        'procesados': resultado.total_filas,
+                        'exitosos': resultado.insertados
                     }
                     
-                    for index, fila in df.iterrows():
-                        resultados['procesados'] += 1
-                        fila_num = index + 2  # +2 porque pandas es 0-indexed y contamos el header
-                        
-                        try:
-                            # Validar nombre comercial (campo obligatorio)
-                            nombre_comercial = str(fila.get('nombre_comercial', '')).strip()
-                            if not nombre_comercial or nombre_comercial.lower() in ['nan', 'none', '']:
-                                resultados['errores'].append(f'Fila {fila_num}: El nombre comercial es obligatorio')
-                                continue
-                            
-                            # Obtener y limpiar otros campos
-                            numero_identificacion = str(fila.get('numero_identificacion', '')).strip()
-                            if numero_identificacion.lower() in ['nan', 'none']:
-                                numero_identificacion = ''
-                            
-                            # Si hay número de identificación, verificar duplicados
-                            if numero_identificacion:
-                                cliente_existente = db.query(Cliente).filter(
-                                    Cliente.numero_identificacion == numero_identificacion
-                                ).first()
-                                if cliente_existente:
-                                    resultados['errores'].append(
-                                        f'Fila {fila_num}: Ya existe un cliente con el número de identificación {numero_identificacion}'
-                                    )
-                                    continue
-                            
-                            # Limpiar y preparar datos
-                            def clean_field(value):
-                                if pd.isna(value) or str(value).lower() in ['nan', 'none', '']:
-                                    return ''
-                                return str(value).strip()
-                            
-                            # Validar email si se proporciona
-                            email = clean_field(fila.get('email', ''))
-                            if email and '@' not in email:
-                                resultados['errores'].append(f'Fila {fila_num}: Email inválido: {email}')
-                                continue
-                            
-                            # Validar departamento si se proporciona
-                            departamento = clean_field(fila.get('departamento', ''))
-                            if departamento and departamento not in DEPARTAMENTOS_CIUDADES:
-                                resultados['errores'].append(
-                                    f'Fila {fila_num}: Departamento "{departamento}" no válido. '
-                                    f'Use uno de: {", ".join(list(DEPARTAMENTOS_CIUDADES.keys())[:5])}...'
-                                )
-                                continue
-                            
-                            # Crear cliente
-                            cliente = Cliente(
-                                nombre_comercial=nombre_comercial,
-                                razon_social=clean_field(fila.get('razon_social', '')) or nombre_comercial,
-                                tipo_identificacion=clean_field(fila.get('tipo_identificacion', '')),
-                                numero_identificacion=numero_identificacion,
-                                email=email,
-                                telefono=clean_field(fila.get('telefono', '')),
-                                direccion=clean_field(fila.get('direccion', '')),
-                                ciudad=clean_field(fila.get('ciudad', '')),
-                                departamento=departamento
-                            )
-                            
-                            db.add(cliente)
-                            db.commit()
-                            resultados['exitosos'] += 1
-                            
-                        except IntegrityError as e:
-                            db.rollback()
-                            if 'numero_identificacion' in str(e) or 'UNIQUE constraint failed' in str(e):
-                                resultados['errores'].append(
-                                    f'Fila {fila_num}: El número de identificación {numero_identificacion} ya está registrado'
-                                )
-                            else:
-                                resultados['errores'].append(f'Fila {fila_num}: Error de base de datos - {str(e)}')
-                        except Exception as e:
-                            db.rollback()
-                            resultados['errores'].append(f'Fila {fila_num}: {str(e)}')
-                    
                     # Actualizar mensaje de resultado
                     if resultados['errores']:
-                        resultados['exito'] = False
                         resultados['mensaje'] = f'Importación completada con errores. Procesados: {resultados["procesados"]}, Exitosos: {resultados["exitosos"]}, Errores: {len(resultados["errores"])}'
                     else:
                         resultados['mensaje'] = f'¡Importación exitosa! Se importaron {resultados["exitosos"]} clientes correctamente.'
@@ -1,5 +1,6 @@
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, Response, jsonify, current_app
 from config.database import db_config
+from utils.metricas_bd import formato_prometheus
 
 health_bp = Blueprint('health', __name__)
 
@@ -22,4 +23,15 @@ def readiness():
             return jsonify({"status": "not ready", "error": message}), 503
     except Exception as e:
         current_app.logger.error(f"Readiness check failed: {e}")
-        return jsonify({"status": "not ready", "error": str(e)}), 503
\ No newline at end of file
+        return jsonify({"status": "not ready", "error": str(e)}), 503
+
+@health_bp.route('/metricas/bd')
+def metricas_bd():
+    """Métricas del pool de conexiones de este proceso (checkouts, conexiones en uso, por petición)"""
+    return jsonify(db_config.metricas.resumen(db_config.engine)), 200
+
+@health_bp.route('/metrics')
+def metrics():
+    """Métricas del pool de este proceso en formato de texto de Prometheus"""
+    datos = db_config.metricas.resumen(db_config.engine)
+    return Response(formato_prometheus(datos), mimetype='text/plain; version=0.0.4')
@@ -1,499 +1,425 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, make_response
 from datetime import datetime, timedelta
-from sqlalchemy import func, extract, desc, case, text
-from models import Cliente, Producto, Pedido, PedidoProducto
+from collections import Counter
 from config.database import db_config
-import calendar
+from utils.cache_respuestas import cache_respuesta
+from utils.motor_indicadores import MotorIndicadores
+from utils.fechas import dia_colombia, hoy_colombia
 
 indicadores_bp = Blueprint('indicadores', __name__)
 
-@indicadores_bp.route('/indicadores')
-def dashboard_indicadores():
-    """Dashboard principal de indicadores"""
-    
-    # Obtener filtros de fecha
+CATEGORIAS_INDICADORES = ('ventas', 'clientes', 'productos', 'operaciones', 'geograficos')
+
+def obtener_periodo():
+    """Lee el período de los parámetros del request (por defecto últimos 30 días)"""
     fecha_inicio = request.args.get('fecha_inicio')
     fecha_fin = request.args.get('fecha_fin')
-    
+
     # Si no hay filtros, usar los últimos 30 días
     if not fecha_inicio or not fecha_fin:
-        fecha_fin = datetime.now().date()
+        fecha_fin = hoy_colombia()
         fecha_inicio = fecha_fin - timedelta(days=30)
     else:
         fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
         fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
-    
-    # Obtener todos los indicadores
-    indicadores_data = {
-        'ventas': obtener_indicadores_ventas(fecha_inicio, fecha_fin),
-        'clientes': obtener_indicadores_clientes(fecha_inicio, fecha_fin),
-        'productos': obtener_indicadores_productos(fecha_inicio, fecha_fin),
-        'operaciones': obtener_indicadores_operaciones(fecha_inicio, fecha_fin),
-        'geograficos': obtener_indicadores_geograficos(fecha_inicio, fecha_fin)
-    }
-    
-    return render_template('indicadores_dashboard.html', 
-                         indicadores=indicadores_data,
-                         fecha_inicio=fecha_inicio,
-                         fecha_fin=fecha_fin)
 
-@indicadores_bp.route('/indicadores/api/<categoria>')
-def api_indicadores(categoria):
-    """API para obtener indicadores por categoría"""
-    
-    fecha_inicio = request.args.get('fecha_inicio')
-    fecha_fin = request.args.get('fecha_fin')
-    
-    if not fecha_inicio or not fecha_fin:
-        fecha_fin = datetime.now().date()
-        fecha_inicio = fecha_fin - timedelta(days=30)
-    else:
-        fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
-        fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
-    
-    if categoria == 'ventas':
-        data = obtener_indicadores_ventas(fecha_inicio, fecha_fin)
-    elif categoria == 'clientes':
-        data = obtener_indicadores_clientes(fecha_inicio, fecha_fin)
-    elif categoria == 'productos':
-        data = obtener_indicadores_productos(fecha_inicio, fecha_fin)
-    elif categoria == 'operaciones':
-        data = obtener_indicadores_operaciones(fecha_inicio, fecha_fin)
-    elif categoria == 'geograficos':
-        data = obtener_indicadores_geograficos(fecha_inicio, fecha_fin)
-    else:
-        return jsonify({'error': 'Categoría no válida'}), 400
-    
-    return jsonify(data)
+    return fecha_inicio, fecha_fin
+
+def _agregar_tiempos(response, motor):
+    """Expone el detalle de consultas del motor en la cabecera Server-Timing"""
+    if motor.tiempos:
+        response.headers['Server-Timing'] = motor.server_timing()
+    response.headers['X-Indicadores-Consultas'] = str(motor.total_consultas)
+    return response
+
+@indicadores_bp.route('/indicadores')
+def dashboard_indicadores():
+    """Dashboard principal de indicadores"""
+
+    fecha_inicio, fecha_fin = obtener_periodo()
 
-def obtener_indicadores_ventas(fecha_inicio, fecha_fin):
-    """Indicadores de ventas y facturación"""
-    
     session = db_config.get_session()
-    
     try:
-        # Total de pedidos en el período
-        total_pedidos = session.query(Pedido).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin
-        ).count()
-        
-        # Total de productos vendidos
-        total_productos_vendidos = session.query(func.sum(PedidoProducto.cantidad)).join(Pedido).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin
-        ).scalar() or 0
-        
-        # Peso total vendido
-        peso_total_vendido = session.query(func.sum(PedidoProducto.peso_total_g_item)).join(Pedido).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin
-        ).scalar() or 0
-        
-        # Promedio de productos por pedido
-        promedio_productos_pedido = round(total_productos_vendidos / total_pedidos, 2) if total_pedidos > 0 else 0
-        
-        # Evolución diaria de pedidos
-        evolucion_diaria = session.query(
-            func.date(Pedido.fecha_creacion).label('fecha'),
-            func.count(Pedido.id).label('cantidad_pedidos'),
-            func.sum(PedidoProducto.cantidad).label('productos_vendidos')
-        ).join(PedidoProducto).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin
-        ).group_by(func.date(Pedido.fecha_creacion)).order_by('fecha').all()
-        
-        # Estados de pedidos
-        estados_pedidos = session.query(
-            Pedido.estado_pedido_general,
-            func.count(Pedido.id).label('cantidad')
-        ).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin
-        ).group_by(Pedido.estado_pedido_general).all()
-        
-        # Tendencia semanal
-        tendencia_semanal = session.query(
-            extract('week', Pedido.fecha_creacion).label('semana'),
-            func.count(Pedido.id).label('pedidos'),
-            func.sum(PedidoProducto.cantidad).label('productos')
-        ).join(PedidoProducto).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin
-        ).group_by('semana').order_by('semana').all()
-        
-        return {
-            'resumen': {
-                'total_pedidos': total_pedidos,
-                'total_productos_vendidos': int(total_productos_vendidos),
-                'peso_total_kg': round(peso_total_vendido / 1000, 2) if peso_total_vendido else 0,
-                'promedio_productos_pedido': promedio_productos_pedido
-            },
-            'evolucion_diaria': [
-                {
-                    'fecha': str(item.fecha),
-                    'pedidos': item.cantidad_pedidos,
-                    'productos': int(item.productos_vendidos or 0)
-                } for item in evolucion_diaria
-            ],
-            'estados_pedidos': [
-                {
-                    'estado': item.estado_pedido_general or 'Sin Estado',
-                    'cantidad': item.cantidad
-                } for item in estados_pedidos
-            ],
-            'tendencia_semanal': [
-                {
-                    'semana': int(item.semana),
-                    'pedidos': item.pedidos,
-                    'productos': int(item.productos or 0)
-                } for item in tendencia_semanal
-            ]
+        # Todos los indicadores comparten los mismos datos del período
+        motor = MotorIndicadores(session, fecha_inicio, fecha_fin)
+        indicadores_data = {
+            categoria: OBTENER_INDICADORES[categoria](fecha_inicio, fecha_fin, motor)
+            for categoria in CATEGORIAS_INDICADORES
         }
-    
     finally:
         session.close()
 
-def obtener_indicadores_clientes(fecha_inicio, fecha_fin):
-    """Indicadores de clientes y segmentación"""
-    
+    response = make_response(render_template('indicadores_dashboard.html',
+                                             indicadores=indicadores_data,
+                                             fecha_inicio=fecha_inicio,
+                                             fecha_fin=fecha_fin))
+    return _agregar_tiempos(response, motor)
+
+@indicadores_bp.route('/indicadores/api/<categoria>')
+@cache_respuesta(['pedidos', 'clientes', 'productos'], ttl=300, omitir_si=lambda: bool(request.args.get('tiempos')))
+def api_indicadores(categoria):
+    """API para obtener indicadores por categoría"""
+
+    if categoria not in OBTENER_INDICADORES:
+        return jsonify({'error': 'Categoría no válida'}), 400
+
+    fecha_inicio, fecha_fin = obtener_periodo()
+
     session = db_config.get_session()
-    
     try:
-        # Total de clientes activos (con pedidos en el período)
-        clientes_activos = session.query(
-            func.count(func.distinct(Pedido.cliente_id))
-        ).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin,
-            Pedido.cliente_id.isnot(None)
-        ).scalar() or 0
-        
-        # Nuevos clientes registrados
-        nuevos_clientes = session.query(Cliente).filter(
-            Cliente.fecha_creacion >= fecha_inicio,
-            Cliente.fecha_creacion <= fecha_fin
-        ).count()
-        
-        # Top 10 clientes por volumen de pedidos - CORREGIDO
-        top_clientes_pedidos = session.query(
-            Cliente.nombre_comercial,
-            Cliente.numero_identificacion,
-            func.count(Pedido.id).label('total_pedidos'),
-            func.sum(PedidoProducto.cantidad).label('total_productos')
-        ).select_from(Cliente).join(Pedido, Cliente.id == Pedido.cliente_id).join(
-            PedidoProducto, Pedido.id == PedidoProducto.pedido_id
-        ).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin
-        ).group_by(Cliente.id, Cliente.nombre_comercial, Cliente.numero_identificacion).order_by(desc('total_pedidos')).limit(10).all()
-        
-        # Distribución por tipo de identificación
-        tipos_identificacion = session.query(
-            Cliente.tipo_identificacion,
-            func.count(Cliente.id).label('cantidad')
-        ).group_by(Cliente.tipo_identificacion).all()
-        
-        # Clientes por departamento
-        clientes_departamento = session.query(
-            Cliente.departamento,
-            func.count(Cliente.id).label('cantidad')
-        ).group_by(Cliente.departamento).order_by(desc('cantidad')).limit(10).all()
-        
-        # Frecuencia de compra por cliente - SIMPLIFICADO para evitar conflictos
-        # Vamos a obtener esta información de manera más simple
-        total_clientes_con_pedidos = session.query(Cliente).join(Pedido).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin
-        ).distinct().count()
-        
-        # Crear datos de frecuencia simulados basados en estadísticas reales
-        frecuencia_compra = [
-            {'frecuencia': 'Compra única', 'clientes': max(1, int(total_clientes_con_pedidos * 0.6))},
-            {'frecuencia': '2-5 pedidos', 'clientes': max(0, int(total_clientes_con_pedidos * 0.3))},
-            {'frecuencia': '6-10 pedidos', 'clientes': max(0, int(total_clientes_con_pedidos * 0.08))},
-            {'frecuencia': 'Más de 10 pedidos', 'clientes': max(0, int(total_clientes_con_pedidos * 0.02))}
-        ]
-        
-        return {
-            'resumen': {
-                'clientes_activos': clientes_activos,
-                'nuevos_clientes': nuevos_clientes,
-                'total_clientes_registrados': session.query(Cliente).count()
-            },
-            'top_clientes': [
-                {
-                    'nombre': item.nombre_comercial,
-                    'identificacion': item.numero_identificacion,
-                    'pedidos': item.total_pedidos,
-                    'productos_comprados': int(item.total_productos or 0)
-                } for item in top_clientes_pedidos
-            ],
-            'tipos_identificacion': [
-                {
-                    'tipo': item.tipo_identificacion or 'Sin Especificar',
-                    'cantidad': item.cantidad
-                } for item in tipos_identificacion
-            ],
-            'clientes_por_departamento': [
-                {
-                    'departamento': item.departamento or 'Sin Especificar',
-                    'cantidad': item.cantidad
-                } for item in clientes_departamento
-            ],
-            'frecuencia_compra': frecuencia_compra
-        }
-    
+        motor = MotorIndicadores(session, fecha_inicio, fecha_fin)
+        data = OBTENER_INDICADORES[categoria](fecha_inicio, fecha_fin, motor)
     finally:
         session.close()
 
-def obtener_indicadores_productos(fecha_inicio, fecha_fin):
+    # Detalle de tiempos por consulta bajo demanda (?tiempos=1)
+    if request.args.get('tiempos'):
+        data = dict(data, tiempos={
+            'consultas': motor.tiempos,
+            'total_consultas': motor.total_consultas,
+            'total_ms': motor.total_ms
+        })
+
+    return _agregar_tiempos(jsonify(data), motor)
+
+def _con_motor(funcion):
+    """Permite llamar un indicador sin motor (dentro de una petición reutiliza la sesión de la petición)"""
+    def envoltura(fecha_inicio, fecha_fin, motor=None):
+        if motor is not None:
+            return funcion(motor)
+        session = db_config.get_session()
+        try:
+            return funcion(MotorIndicadores(session, fecha_inicio, fecha_fin))
+        finally:
+            session.close()
+    envoltura.__name__ = funcion.__name__
+    envoltura.__doc__ = funcion.__doc__
+    return envoltura
+
+def _top(contador, limite=None):
+    """Elementos de un Counter ordenados de mayor a menor"""
+    return contador.most_common(limite)
+
+def _por_clave(contador):
+    """Elementos de un Counter ordenados por clave, como un GROUP BY (None primero)"""
+    return sorted(contador.items(), key=lambda par: (par[0] is not None, par[0] or ''))
+
+@_con_motor
+def obtener_indicadores_ventas(motor):
+    """Indicadores de ventas y facturación"""
+
+    pedidos = motor.pedidos
+    resumen = motor.resumen
+
+    # Total de pedidos en el período
+    total_pedidos = len(pedidos)
+
+    # Total de productos vendidos y peso total vendido
+    total_productos_vendidos = sum(fila.cantidad or 0 for fila in resumen)
+    peso_total_vendido = sum(fila.peso or 0 for fila in resumen)
+
+    # Promedio de productos por pedido
+    promedio_productos_pedido = round(total_productos_vendidos / total_pedidos, 2) if total_pedidos > 0 else 0
+
+    # Evolución diaria y tendencia semanal (pedidos con productos)
+    pedidos_dia, productos_dia = Counter(), Counter()
+    pedidos_semana, productos_semana = Counter(), Counter()
+    for p in pedidos:
+        if p.tiene_items and p.fecha_creacion is not None:
+            dia = dia_colombia(p.fecha_creacion)
+            pedidos_dia[dia] += 1
+            pedidos_semana[dia.isocalendar()[1]] += 1
+    for fila in resumen:
+        productos_dia[fila.fecha] += fila.cantidad or 0
+        productos_semana[fila.fecha.isocalendar()[1]] += fila.cantidad or 0
+
+    # Estados de pedidos
+    estados_pedidos = Counter(p.estado_pedido_general for p in pedidos)
+
+    return {
+        'resumen': {
+            'total_pedidos': total_pedidos,
+            'total_productos_vendidos': int(total_productos_vendidos),
+            'peso_total_kg': round(peso_total_vendido / 1000, 2) if peso_total_vendido else 0,
+            'promedio_productos_pedido': promedio_productos_pedido
+        },
+        'evolucion_diaria': [
+            {
+                'fecha': str(dia),
+                'pedidos': pedidos_dia[dia],
+                'productos': int(productos_dia[dia])
+            } for dia in sorted(pedidos_dia)
+        ],
+        'estados_pedidos': [
+            {
+                'estado': estado or 'Sin Estado',
+                'cantidad': cantidad
+            } for estado, cantidad in _por_clave(estados_pedidos)
+        ],
+        'tendencia_semanal': [
+            {
+                'semana': int(semana),
+                'pedidos': pedidos_semana[semana],
+                'productos': int(productos_semana[semana])
+            } for semana in sorted(pedidos_semana)
+        ]
+    }
+
+@_con_motor
+def obtener_indicadores_clientes(motor):
+    """Indicadores de clientes y segmentación"""
+
+    pedidos = motor.pedidos
+    resumen_clientes = motor.clientes_resumen
+
+    # Total de clientes activos (con pedidos en el período)
+    clientes_con_pedidos = {p.cliente_id for p in pedidos if p.cliente_id is not None}
+    clientes_activos = len(clientes_con_pedidos)
+
+    # Nuevos clientes registrados, tipos de identificación y departamentos
+    nuevos_clientes = sum(int(fila.nuevos or 0) for fila in resumen_clientes)
+    total_clientes_registrados = sum(fila.total for fila in resumen_clientes)
+    tipos_identificacion = Counter()
+    clientes_departamento = Counter()
+    for fila in resumen_clientes:
+        tipos_identificacion[fila.tipo_identificacion] += fila.total
+        clientes_departamento[fila.departamento] += fila.total
+
+    # Top 10 clientes por volumen de pedidos (pedidos con productos)
+    top_clientes = motor.top_clientes(10)
+
+    # Crear datos de frecuencia simulados basados en estadísticas reales
+    total_clientes_con_pedidos = len(clientes_con_pedidos)
+    frecuencia_compra = [
+        {'frecuencia': 'Compra única', 'clientes': max(1, int(total_clientes_con_pedidos * 0.6))},
+        {'frecuencia': '2-5 pedidos', 'clientes': max(0, int(total_clientes_con_pedidos * 0.3))},
+        {'frecuencia': '6-10 pedidos', 'clientes': max(0, int(total_clientes_con_pedidos * 0.08))},
+        {'frecuencia': 'Más de 10 pedidos', 'clientes': max(0, int(total_clientes_con_pedidos * 0.02))}
+    ]
+
+    return {
+        'resumen': {
+            'clientes_activos': clientes_activos,
+            'nuevos_clientes': nuevos_clientes,
+            'total_clientes_registrados': total_clientes_registrados
+        },
+        'top_clientes': [
+            {
+                'nombre': cliente.nombre_comercial,
+                'identificacion': cliente.numero_identificacion,
+                'pedidos': cliente.pedidos,
+                'productos_comprados': int(cliente.productos or 0)
+            } for cliente in top_clientes
+        ],
+        'tipos_identificacion': [
+            {
+                'tipo': tipo or 'Sin Especificar',
+                'cantidad': cantidad
+            } for tipo, cantidad in _por_clave(tipos_identificacion)
+        ],
+        'clientes_por_departamento': [
+            {
+                'departamento': departamento or 'Sin Especificar',
+                'cantidad': cantidad
+            } for departamento, cantidad in _top(clientes_departamento, 10)
+        ],
+        'frecuencia_compra': frecuencia_compra
+    }
+
+def _rango_gramaje(gramaje):
+    """Rango de gramaje de un producto (mismos cortes que el reporte original)"""
+    if gramaje is None:
+        return None
+    if gramaje <= 100:
+        return '≤ 100g'
+    if 101 <= gramaje <= 500:
+        return '101-500g'
+    if 501 <= gramaje <= 1000:
+        return '501-1000g'
+    if gramaje > 1000:
+        return '> 1000g'
+    return None
+
+@_con_motor
+def obtener_indicadores_productos(motor):
     """Indicadores de productos y catálogo"""
-    
-    session = db_config.get_session()
-    
-    try:
-        # Total de productos en catálogo
-        total_productos_catalogo = session.query(Producto).filter(
-            Producto.estado == 'activo'
-        ).count()
-        
-        # Productos más vendidos
-        productos_mas_vendidos = session.query(
-            Producto.codigo,
-            Producto.referencia_de_producto,
-            func.sum(PedidoProducto.cantidad).label('total_vendido'),
-            func.count(func.distinct(PedidoProducto.pedido_id)).label('pedidos_diferentes')
-        ).join(PedidoProducto).join(Pedido).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin
-        ).group_by(Producto.id).order_by(desc('total_vendido')).limit(15).all()
-        
-        # Productos por grupo/formulación
-        productos_por_grupo = session.query(
-            Producto.formulacion_grupo,
-            func.count(Producto.id).label('cantidad_productos'),
-            func.sum(PedidoProducto.cantidad).label('total_vendido')
-        ).outerjoin(PedidoProducto).outerjoin(Pedido).filter(
-            func.coalesce(Pedido.fecha_creacion >= fecha_inicio, True),
-            func.coalesce(Pedido.fecha_creacion <= fecha_fin, True)
-        ).group_by(Producto.formulacion_grupo).order_by(desc('total_vendido')).all()
-        
-        # Productos por línea/categoría
-        productos_por_linea = session.query(
-            Producto.categoria_linea,
-            func.count(Producto.id).label('cantidad_productos'),
-            func.sum(PedidoProducto.cantidad).label('total_vendido')
-        ).outerjoin(PedidoProducto).outerjoin(Pedido).filter(
-            func.coalesce(Pedido.fecha_creacion >= fecha_inicio, True),
-            func.coalesce(Pedido.fecha_creacion <= fecha_fin, True)
-        ).group_by(Producto.categoria_linea).order_by(desc('total_vendido')).all()
-        
-        # Distribución por gramaje
-        distribucion_gramaje = session.query(
-            case(
-                (Producto.gramaje_g <= 100, '≤ 100g'),
-                (Producto.gramaje_g.between(101, 500), '101-500g'),
-                (Producto.gramaje_g.between(501, 1000), '501-1000g'),
-                (Producto.gramaje_g > 1000, '> 1000g')
-            ).label('rango_gramaje'),
-            func.count(Producto.id).label('cantidad')
-        ).group_by('rango_gramaje').all()
-        
-        # Productos sin ventas en el período - simplificado
-        productos_sin_ventas = 0  # Simplificado por ahora
-        
-        return {
-            'resumen': {
-                'total_productos_catalogo': total_productos_catalogo,
-                'productos_vendidos_periodo': len(productos_mas_vendidos),
-                'productos_sin_ventas': productos_sin_ventas
-            },
-            'productos_mas_vendidos': [
-                {
-                    'codigo': item.codigo,
-                    'referencia': item.referencia_de_producto,
-                    'cantidad_vendida': int(item.total_vendido),
-                    'pedidos_diferentes': item.pedidos_diferentes
-                } for item in productos_mas_vendidos
-            ],
-            'productos_por_grupo': [
-                {
-                    'grupo': item.formulacion_grupo or 'Sin Grupo',
-                    'cantidad_productos': item.cantidad_productos,
-                    'total_vendido': int(item.total_vendido or 0)
-                } for item in productos_por_grupo
-            ],
-            'productos_por_linea': [
-                {
-                    'linea': item.categoria_linea or 'Sin Línea',
-                    'cantidad_productos': item.cantidad_productos,
-                    'total_vendido': int(item.total_vendido or 0)
-                } for item in productos_por_linea
-            ],
-            'distribucion_gramaje': [
-                {
-                    'rango': item.rango_gramaje,
-                    'cantidad': item.cantidad
-                } for item in distribucion_gramaje
-            ]
-        }
-    
-    finally:
-        session.close()
 
-def obtener_indicadores_operaciones(fecha_inicio, fecha_fin):
+    productos = motor.productos
+
+    # Total de productos en catálogo
+    total_productos_catalogo = sum(1 for p in productos if p.estado == 'activo')
+
+    # Ventas del período por producto
+    vendido_producto = Counter()
+    for fila in motor.resumen:
+        vendido_producto[fila.producto_id] += fila.cantidad or 0
+
+    # Productos por grupo/formulación y por línea/categoría
+    cantidad_grupo, vendido_grupo = Counter(), Counter()
+    cantidad_linea, vendido_linea = Counter(), Counter()
+    distribucion_gramaje = Counter()
+    datos_producto = {}
+    for p in productos:
+        datos_producto[p.id] = p
+        cantidad_grupo[p.formulacion_grupo] += 1
+        vendido_grupo[p.formulacion_grupo] += vendido_producto.get(p.id, 0)
+        cantidad_linea[p.categoria_linea] += 1
+        vendido_linea[p.categoria_linea] += vendido_producto.get(p.id, 0)
+        distribucion_gramaje[_rango_gramaje(p.gramaje_g)] += 1
+
+    # Productos más vendidos
+    productos_mas_vendidos = [
+        (producto_id, cantidad) for producto_id, cantidad in _top(vendido_producto)
+        if producto_id in datos_producto
+    ][:15]
+    pedidos_producto = motor.pedidos_por_producto(producto_id for producto_id, _ in productos_mas_vendidos)
+
+    # Productos sin ventas en el período - simplificado
+    productos_sin_ventas = 0  # Simplificado por ahora
+
+    return {
+        'resumen': {
+            'total_productos_catalogo': total_productos_catalogo,
+            'productos_vendidos_periodo': len(vendido_producto),
+            'productos_sin_ventas': productos_sin_ventas
+        },
+        'productos_mas_vendidos': [
+            {
+                'codigo': datos_producto[producto_id].codigo,
+                'referencia': datos_producto[producto_id].referencia_de_producto,
+                'cantidad_vendida': int(cantidad),
+                'pedidos_diferentes': pedidos_producto.get(producto_id, 0)
+            } for producto_id, cantidad in productos_mas_vendidos
+        ],
+        'productos_por_grupo': [
+            {
+                'grupo': grupo or 'Sin Grupo',
+                'cantidad_productos': cantidad_grupo[grupo],
+                'total_vendido': int(total_vendido or 0)
+            } for grupo, total_vendido in _top(vendido_grupo)
+        ],
+        'productos_por_linea': [
+            {
+                'linea': linea or 'Sin Línea',
+                'cantidad_productos': cantidad_linea[linea],
+                'total_vendido': int(total_vendido or 0)
+            } for linea, total_vendido in _top(vendido_linea)
+        ],
+        'distribucion_gramaje': [
+            {
+                'rango': rango,
+                'cantidad': cantidad
+            } for rango, cantidad in _por_clave(distribucion_gramaje)
+        ]
+    }
+
+@_con_motor
+def obtener_indicadores_operaciones(motor):
     """Indicadores operacionales y logísticos"""
-    
-    session = db_config.get_session()
-    
-    try:
-        # Tipos de despacho más utilizados
-        tipos_despacho = session.query(
-            Pedido.despacho_tipo,
-            func.count(Pedido.id).label('cantidad')
-        ).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin
-        ).group_by(Pedido.despacho_tipo).order_by(desc('cantidad')).all()
-        
-        # Distribución por horarios de atención
-        horarios_atencion = session.query(
-            Pedido.despacho_horario_atencion,
-            func.count(Pedido.id).label('cantidad')
-        ).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin,
-            Pedido.despacho_horario_atencion.isnot(None)
-        ).group_by(Pedido.despacho_horario_atencion).order_by(desc('cantidad')).limit(10).all()
-        
-        # Tiempo promedio de entrega - simplificado para evitar problemas de SQL
-        tiempos_entrega = 0  # Simplificado por ahora
-        
-        # Estados de items de pedido
-        estados_items = session.query(
-            PedidoProducto.estado_del_pedido_item,
-            func.count(PedidoProducto.id).label('cantidad')
-        ).join(Pedido).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin
-        ).group_by(PedidoProducto.estado_del_pedido_item).all()
-        
-        # Pedidos con observaciones/comentarios
-        pedidos_con_comentarios = session.query(Pedido).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin,
-            Pedido.observaciones_despacho.isnot(None),
-            Pedido.observaciones_despacho != ''
-        ).count()
-        
-        total_pedidos_periodo = session.query(Pedido).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin
-        ).count()
-        
-        # Sedes más utilizadas
-        sedes_populares = session.query(
-            Pedido.despacho_sede,
-            func.count(Pedido.id).label('cantidad')
-        ).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin,
-            Pedido.despacho_sede.isnot(None)
-        ).group_by(Pedido.despacho_sede).order_by(desc('cantidad')).limit(10).all()
-        
-        return {
-            'resumen': {
-                'promedio_dias_entrega': round(float(tiempos_entrega or 0), 1),
-                'pedidos_con_comentarios': pedidos_con_comentarios,
-                'porcentaje_con_comentarios': round((pedidos_con_comentarios / total_pedidos_periodo * 100), 1) if total_pedidos_periodo > 0 else 0
-            },
-            'tipos_despacho': [
-                {
-                    'tipo': item.despacho_tipo or 'Sin Especificar',
-                    'cantidad': item.cantidad
-                } for item in tipos_despacho
-            ],
-            'horarios_atencion': [
-                {
-                    'horario': item.despacho_horario_atencion,
-                    'cantidad': item.cantidad
-                } for item in horarios_atencion
-            ],
-            'estados_items': [
-                {
-                    'estado': item.estado_del_pedido_item or 'Sin Estado',
-                    'cantidad': item.cantidad
-                } for item in estados_items
-            ],
-            'sedes_populares': [
-                {
-                    'sede': item.despacho_sede,
-                    'cantidad': item.cantidad
-                } for item in sedes_populares
-            ]
-        }
-    
-    finally:
-        session.close()
 
-def obtener_indicadores_geograficos(fecha_inicio, fecha_fin):
+    pedidos = motor.pedidos
+
+    # Tipos de despacho más utilizados
+    tipos_despacho = Counter(p.despacho_tipo for p in pedidos)
+
+    # Distribución por horarios de atención
+    horarios_atencion = Counter(p.despacho_horario_atencion for p in pedidos
+                                if p.despacho_horario_atencion is not None)
+
+    # Tiempo promedio de entrega - simplificado para evitar problemas de SQL
+    tiempos_entrega = 0  # Simplificado por ahora
+
+    # Estados de items de pedido
+    estados_items = Counter()
+    for fila in motor.resumen:
+        estados_items[fila.estado_item] += fila.lineas or 0
+
+    # Pedidos con observaciones/comentarios
+    pedidos_con_comentarios = sum(p.tiene_comentarios for p in pedidos)
+    total_pedidos_periodo = len(pedidos)
+
+    # Sedes más utilizadas
+    sedes_populares = Counter(p.despacho_sede for p in pedidos if p.despacho_sede is not None)
+
+    return {
+        'resumen': {
+            'promedio_dias_entrega': round(float(tiempos_entrega or 0), 1),
+            'pedidos_con_comentarios': pedidos_con_comentarios,
+            'porcentaje_con_comentarios': round((pedidos_con_comentarios / total_pedidos_periodo * 100), 1) if total_pedidos_periodo > 0 else 0
+        },
+        'tipos_despacho': [
+            {
+                'tipo': tipo or 'Sin Especificar',
+                'cantidad': cantidad
+            } for tipo, cantidad in _top(tipos_despacho)
+        ],
+        'horarios_atencion': [
+            {
+                'horario': horario,
+                'cantidad': cantidad
+            } for horario, cantidad in _top(horarios_atencion, 10)
+        ],
+        'estados_items': [
+            {
+                'estado': estado or 'Sin Estado',
+                'cantidad': cantidad
+            } for estado, cantidad in _por_clave(estados_items)
+        ],
+        'sedes_populares': [
+            {
+                'sede': sede,
+                'cantidad': cantidad
+            } for sede, cantidad in _top(sedes_populares, 10)
+        ]
+    }
+
+@_con_motor
+def obtener_indicadores_geograficos(motor):
     """Indicadores geográficos de distribución"""
-    
-    session = db_config.get_session()
-    
-    try:
-        # Pedidos por departamento
-        pedidos_por_departamento = session.query(
-            Pedido.departamento_entrega,
-            func.count(Pedido.id).label('cantidad_pedidos'),
-            func.sum(PedidoProducto.cantidad).label('productos_vendidos')
-        ).join(PedidoProducto).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin
-        ).group_by(Pedido.departamento_entrega).order_by(desc('cantidad_pedidos')).all()
-        
-        # Pedidos por ciudad
-        pedidos_por_ciudad = session.query(
-            Pedido.ciudad_entrega,
-            Pedido.departamento_entrega,
-            func.count(Pedido.id).label('cantidad_pedidos')
-        ).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin
-        ).group_by(Pedido.ciudad_entrega, Pedido.departamento_entrega).order_by(desc('cantidad_pedidos')).limit(15).all()
-        
-        # Concentración geográfica (% de pedidos en top 5 departamentos)
-        total_pedidos = session.query(Pedido).filter(
-            Pedido.fecha_creacion >= fecha_inicio,
-            Pedido.fecha_creacion <= fecha_fin
-        ).count()
-        
-        top_5_departamentos = pedidos_por_departamento[:5]
-        pedidos_top_5 = sum([item.cantidad_pedidos for item in top_5_departamentos])
-        concentracion_geografica = round((pedidos_top_5 / total_pedidos * 100), 1) if total_pedidos > 0 else 0
-        
-        return {
-            'resumen': {
-                'departamentos_atendidos': len(pedidos_por_departamento),
-                'concentracion_top_5': concentracion_geografica,
-                'total_pedidos': total_pedidos
-            },
-            'pedidos_por_departamento': [
-                {
-                    'departamento': item.departamento_entrega or 'Sin Especificar',
-                    'cantidad_pedidos': item.cantidad_pedidos,
-                    'productos_vendidos': int(item.productos_vendidos or 0)
-                } for item in pedidos_por_departamento
-            ],
-            'pedidos_por_ciudad': [
-                {
-                    'ciudad': item.ciudad_entrega or 'Sin Especificar',
-                    'departamento': item.departamento_entrega or 'Sin Especificar',
-                    'cantidad_pedidos': item.cantidad_pedidos
-                } for item in pedidos_por_ciudad
-            ]
-        }
-    
-    finally:
-        session.close()
\ No newline at end of file
+
+    pedidos = motor.pedidos
+
+    # Pedidos por departamento (pedidos con productos)
+    pedidos_departamento = Counter(p.departamento_entrega or '' for p in pedidos if p.tiene_items)
+    productos_departamento = Counter()
+    for fila in motor.resumen:
+        productos_departamento[fila.departamento] += fila.cantidad or 0
+    pedidos_por_departamento = [departamento for departamento, _ in _top(pedidos_departamento)]
+
+    # Pedidos por ciudad
+    pedidos_por_ciudad = Counter((p.ciudad_entrega, p.departamento_entrega) for p in pedidos)
+
+    # Concentración geográfica (% de pedidos en top 5 departamentos)
+    total_pedidos = len(pedidos)
+    pedidos_top_5 = sum(pedidos_departamento[d] for d in pedidos_por_departamento[:5])
+    concentracion_geografica = round((pedidos_top_5 / total_pedidos * 100), 1) if total_pedidos > 0 else 0
+
+    return {
+        'resumen': {
+            'departamentos_atendidos': len(pedidos_por_departamento),
+            'concentracion_top_5': concentracion_geografica,
+            'total_pedidos': total_pedidos
+        },
+        'pedidos_por_departamento': [
+            {
+                'departamento': departamento or 'Sin Especificar',
+                'cantidad_pedidos': pedidos_departamento[departamento],
+                'productos_vendidos': int(productos_departamento[departamento])
+            } for departamento in pedidos_por_departamento
+        ],
+        'pedidos_por_ciudad': [
+            {
+                'ciudad': ciudad or 'Sin Especificar',
+                'departamento': departamento or 'Sin Especificar',
+                'cantidad_pedidos': cantidad
+            } for (ciudad, departamento), cantidad in _top(pedidos_por_ciudad, 15)
+        ]
+    }
+
+OBTENER_INDICADORES = {
+    'ventas': obtener_indicadores_ventas,
+    'clientes': obtener_indicadores_clientes,
+    'productos': obtener_indicadores_productos,
+    'operaciones': obtener_indicadores_operaciones,
+    'geograficos': obtener_indicadores_geograficos
+}
@@ -1,9 +1,14 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, g, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, g, current_app, jsonify
 from config.database import db_config
 from models import Producto, Cliente, Pedido, PedidoProducto
 import business_logic
 from utils.helpers import get_current_year
-from sqlalchemy import func
+from utils.catalogo_productos import obtener_catalogo
+from utils.resumen_diario import aportes_pedido, registrar_cambio_pedido
+from utils.plan_produccion import aportes_plan, consultar_plan, registrar_cambio_plan, totales_plan, ventana_plan
+from utils.cache_respuestas import cache_respuesta
+from sqlalchemy import delete, insert
+from types import SimpleNamespace
 import logging
 
 # Configurar logging para esta ruta
@@ -21,8 +26,14 @@ def form():
     try:
         db = db_config.get_session()
         
-        # OPTIMIZACIÓN: Usar caché de productos en lugar de consulta directa
-        productos_dict = business_logic.get_productos_cached(db)
+        # Instantánea del catálogo en memoria (se refresca al cambiar su versión).
+        # El navegador descarga el catálogo aparte, como JSON versionado y
+        # cacheable; la plantilla solo usa el mapa por id para las filas.
+        catalogo = obtener_catalogo(db)
+        contexto_catalogo = {
+            'productos_por_id': catalogo.por_id,
+            'catalogo_url': url_for('catalogo.api_catalogo', v=catalogo.huella()),
+        }
         
         current_year = get_current_year()
 
@@ -101,8 +112,8 @@ def form():
                 form_state['show_subform_pedido'] = True
                 return render_template(template_name, 
                                      form_data=form_state, 
-                                     productos=productos_dict, 
-                                     current_year=current_year)
+                                     current_year=current_year,
+                                     **contexto_catalogo)
         else:
             form_state = business_logic.inicializar_estado_nuevo_pedido()
             form_state.update(cliente_data)  # Prefill with client data
@@ -110,9 +121,9 @@ def form():
             
             return render_template(template_name, 
                                 form_data=form_state, 
-                                productos=productos_dict, 
                                 current_year=current_year,
-                                show_welcome_message=show_welcome_message)
+                                show_welcome_message=show_welcome_message,
+                                **contexto_catalogo)
     except Exception as e:
         logger.error(f"Error interno del servidor en pedidos.form: {str(e)}", exc_info=True)
         return f"Error interno del servidor: {str(e)}", 500
@@ -177,6 +188,8 @@ def eliminar(pedido_id):
             flash('Pedido no encontrado', 'danger')
             return redirect(url_for('pedidos.lista'))
             
+        registrar_cambio_pedido(db, antes=aportes_pedido(pedido))
+        registrar_cambio_plan(db, antes=aportes_plan(pedido))
         db.delete(pedido)
         db.commit()
         flash('Pedido eliminado correctamente', 'success')
@@ -188,34 +201,112 @@ def eliminar(pedido_id):
     finally:
         db.close()
 
+@pedidos_bp.route('/estado-masivo', methods=['POST'])
+def estado_masivo():
+    """
+    Cambia el estado de muchos pedidos (y de sus ítems) en una sola transacción.
+
+    Recibe JSON o formulario con:
+        estado: nuevo estado general (uno de ESTADOS_PEDIDO).
+        estado_items: estado de los ítems (opcional, por defecto el mismo).
+        pedido_ids: lista de IDs, o bien
+        fecha_entrega (YYYY-MM-DD) y opcionalmente estado_actual: todos los
+            pedidos con entregas ese día, p. ej. el despacho del día a 'Entregado'.
+    """
+    import datetime
+
+    es_json = request.is_json
+    if es_json:
+        datos = request.get_json(silent=True) or {}
+        pedido_ids = datos.get('pedido_ids') or []
+    else:
+        datos = request.form
+        pedido_ids = request.form.getlist('pedido_ids')
+
+    def responder(mensaje, categoria, codigo=200, **extra):
+        if es_json:
+            return jsonify({'success': categoria != 'danger', 'mensaje': mensaje, **extra}), codigo
+        flash(mensaje, categoria)
+        return redirect(url_for('pedidos.lista'))
+
+    estado = datos.get('estado')
+    if estado not in business_logic.ESTADOS_PEDIDO:
+        return responder(f'Estado no válido: {estado}', 'danger', 400)
+
+    db = db_config.get_session()
+    try:
+        if datos.get('fecha_entrega'):
+            try:
+                fecha_entrega = datetime.date.fromisoformat(datos.get('fecha_entrega'))
+            except ValueError:
+                return responder('Fecha de entrega no válida', 'danger', 400)
+            pedido_ids = business_logic.pedidos_con_entrega(db, fecha_entrega, datos.get('estado_actual'))
+        else:
+            try:
+                pedido_ids = [int(pedido_id) for pedido_id in pedido_ids]
+            except (TypeError, ValueError):
+                return responder('IDs de pedido no válidos', 'danger', 400)
+
+        if not pedido_ids:
+            return responder('No hay pedidos para actualizar', 'warning', pedidos=0, items=0)
+
+        actualizados = business_logic.actualizar_estado_pedidos(
+            db, pedido_ids, estado, estado_items=datos.get('estado_items') or None
+        )
+        db.commit()
+        logger.info(f"Estado masivo '{estado}': {actualizados['pedidos']} pedidos, {actualizados['items']} ítems")
+        return responder(f"{actualizados['pedidos']} pedidos actualizados a '{estado}'", 'success', **actualizados)
+    except Exception as e:
+        db.rollback()
+        logger.error(f'Error en el cambio de estado masivo: {str(e)}', exc_info=True)
+        return responder(f'Error al actualizar los pedidos: {str(e)}', 'danger', 500)
+    finally:
+        db.close()
+
 @pedidos_bp.route('/consolidado')
 def consolidado():
-    """Mostrar vista consolidada de productos pedidos"""
+    """Plan de producción: cantidades por día de entrega en una ventana de días (por defecto la próxima semana)"""
     db = db_config.get_session()
     try:
-        # Consulta para obtener productos consolidados con su cantidad total
-        productos_consolidados = db.query(
-            Producto.referencia_de_producto,
-            Producto.codigo,
-            Producto.formulacion_grupo,
-            Producto.categoria_linea,
-            func.sum(PedidoProducto.cantidad).label('total_cantidad')
-        ).join(
-            PedidoProducto, Producto.id == PedidoProducto.producto_id
-        ).group_by(
-            Producto.referencia_de_producto,
-            Producto.codigo,
-            Producto.formulacion_grupo,
-            Producto.categoria_linea
-        ).all()
-        
+        try:
+            desde, hasta = ventana_plan(request.args.get('desde'), request.args.get('hasta'))
+        except ValueError as e:
+            flash(f'Rango de fechas no válido: {e}', 'warning')
+            desde, hasta = ventana_plan()
+
+        plan = totales_plan(consultar_plan(db, desde, hasta))
         current_year = get_current_year()
-        return render_template('pedidos_consolidado.html', 
-                             productos=productos_consolidados,
+        return render_template('pedidos_consolidado.html',
+                             productos=plan['productos'],
+                             dias=plan['dias'],
+                             desde=desde,
+                             hasta=hasta,
                              current_year=current_year)
     finally:
         db.close()
 
+@pedidos_bp.route('/api/plan-produccion')
+@cache_respuesta(['pedidos'], ttl=60)
+def api_plan_produccion():
+    """API del plan de producción por día de entrega (?desde=AAAA-MM-DD&hasta=AAAA-MM-DD)"""
+    try:
+        desde, hasta = ventana_plan(request.args.get('desde'), request.args.get('hasta'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    db = db_config.get_session()
+    try:
+        plan = totales_plan(consultar_plan(db, desde, hasta))
+        return jsonify({
+            'success': True,
+            'desde': desde.isoformat(),
+            'hasta': hasta.isoformat(),
+            'dias': plan['dias'],
+            'productos': plan['productos'],
+        })
+    finally:
+        db.close()
+
 @pedidos_bp.route('/editar/<int:pedido_id>', methods=['GET', 'POST'])
 def editar(pedido_id):
     """Editar un pedido existente"""
@@ -234,11 +325,15 @@ def editar(pedido_id):
             return redirect(url_for('pedidos.lista'))
 
         productos = db.query(Producto).all()
-        estados = ['En Proceso', 'Programado', 'Cancelado', 'Entregado']
+        estados = business_logic.ESTADOS_PEDIDO
         
         if request.method == 'POST':
             try:
                 logger.info(f"Actualizando pedido con ID: {pedido_id}")
+                # Aporte actual del pedido al resumen diario y al plan, antes de modificarlo
+                aporte_anterior = aportes_pedido(pedido)
+                plan_anterior = aportes_plan(pedido)
+
                 # Update pedido general info
                 pedido.estado_pedido_general = request.form.get('estado')
                 pedido.alerta = request.form.get('alerta')
@@ -249,13 +344,13 @@ def editar(pedido_id):
                 pedido.despacho_horario_atencion = request.form.get('despacho_horario_atencion')
                 pedido.observaciones_despacho = request.form.get('observaciones_despacho')
 
-                # Delete existing items
+                # Delete existing items (un solo DELETE por pedido_id)
                 logger.info(f"Eliminando {len(pedido.items)} items existentes del pedido")
-                for item in pedido.items:
-                    db.delete(item)
+                db.execute(delete(PedidoProducto).where(PedidoProducto.pedido_id == pedido.id))
                 
                 # Add new items
                 logger.info("Agregando nuevos items al pedido")
+                nuevos_items = []
                 idx = 0
                 while True:
                     producto_id_key = f'producto_id_{idx}'
@@ -278,7 +373,7 @@ def editar(pedido_id):
                         except (ValueError, TypeError):
                             cantidad = 0
                         
-                        item = PedidoProducto(
+                        nuevos_items.append(dict(
                             pedido_id=pedido.id,
                             producto_id=int(request.form.get(producto_id_key)),
                             fecha_pedido_item=fecha_pedido_item,  # AGREGADO: Columna faltante
@@ -290,10 +385,16 @@ def editar(pedido_id):
                             fecha_de_entrega_item=fecha_entrega,
                             estado_del_pedido_item=request.form.get(f'estado_del_pedido_item_{idx}', 'Pendiente'),
                             comentarios_item=request.form.get(f'presentacion_item_{idx}', '')  # CAMBIADO: De comentarios_item a presentacion_item
-                        )
-                        db.add(item)
+                        ))
                     idx += 1
 
+                # Todos los ítems nuevos en un solo INSERT por lotes
+                if nuevos_items:
+                    db.execute(insert(PedidoProducto), nuevos_items)
+
+                items_guardados = [SimpleNamespace(**item) for item in nuevos_items]
+                registrar_cambio_pedido(db, aporte_anterior, aportes_pedido(pedido, items_guardados))
+                registrar_cambio_plan(db, plan_anterior, aportes_plan(pedido, items_guardados))
                 db.commit()
                 flash('Pedido actualizado correctamente', 'success')
                 return redirect(url_for('pedidos.ver', pedido_id=pedido_id))
@@ -2,8 +2,12 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from config.database import db_config
 from models import Producto
 from utils.helpers import get_current_year
-import pandas as pd
-from sqlalchemy import or_, and_
+from utils.busqueda_productos import obtener_indice_productos
+from utils.catalogo_productos import registrar_cambio_catalogo
+from utils.cache_respuestas import cache_respuesta
+from utils.listado_productos import pagina_productos, serializar_producto_lista, POR_PAGINA_PRODUCTOS
+from utils.trabajos import encolar_trabajo, nuevo_id_trabajo, guardar_archivo_subido
+from routes.trabajos import solicita_segundo_plano, respuesta_trabajo_encolado
 import logging
 
 # Configurar logger
@@ -15,56 +19,39 @@ productos_bp = Blueprint('productos', __name__, url_prefix='/productos')
 @productos_bp.route('', methods=['GET'], strict_slashes=False)
 @productos_bp.route('/')
 def lista():
-    """Lista de productos"""
+    """Lista de productos: primera página en el servidor, las siguientes desde /productos/api/filtrar"""
     db = db_config.get_session()
     try:
-        productos = db.query(Producto).all()
-        
-        # Obtener valores únicos para los filtros
-        grupos = db.query(Producto.formulacion_grupo).distinct().filter(Producto.formulacion_grupo.isnot(None)).all()
-        lineas = db.query(Producto.categoria_linea).distinct().filter(Producto.categoria_linea.isnot(None)).all()
-        
-        grupos = [g[0] for g in grupos if g[0]]
-        lineas = [l[0] for l in lineas if l[0]]
-        
+        pagina = pagina_productos(db, facetas=True)
         current_year = get_current_year()
         return render_template('productos_list.html', 
-                             productos=productos, 
-                             grupos=grupos,
-                             lineas=lineas,
+                             productos=pagina['productos'], 
+                             siguiente=pagina['siguiente'],
+                             total=pagina['total'],
+                             grupos=pagina['facetas']['grupos'],
+                             lineas=pagina['facetas']['lineas'],
                              current_year=current_year)
     finally:
         db.close()
 
 @productos_bp.route('/api/buscar')
+@cache_respuesta(['productos'], ttl=600, max_entradas=512)
 def api_buscar():
     """API para búsqueda de productos con autocompletado para pedidos"""
-    db = db_config.get_session()
     try:
         # Obtener parámetros de búsqueda
         termino = request.args.get('q', '').strip()
         producto_id = request.args.get('id', '').strip()
         limite = int(request.args.get('limit', 10))  # Limitar resultados para rendimiento
         
+        # El índice en memoria responde sin consultar la base de datos
+        indice = obtener_indice_productos()
+        
         # Si se proporciona un ID específico, buscar por ID
         if producto_id:
             try:
-                producto = db.query(Producto).filter(Producto.id == int(producto_id)).first()
-                if producto:
-                    resultado = {
-                        'id': producto.id,
-                        'codigo': producto.codigo,
-                        'referencia': producto.referencia_de_producto,
-                        'display': f"{producto.codigo} - {producto.referencia_de_producto} - {producto.categoria_linea or 'Sin línea'}",
-                        'gramaje_g': producto.gramaje_g,
-                        'formulacion_grupo': producto.formulacion_grupo or '',
-                        'categoria_linea': producto.categoria_linea or '',
-                        'presentacion1': producto.presentacion1 or '',
-                        'presentacion2': producto.presentacion2 or ''
-                    }
-                    return jsonify([resultado])
-                else:
-                    return jsonify([])
+                resultado = indice.obtener(int(producto_id))
+                return jsonify([resultado] if resultado else [])
             except ValueError:
                 return jsonify([])
         
@@ -72,89 +59,45 @@ def api_buscar():
         if len(termino) < 1:  # Mínimo 1 carácter para iniciar búsqueda
             return jsonify([])
         
-        # Buscar productos por código, referencia o línea
-        query = db.query(Producto).filter(
-            or_(
-                Producto.codigo.ilike(f'%{termino}%'),
-                Producto.referencia_de_producto.ilike(f'%{termino}%'),
-                Producto.categoria_linea.ilike(f'%{termino}%')
-            )
-        ).limit(limite)
-        
-        productos = query.all()
-        
-        # Formatear resultados para autocompletado
-        resultados = []
-        for p in productos:
-            resultados.append({
-                'id': p.id,
-                'codigo': p.codigo,
-                'referencia': p.referencia_de_producto,
-                'display': f"{p.codigo} - {p.referencia_de_producto} - {p.categoria_linea or 'Sin línea'}",
-                'gramaje_g': p.gramaje_g,
-                'formulacion_grupo': p.formulacion_grupo or '',
-                'categoria_linea': p.categoria_linea or '',
-                'presentacion1': p.presentacion1 or '',
-                'presentacion2': p.presentacion2 or ''
-            })
-        
-        return jsonify(resultados)
+        # Buscar productos por código, referencia o línea ordenados por relevancia
+        return jsonify(indice.buscar(termino, limite))
         
     except Exception as e:
+        logger.error(f"Error en búsqueda de productos: {str(e)}")
         return jsonify([]), 500
-    finally:
-        db.close()
 
 @productos_bp.route('/api/filtrar')
+@cache_respuesta(['productos'], ttl=300)
 def api_filtrar():
-    """API para filtrar productos en tiempo real"""
+    """
+    API para filtrar productos en tiempo real.
+
+    Devuelve una página (?limite=, ?despues=cursor) con las columnas del
+    listado; la primera página (sin cursor) incluye el total y los conteos
+    por grupo y línea.
+    """
     db = db_config.get_session()
     try:
-        # Obtener parámetros de filtrado
-        busqueda = request.args.get('busqueda', '').strip()
-        grupo = request.args.get('grupo', '').strip()
-        linea = request.args.get('linea', '').strip()
-        
-        # Construir query base
-        query = db.query(Producto)
-        
-        # Aplicar filtros
-        if busqueda:
-            query = query.filter(
-                or_(
-                    Producto.codigo.ilike(f'%{busqueda}%'),
-                    Producto.referencia_de_producto.ilike(f'%{busqueda}%')
-                )
-            )
-        
-        if grupo:
-            query = query.filter(Producto.formulacion_grupo == grupo)
-            
-        if linea:
-            query = query.filter(Producto.categoria_linea == linea)
-        
-        productos = query.all()
-        
-        # Convertir a JSON
-        productos_data = []
-        for p in productos:
-            productos_data.append({
-                'id': p.id,
-                'codigo': p.codigo,
-                'referencia_de_producto': p.referencia_de_producto,
-                'gramaje_g': p.gramaje_g,
-                'formulacion_grupo': p.formulacion_grupo or '',
-                'categoria_linea': p.categoria_linea or '',
-                'presentacion1': p.presentacion1 or '',
-                'presentacion2': p.presentacion2 or ''
-            })
-        
+        despues = request.args.get('despues')
+        pagina = pagina_productos(
+            db,
+            busqueda=request.args.get('busqueda', '').strip(),
+            grupo=request.args.get('grupo', '').strip(),
+            linea=request.args.get('linea', '').strip(),
+            orden=request.args.get('orden', 'codigo'),
+            despues=despues,
+            limite=request.args.get('limite', POR_PAGINA_PRODUCTOS, type=int),
+            facetas=not despues
+        )
         return jsonify({
             'success': True,
-            'productos': productos_data,
-            'total': len(productos_data)
+            'productos': [serializar_producto_lista(fila) for fila in pagina['productos']],
+            'siguiente': pagina['siguiente'],
+            'total': pagina['total'],
+            'facetas': pagina['facetas']
         })
-        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -192,6 +135,7 @@ def agregar():
                 presentacion2=presentacion2
             )
             db.add(prod)
+            registrar_cambio_catalogo(db)
             db.commit()
             flash('Producto agregado correctamente.', 'success')
             return redirect(url_for('productos.lista'))
@@ -220,6 +164,7 @@ def editar(producto_id):
             prod.categoria_linea = request.form.get('categoria_linea')
             prod.presentacion1 = request.form.get('presentacion1')
             prod.presentacion2 = request.form.get('presentacion2')
+            registrar_cambio_catalogo(db)
             db.commit()
             flash('Producto actualizado correctamente.', 'success')
             return redirect(url_for('productos.lista'))
@@ -236,6 +181,7 @@ def eliminar(producto_id):
         prod = db.query(Producto).get(producto_id)
         if prod:
             db.delete(prod)
+            registrar_cambio_catalogo(db)
             db.commit()
             flash('Producto eliminado.', 'success')
         else:
@@ -278,6 +224,7 @@ def eliminar_multiple():
         for producto in productos:
             db.delete(producto)
         
+        registrar_cambio_catalogo(db)
         db.commit()
         
         # Mensaje de éxito
@@ -316,6 +263,12 @@ def ver(producto_id):
     finally:
         db.close()
 
+def _trabajo_importar_productos(db, contexto, ruta):
+    """Trabajo en segundo plano: importa el Excel guardado"""
+    from utils.importacion_productos import importar_productos  # pandas se carga solo al importar
+    resultado = importar_productos(db, ruta, progreso=contexto.progreso)
+    return resultado.to_dict()
+
 @productos_bp.route('/importar', methods=['GET', 'POST'])
 def importar():
     """Importar productos desde Excel"""
@@ -331,58 +284,27 @@ def importar():
             if archivo.filename == '':
                 return redirect(request.url)
                 
+            if archivo and solicita_segundo_plano():
+                # El archivo se guarda en disco y la importación sigue en un hilo aparte
+                trabajo_id = nuevo_id_trabajo()
+                ruta = guardar_archivo_subido(archivo, trabajo_id)
+                encolar_trabajo('importar_productos', _trabajo_importar_productos, ruta, trabajo_id=trabajo_id)
+                return respuesta_trabajo_encolado(trabajo_id)
+
             if archivo:
                 try:
-                    # Leer el archivo Excel
-                    df = pd.read_excel(archivo)
-                    
-                    # Validar columnas requeridas
-                    columnas_requeridas = ['codigo', 'referencia_de_producto', 'gramaje_g', 'formulacion_grupo', 'categoria_linea']
-                    for col in columnas_requeridas:
-                        if col not in df.columns:
-                            raise ValueError(f'Falta la columna requerida: {col}')
-                    
-                    # Procesar cada fila
-                    resultados = {'exito': True, 'mensaje': 'Productos importados correctamente', 'errores': []}
-                    for _, fila in df.iterrows():
-                        try:
-                            # Función para manejar valores NaN
-                            def safe_get(key, default=''):
-                                val = fila.get(key, default)
-                                return default if pd.isna(val) else val
-                            
-                            def safe_get_float(key, default=0.0):
-                                val = fila.get(key, default)
-                                if pd.isna(val):
-                                    return default
-                                try:
-                                    return float(val)
-                                except (ValueError, TypeError):
-                                    return default
-                            
-                            producto = Producto(
-                                codigo=safe_get('codigo'),
-                                referencia_de_producto=safe_get('referencia_de_producto'),
-                                gramaje_g=safe_get_float('gramaje_g', 0.0),
-                                formulacion_grupo=safe_get('formulacion_grupo'),
-                                categoria_linea=safe_get('categoria_linea'),
-                                descripcion=safe_get('descripcion'),
-                                presentacion1=safe_get('presentacion1'),
-                                presentacion2=safe_get('presentacion2'),
-                                precio_unitario=safe_get_float('precio_unitario', 0.0),
-                                unidad_medida=safe_get('unidad_medida', 'unidad'),
-                                estado='Activo' if str(safe_get('estado', '')).lower() in ['activo', '1', 'sí', 'si', 'true'] else 'Inactivo'
-                            )
-                            db.add(producto)
-                            db.commit()
-                        except Exception as e:
-                            db.rollback()
-                            resultados['errores'].append(f'Error en fila {_ + 2}: {str(e)}')
-                    
-                    if resultados['errores']:
-                        resultados['exito'] = False
-                        resultados['mensaje'] = 'Se produjeron algunos errores durante la importación'
-                    
+                    # Validación por columnas y escritura por lotes (upsert por código)
+                    from utils.importacion_productos import importar_productos
+                    resultado = importar_productos(db, archivo)
+
+                    resultados = {
+                        'exito': not resultado.errores,
+                        'mensaje': f'Productos importados correctamente: {resultado.resumen()}',
+                        'errores': resultado.mensajes_error()
+                    }
+                    if resultado.errores:
+                        resultados['mensaje'] = f'Se produjeron algunos errores durante la importación: {resultado.resumen()}'
+
                     return render_template('importar_productos.html', 
                                          resultados=resultados,
                                          current_year=current_year)
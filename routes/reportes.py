@@ -1,15 +1,38 @@
 from flask import Blueprint, render_template, request, make_response, flash, redirect, url_for, send_file, current_app
 from flask_login import login_required, current_user
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
 from config.database import db_config
-from models import Pedido, PedidoProducto, Producto, Cliente
+from models import Pedido, Producto, Cliente
 from datetime import datetime, date, timedelta
 import io
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment
-import pytz
+import os
 from utils.template_filters import utc_to_colombia
+from utils.cache import CacheTTL
+from utils.cache_respuestas import cache_respuesta
+from utils.consolidado_productos import (
+    FILA_PRODUCTO,
+    FILA_SUBTOTAL_FORMULACION,
+    FILA_TOTAL_CATEGORIA,
+    consolidar,
+    consulta_consolidado,
+)
+from utils.reporte_pedidos import (
+    LOTE_EXPORTACION_PEDIDOS,
+    POR_PAGINA_REPORTE_PEDIDOS,
+    clientes_exportacion,
+    consulta_pagina_pedidos,
+    consulta_pedidos_filtrada,
+    iterar_pedidos_exportacion,
+)
+from utils.fechas import formatear_fechas_colombia
+from utils.exportacion_excel import (
+    crear_libro_streaming,
+    celda,
+    fila_banda,
+    guardar_libro_temporal,
+    respuesta_archivo_por_partes,
+)
+from utils.trabajos import encolar_trabajo
+from routes.trabajos import solicita_segundo_plano, respuesta_trabajo_encolado
 
 reportes_bp = Blueprint('reportes', __name__, url_prefix='/reportes')
 
@@ -17,9 +40,46 @@ def get_current_year():
     """Obtener el año actual para el footer"""
     return datetime.now().year
 
+# Conteos del reporte por combinación de filtros y listas de los filtros
+_conteos_reporte_pedidos = CacheTTL(int(os.getenv('REPORTE_CONTEO_TTL', 60)))
+_listas_filtros = CacheTTL(int(os.getenv('REPORTE_FILTROS_TTL', 300)), max_entradas=8)
+
+def _cursor_pedido(pedido):
+    """Cursor de paginación de un pedido: fecha de creación e id (el reporte excluye los pedidos sin fecha)"""
+    return f"{pedido.fecha_creacion.isoformat()}_{pedido.id}"
+
+def _leer_cursor_pedido(valor):
+    """Valores (fecha_creacion, id) de un cursor; ValueError si no es válido"""
+    fecha, pedido_id = valor.rsplit('_', 1)
+    return datetime.fromisoformat(fecha), int(pedido_id)
+
+def estados_pedido_cacheados(db):
+    """Estados distintos de los pedidos para el filtro (cacheados unos minutos)"""
+    def consultar():
+        estados = db.query(Pedido.estado_pedido_general).distinct().filter(
+            Pedido.estado_pedido_general.isnot(None)
+        ).all()
+        return sorted(e[0] for e in estados if e[0])
+    return _listas_filtros.obtener('estados_pedido', consultar)
+
+class PaginacionCursor:
+    """Paginación por cursor: enlaces anterior/siguiente y un total aproximado"""
+
+    def __init__(self, pedidos, pagina, por_pagina, total, has_prev, has_next, filtros):
+        self.page = pagina
+        self.per_page = por_pagina
+        self.total = total
+        self.pages = max(1, (total + por_pagina - 1) // por_pagina)
+        self.has_prev = has_prev and bool(pedidos)
+        self.has_next = has_next and bool(pedidos)
+        self.prev_args = dict(filtros, antes=_cursor_pedido(pedidos[0]), pagina=max(1, pagina - 1)) if self.has_prev else None
+        self.next_args = dict(filtros, despues=_cursor_pedido(pedidos[-1]), pagina=pagina + 1) if self.has_next else None
+        self.primero = (pagina - 1) * por_pagina + 1 if pedidos else 0
+        self.ultimo = self.primero + len(pedidos) - 1 if pedidos else 0
+
 @reportes_bp.route('/pedidos')
 def reporte_pedidos():
-    """Reporte de pedidos con filtros y paginación"""
+    """Reporte de pedidos con filtros y paginación por cursor"""
     db = db_config.get_session()
     try:
         # Parámetros de filtro
@@ -27,81 +87,67 @@ def reporte_pedidos():
         fecha_hasta = request.args.get('fecha_hasta', '')
         estado = request.args.get('estado', '')
         cliente_id = request.args.get('cliente_id', '')
-        page = int(request.args.get('page', 1))
-        per_page = 20
-
-        # Query base
-        query = db.query(Pedido)
-
-        # Aplicar filtros
-        if fecha_desde:
-            try:
-                fecha_desde_dt = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-                query = query.filter(func.date(Pedido.fecha_creacion) >= fecha_desde_dt)
-            except ValueError:
-                flash('Fecha desde inválida', 'error')
-
-        if fecha_hasta:
-            try:
-                fecha_hasta_dt = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
-                query = query.filter(func.date(Pedido.fecha_creacion) <= fecha_hasta_dt)
-            except ValueError:
-                flash('Fecha hasta inválida', 'error')
-
-        if estado:
-            query = query.filter(Pedido.estado_pedido_general == estado)
-
-        if cliente_id and cliente_id != 'todos':
-            try:
-                cliente_id_int = int(cliente_id)
-                query = query.filter(Pedido.cliente_id == cliente_id_int)
-            except ValueError:
-                flash('ID de cliente inválido', 'error')
-
-        # Ordenar por fecha de creación descendente
-        query = query.order_by(desc(Pedido.fecha_creacion))
-
-        # Paginación
-        total = query.count()
-        pedidos = query.offset((page - 1) * per_page).limit(per_page).all()
-
-        # Crear objeto de paginación manual
-        class Pagination:
-            def __init__(self, page, per_page, total):
-                self.page = page
-                self.per_page = per_page
-                self.total = total
-                self.pages = (total + per_page - 1) // per_page
-                self.has_prev = page > 1
-                self.prev_num = page - 1 if self.has_prev else None
-                self.has_next = page < self.pages
-                self.next_num = page + 1 if self.has_next else None
-
-            def iter_pages(self, left_edge=2, right_edge=2, left_current=2, right_current=3):
-                last = self.pages
-                for num in range(1, last + 1):
-                    if num <= left_edge or \
-                       (self.page - left_current - 1 < num < self.page + right_current) or \
-                       num > last - right_edge:
-                        yield num
-
-        pagination = Pagination(page, per_page, total)
-
-        # Obtener datos para filtros
-        estados = db.query(Pedido.estado_pedido_general).distinct().filter(
-            Pedido.estado_pedido_general.isnot(None)
-        ).all()
-        estados = [e[0] for e in estados if e[0]]
-
-        clientes = db.query(Cliente).order_by(Cliente.nombre_comercial).all()
+        despues = request.args.get('despues', '')
+        antes = request.args.get('antes', '')
+        pagina = max(1, request.args.get('pagina', 1, type=int) or 1)
+        per_page = POR_PAGINA_REPORTE_PEDIDOS
+
+        # Pedidos filtrados (misma consulta que la exportación a Excel)
+        query, errores = consulta_pedidos_filtrada(db, request.args)
+        for error in errores:
+            flash(error, 'error')
+        cliente_seleccionado = None
+        if cliente_id and cliente_id != 'todos' and cliente_id.isdigit():
+            cliente_seleccionado = db.get(Cliente, int(cliente_id))
+
+        # Total cacheado por combinación de filtros (se muestra como aproximado)
+        clave_conteo = (fecha_desde, fecha_hasta, estado, cliente_id)
+        total = _conteos_reporte_pedidos.obtener(clave_conteo, query.order_by(None).count)
+
+        # Página por cursor: WHERE (fecha_creacion, id) < cursor en lugar de OFFSET
+        try:
+            if antes:
+                # Página anterior: se recorre en orden inverso y luego se invierte
+                pedidos = consulta_pagina_pedidos(
+                    query, per_page + 1, _leer_cursor_pedido(antes), hacia_atras=True
+                ).all()
+                has_prev = len(pedidos) > per_page
+                pedidos = pedidos[:per_page][::-1]
+                has_next = True
+            else:
+                cursor = _leer_cursor_pedido(despues) if despues else None
+                pedidos = consulta_pagina_pedidos(query, per_page + 1, cursor).all()
+                has_next = len(pedidos) > per_page
+                pedidos = pedidos[:per_page]
+                has_prev = bool(despues)
+        except ValueError:
+            # Cursor inválido: se vuelve a la primera página
+            pedidos = consulta_pagina_pedidos(query, per_page + 1).all()
+            has_next = len(pedidos) > per_page
+            pedidos = pedidos[:per_page]
+            has_prev = False
+            pagina = 1
+        if not has_prev:
+            pagina = 1
+
+        filtros = {clave: valor for clave, valor in (
+            ('fecha_desde', fecha_desde), ('fecha_hasta', fecha_hasta),
+            ('estado', estado), ('cliente_id', cliente_id)
+        ) if valor}
+        pagination = PaginacionCursor(pedidos, pagina, per_page, total, has_prev, has_next, filtros)
+
+        # Datos para filtros: estados cacheados y solo el cliente seleccionado
+        # (el selector busca clientes en /api/clientes/sugerencias)
+        estados = estados_pedido_cacheados(db)
 
         current_year = get_current_year()
         
         return render_template('reporte_pedidos.html', 
                              pedidos=pedidos,
                              pagination=pagination,
+                             filtros=filtros,
                              estados=estados,
-                             clientes=clientes,
+                             cliente_seleccionado=cliente_seleccionado,
                              current_user=current_user,
                              current_year=current_year)
     
@@ -113,6 +159,7 @@ def reporte_pedidos():
 
 @reportes_bp.route('/consolidado')
 @reportes_bp.route('/consolidado-productos')  # Agregar ruta alternativa con guiones
+@cache_respuesta(['pedidos', 'productos'], ttl=300)
 def consolidado_productos():
     """Consolidado de productos pedidos agrupados por categoría con subtotales por formulación y referencia"""
     db = db_config.get_session()
@@ -131,99 +178,14 @@ def consolidado_productos():
             categoria = ''
             formulacion = ''
 
-        # Query base para obtener items de pedidos con información de productos e incluir presentaciones
-        # Agrupa directamente por producto y suma las cantidades
-        # Calcula el peso total usando cantidad * gramaje_g directamente
-        query = db.query(
-            func.sum(PedidoProducto.cantidad).label('cantidad_total'),
-            func.sum(PedidoProducto.cantidad * Producto.gramaje_g).label('peso_total'),
-            PedidoProducto.comentarios_item.label('presentacion'),
-            Producto.referencia_de_producto,
-            Producto.formulacion_grupo,
-            Producto.categoria_linea
-        ).join(
-            Producto, PedidoProducto.producto_id == Producto.id
-        ).join(
-            Pedido, PedidoProducto.pedido_id == Pedido.id
-        ).group_by(
-            Producto.categoria_linea,
-            Producto.formulacion_grupo,
-            Producto.referencia_de_producto,
-            PedidoProducto.comentarios_item
-        )
-
-        # Aplicar filtros
-        if estado:
-            query = query.filter(Pedido.estado_pedido_general == estado)
-
-        if fecha_desde:
-            try:
-                fecha_desde_dt = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-                query = query.filter(func.date(Pedido.fecha_creacion) >= fecha_desde_dt)
-            except ValueError:
-                flash('Fecha desde inválida', 'error')
-
-        if fecha_hasta:
-            try:
-                fecha_hasta_dt = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
-                query = query.filter(func.date(Pedido.fecha_creacion) <= fecha_hasta_dt)
-            except ValueError:
-                flash('Fecha hasta inválida', 'error')
-
-        if categoria:
-            query = query.filter(Producto.categoria_linea.ilike(f'%{categoria}%'))
-
-        if formulacion:
-            query = query.filter(Producto.formulacion_grupo.ilike(f'%{formulacion}%'))
-
-        # Obtener resultados
-        resultados = query.all()
-
-        # Agrupar productos consolidados y calcular subtotales jerárquicos
-        productos_consolidados = []
-        subtotales_formulacion = {}
-        subtotales_categoria = {}
-        total_cantidad = 0
-        total_peso = 0
-
-        for resultado in resultados:
-            categoria = resultado.categoria_linea or 'Sin Categoría'
-            formulacion = resultado.formulacion_grupo or 'Sin Formulación'
-            referencia = resultado.referencia_de_producto or 'Sin Referencia'
-            presentacion = resultado.presentacion or 'Sin Presentación'
-            cantidad = resultado.cantidad_total or 0
-            peso = resultado.peso_total or 0
-            
-            producto_consolidado = {
-                'categoria': categoria,
-                'formulacion': formulacion,
-                'referencia': referencia,
-                'presentacion': presentacion,
-                'total_cantidad': cantidad,
-                'total_peso': peso
-            }
-            
-            productos_consolidados.append(producto_consolidado)
-            
-            # Calcular subtotales por formulación (categoria + formulacion)
-            form_key = f"{categoria}|{formulacion}"
-            if form_key not in subtotales_formulacion:
-                subtotales_formulacion[form_key] = {'cantidad': 0, 'peso': 0}
-            subtotales_formulacion[form_key]['cantidad'] += cantidad
-            subtotales_formulacion[form_key]['peso'] += peso
-            
-            # Calcular subtotales por categoría
-            if categoria not in subtotales_categoria:
-                subtotales_categoria[categoria] = {'cantidad': 0, 'peso': 0}
-            subtotales_categoria[categoria]['cantidad'] += cantidad
-            subtotales_categoria[categoria]['peso'] += peso
-            
-            # Actualizar totales generales
-            total_cantidad += cantidad
-            total_peso += peso
-
-        # Ordenar productos por categoría, formulación, referencia, presentación
-        productos_consolidados.sort(key=lambda x: (x['categoria'], x['formulacion'], x['referencia'], x['presentacion']))
+        # Consolidado sobre el resumen diario con subtotales por formulación y categoría
+        consulta, errores = consulta_consolidado(db, {
+            'estado': estado, 'fecha_desde': fecha_desde, 'fecha_hasta': fecha_hasta,
+            'categoria': categoria, 'formulacion': formulacion,
+        })
+        for error in errores:
+            flash(error, 'error')
+        consolidado = consolidar(consulta.all())
 
         # Obtener datos para filtros (independientes de los filtros aplicados)
         estados = db.query(Pedido.estado_pedido_general).distinct().filter(
@@ -254,11 +216,9 @@ def consolidado_productos():
         current_year = get_current_year()
 
         return render_template('consolidado_productos.html',
-                             productos_consolidados=productos_consolidados,
-                             subtotales_formulacion=subtotales_formulacion,
-                             subtotales_categoria=subtotales_categoria,
-                             total_cantidad=total_cantidad,
-                             total_peso=total_peso,
+                             filas_consolidado=consolidado['filas'],
+                             total_cantidad=consolidado['total_cantidad'],
+                             total_peso=consolidado['total_peso'],
                              estados=estados,
                              categorias=categorias,
                              formulaciones=formulaciones,
@@ -272,200 +232,160 @@ def consolidado_productos():
     finally:
         db.close()
 
+def escribir_excel_pedidos(db, query, destino=None, progreso=None):
+    """
+    Escribe el reporte de pedidos agrupado por cliente en un libro de solo escritura.
+
+    Los nombres de los clientes se ordenan una vez y los pedidos se leen por
+    cliente en lotes con sus ítems y productos precargados (ver
+    utils.reporte_pedidos), de modo que ninguna consulta ordena todos los
+    pedidos y la memoria usada no depende de la cantidad exportada.
+
+    Args:
+        db: Sesión de SQLAlchemy.
+        query: Consulta de Pedido con los filtros ya aplicados.
+        destino: Ruta del archivo a generar. Si es None se usa un archivo temporal.
+        progreso: Callable opcional progreso(porcentaje, mensaje) que se llama
+            después de cada lote (lo usan los trabajos en segundo plano).
+
+    Returns:
+        str: Ruta del archivo generado.
+    """
+    from openpyxl.styles import Font, PatternFill, Alignment
+
+    # Clientes en orden de nombre, con la cantidad de pedidos de cada uno
+    grupos = clientes_exportacion(query)
+    total_pedidos = sum(grupo.pedidos for grupo in grupos)
+    pedidos_escritos = 0
+
+    wb, ws = crear_libro_streaming("Reporte de Pedidos", [18, 35, 15, 30, 40, 25])
+
+    # Estilos
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    cliente_font = Font(bold=True, color="FFFFFF", size=14)
+    cliente_fill = PatternFill(start_color="0066CC", end_color="0066CC", fill_type="solid")  # Azul
+    pedido_font = Font(bold=True, color="000000")
+    pedido_fill = PatternFill(start_color="B3D9FF", end_color="B3D9FF", fill_type="solid")  # Azul claro
+    center_alignment = Alignment(horizontal="center")
+    left_alignment = Alignment(horizontal="left")
+
+    # Encabezados
+    headers = [
+        "Código Producto", "Referencia", "Cantidad", "Comentarios", "Dirección", "Horarios"
+    ]
+    ws.append([celda(ws, header, header_font, header_fill, center_alignment) for header in headers])
+
+    cliente_actual = None
+    hay_resultados = False
+
+    lotes = iterar_pedidos_exportacion(query, grupos, tamano_lote=LOTE_EXPORTACION_PEDIDOS, session=db)
+    for lote in lotes:
+        # Fechas de los encabezados de pedido convertidas en bloque por lote
+        fechas_lote = formatear_fechas_colombia([pedido.fecha_creacion for pedido, _ in lote], '%d/%m/%Y')
+        for (pedido, cliente_nombre), fecha_pedido in zip(lote, fechas_lote):
+            hay_resultados = True
+
+            # Nivel 1: Cliente (azul, texto grande)
+            if cliente_nombre != cliente_actual:
+                if cliente_actual is not None:
+                    # Línea en blanco adicional para separar clientes
+                    ws.append([])
+                cliente_actual = cliente_nombre
+                ws.append(fila_banda(ws, f"👤 {cliente_nombre}", 6, cliente_font, cliente_fill, left_alignment))
+
+            # Nivel 2: Productos del Pedido dentro de Cliente (azul claro)
+            pedido_info = f"📦 Pedido #{pedido.id} - {fecha_pedido} - Estado: {pedido.estado_pedido_general}"
+            ws.append(fila_banda(ws, pedido_info, 6, pedido_font, pedido_fill, left_alignment))
+
+            # Consolidar productos iguales dentro del mismo pedido
+            productos_consolidados = {}
+            for item in pedido.items:
+                if item.producto_asociado:
+                    producto_key = (item.producto_asociado.codigo, item.producto_asociado.referencia_de_producto)
+
+                    if producto_key not in productos_consolidados:
+                        productos_consolidados[producto_key] = {
+                            'codigo': item.producto_asociado.codigo,
+                            'referencia': item.producto_asociado.referencia_de_producto,
+                            'cantidad_total': 0,
+                            'presentaciones': []
+                        }
+
+                    # Sumar cantidad
+                    productos_consolidados[producto_key]['cantidad_total'] += item.cantidad or 0
+
+                    # Recopilar presentaciones únicas
+                    if item.comentarios_item and item.comentarios_item.strip():
+                        if item.comentarios_item not in productos_consolidados[producto_key]['presentaciones']:
+                            productos_consolidados[producto_key]['presentaciones'].append(item.comentarios_item)
+
+            # Dirección y horario son comunes a todos los ítems del pedido
+            direccion_completa = [
+                parte for parte in (pedido.direccion_entrega, pedido.ciudad_entrega, pedido.departamento_entrega)
+                if parte
+            ]
+            direccion = ", ".join(direccion_completa) if direccion_completa else 'Sin dirección especificada'
+            horario = pedido.despacho_horario_atencion if pedido.despacho_horario_atencion else 'Sin horario especificado'
+
+            # Nivel 3: Items consolidados de productos
+            for producto_data in productos_consolidados.values():
+                presentaciones_texto = "; ".join(producto_data['presentaciones']) if producto_data['presentaciones'] else 'Sin presentaciones'
+                ws.append([
+                    producto_data['codigo'],
+                    producto_data['referencia'],
+                    f"{producto_data['cantidad_total']} unidades",
+                    presentaciones_texto,
+                    direccion,
+                    horario
+                ])
+
+            # Línea en blanco para separar pedidos
+            ws.append([])
+
+        if progreso and total_pedidos:
+            pedidos_escritos += len(lote)
+            progreso(90 * pedidos_escritos // total_pedidos, f'{pedidos_escritos} de {total_pedidos} pedidos escritos')
+
+    if not hay_resultados:
+        # No hay resultados
+        ws.append([celda(ws, "No se encontraron pedidos con los filtros seleccionados", alignment=center_alignment)])
+
+    if destino is None:
+        return guardar_libro_temporal(wb, prefijo='reporte_pedidos_')
+    wb.save(destino)
+    return destino
+
+def _nombre_exportacion_pedidos():
+    colombia_now = utc_to_colombia(datetime.utcnow())
+    return f'reporte_pedidos_{colombia_now.strftime("%Y%m%d_%H%M%S")}.xlsx'
+
+def _trabajo_exportar_pedidos(db, contexto, filtros):
+    """Trabajo en segundo plano: genera el Excel de pedidos en el directorio del trabajo"""
+    nombre = _nombre_exportacion_pedidos()
+    query, _ = consulta_pedidos_filtrada(db, filtros)
+    ruta = escribir_excel_pedidos(db, query, contexto.ruta(nombre), progreso=contexto.progreso)
+    contexto.adjuntar_archivo(ruta, nombre)
+    return {'archivo': nombre}
+
 @reportes_bp.route('/exportar-pedidos-excel')
 def exportar_pedidos_excel():
     """Exportar reporte de pedidos a Excel con estructura jerárquica por cliente"""
+    filtros = request.args.to_dict()
+    if solicita_segundo_plano():
+        # El libro se genera en un hilo aparte; la descarga queda en /trabajos/<id>/descargar
+        trabajo_id = encolar_trabajo('exportar_pedidos', _trabajo_exportar_pedidos, filtros)
+        return respuesta_trabajo_encolado(trabajo_id)
+
     db = db_config.get_session()
     try:
-        # Aplicar los mismos filtros que en el reporte
-        fecha_desde = request.args.get('fecha_desde', '')
-        fecha_hasta = request.args.get('fecha_hasta', '')
-        estado = request.args.get('estado', '')
-        cliente_id = request.args.get('cliente_id', '')
+        # Los mismos filtros que el reporte (los no válidos se ignoran)
+        query, _ = consulta_pedidos_filtrada(db, filtros)
 
-        # Query base con join para obtener información completa
-        query = db.query(Pedido).join(
-            PedidoProducto, Pedido.id == PedidoProducto.pedido_id
-        ).join(
-            Producto, PedidoProducto.producto_id == Producto.id
-        ).outerjoin(
-            Cliente, Pedido.cliente_id == Cliente.id
-        )
-
-        # Aplicar filtros
-        if fecha_desde:
-            try:
-                fecha_desde_dt = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-                query = query.filter(func.date(Pedido.fecha_creacion) >= fecha_desde_dt)
-            except ValueError:
-                pass
-
-        if fecha_hasta:
-            try:
-                fecha_hasta_dt = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
-                query = query.filter(func.date(Pedido.fecha_creacion) <= fecha_hasta_dt)
-            except ValueError:
-                pass
-
-        if estado:
-            query = query.filter(Pedido.estado_pedido_general == estado)
-
-        if cliente_id and cliente_id != 'todos':
-            try:
-                cliente_id_int = int(cliente_id)
-                query = query.filter(Pedido.cliente_id == cliente_id_int)
-            except ValueError:
-                pass
-
-        # Obtener pedidos únicos y ordenarlos
-        pedidos = query.distinct().order_by(desc(Pedido.fecha_creacion)).all()
-
-        # Agrupar pedidos por cliente
-        pedidos_por_cliente = {}
-        for pedido in pedidos:
-            cliente_key = (
-                pedido.cliente_asociado.nombre_comercial if pedido.cliente_asociado 
-                else pedido.nombre_cliente_ingresado or 'Cliente no registrado'
-            )
-            
-            if cliente_key not in pedidos_por_cliente:
-                pedidos_por_cliente[cliente_key] = []
-            
-            pedidos_por_cliente[cliente_key].append(pedido)
-
-        # Crear libro de Excel
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Reporte de Pedidos"
-
-        # Estilos
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cliente_font = Font(bold=True, color="FFFFFF", size=14)
-        cliente_fill = PatternFill(start_color="0066CC", end_color="0066CC", fill_type="solid")  # Azul
-        pedido_font = Font(bold=True, color="000000")
-        pedido_fill = PatternFill(start_color="B3D9FF", end_color="B3D9FF", fill_type="solid")  # Azul claro
-        center_alignment = Alignment(horizontal="center")
-        left_alignment = Alignment(horizontal="left")
-
-        # Encabezados
-        headers = [
-            "Código Producto", "Referencia", "Cantidad", "Comentarios", "Dirección", "Horarios"
-        ]
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center_alignment
-
-        # Datos con estructura jerárquica
-        row = 2
-        
-        if pedidos_por_cliente:
-            for cliente_nombre, pedidos_cliente in pedidos_por_cliente.items():
-                # Nivel 1: Cliente (azul, texto grande)
-                cliente_cell = ws.cell(row=row, column=1, value=f"👤 {cliente_nombre}")
-                cliente_cell.font = cliente_font
-                cliente_cell.fill = cliente_fill
-                cliente_cell.alignment = left_alignment
-                ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
-                row += 1
-                
-                for pedido in pedidos_cliente:
-                    # Nivel 2: Productos del Pedido dentro de Cliente (azul claro)
-                    pedido_info = f"📦 Pedido #{pedido.id} - {utc_to_colombia(pedido.fecha_creacion).strftime('%d/%m/%Y')} - Estado: {pedido.estado_pedido_general}"
-                    pedido_cell = ws.cell(row=row, column=1, value=pedido_info)
-                    pedido_cell.font = pedido_font
-                    pedido_cell.fill = pedido_fill
-                    pedido_cell.alignment = left_alignment
-                    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
-                    row += 1
-                    
-                    # Consolidar productos iguales dentro del mismo pedido
-                    productos_consolidados = {}
-                    
-                    for item in pedido.items:
-                        if item.producto_asociado:
-                            producto_key = (item.producto_asociado.codigo, item.producto_asociado.referencia_de_producto)
-                            
-                            if producto_key not in productos_consolidados:
-                                productos_consolidados[producto_key] = {
-                                    'codigo': item.producto_asociado.codigo,
-                                    'referencia': item.producto_asociado.referencia_de_producto,
-                                    'cantidad_total': 0,
-                                    'presentaciones': []
-                                }
-                            
-                            # Sumar cantidad
-                            productos_consolidados[producto_key]['cantidad_total'] += item.cantidad or 0
-                            
-                            # Recopilar presentaciones únicas
-                            if item.comentarios_item and item.comentarios_item.strip():
-                                if item.comentarios_item not in productos_consolidados[producto_key]['presentaciones']:
-                                    productos_consolidados[producto_key]['presentaciones'].append(item.comentarios_item)
-                    
-                    # Nivel 3: Items consolidados de productos
-                    for producto_key, producto_data in productos_consolidados.items():
-                        # Código del producto
-                        ws.cell(row=row, column=1, value=producto_data['codigo'])
-                        
-                        # Referencia del producto
-                        ws.cell(row=row, column=2, value=producto_data['referencia'])
-                        
-                        # Cantidad total consolidada
-                        ws.cell(row=row, column=3, value=f"{producto_data['cantidad_total']} unidades")
-                        
-                        # Presentaciones consolidadas
-                        presentaciones_texto = "; ".join(producto_data['presentaciones']) if producto_data['presentaciones'] else 'Sin presentaciones'
-                        ws.cell(row=row, column=4, value=presentaciones_texto)
-                        
-                        # Dirección
-                        direccion_completa = []
-                        if pedido.direccion_entrega:
-                            direccion_completa.append(pedido.direccion_entrega)
-                        if pedido.ciudad_entrega:
-                            direccion_completa.append(pedido.ciudad_entrega)
-                        if pedido.departamento_entrega:
-                            direccion_completa.append(pedido.departamento_entrega)
-                        
-                        direccion = ", ".join(direccion_completa) if direccion_completa else 'Sin dirección especificada'
-                        ws.cell(row=row, column=5, value=direccion)
-                        
-                        # Horarios
-                        horario = pedido.despacho_horario_atencion if pedido.despacho_horario_atencion else 'Sin horario especificado'
-                        ws.cell(row=row, column=6, value=horario)
-                        
-                        row += 1
-                    
-                    # Línea en blanco para separar pedidos
-                    row += 1
-                
-                # Línea en blanco adicional para separar clientes
-                row += 1
-        else:
-            # No hay resultados
-            no_results_cell = ws.cell(row=row, column=1, value="No se encontraron pedidos con los filtros seleccionados")
-            ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
-            no_results_cell.alignment = center_alignment
+        # El libro se escribe a disco por lotes y se envía por partes
+        ruta = escribir_excel_pedidos(db, query)
 
-        # Ajustar ancho de columnas
-        column_widths = [18, 35, 15, 30, 40, 25]  # Anchos específicos para cada columna
-        for i, width in enumerate(column_widths, 1):
-            column_letter = openpyxl.utils.get_column_letter(i)
-            ws.column_dimensions[column_letter].width = width
-
-        # Crear respuesta
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        colombia_now = utc_to_colombia(datetime.utcnow())
-        response.headers['Content-Disposition'] = f'attachment; filename=reporte_pedidos_{colombia_now.strftime("%Y%m%d_%H%M%S")}.xlsx'
-        
-        return response
+        return respuesta_archivo_por_partes(ruta, _nombre_exportacion_pedidos())
 
     except Exception as e:
         flash(f'Error al exportar: {str(e)}', 'error')
@@ -473,253 +393,154 @@ def exportar_pedidos_excel():
     finally:
         db.close()
 
+def _libro_consolidado(db, filtros):
+    """Libro de Excel del consolidado de productos agrupado por categoría con subtotales por formulación"""
+    import openpyxl
+    from openpyxl.styles import Font, PatternFill, Alignment
+
+    # Mismo consolidado que la vista (los filtros no válidos se ignoran)
+    consulta, _ = consulta_consolidado(db, filtros)
+    consolidado = consolidar(consulta.all())
+
+    # Crear libro de Excel
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Consolidado de Productos"
+
+    # Estilos
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    categoria_font = Font(bold=True, color="000000", size=14)
+    categoria_fill = PatternFill(start_color="0066CC", end_color="0066CC", fill_type="solid")  # Azul
+    formulacion_font = Font(bold=True, color="000000")
+    formulacion_fill = PatternFill(start_color="D1ECF1", end_color="D1ECF1", fill_type="solid")  # Azul claro
+    subtotal_font = Font(bold=True, color="000000")
+    subtotal_fill = PatternFill(start_color="FFF3CD", end_color="FFF3CD", fill_type="solid")  # Amarillo claro
+    total_categoria_font = Font(bold=True, color="000000")
+    total_categoria_fill = PatternFill(start_color="E9ECEF", end_color="E9ECEF", fill_type="solid")  # Gris claro
+    total_font = Font(bold=True, color="FFFFFF")
+    total_fill = PatternFill(start_color="343A40", end_color="343A40", fill_type="solid")  # Gris oscuro
+    center_alignment = Alignment(horizontal="center")
+    right_alignment = Alignment(horizontal="right")
+
+    # Encabezados
+    headers = [
+        "Categoría", "Formulación", "Referencia de Producto", "Presentación",
+        "Cantidad Total", "Peso Total (g)"
+    ]
+    
+    for col, header in enumerate(headers, 1):
+        cell = ws.cell(row=1, column=col, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = center_alignment
+
+    # Datos consolidados con subtotales jerárquicos (sin encabezados intermedios)
+    row = 2
+    estilos_subtotal = {
+        FILA_SUBTOTAL_FORMULACION: (subtotal_font, subtotal_fill),
+        FILA_TOTAL_CATEGORIA: (total_categoria_font, total_categoria_fill),
+    }
+
+    for fila in consolidado['filas']:
+        if fila['tipo'] == FILA_PRODUCTO:
+            # Fila del producto
+            ws.cell(row=row, column=1, value=fila['categoria'])
+            ws.cell(row=row, column=2, value=fila['formulacion'])
+            ws.cell(row=row, column=3, value=fila['referencia'])
+            ws.cell(row=row, column=4, value=fila['presentacion'])
+
+            cantidad_cell = ws.cell(row=row, column=5, value=round(fila['total_cantidad'], 2))
+            cantidad_cell.alignment = right_alignment
+            peso_cell = ws.cell(row=row, column=6, value=round(fila['total_peso'], 2))
+            peso_cell.alignment = right_alignment
+            row += 1
+            continue
+
+        # Subtotal por formulación o total por categoría
+        font, fill = estilos_subtotal[fila['tipo']]
+        if fila['tipo'] == FILA_SUBTOTAL_FORMULACION:
+            etiqueta = f"🧮 Subtotal {fila['formulacion']}:"
+        else:
+            etiqueta = f"🏷️ Total {fila['categoria']}:"
+        cell = ws.cell(row=row, column=4, value=etiqueta)
+        cell.font = font
+        cell.fill = fill
+        cell.alignment = right_alignment
+        ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=4)
+
+        for columna, campo in ((5, 'total_cantidad'), (6, 'total_peso')):
+            valor_cell = ws.cell(row=row, column=columna, value=round(fila[campo], 2))
+            valor_cell.font = font
+            valor_cell.fill = fill
+            valor_cell.alignment = right_alignment
+        row += 1
+
+        if fila['tipo'] == FILA_TOTAL_CATEGORIA:
+            # Línea en blanco para separar categorías
+            row += 1
+
+    if not consolidado['filas']:
+        # No hay resultados
+        no_results_cell = ws.cell(row=row, column=1, value="No se encontraron resultados con los filtros seleccionados")
+        ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
+        no_results_cell.alignment = center_alignment
+        row += 1
+
+    # Total General
+    total_cell = ws.cell(row=row, column=4, value="🔢 TOTALES GENERALES:")
+    total_cell.font = total_font
+    total_cell.fill = total_fill
+    total_cell.alignment = right_alignment
+    
+    # Merge las primeras 4 columnas para el texto del total
+    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=4)
+    
+    # Total cantidad
+    total_cantidad_cell = ws.cell(row=row, column=5, value=round(consolidado['total_cantidad'], 2))
+    total_cantidad_cell.font = total_font
+    total_cantidad_cell.fill = total_fill
+    total_cantidad_cell.alignment = right_alignment
+    
+    # Total peso
+    total_peso_cell = ws.cell(row=row, column=6, value=round(consolidado['total_peso'], 2))
+    total_peso_cell.font = total_font
+    total_peso_cell.fill = total_fill
+    total_peso_cell.alignment = right_alignment
+
+    # Ajustar ancho de columnas
+    column_widths = [25, 30, 25, 12, 12, 15]  # Anchos específicos para cada columna
+    for i, width in enumerate(column_widths, 1):
+        column_letter = openpyxl.utils.get_column_letter(i)
+        ws.column_dimensions[column_letter].width = width
+
+    return wb
+
+def _nombre_exportacion_consolidado():
+    return f'consolidado_productos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+
+def _trabajo_exportar_consolidado(db, contexto, filtros):
+    """Trabajo en segundo plano: genera el Excel del consolidado en el directorio del trabajo"""
+    nombre = _nombre_exportacion_consolidado()
+    contexto.progreso(10, 'Consultando el consolidado')
+    wb = _libro_consolidado(db, filtros)
+    contexto.progreso(80, 'Guardando el archivo')
+    ruta = contexto.ruta(nombre)
+    wb.save(ruta)
+    contexto.adjuntar_archivo(ruta, nombre)
+    return {'archivo': nombre}
+
 @reportes_bp.route('/exportar-consolidado-excel')
 def exportar_consolidado_excel():
     """Exportar consolidado de productos a Excel agrupado por categoría con subtotales por formulación"""
+    filtros = request.args.to_dict()
+    if solicita_segundo_plano():
+        trabajo_id = encolar_trabajo('exportar_consolidado', _trabajo_exportar_consolidado, filtros)
+        return respuesta_trabajo_encolado(trabajo_id)
+
     db = db_config.get_session()
     try:
-        # Aplicar los mismos filtros que en el consolidado
-        estado = request.args.get('estado', '')
-        fecha_desde = request.args.get('fecha_desde', '')
-        fecha_hasta = request.args.get('fecha_hasta', '')
-        categoria = request.args.get('categoria', '')
-        formulacion = request.args.get('formulacion', '')
-
-        # Query base (misma lógica que en consolidado_productos)
-        # Agrupa directamente por producto y suma las cantidades
-        # Calcula el peso total usando cantidad * gramaje_g directamente
-        query = db.query(
-            func.sum(PedidoProducto.cantidad).label('cantidad_total'),
-            func.sum(PedidoProducto.cantidad * Producto.gramaje_g).label('peso_total'),
-            PedidoProducto.comentarios_item.label('presentacion'),
-            Producto.referencia_de_producto,
-            Producto.formulacion_grupo,
-            Producto.categoria_linea
-        ).join(
-            Producto, PedidoProducto.producto_id == Producto.id
-        ).join(
-            Pedido, PedidoProducto.pedido_id == Pedido.id
-        ).group_by(
-            Producto.categoria_linea,
-            Producto.formulacion_grupo,
-            Producto.referencia_de_producto,
-            PedidoProducto.comentarios_item
-        )
-
-        # Aplicar filtros
-        if estado:
-            query = query.filter(Pedido.estado_pedido_general == estado)
-        if fecha_desde:
-            try:
-                fecha_desde_dt = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-                query = query.filter(func.date(Pedido.fecha_creacion) >= fecha_desde_dt)
-            except ValueError:
-                pass
-        if fecha_hasta:
-            try:
-                fecha_hasta_dt = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
-                query = query.filter(func.date(Pedido.fecha_creacion) <= fecha_hasta_dt)
-            except ValueError:
-                pass
-        if categoria:
-            query = query.filter(Producto.categoria_linea.ilike(f'%{categoria}%'))
-        if formulacion:
-            query = query.filter(Producto.formulacion_grupo.ilike(f'%{formulacion}%'))
-
-        resultados = query.all()
-
-        # Procesar productos consolidados y calcular subtotales jerárquicos para Excel
-        productos_consolidados = []
-        subtotales_formulacion_excel = {}
-        subtotales_categoria_excel = {}
-        total_cantidad = 0
-        total_peso = 0
-
-        for resultado in resultados:
-            categoria = resultado.categoria_linea or 'Sin Categoría'
-            formulacion = resultado.formulacion_grupo or 'Sin Formulación'
-            referencia = resultado.referencia_de_producto or 'Sin Referencia'
-            presentacion = resultado.presentacion or 'Sin Presentación'
-            cantidad = resultado.cantidad_total or 0
-            peso = resultado.peso_total or 0
-            
-            producto_consolidado = {
-                'categoria': categoria,
-                'formulacion': formulacion,
-                'referencia': referencia,
-                'presentacion': presentacion,
-                'total_cantidad': cantidad,
-                'total_peso': peso
-            }
-            
-            productos_consolidados.append(producto_consolidado)
-            
-            # Calcular subtotales por formulación
-            form_key = f"{categoria}|{formulacion}"
-            if form_key not in subtotales_formulacion_excel:
-                subtotales_formulacion_excel[form_key] = {'cantidad': 0, 'peso': 0}
-            subtotales_formulacion_excel[form_key]['cantidad'] += cantidad
-            subtotales_formulacion_excel[form_key]['peso'] += peso
-            
-            # Calcular subtotales por categoría
-            if categoria not in subtotales_categoria_excel:
-                subtotales_categoria_excel[categoria] = {'cantidad': 0, 'peso': 0}
-            subtotales_categoria_excel[categoria]['cantidad'] += cantidad
-            subtotales_categoria_excel[categoria]['peso'] += peso
-            
-            # Actualizar totales generales
-            total_cantidad += cantidad
-            total_peso += peso
-
-        # Ordenar productos por categoría, formulación, referencia, presentación
-        productos_consolidados.sort(key=lambda x: (x['categoria'], x['formulacion'], x['referencia'], x['presentacion']))
-
-        # Crear libro de Excel
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Consolidado de Productos"
-
-        # Estilos
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        categoria_font = Font(bold=True, color="000000", size=14)
-        categoria_fill = PatternFill(start_color="0066CC", end_color="0066CC", fill_type="solid")  # Azul
-        formulacion_font = Font(bold=True, color="000000")
-        formulacion_fill = PatternFill(start_color="D1ECF1", end_color="D1ECF1", fill_type="solid")  # Azul claro
-        subtotal_font = Font(bold=True, color="000000")
-        subtotal_fill = PatternFill(start_color="FFF3CD", end_color="FFF3CD", fill_type="solid")  # Amarillo claro
-        total_categoria_font = Font(bold=True, color="000000")
-        total_categoria_fill = PatternFill(start_color="E9ECEF", end_color="E9ECEF", fill_type="solid")  # Gris claro
-        total_font = Font(bold=True, color="FFFFFF")
-        total_fill = PatternFill(start_color="343A40", end_color="343A40", fill_type="solid")  # Gris oscuro
-        center_alignment = Alignment(horizontal="center")
-        right_alignment = Alignment(horizontal="right")
-
-        # Encabezados
-        headers = [
-            "Categoría", "Formulación", "Referencia de Producto", "Presentación",
-            "Cantidad Total", "Peso Total (g)"
-        ]
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center_alignment
-
-        # Datos consolidados con subtotales jerárquicos (sin encabezados intermedios)
-        row = 2
-        current_categoria = ''
-        current_formulacion = ''
-        current_referencia = ''
-        
-        if productos_consolidados:
-            for i, producto in enumerate(productos_consolidados):
-                # Actualizar variables de control sin mostrar encabezados
-                if producto['categoria'] != current_categoria:
-                    current_categoria = producto['categoria']
-                    current_formulacion = ''
-                    current_referencia = ''
-                
-                if producto['formulacion'] != current_formulacion:
-                    current_formulacion = producto['formulacion']
-                    current_referencia = ''
-                
-                if producto['referencia'] != current_referencia:
-                    current_referencia = producto['referencia']
-                
-                # Fila del producto
-                ws.cell(row=row, column=1, value=producto['categoria'])
-                ws.cell(row=row, column=2, value=producto['formulacion'])
-                ws.cell(row=row, column=3, value=producto['referencia'])
-                ws.cell(row=row, column=4, value=producto['presentacion'])
-                
-                cantidad_cell = ws.cell(row=row, column=5, value=round(producto['total_cantidad'], 2))
-                cantidad_cell.alignment = right_alignment
-                peso_cell = ws.cell(row=row, column=6, value=round(producto['total_peso'], 2))
-                peso_cell.alignment = right_alignment
-                
-                row += 1
-                
-                # Verificar si es el último producto del grupo para mostrar subtotales
-                next_producto = productos_consolidados[i + 1] if i + 1 < len(productos_consolidados) else None
-                
-                # Subtotal por Formulación
-                if not next_producto or next_producto['categoria'] != producto['categoria'] or next_producto['formulacion'] != producto['formulacion']:
-                    form_key = f"{producto['categoria']}|{producto['formulacion']}"
-                    
-                    cell = ws.cell(row=row, column=4, value=f"🧮 Subtotal {producto['formulacion']}:")
-                    cell.font = subtotal_font
-                    cell.fill = subtotal_fill
-                    cell.alignment = right_alignment
-                    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=4)
-                    
-                    cantidad_cell = ws.cell(row=row, column=5, value=round(subtotales_formulacion_excel[form_key]['cantidad'], 2))
-                    cantidad_cell.font = subtotal_font
-                    cantidad_cell.fill = subtotal_fill
-                    cantidad_cell.alignment = right_alignment
-                    
-                    peso_cell = ws.cell(row=row, column=6, value=round(subtotales_formulacion_excel[form_key]['peso'], 2))
-                    peso_cell.font = subtotal_font
-                    peso_cell.fill = subtotal_fill
-                    peso_cell.alignment = right_alignment
-                    
-                    row += 1
-                
-                # Subtotal por Categoría
-                if not next_producto or next_producto['categoria'] != producto['categoria']:
-                    cell = ws.cell(row=row, column=4, value=f"🏷️ Total {producto['categoria']}:")
-                    cell.font = total_categoria_font
-                    cell.fill = total_categoria_fill
-                    cell.alignment = right_alignment
-                    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=4)
-                    
-                    cantidad_cell = ws.cell(row=row, column=5, value=round(subtotales_categoria_excel[producto['categoria']]['cantidad'], 2))
-                    cantidad_cell.font = total_categoria_font
-                    cantidad_cell.fill = total_categoria_fill
-                    cantidad_cell.alignment = right_alignment
-                    
-                    peso_cell = ws.cell(row=row, column=6, value=round(subtotales_categoria_excel[producto['categoria']]['peso'], 2))
-                    peso_cell.font = total_categoria_font
-                    peso_cell.fill = total_categoria_fill
-                    peso_cell.alignment = right_alignment
-                    
-                    row += 1
-                    # Línea en blanco para separar categorías
-                    row += 1
-        else:
-            # No hay resultados
-            no_results_cell = ws.cell(row=row, column=1, value="No se encontraron resultados con los filtros seleccionados")
-            ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
-            no_results_cell.alignment = center_alignment
-            row += 1
-
-        # Total General
-        total_cell = ws.cell(row=row, column=4, value="🔢 TOTALES GENERALES:")
-        total_cell.font = total_font
-        total_cell.fill = total_fill
-        total_cell.alignment = right_alignment
-        
-        # Merge las primeras 4 columnas para el texto del total
-        ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=4)
-        
-        # Total cantidad
-        total_cantidad_cell = ws.cell(row=row, column=5, value=round(total_cantidad, 2))
-        total_cantidad_cell.font = total_font
-        total_cantidad_cell.fill = total_fill
-        total_cantidad_cell.alignment = right_alignment
-        
-        # Total peso
-        total_peso_cell = ws.cell(row=row, column=6, value=round(total_peso, 2))
-        total_peso_cell.font = total_font
-        total_peso_cell.fill = total_fill
-        total_peso_cell.alignment = right_alignment
-
-        # Ajustar ancho de columnas
-        column_widths = [25, 30, 25, 12, 12, 15]  # Anchos específicos para cada columna
-        for i, width in enumerate(column_widths, 1):
-            column_letter = openpyxl.utils.get_column_letter(i)
-            ws.column_dimensions[column_letter].width = width
+        wb = _libro_consolidado(db, filtros)
 
         # Crear respuesta
         output = io.BytesIO()
@@ -728,7 +549,7 @@ def exportar_consolidado_excel():
 
         response = make_response(output.getvalue())
         response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        response.headers['Content-Disposition'] = f'attachment; filename=consolidado_productos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+        response.headers['Content-Disposition'] = f'attachment; filename={_nombre_exportacion_consolidado()}'
         
         return response
 
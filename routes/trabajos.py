@@ -0,0 +1,60 @@
+from flask import Blueprint, Response, jsonify, request, url_for
+from config.database import db_config
+from models import Trabajo
+from utils.trabajos import estado_trabajo, tamano_archivo_trabajo, partes_archivo_trabajo, COMPLETADO
+from utils.exportacion_excel import MIMETYPE_XLSX
+
+trabajos_bp = Blueprint('trabajos', __name__, url_prefix='/trabajos')
+
+
+def solicita_segundo_plano():
+    """Indica si la petición pidió ejecutar la tarea como trabajo en segundo plano"""
+    return request.values.get('segundo_plano') in ('1', 'true', 'si')
+
+
+def respuesta_trabajo_encolado(trabajo_id):
+    """Respuesta 202 con el id del trabajo y las URLs para consultarlo"""
+    return jsonify({
+        'trabajo_id': trabajo_id,
+        'estado': 'pendiente',
+        'url_estado': url_for('trabajos.estado', trabajo_id=trabajo_id),
+        'url_descarga': url_for('trabajos.descargar', trabajo_id=trabajo_id),
+    }), 202
+
+
+@trabajos_bp.route('/<trabajo_id>')
+def estado(trabajo_id):
+    """Estado, progreso y resultado de un trabajo en segundo plano"""
+    db = db_config.get_session()
+    try:
+        datos = estado_trabajo(db, trabajo_id)
+        if datos is None:
+            return jsonify({'error': 'Trabajo no encontrado'}), 404
+        if datos['tiene_archivo']:
+            datos['url_descarga'] = url_for('trabajos.descargar', trabajo_id=trabajo_id)
+        return jsonify(datos)
+    finally:
+        db.close()
+
+
+@trabajos_bp.route('/<trabajo_id>/descargar')
+def descargar(trabajo_id):
+    """Descarga el archivo generado por un trabajo terminado"""
+    db = db_config.get_session()
+    try:
+        trabajo = db.get(Trabajo, trabajo_id)
+        if trabajo is None:
+            return jsonify({'error': 'Trabajo no encontrado'}), 404
+        if trabajo.estado != COMPLETADO:
+            return jsonify({'error': 'El trabajo todavía no ha terminado', 'estado': trabajo.estado}), 409
+        tamano = tamano_archivo_trabajo(db, trabajo_id) if trabajo.nombre_archivo else 0
+        if not tamano:
+            return jsonify({'error': 'El trabajo no generó un archivo o ya fue eliminado'}), 404
+        # El archivo está en la base (cualquier instancia lo puede enviar) y se conserva
+        # hasta que expire el trabajo para permitir descargarlo de nuevo
+        response = Response(partes_archivo_trabajo(trabajo_id), mimetype=MIMETYPE_XLSX, direct_passthrough=True)
+        response.headers['Content-Length'] = str(tamano)
+        response.headers['Content-Disposition'] = f'attachment; filename={trabajo.nombre_archivo}'
+        return response
+    finally:
+        db.close()
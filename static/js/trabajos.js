@@ -0,0 +1,121 @@
+/*
+ * Trabajos en segundo plano (importaciones y exportaciones).
+ *
+ * Los enlaces y formularios con el atributo data-segundo-plano se envían con
+ * segundo_plano=1: el servidor responde de inmediato con el id del trabajo y
+ * aquí se consulta /trabajos/<id> hasta que termina. Las exportaciones se
+ * descargan al completarse; las importaciones muestran su resumen.
+ */
+(function () {
+    'use strict';
+
+    var INTERVALO_MS = 1000;
+
+    function escapar(texto) {
+        var div = document.createElement('div');
+        div.textContent = texto == null ? '' : String(texto);
+        return div.innerHTML;
+    }
+
+    function crearAviso(contenedor) {
+        var aviso = document.createElement('div');
+        aviso.className = 'alert alert-info mt-3';
+        aviso.innerHTML =
+            '<div class="d-flex justify-content-between"><span class="trabajo-mensaje">Trabajo en cola...</span>' +
+            '<span class="trabajo-porcentaje">0%</span></div>' +
+            '<div class="progress mt-2"><div class="progress-bar progress-bar-striped progress-bar-animated" ' +
+            'role="progressbar" style="width: 0%"></div></div>';
+        contenedor.appendChild(aviso);
+        return aviso;
+    }
+
+    function mostrarProgreso(aviso, estado) {
+        var porcentaje = (estado.progreso || 0) + '%';
+        aviso.querySelector('.progress-bar').style.width = porcentaje;
+        aviso.querySelector('.trabajo-porcentaje').textContent = porcentaje;
+        if (estado.mensaje) {
+            aviso.querySelector('.trabajo-mensaje').textContent = estado.mensaje;
+        }
+    }
+
+    function mostrarResultado(aviso, estado) {
+        var resultado = estado.resultado || {};
+        var errores = resultado.mensajes_error || [];
+        aviso.className = 'alert mt-3 ' + (errores.length ? 'alert-warning' : 'alert-success');
+        var html = '<strong>' + (errores.length ? 'Importación con errores' : 'Importación exitosa') + ':</strong> ' +
+            escapar(resultado.resumen || 'Trabajo completado');
+        if (errores.length) {
+            html += '<ul class="small mt-2 mb-0">' + errores.slice(0, 100).map(function (e) {
+                return '<li>' + escapar(e) + '</li>';
+            }).join('') + '</ul>';
+            if (errores.length > 100) {
+                html += '<div class="small">... y ' + (errores.length - 100) + ' errores más</div>';
+            }
+        }
+        aviso.innerHTML = html;
+    }
+
+    function mostrarError(aviso, mensaje) {
+        aviso.className = 'alert alert-danger mt-3';
+        aviso.textContent = 'Error: ' + (mensaje || 'el trabajo no pudo completarse');
+    }
+
+    function seguirTrabajo(respuesta, aviso, alTerminar) {
+        function consultar() {
+            fetch(respuesta.url_estado, { headers: { 'Accept': 'application/json' } })
+                .then(function (r) { return r.json(); })
+                .then(function (estado) {
+                    if (estado.estado === 'completado') {
+                        alTerminar(estado);
+                    } else if (estado.estado === 'error' || estado.error) {
+                        mostrarError(aviso, estado.mensaje || estado.error);
+                    } else {
+                        mostrarProgreso(aviso, estado);
+                        setTimeout(consultar, INTERVALO_MS);
+                    }
+                })
+                .catch(function () { setTimeout(consultar, INTERVALO_MS * 3); });
+        }
+        consultar();
+    }
+
+    function iniciar(promesa, aviso, alTerminar) {
+        promesa
+            .then(function (r) {
+                if (r.status !== 202) { throw new Error('respuesta inesperada del servidor (' + r.status + ')'); }
+                return r.json();
+            })
+            .then(function (respuesta) { seguirTrabajo(respuesta, aviso, alTerminar); })
+            .catch(function (e) { mostrarError(aviso, e.message); });
+    }
+
+    document.addEventListener('click', function (evento) {
+        var enlace = evento.target.closest('a[data-segundo-plano]');
+        if (!enlace) { return; }
+        evento.preventDefault();
+        var url = enlace.href + (enlace.href.indexOf('?') === -1 ? '?' : '&') + 'segundo_plano=1';
+        var selector = enlace.getAttribute('data-segundo-plano');
+        var contenedor = (selector && document.querySelector(selector)) || enlace.parentNode;
+        var aviso = crearAviso(contenedor);
+        iniciar(fetch(url, { headers: { 'Accept': 'application/json' } }), aviso, function (estado) {
+            aviso.className = 'alert alert-success mt-3';
+            aviso.textContent = 'Archivo generado, descargando...';
+            window.location = estado.url_descarga;
+        });
+    });
+
+    document.addEventListener('submit', function (evento) {
+        var formulario = evento.target;
+        if (!formulario.hasAttribute('data-segundo-plano')) { return; }
+        evento.preventDefault();
+        var datos = new FormData(formulario);
+        datos.append('segundo_plano', '1');
+        var boton = formulario.querySelector('[type="submit"]');
+        if (boton) { boton.disabled = true; }
+        var aviso = crearAviso(formulario);
+        iniciar(fetch(formulario.action, { method: 'POST', body: datos }), aviso, function (estado) {
+            mostrarResultado(aviso, estado);
+            if (boton) { boton.disabled = false; }
+        });
+    });
+})();
@@ -0,0 +1,72 @@
+"""
+Índice de búsqueda de productos del autocompletado (utils.busqueda_productos).
+
+Las búsquedas deben devolver lo mismo que el ilike '%termino%' sobre código,
+referencia y línea, para términos de cualquier largo.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from utils.busqueda_productos import IndiceProductos
+from utils.helpers import normalizar_texto
+
+PRODUCTOS = [
+    ('PT-102', 'Croissant mantequilla', 'Congelados'),
+    ('PT-210', 'Pan de bono', 'Horneados'),
+    ('10-AB', 'Almojábana', 'Congelados'),
+    ('XY-9', 'Buñuelo', 'Fritos'),
+    ('PT-3', 'Pandebono 10 unidades', 'Horneados'),
+]
+
+
+@pytest.fixture(scope='module')
+def indice():
+    return IndiceProductos(
+        SimpleNamespace(id=i, codigo=codigo, referencia_de_producto=referencia, categoria_linea=linea,
+                        gramaje_g=50.0, formulacion_grupo='', presentacion1='', presentacion2='')
+        for i, (codigo, referencia, linea) in enumerate(PRODUCTOS, start=1)
+    )
+
+
+def _ilike(termino):
+    """Códigos que encuentra el ilike de cada palabra sobre código, referencia o línea"""
+    palabras = normalizar_texto(termino).split()
+    return {
+        codigo for codigo, referencia, linea in PRODUCTOS
+        if all(any(palabra in normalizar_texto(campo) for campo in (codigo, referencia, linea))
+               for palabra in palabras)
+    }
+
+
+@pytest.mark.parametrize('termino', ['1', '10', '02', 'b', 'ño', 'pan', 'ban', 'bono', 'pt-1', 'pan 10', 'zz'])
+def test_igual_que_ilike(indice, termino):
+    assert {p['codigo'] for p in indice.buscar(termino, limite=50)} == _ilike(termino)
+
+
+def test_termino_corto_dentro_del_codigo(indice):
+    # "10" está dentro de "PT-102" y "PT-210", no solo al inicio de una palabra
+    codigos = [p['codigo'] for p in indice.buscar('10')]
+    assert 'PT-102' in codigos and 'PT-210' in codigos
+    # El prefijo de código va primero
+    assert codigos[0] == '10-AB'
+
+
+class _SinRecorrer(dict):
+    """Documentos del índice que fallan si alguien los recorre completos"""
+
+    def __iter__(self):
+        raise AssertionError('La búsqueda recorrió todo el catálogo')
+
+    items = values = keys = __iter__
+
+
+@pytest.mark.parametrize('termino', ['1', '10', 'ño', 'b pan'])
+def test_termino_corto_no_recorre_el_catalogo(termino):
+    indice = IndiceProductos(
+        SimpleNamespace(id=i, codigo=codigo, referencia_de_producto=referencia, categoria_linea=linea,
+                        gramaje_g=50.0, formulacion_grupo='', presentacion1='', presentacion2='')
+        for i, (codigo, referencia, linea) in enumerate(PRODUCTOS, start=1)
+    )
+    indice._documentos = _SinRecorrer(indice._documentos)
+    assert {p['codigo'] for p in indice.buscar(termino, limite=50)} == _ilike(termino)
@@ -0,0 +1,30 @@
+"""
+Motor de indicadores (utils.motor_indicadores).
+
+Cada conjunto de datos se consulta una vez por request, pero los que dependen
+de argumentos (límite, IDs de productos) se guardan por argumentos.
+"""
+import datetime
+
+from utils.motor_indicadores import MotorIndicadores
+
+
+def test_consultas_con_argumentos_no_comparten_resultado(db, crear_pedido, catalogo_pruebas):
+    crear_pedido([(0, 2, 'Unidad', '2030-06-01'), (1, 1, 'Docena', '2030-06-01')])
+    crear_pedido([(0, 1, 'Unidad', '2030-06-02')])
+    hoy = datetime.date.today()
+    motor = MotorIndicadores(db, hoy - datetime.timedelta(days=1), hoy + datetime.timedelta(days=1))
+    (producto_a, _), (producto_b, _), _ = catalogo_pruebas['productos']
+
+    # Otras pruebas también crean pedidos hoy: se comparan las claves y no los conteos
+    assert set(motor.pedidos_por_producto([producto_a])) == {producto_a}
+    assert set(motor.pedidos_por_producto([producto_b])) == {producto_b}
+    assert set(motor.pedidos_por_producto([producto_b, producto_a])) == {producto_a, producto_b}
+    assert len(motor.top_clientes(1)) == 1
+    assert motor.top_clientes(10) != []
+
+    # Los mismos argumentos (en otro orden) no repiten la consulta
+    consultas = motor.total_consultas
+    motor.pedidos_por_producto([producto_a, producto_b])
+    motor.top_clientes(1)
+    assert motor.total_consultas == consultas == 5
@@ -0,0 +1,166 @@
+"""
+Plan de producción por día de entrega (utils.plan_produccion).
+
+Igual que el resumen diario, el plan se mantiene aplicando la diferencia del
+aporte de cada pedido. Las pruebas verifican que tras crear, editar, cancelar
+en bloque y eliminar pedidos la tabla sea igual a una reconstrucción completa,
+y que la API devuelva solo la ventana de días pedida.
+"""
+import datetime
+
+import pytest
+
+from models import PlanProduccion
+from utils.plan_produccion import COLUMNAS_CLAVE_PLAN, MAXIMO_DIAS_PLAN, reconstruir_plan_produccion
+
+
+def _filas_plan(db, fecha=None):
+    """Contenido del plan (o de un día de entrega): {clave: (cantidad, peso_total_g, lineas)}"""
+    consulta = db.query(PlanProduccion)
+    if fecha:
+        consulta = consulta.filter(PlanProduccion.fecha_entrega == datetime.date.fromisoformat(fecha))
+    return {
+        tuple(getattr(fila, columna) for columna in COLUMNAS_CLAVE_PLAN):
+            (fila.cantidad, round(fila.peso_total_g, 3), fila.lineas)
+        for fila in consulta
+    }
+
+
+def assert_igual_a_reconstruccion(db):
+    # Descartar lo leído antes: las rutas escriben con su propia sesión
+    db.rollback()
+    incremental = _filas_plan(db)
+    reconstruir_plan_produccion(db)
+    db.flush()
+    reconstruido = _filas_plan(db)
+    db.rollback()
+    assert incremental == reconstruido
+
+
+def test_crear_pedidos(db, crear_pedido, catalogo_pruebas):
+    crear_pedido([(0, 3, 'Unidad', '2031-01-10'), (0, 2, 'Unidad', '2031-01-10'), (1, 1, 'Docena', '2031-01-11')])
+    # Los pedidos creados ya cancelados no entran al plan
+    crear_pedido([(0, 9, 'Unidad', '2031-01-10')], estado='Cancelado')
+    assert_igual_a_reconstruccion(db)
+
+    producto_id, gramaje = catalogo_pruebas['productos'][0]
+    assert _filas_plan(db, '2031-01-10') == {
+        (datetime.date(2031, 1, 10), producto_id, 'Unidad'): (5, round(gramaje * 5, 3), 2)
+    }
+
+
+def test_editar_pedido(db, cliente_http, crear_pedido, formulario_edicion):
+    pedido_id = crear_pedido([(0, 3, 'Unidad', '2031-02-10'), (1, 2, 'Docena', '2031-02-10')])
+
+    # Cambian fechas de entrega, producto y presentación; un ítem se retira
+    respuesta = cliente_http.post(f'/pedidos/editar/{pedido_id}', data=formulario_edicion(
+        [(2, 7, 'Bandeja', '2031-02-11')], estado='Programado'
+    ))
+    assert respuesta.status_code == 302
+    assert_igual_a_reconstruccion(db)
+    assert _filas_plan(db, '2031-02-10') == {}
+
+    # Editar a Cancelado lo retira del plan
+    respuesta = cliente_http.post(f'/pedidos/editar/{pedido_id}', data=formulario_edicion(
+        [(2, 7, 'Bandeja', '2031-02-11')], estado='Cancelado'
+    ))
+    assert respuesta.status_code == 302
+    assert_igual_a_reconstruccion(db)
+    assert _filas_plan(db, '2031-02-11') == {}
+
+
+def test_cancelar_y_reactivar_en_bloque(db, cliente_http, crear_pedido):
+    ids = [crear_pedido([(0, 2, 'Unidad', '2031-03-10'), (1, 5, 'Docena', '2031-03-11')]) for _ in range(3)]
+    antes = {**_filas_plan(db, '2031-03-10'), **_filas_plan(db, '2031-03-11')}
+
+    respuesta = cliente_http.post('/pedidos/estado-masivo', json={'estado': 'Cancelado', 'pedido_ids': ids})
+    assert respuesta.get_json()['pedidos'] == 3
+    assert_igual_a_reconstruccion(db)
+    assert _filas_plan(db, '2031-03-10') == {} and _filas_plan(db, '2031-03-11') == {}
+
+    respuesta = cliente_http.post('/pedidos/estado-masivo', json={'estado': 'Programado', 'pedido_ids': ids})
+    assert respuesta.get_json()['pedidos'] == 3
+    assert_igual_a_reconstruccion(db)
+    assert {**_filas_plan(db, '2031-03-10'), **_filas_plan(db, '2031-03-11')} == antes
+
+    # Cambiar entre estados que sí se producen no mueve el plan
+    respuesta = cliente_http.post('/pedidos/estado-masivo', json={'estado': 'Entregado', 'fecha_entrega': '2031-03-10'})
+    assert respuesta.get_json()['pedidos'] == 3
+    assert_igual_a_reconstruccion(db)
+    assert {**_filas_plan(db, '2031-03-10'), **_filas_plan(db, '2031-03-11')} == antes
+
+
+def test_eliminar_pedido(db, cliente_http, crear_pedido):
+    crear_pedido([(0, 6, 'Unidad', '2031-04-10')])
+    eliminado = crear_pedido([(0, 2, 'Unidad', '2031-04-10'), (2, 1, 'Caja', '2031-04-11')])
+
+    respuesta = cliente_http.post(f'/pedidos/eliminar/{eliminado}')
+    assert respuesta.status_code == 302
+    assert_igual_a_reconstruccion(db)
+    assert [valores[0] for valores in _filas_plan(db, '2031-04-10').values()] == [6]
+    assert _filas_plan(db, '2031-04-11') == {}
+
+
+def test_api_devuelve_solo_la_ventana(cliente_http, crear_pedido):
+    crear_pedido([(0, 1, 'Unidad', '2031-05-09'), (0, 2, 'Unidad', '2031-05-10'),
+                  (1, 3, 'Docena', '2031-05-12'), (0, 4, 'Unidad', '2031-05-13')])
+
+    datos = cliente_http.get('/pedidos/api/plan-produccion?desde=2031-05-10&hasta=2031-05-12').get_json()
+    assert datos['success']
+    assert (datos['desde'], datos['hasta']) == ('2031-05-10', '2031-05-12')
+    assert [dia['fecha'] for dia in datos['dias']] == ['2031-05-10', '2031-05-12']
+    assert sorted((p['presentacion'], p['cantidad']) for p in datos['productos']) == [('Docena', 3), ('Unidad', 2)]
+
+
+@pytest.mark.parametrize('consulta', [
+    'desde=2031-05-12&hasta=2031-05-10',
+    'desde=2031-13-01',
+    f'desde=2031-01-01&hasta={datetime.date(2031, 1, 1) + datetime.timedelta(days=MAXIMO_DIAS_PLAN)}',
+])
+def test_api_rechaza_ventanas_no_validas(cliente_http, consulta):
+    respuesta = cliente_http.get(f'/pedidos/api/plan-produccion?{consulta}')
+    assert respuesta.status_code == 400
+    assert not respuesta.get_json()['success']
+
+
+def test_historico_se_construye_aunque_se_escriba_antes(tmp_path):
+    """Igual que el resumen diario: el plan se construye según su marca, no porque la tabla esté vacía"""
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import Session
+
+    import business_logic
+    from models import Base, Cliente, Pedido, PedidoProducto, Producto, VersionTabla
+    from utils.plan_produccion import MARCA_CONSTRUIDO, construir_plan_produccion
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'historico.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add_all([Cliente(id=1, nombre_comercial='Histórico', numero_identificacion='800'),
+                    Producto(id=1, codigo='H-1', referencia_de_producto='Histórico', gramaje_g=10.0)])
+        # Pedido anterior al plan, escrito sin pasar por registrar_cambio_plan
+        pedido_id = db.execute(insert(Pedido).values(
+            fecha_creacion=datetime.datetime(2024, 1, 10, 15), cliente_id=1, estado_pedido_general='En Proceso'
+        )).inserted_primary_key[0]
+        db.execute(insert(PedidoProducto).values(
+            pedido_id=pedido_id, producto_id=1, fecha_pedido_item=datetime.date(2024, 1, 10), cantidad=100,
+            peso_total_g_item=1000.0, comentarios_item='Unidad', fecha_de_entrega_item=datetime.date(2031, 6, 1)
+        ))
+        db.commit()
+
+        ok, errores = business_logic.guardar_pedido_completo(db, {
+            'numero_identificacion_cliente_ingresado': '800', 'nombre_cliente_ingresado': 'Histórico',
+            'despacho_tipo': 'Domicilio', 'direccion_entrega': 'Calle 1', 'ciudad_entrega': 'Medellín',
+            'departamento_entrega': 'Antioquia',
+            'pedido_items': [{'producto_id': 1, 'cantidad': 5, 'gramaje_g_item': 10, 'peso_total_g_item': 50,
+                              'comentarios_item': 'Unidad', 'fecha_de_entrega_item': '2031-06-02'}],
+        })
+        assert ok, errores
+        assert sorted(valores[0] for valores in _filas_plan(db).values()) == [5]
+
+    assert construir_plan_produccion(engine) == 2
+    with Session(engine) as db:
+        assert sorted(valores[0] for valores in _filas_plan(db).values()) == [5, 100]
+        assert db.get(VersionTabla, MARCA_CONSTRUIDO) is not None
+    # Con la marca ya no se reconstruye
+    assert construir_plan_produccion(engine) is None
+    engine.dispose()
@@ -0,0 +1,143 @@
+"""
+Filtros de rango de fechas en hora de Colombia: condiciones sargables que
+usan los índices compuestos de pedidos (ver utils.fechas.filtro_rango_fechas).
+
+Se construyen las consultas de los reportes con las mismas funciones que usan
+las rutas (gestionar_bd._consultas_reportes) y se verifica con EXPLAIN que
+cada una lee un rango del índice esperado y no recorre ninguna tabla completa.
+"""
+import datetime
+
+import pytest
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import Session
+
+import gestionar_bd
+from models import Base, Pedido, PlanProduccion, Producto, ResumenDiarioProducto
+from utils.fechas import filtro_rango_fechas, inicio_dia_utc
+
+# Consulta de gestionar_bd._consultas_reportes -> (tabla leída por rango, índice que debe usar)
+INDICES_ESPERADOS = {
+    'reporte de pedidos por rango': ('pedidos', 'ix_pedidos_fecha_estado'),
+    'reporte de pedidos por rango, página siguiente': ('pedidos', 'ix_pedidos_fecha_estado'),
+    'reporte de pedidos por rango, página anterior': ('pedidos', 'ix_pedidos_fecha_estado'),
+    'reporte de pedidos por rango y estado': ('pedidos', 'ix_pedidos_fecha_estado'),
+    'reporte de pedidos de un cliente por rango': ('pedidos', 'ix_pedidos_cliente_fecha'),
+    'exportación de pedidos: clientes del rango': ('pedidos', 'ix_pedidos_fecha_estado'),
+    'exportación de pedidos: pedidos de un cliente': ('pedidos', 'ix_pedidos_cliente_fecha'),
+    'consolidado y su exportación': ('resumen_diario_productos', 'ix_resumen_diario_productos_fecha'),
+    'plan de producción de la semana': ('plan_produccion', 'uq_plan_produccion_clave'),
+}
+
+# Columna de fecha por la que se lee el rango de cada tabla
+COLUMNA_RANGO = {
+    'pedidos': 'fecha_creacion',
+    'resumen_diario_productos': 'fecha',
+    'plan_produccion': 'fecha_entrega',
+}
+
+
+def _consulta_reporte(engine, nombre, dias):
+    """SQL de una consulta de los reportes tal como la construyen las rutas"""
+    with Session(engine) as db:
+        return gestionar_bd._sql_consulta(gestionar_bd._consultas_reportes(db, dias)[nombre], engine.dialect)
+
+
+def _sql(consulta, engine):
+    return str(consulta.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+
+
+def test_limites_en_utc_del_dia_colombiano():
+    desde, hasta = datetime.date(2024, 3, 1), datetime.date(2024, 3, 31)
+    condiciones = filtro_rango_fechas(Pedido.fecha_creacion, desde, hasta)
+
+    assert len(condiciones) == 2
+    # Colombia es UTC-5 todo el año: el día empieza a las 05:00 UTC
+    assert inicio_dia_utc(desde) == datetime.datetime(2024, 3, 1, 5, 0)
+    assert condiciones[0].right.value == datetime.datetime(2024, 3, 1, 5, 0)
+    assert condiciones[1].right.value == datetime.datetime(2024, 4, 1, 5, 0)
+
+
+def test_condiciones_sobre_la_columna_sin_funciones():
+    engine = create_engine('sqlite://')
+    sql = ' AND '.join(
+        _sql(condicion, engine)
+        for condicion in filtro_rango_fechas(Pedido.fecha_creacion, datetime.date(2024, 3, 1), datetime.date(2024, 3, 31))
+    )
+    # La columna se compara directamente: sin date(), CONVERT_TZ() ni datetime() sobre ella
+    assert sql.startswith('pedidos.fecha_creacion >= ')
+    assert ' AND pedidos.fecha_creacion < ' in sql
+    assert '(pedidos.fecha_creacion' not in sql
+
+
+@pytest.fixture(scope='module')
+def motor_sqlite():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize('nombre', sorted(INDICES_ESPERADOS))
+def test_explain_sqlite_usa_rango_del_indice(motor_sqlite, nombre):
+    tabla, indice = INDICES_ESPERADOS[nombre]
+    if indice.startswith('uq_'):
+        # SQLite nombra por su cuenta el índice de una restricción única
+        indice = f'sqlite_autoindex_{tabla}_'
+    with motor_sqlite.connect() as conn:
+        plan = conn.execute(text('EXPLAIN QUERY PLAN ' + _consulta_reporte(motor_sqlite, nombre, 30))).all()
+
+    detalle = [fila[-1] for fila in plan]
+    assert not any(gestionar_bd._recorrido_completo('sqlite', fila) for fila in plan), detalle
+    uso_tabla = next(d for d in detalle if f' {tabla} ' in f'{d} ')
+    assert uso_tabla.startswith('SEARCH')
+    assert indice in uso_tabla
+    columna = COLUMNA_RANGO[tabla]
+    assert f'{columna}>?' in uso_tabla and f'{columna}<?' in uso_tabla
+
+
+@pytest.fixture(scope='module')
+def motor_mysql(url_mysql):
+    engine = create_engine(url_mysql)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # Con las tablas vacías el optimizador puede preferir recorrerlas: cargar pedidos de 90 días
+        if conn.execute(text('SELECT COUNT(*) FROM pedidos')).scalar() < 1000:
+            ahora = datetime.datetime.utcnow()
+            conn.execute(insert(Pedido), [
+                {'fecha_creacion': ahora - datetime.timedelta(hours=i * 2), 'cliente_id': None,
+                 'estado_pedido_general': ('En Proceso', 'Entregado', 'Cancelado')[i % 3]}
+                for i in range(1000)
+            ])
+        # ... y 90 días de resumen diario y de plan de producción sobre 100 productos
+        if conn.execute(text('SELECT COUNT(*) FROM resumen_diario_productos')).scalar() < 1000:
+            hoy = datetime.date.today()
+            conn.execute(insert(Producto), [
+                {'codigo': f'EXP-{i}', 'referencia_de_producto': f'Explicar {i}', 'gramaje_g': 10.0}
+                for i in range(100)
+            ])
+            productos = [fila[0] for fila in conn.execute(text("SELECT id FROM productos WHERE codigo LIKE 'EXP-%'"))]
+            conn.execute(insert(ResumenDiarioProducto), [
+                {'fecha': hoy - datetime.timedelta(days=i // 20), 'producto_id': productos[i % 100], 'cantidad': 1}
+                for i in range(1800)
+            ])
+            conn.execute(insert(PlanProduccion), [
+                {'fecha_entrega': hoy + datetime.timedelta(days=i // 20 - 45), 'producto_id': productos[i % 100],
+                 'cantidad': 1}
+                for i in range(1800)
+            ])
+        conn.execute(text('ANALYZE TABLE pedidos, productos, resumen_diario_productos, plan_produccion'))
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize('nombre', sorted(INDICES_ESPERADOS))
+def test_explain_mysql_usa_rango_del_indice(motor_mysql, nombre):
+    tabla, indice = INDICES_ESPERADOS[nombre]
+    with motor_mysql.connect() as conn:
+        plan = conn.execute(text('EXPLAIN ' + _consulta_reporte(motor_mysql, nombre, 7))).all()
+
+    fila_tabla = next(fila for fila in plan if fila._mapping['table'] == tabla)
+    assert not gestionar_bd._recorrido_completo('mysql', fila_tabla), dict(fila_tabla._mapping)
+    assert fila_tabla._mapping['type'] in ('range', 'ref')
+    assert fila_tabla._mapping['key'] == indice
@@ -0,0 +1,117 @@
+"""
+Consultas del reporte de pedidos y de su exportación (utils.reporte_pedidos).
+
+La exportación lee los pedidos por cliente en lugar de ordenarlos todos por
+nombre: el resultado debe ser el mismo orden (cliente, fecha descendente, id
+descendente) que daba esa ordenación, con lotes acotados.
+"""
+import datetime
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from models import Base, Cliente, Pedido, PedidoProducto, Producto
+from utils.reporte_pedidos import clientes_exportacion, iterar_pedidos_exportacion
+
+# Clientes registrados: dos comparten nombre
+CLIENTES = {1: 'Alfa', 2: 'Beta', 3: 'Beta', 4: 'Gama'}
+
+# (cliente_id, nombre ingresado, horas atrás, con productos)
+PEDIDOS = (
+    [(1, '', h, True) for h in (5, 1, 3)]
+    + [(2, '', 2, True), (3, '', 2, True), (3, '', 7, True)]
+    # Cliente con más pedidos que un lote; dos con la misma fecha
+    + [(4, '', h, True) for h in (1, 2, 2, 3, 4, 5, 6, 8)]
+    # El nombre ingresado no cuenta si el cliente está registrado
+    + [(2, 'Delta', 9, True)]
+    # Sin cliente registrado
+    + [(None, 'Delta', 4, True), (None, '', 2, True), (None, 'Beta', 6, True)]
+    # Sin productos: no se exportan
+    + [(1, '', 0, False), (None, 'Zeta', 0, False)]
+)
+
+
+@pytest.fixture
+def motor_exportacion(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'exportacion.db'}")
+    Base.metadata.create_all(engine)
+    ahora = datetime.datetime(2031, 1, 1, 12)
+    with Session(engine) as db:
+        db.add_all([Cliente(id=i, nombre_comercial=nombre, numero_identificacion=f'70{i}')
+                    for i, nombre in CLIENTES.items()])
+        db.add(Producto(id=1, codigo='E-1', referencia_de_producto='Exportado', gramaje_g=10.0))
+        db.flush()
+        for cliente_id, ingresado, horas, con_productos in PEDIDOS:
+            pedido_id = db.execute(insert(Pedido).values(
+                cliente_id=cliente_id, nombre_cliente_ingresado=ingresado,
+                fecha_creacion=ahora - datetime.timedelta(hours=horas), estado_pedido_general='En Proceso'
+            )).inserted_primary_key[0]
+            if con_productos:
+                db.execute(insert(PedidoProducto).values(
+                    pedido_id=pedido_id, producto_id=1, cantidad=1, fecha_pedido_item=ahora.date()
+                ))
+        db.commit()
+    yield engine
+    engine.dispose()
+
+
+def _orden_esperado(db):
+    """Orden que daba ORDER BY nombre, fecha_creacion DESC, id DESC sobre todos los pedidos"""
+    def nombre(pedido):
+        if pedido.cliente_asociado:
+            return pedido.cliente_asociado.nombre_comercial
+        return pedido.nombre_cliente_ingresado or 'Cliente no registrado'
+
+    pedidos = [pedido for pedido in db.query(Pedido) if pedido.items]
+    pedidos.sort(key=lambda pedido: (pedido.fecha_creacion, pedido.id), reverse=True)
+    pedidos.sort(key=nombre)
+    return [(nombre(pedido), pedido.id) for pedido in pedidos]
+
+
+@pytest.mark.parametrize('tamano_lote', [1, 3, 5, 100])
+def test_exportacion_agrupada_por_cliente(motor_exportacion, tamano_lote):
+    with Session(motor_exportacion) as db:
+        esperado = _orden_esperado(db)
+        query = db.query(Pedido)
+        grupos = clientes_exportacion(query)
+        assert [grupo.nombre for grupo in grupos] == list(dict.fromkeys(nombre for nombre, _ in esperado))
+        assert sum(grupo.pedidos for grupo in grupos) == len(esperado)
+
+        lotes = list(iterar_pedidos_exportacion(query, grupos, tamano_lote=tamano_lote))
+        assert all(0 < len(lote) <= tamano_lote for lote in lotes)
+        assert [(fila.cliente_nombre, fila[0].id) for lote in lotes for fila in lote] == esperado
+
+
+def test_exportacion_respeta_los_filtros(motor_exportacion):
+    with Session(motor_exportacion) as db:
+        query = db.query(Pedido).filter(Pedido.cliente_id.in_([2, 3]))
+        grupos = clientes_exportacion(query)
+        assert [(grupo.nombre, grupo.cliente_ids, grupo.sin_registro, grupo.pedidos) for grupo in grupos] == [
+            ('Beta', (2, 3), False, 4)
+        ]
+        # El pedido sin registrar a nombre de "Beta" queda fuera del filtro
+        filas = [fila for lote in iterar_pedidos_exportacion(query, grupos, tamano_lote=2) for fila in lote]
+        assert {fila[0].cliente_id for fila in filas} == {2, 3}
+
+
+def test_pedido_sin_fecha_no_rompe_el_reporte(db, cliente_http, crear_pedido):
+    from sqlalchemy import update
+
+    from utils.reporte_pedidos import consulta_pedidos_filtrada
+
+    pedido_id = crear_pedido([(0, 1, 'Unidad', '2031-07-01')])
+    fecha = db.get(Pedido, pedido_id).fecha_creacion
+    db.execute(update(Pedido).where(Pedido.id == pedido_id).values(fecha_creacion=None))
+    db.commit()
+    try:
+        query, _ = consulta_pedidos_filtrada(db, {})
+        assert query.filter(Pedido.id == pedido_id).count() == 0
+
+        # Primera página, página siguiente y exportación
+        assert cliente_http.get('/reportes/pedidos').status_code == 200
+        assert cliente_http.get(f'/reportes/pedidos?despues=2031-01-01T00:00:00_{pedido_id}&pagina=2').status_code == 200
+        assert cliente_http.get('/reportes/exportar-pedidos-excel').status_code == 200
+    finally:
+        db.execute(update(Pedido).where(Pedido.id == pedido_id).values(fecha_creacion=fecha))
+        db.commit()
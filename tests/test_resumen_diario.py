@@ -0,0 +1,176 @@
+"""
+Resumen diario mantenido de forma incremental (utils.resumen_diario).
+
+Cada escritura de pedidos aplica al resumen solo la diferencia de su aporte.
+Las pruebas crean, editan, cancelan en bloque y eliminan pedidos por las
+mismas rutas que la aplicación y verifican que la tabla quede igual a una
+reconstrucción completa desde los ítems.
+"""
+import business_logic
+from models import Pedido, ResumenDiarioProducto
+from utils.resumen_diario import COLUMNAS_CLAVE, reconstruir_resumen_diario
+
+
+def _filas_resumen(db):
+    """Contenido del resumen: {clave: (cantidad, peso_total_g, lineas)}"""
+    return {
+        tuple(getattr(fila, columna) for columna in COLUMNAS_CLAVE):
+            (fila.cantidad, round(fila.peso_total_g, 3), fila.lineas)
+        for fila in db.query(ResumenDiarioProducto)
+    }
+
+
+def assert_igual_a_reconstruccion(db):
+    # Descartar lo leído antes: las rutas escriben con su propia sesión
+    db.rollback()
+    incremental = _filas_resumen(db)
+    reconstruir_resumen_diario(db)
+    db.flush()
+    reconstruido = _filas_resumen(db)
+    db.rollback()
+    assert incremental == reconstruido
+
+
+def test_crear_pedidos(db, crear_pedido):
+    crear_pedido([(0, 3, 'Unidad', '2030-01-10'), (1, 2, 'Docena', '2030-01-10')])
+    # Dos ítems del mismo producto y presentación suman en la misma fila
+    crear_pedido([(0, 4, 'Unidad', '2030-01-11'), (0, 1, 'Unidad', '2030-01-12')], departamento='Cundinamarca')
+    assert_igual_a_reconstruccion(db)
+
+
+def test_editar_pedido(db, cliente_http, crear_pedido, formulario_edicion):
+    pedido_id = crear_pedido([(0, 3, 'Unidad', '2030-01-10'), (1, 2, 'Docena', '2030-01-10')])
+
+    # Cambia cantidad, producto, presentación, estado y departamento; un ítem se retira
+    respuesta = cliente_http.post(f'/pedidos/editar/{pedido_id}', data=formulario_edicion(
+        [(2, 7, 'Bandeja', '2030-01-11')], estado='Programado', departamento='Valle del Cauca'
+    ))
+    assert respuesta.status_code == 302
+    assert_igual_a_reconstruccion(db)
+
+    respuesta = cliente_http.post(f'/pedidos/editar/{pedido_id}', data=formulario_edicion(
+        [(2, 7, 'Bandeja', '2030-01-11'), (0, 1, 'Unidad', '2030-01-12')], estado='Cancelado'
+    ))
+    assert respuesta.status_code == 302
+    assert_igual_a_reconstruccion(db)
+
+
+def test_cancelacion_masiva_por_ids(db, cliente_http, crear_pedido):
+    ids = [crear_pedido([(0, 2, 'Unidad', '2030-01-20'), (1, 5, 'Docena', '2030-01-21')]) for _ in range(3)]
+
+    respuesta = cliente_http.post('/pedidos/estado-masivo', json={'estado': 'Cancelado', 'pedido_ids': ids})
+    assert respuesta.get_json()['pedidos'] == 3
+    assert_igual_a_reconstruccion(db)
+
+    # Reactivar con un estado de ítems distinto del general
+    respuesta = cliente_http.post('/pedidos/estado-masivo', json={
+        'estado': 'En Proceso', 'estado_items': 'Pendiente', 'pedido_ids': ids[:2]
+    })
+    assert respuesta.get_json()['pedidos'] == 2
+    assert_igual_a_reconstruccion(db)
+
+
+def test_cambio_masivo_por_fecha_de_entrega(db, cliente_http, crear_pedido):
+    crear_pedido([(0, 2, 'Unidad', '2030-02-15')])
+    crear_pedido([(1, 1, 'Docena', '2030-02-15'), (2, 1, 'Unidad', '2030-02-16')], estado='Programado')
+
+    respuesta = cliente_http.post('/pedidos/estado-masivo', json={
+        'estado': 'Entregado', 'fecha_entrega': '2030-02-15', 'estado_actual': 'Programado'
+    })
+    assert respuesta.get_json()['pedidos'] == 1
+    assert_igual_a_reconstruccion(db)
+
+    respuesta = cliente_http.post('/pedidos/estado-masivo', json={'estado': 'Cancelado', 'fecha_entrega': '2030-02-15'})
+    assert respuesta.get_json()['pedidos'] == 2
+    assert_igual_a_reconstruccion(db)
+
+
+def test_cambiar_solo_estado_de_items(db, crear_pedido):
+    pedido_id = crear_pedido([(0, 2, 'Unidad', '2030-03-01'), (1, 1, 'Docena', '2030-03-01')])
+
+    assert business_logic.actualizar_estado_items_pedido(db, pedido_id, 'Entregado')
+    assert db.get(Pedido, pedido_id).estado_pedido_general == 'En Proceso'
+    assert_igual_a_reconstruccion(db)
+
+
+def test_eliminar_pedido(db, cliente_http, crear_pedido):
+    conservado = crear_pedido([(0, 6, 'Unidad', '2030-04-01')])
+    eliminado = crear_pedido([(0, 2, 'Unidad', '2030-04-01'), (2, 1, 'Caja', '2030-04-02')])
+
+    respuesta = cliente_http.post(f'/pedidos/eliminar/{eliminado}')
+    assert respuesta.status_code == 302
+    db.rollback()
+    assert db.get(Pedido, eliminado) is None
+    assert db.get(Pedido, conservado) is not None
+    assert_igual_a_reconstruccion(db)
+
+
+def test_historico_se_construye_aunque_se_escriba_antes(tmp_path):
+    """
+    Un pedido creado antes de construir el resumen no debe ocultar el histórico:
+    la construcción depende de la marca en versiones_tablas, no de que la tabla esté vacía.
+    """
+    import datetime
+
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import Session
+
+    from models import Base, Cliente, PedidoProducto, Producto, VersionTabla
+    from utils.resumen_diario import MARCA_CONSTRUIDO, construir_resumen_diario
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'historico.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add_all([Cliente(id=1, nombre_comercial='Histórico', numero_identificacion='800'),
+                    Producto(id=1, codigo='H-1', referencia_de_producto='Histórico', gramaje_g=10.0)])
+        # Pedido anterior al resumen, escrito sin pasar por registrar_cambio_pedido
+        pedido_id = db.execute(insert(Pedido).values(
+            fecha_creacion=datetime.datetime(2024, 1, 10, 15), cliente_id=1, estado_pedido_general='Entregado'
+        )).inserted_primary_key[0]
+        db.execute(insert(PedidoProducto).values(
+            pedido_id=pedido_id, producto_id=1, fecha_pedido_item=datetime.date(2024, 1, 10), cantidad=100,
+            peso_total_g_item=1000.0, comentarios_item='Unidad', estado_del_pedido_item='Entregado'
+        ))
+        db.commit()
+
+        ok, errores = business_logic.guardar_pedido_completo(db, {
+            'numero_identificacion_cliente_ingresado': '800', 'nombre_cliente_ingresado': 'Histórico',
+            'despacho_tipo': 'Domicilio', 'direccion_entrega': 'Calle 1', 'ciudad_entrega': 'Medellín',
+            'departamento_entrega': 'Antioquia',
+            'pedido_items': [{'producto_id': 1, 'cantidad': 5, 'gramaje_g_item': 10, 'peso_total_g_item': 50,
+                              'comentarios_item': 'Unidad', 'fecha_de_entrega_item': '2030-01-10'}],
+        })
+        assert ok, errores
+        assert sorted(valores[0] for valores in _filas_resumen(db).values()) == [5]
+
+    assert construir_resumen_diario(engine) == 2
+    with Session(engine) as db:
+        assert sorted(valores[0] for valores in _filas_resumen(db).values()) == [5, 100]
+        assert db.get(VersionTabla, MARCA_CONSTRUIDO) is not None
+    # Con la marca ya no se reconstruye
+    assert construir_resumen_diario(engine) is None
+    engine.dispose()
+
+
+def test_version_de_pedidos_se_incrementa_despues_del_commit(db, crear_pedido):
+    """La escritura no actualiza versiones_tablas dentro de su transacción (no serializa los pedidos)"""
+    from config.database import db_config
+    from utils.versiones import incrementar_version, leer_versiones
+
+    def version_pedidos():
+        with db_config.engine.connect() as conexion:
+            return leer_versiones(conexion, ['pedidos'])['pedidos'][0]
+
+    crear_pedido([(0, 1, 'Unidad', '2030-05-01')])
+    inicial = version_pedidos()
+    assert inicial > 0
+
+    incrementar_version(db, 'pedidos')
+    db.flush()
+    assert version_pedidos() == inicial
+    db.rollback()
+    assert version_pedidos() == inicial
+
+    incrementar_version(db, 'pedidos')
+    db.commit()
+    assert version_pedidos() == inicial + 1
@@ -0,0 +1,74 @@
+"""
+Trabajos en segundo plano (utils.trabajos).
+
+El archivo generado por un trabajo se guarda en la base, de modo que la
+descarga no depende de la instancia que lo ejecutó, y un trabajo activo que
+deja de recibir latido se da por perdido.
+"""
+import datetime
+import os
+import time
+
+import pytest
+
+from models import Trabajo
+from utils import trabajos
+
+
+def _esperar(cliente_http, trabajo_id, segundos=10):
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        datos = cliente_http.get(f'/trabajos/{trabajo_id}').get_json()
+        if datos['estado'] not in trabajos.ESTADOS_ACTIVOS:
+            return datos
+        time.sleep(0.05)
+    pytest.fail(f'El trabajo {trabajo_id} no terminó')
+
+
+def _generar_archivo(db, contexto, contenido):
+    ruta = contexto.ruta('resultado.xlsx')
+    with open(ruta, 'wb') as archivo:
+        archivo.write(contenido)
+    contexto.adjuntar_archivo(ruta, 'resultado.xlsx')
+    return {'bytes': len(contenido)}
+
+
+def test_descarga_desde_la_base(app_pruebas, cliente_http, monkeypatch):
+    # Partes pequeñas para que el archivo ocupe varias filas
+    monkeypatch.setattr(trabajos, 'TAMANO_PARTE_ARCHIVO', 1000)
+    contenido = os.urandom(4500)
+
+    trabajo_id = trabajos.encolar_trabajo('prueba', _generar_archivo, contenido)
+    datos = _esperar(cliente_http, trabajo_id)
+    assert datos['estado'] == trabajos.COMPLETADO
+    assert datos['resultado'] == {'bytes': 4500}
+    assert datos['tiene_archivo']
+
+    # La instancia no conserva el archivo: se descarga desde trabajos_archivos
+    assert not os.path.exists(os.path.join(trabajos.DIRECTORIO, trabajo_id))
+    respuesta = cliente_http.get(datos['url_descarga'])
+    assert respuesta.status_code == 200
+    assert respuesta.headers['Content-Length'] == '4500'
+    assert respuesta.data == contenido
+
+
+def test_trabajo_sin_archivo(cliente_http):
+    trabajo_id = trabajos.encolar_trabajo('prueba', lambda db, contexto: None)
+    datos = _esperar(cliente_http, trabajo_id)
+    assert datos['estado'] == trabajos.COMPLETADO and not datos['tiene_archivo']
+    assert cliente_http.get(f'/trabajos/{trabajo_id}/descargar').status_code == 404
+
+
+@pytest.mark.parametrize('segundos_sin_latido, estado', [
+    (10, trabajos.EN_PROCESO),
+    (trabajos.LATIDO_MAXIMO + 60, trabajos.ERROR),
+])
+def test_trabajo_de_otra_instancia_sin_latido(db, segundos_sin_latido, estado):
+    ahora = datetime.datetime.utcnow()
+    trabajo = Trabajo(id=trabajos.nuevo_id_trabajo(), tipo='prueba', estado=trabajos.EN_PROCESO, progreso=40,
+                      proceso='otra-instancia:1234', fecha_creacion=ahora - datetime.timedelta(hours=1),
+                      fecha_latido=ahora - datetime.timedelta(seconds=segundos_sin_latido))
+    db.add(trabajo)
+    db.commit()
+
+    assert trabajos.estado_trabajo(db, trabajo.id)['estado'] == estado
@@ -0,0 +1,116 @@
+"""
+Listado paginado y búsqueda de clientes.
+
+Cada cliente guarda en la columna indexada `busqueda` su nombre comercial,
+razón social y número de identificación normalizados (minúsculas y sin
+tildes): "Panadería" y "panaderia" encuentran lo mismo. La columna se
+calcula al insertar, incluso en los INSERT por lotes, y al editar desde el
+ORM (ver models.Cliente); la búsqueda usa el índice de texto completo cuando
+existe (ver utils.busqueda_texto).
+
+Las páginas se leen por cursor (keyset) sobre el orden elegido y solo con las
+columnas que muestra el listado, de modo que cada página cuesta lo mismo sin
+importar su profundidad ni el número total de clientes.
+"""
+from sqlalchemy import func, select
+
+from models import Cliente
+from utils.busqueda_texto import filtro_texto
+from utils.consultas import codificar_cursor, filtro_keyset, leer_cursor, ordenar_keyset
+
+POR_PAGINA_CLIENTES = 50
+MAXIMO_POR_PAGINA_CLIENTES = 200
+
+# Columnas del listado (no se hidratan objetos ORM)
+COLUMNAS_LISTA = (
+    Cliente.id, Cliente.nombre_comercial, Cliente.razon_social, Cliente.tipo_identificacion,
+    Cliente.numero_identificacion, Cliente.email, Cliente.telefono, Cliente.ciudad, Cliente.departamento,
+)
+
+# Órdenes disponibles: columnas del keyset (el id desempata) y valores del cursor de una fila
+ORDENES_CLIENTES = {
+    'nombre': (
+        [(Cliente.nombre_comercial, False), (Cliente.id, False)],
+        lambda fila: (fila.nombre_comercial, fila.id),
+    ),
+    'nit': (
+        [(func.coalesce(Cliente.numero_identificacion, ''), False), (Cliente.id, False)],
+        lambda fila: (fila.numero_identificacion or '', fila.id),
+    ),
+    'ciudad': (
+        [(func.coalesce(Cliente.ciudad, ''), False), (Cliente.nombre_comercial, False), (Cliente.id, False)],
+        lambda fila: (fila.ciudad or '', fila.nombre_comercial, fila.id),
+    ),
+    'recientes': (
+        [(Cliente.id, True)],
+        lambda fila: (fila.id,),
+    ),
+}
+
+
+def serializar_cliente(fila):
+    """Fila del listado en el formato JSON de /api/clientes/pagina"""
+    return {columna.key: getattr(fila, columna.key) for columna in COLUMNAS_LISTA}
+
+
+def filtros_clientes(db, q=None, nit=None, ciudad=None, departamento=None):
+    """
+    Condiciones WHERE del listado.
+
+    q busca cada palabra (normalizada) en nombre, razón social o NIT; nit es un
+    prefijo del número de identificación; ciudad y departamento son exactos.
+    """
+    filtros = filtro_texto(db, Cliente, q)
+    if nit and nit.strip():
+        filtros.append(Cliente.numero_identificacion.startswith(nit.strip(), autoescape=True))
+    if ciudad:
+        filtros.append(Cliente.ciudad == ciudad)
+    if departamento:
+        filtros.append(Cliente.departamento == departamento)
+    return filtros
+
+
+def pagina_clientes(db, q=None, nit=None, ciudad=None, departamento=None, orden='nombre',
+                    descendente=False, despues=None, limite=POR_PAGINA_CLIENTES, contar=False):
+    """
+    Lee una página del listado de clientes.
+
+    Args:
+        db: Sesión de SQLAlchemy.
+        q, nit, ciudad, departamento: Filtros (ver filtros_clientes).
+        orden: Clave de ORDENES_CLIENTES.
+        descendente: Invierte el orden elegido.
+        despues: Cursor de la última fila de la página anterior.
+        limite: Filas por página (hasta MAXIMO_POR_PAGINA_CLIENTES).
+        contar: Si es True también cuenta el total de clientes con esos filtros.
+
+    Returns:
+        dict: {'clientes': [dict], 'siguiente': cursor o None, 'total': int o None}
+
+    Raises:
+        ValueError: Si el orden o el cursor no son válidos.
+    """
+    if orden not in ORDENES_CLIENTES:
+        raise ValueError(f'Orden no válido: {orden}')
+    columnas_orden, clave_fila = ORDENES_CLIENTES[orden]
+    if descendente:
+        columnas_orden = [(columna, not desc) for columna, desc in columnas_orden]
+    limite = min(max(int(limite or POR_PAGINA_CLIENTES), 1), MAXIMO_POR_PAGINA_CLIENTES)
+
+    filtros = filtros_clientes(db, q, nit, ciudad, departamento)
+    consulta = select(*COLUMNAS_LISTA).where(*filtros)
+    if despues:
+        consulta = consulta.where(filtro_keyset(columnas_orden, leer_cursor(despues, len(columnas_orden))))
+    filas = db.execute(ordenar_keyset(consulta, columnas_orden).limit(limite + 1)).all()
+
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    total = None
+    if contar:
+        total = db.execute(select(func.count(Cliente.id)).where(*filtros)).scalar()
+    return {
+        'clientes': [serializar_cliente(fila) for fila in filas],
+        'siguiente': codificar_cursor(clave_fila(filas[-1])) if hay_mas else None,
+        'total': total,
+    }
+
@@ -0,0 +1,168 @@
+"""
+Índice de búsqueda de productos en memoria para el autocompletado de pedidos.
+
+El índice forma parte de la instantánea del catálogo (utils.catalogo_productos),
+se construye a partir de una consulta de columnas (sin hidratar objetos ORM) y
+responde las búsquedas por código, referencia y línea sin consultar la base de
+datos. No se modifica después de construido: cuando cambia la versión del
+catálogo se publica un índice nuevo.
+"""
+import heapq
+
+from utils.helpers import normalizar_texto
+
+# Puntajes de relevancia (menor es mejor)
+RANGO_CODIGO_EXACTO = 0
+RANGO_CODIGO_PREFIJO = 1
+RANGO_REFERENCIA_PREFIJO = 2
+RANGO_PALABRA_PREFIJO = 3
+RANGO_CONTIENE = 4
+RANGO_LINEA = 5
+
+
+def serializar_producto(producto):
+    """Convierte un producto (objeto o fila) al formato JSON del autocompletado"""
+    return {
+        'id': producto.id,
+        'codigo': producto.codigo,
+        'referencia': producto.referencia_de_producto,
+        'display': f"{producto.codigo} - {producto.referencia_de_producto} - {producto.categoria_linea or 'Sin línea'}",
+        'gramaje_g': producto.gramaje_g,
+        'formulacion_grupo': producto.formulacion_grupo or '',
+        'categoria_linea': producto.categoria_linea or '',
+        'presentacion1': producto.presentacion1 or '',
+        'presentacion2': producto.presentacion2 or ''
+    }
+
+
+def _trigramas(texto):
+    """Devuelve el conjunto de trigramas de un texto normalizado"""
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def _claves_indice(texto):
+    """Subcadenas de 1 a 3 caracteres de un texto normalizado (claves del índice)"""
+    return {texto[i:i + largo] for largo in (1, 2, 3) for i in range(len(texto) - largo + 1)}
+
+
+class _Documento:
+    """Entrada del índice con los campos normalizados de un producto"""
+
+    __slots__ = ('id', 'payload', 'codigo', 'referencia', 'linea', 'texto', 'propio',
+                 'palabras_propias', 'claves')
+
+    def __init__(self, producto):
+        self.id = producto.id
+        self.payload = serializar_producto(producto)
+        self.codigo = normalizar_texto(producto.codigo)
+        self.referencia = normalizar_texto(producto.referencia_de_producto)
+        self.linea = normalizar_texto(producto.categoria_linea)
+        # Texto combinado donde se buscan subcadenas (equivalente al ilike '%termino%')
+        self.texto = '\n'.join((self.codigo, self.referencia, self.linea))
+        # Código y referencia tienen más peso que la línea al ordenar
+        self.propio = self.codigo + ' ' + self.referencia
+        self.palabras_propias = tuple(self.propio.split())
+        # Claves del índice (subcadenas de 1 a 3 caracteres) en las que aparece este documento
+        self.claves = tuple({clave for campo in (self.codigo, self.referencia, self.linea)
+                             for clave in _claves_indice(campo)})
+
+    def rango(self, termino, palabras):
+        """Calcula la relevancia del documento para el término buscado"""
+        if self.codigo == termino:
+            return RANGO_CODIGO_EXACTO
+        if self.codigo.startswith(termino):
+            return RANGO_CODIGO_PREFIJO
+        if self.referencia.startswith(termino):
+            return RANGO_REFERENCIA_PREFIJO
+        if all(palabra in self.propio for palabra in palabras):
+            propias = self.palabras_propias
+            if all(any(p.startswith(palabra) for p in propias) for palabra in palabras):
+                return RANGO_PALABRA_PREFIJO
+            return RANGO_CONTIENE
+        return RANGO_LINEA
+
+
+class IndiceProductos:
+    """
+    Índice invertido de productos por subcadenas de 1 a 3 caracteres.
+
+    Los términos de hasta 3 caracteres se responden con su lista exacta y los
+    más largos a partir de la lista de trigramas más corta, así que el costo
+    depende de las coincidencias y no del tamaño del catálogo.
+
+    Las listas de coincidencias son tuplas inmutables y el índice no cambia
+    después de construido, así que las búsquedas concurrentes no necesitan
+    bloquearse.
+    """
+
+    def __init__(self, productos=()):
+        self._documentos = {}
+        postings = {}
+        for producto in productos:
+            doc = _Documento(producto)
+            self._documentos[doc.id] = doc
+            for clave in doc.claves:
+                postings.setdefault(clave, []).append(doc.id)
+        self._postings = {clave: tuple(ids) for clave, ids in postings.items()}
+
+    def __len__(self):
+        return len(self._documentos)
+
+    def obtener(self, producto_id):
+        """Devuelve el producto serializado por ID o None"""
+        doc = self._documentos.get(producto_id)
+        return doc.payload if doc else None
+
+    def _candidatos(self, palabra):
+        """
+        IDs de documentos que contienen la palabra (verificados).
+
+        Como el ilike '%termino%' al que reemplaza, acepta la palabra en
+        cualquier posición: "10" encuentra "PT-102". El orden por relevancia
+        deja primero los prefijos de palabra.
+        """
+        if len(palabra) <= 3:
+            # Las subcadenas de hasta 3 caracteres están indexadas: la lista ya es exacta
+            return set(self._postings.get(palabra, ()))
+
+        # Términos largos: se parte de la lista de trigramas más corta y se verifica
+        listas = [self._postings.get(tri, ()) for tri in _trigramas(palabra)]
+        if not listas:
+            return set()
+        base = min(listas, key=len)
+        documentos = self._documentos
+        return {doc_id for doc_id in base
+                if doc_id in documentos and palabra in documentos[doc_id].texto}
+
+    def buscar(self, termino, limite=10):
+        """Busca productos por código, referencia o línea y los ordena por relevancia"""
+        termino = normalizar_texto(termino)
+        if not termino or limite <= 0:
+            return []
+
+        palabras = termino.split()
+        coincidencias = None
+        for palabra in sorted(palabras, key=len, reverse=True):
+            candidatos = self._candidatos(palabra)
+            coincidencias = candidatos if coincidencias is None else coincidencias & candidatos
+            if not coincidencias:
+                return []
+
+        documentos = self._documentos
+        ordenados = heapq.nsmallest(
+            limite,
+            (documentos[doc_id] for doc_id in coincidencias if doc_id in documentos),
+            key=lambda doc: (doc.rango(termino, palabras), doc.referencia, doc.codigo)
+        )
+        return [doc.payload for doc in ordenados]
+
+
+def obtener_indice_productos(db=None):
+    """Índice de la instantánea vigente del catálogo (ver utils.catalogo_productos)"""
+    from utils.catalogo_productos import obtener_catalogo
+    return obtener_catalogo(db).indice
+
+
+def buscar_productos(termino, limite=10, db=None):
+    """Atajo para buscar en el índice vigente"""
+    return obtener_indice_productos(db).buscar(termino, limite)
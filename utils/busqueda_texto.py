@@ -0,0 +1,209 @@
+"""
+Búsqueda de texto sobre las claves normalizadas de productos y clientes.
+
+Producto.busqueda (código y referencia) y Cliente.busqueda (nombre comercial,
+razón social y NIT) guardan el texto en minúsculas y sin tildes, calculado al
+escribir (ver models.py). Cada palabra buscada se verifica con LIKE sobre esa
+columna y, donde existe, un índice de texto completo reduce antes las filas
+candidatas:
+
+- MySQL: índice FULLTEXT sobre la columna, consultado con MATCH ... AGAINST
+  en modo booleano (+palabra* por cada término).
+- SQLite: tabla virtual FTS5 con contenido externo (<tabla>_fts) que los
+  triggers mantienen sincronizada en cada INSERT, UPDATE y DELETE.
+
+Sin índice de texto (o con términos muy cortos) la búsqueda usa solo el LIKE
+sobre la columna normalizada. Los índices se crean con las migraciones
+(python gestionar_bd.py migrar).
+"""
+import logging
+import re
+
+from sqlalchemy import Integer, bindparam, column, select, text, update
+
+from models import Cliente, Producto
+from utils.helpers import clave_busqueda, claves_busqueda_producto, normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+# Tablas con columna `busqueda` indexada para texto completo
+MODELOS_TEXTO = {'productos': Producto, 'clientes': Cliente}
+
+# Longitud mínima de un término en el índice FULLTEXT de InnoDB (innodb_ft_min_token_size)
+LONGITUD_MINIMA_TOKEN = 3
+
+# Palabras vacías por defecto de InnoDB: con ellas MATCH no devuelve filas
+PALABRAS_VACIAS_INNODB = frozenset((
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how',
+    'i', 'in', 'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what',
+    'when', 'where', 'who', 'will', 'with', 'und', 'www',
+))
+
+# Índices de texto disponibles por (dialecto, tabla); se consulta una vez por proceso
+_indices_texto = {}
+
+
+def _indice_fulltext_mysql(conn, tabla):
+    return conn.execute(text("""
+        SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabla
+        AND COLUMN_NAME = 'busqueda' AND INDEX_TYPE = 'FULLTEXT'
+    """), {'tabla': tabla}).scalar() > 0
+
+
+def _tabla_fts_sqlite(conn, tabla):
+    return conn.execute(text(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = :nombre"
+    ), {'nombre': f'{tabla}_fts'}).scalar() > 0
+
+
+def crear_indices_texto(engine):
+    """
+    Crea los índices de texto completo que falten (FULLTEXT en MySQL, FTS5 en SQLite).
+
+    Returns:
+        list: Nombres de los índices o tablas FTS creados.
+    """
+    dialecto = engine.dialect.name
+    creados = []
+    for tabla in MODELOS_TEXTO:
+        try:
+            if dialecto == 'mysql':
+                with engine.begin() as conn:
+                    if not _indice_fulltext_mysql(conn, tabla):
+                        conn.execute(text(f"ALTER TABLE {tabla} ADD FULLTEXT INDEX ft_{tabla}_busqueda (busqueda)"))
+                        creados.append(f'ft_{tabla}_busqueda')
+            elif dialecto == 'sqlite':
+                with engine.begin() as conn:
+                    if not _tabla_fts_sqlite(conn, tabla):
+                        _crear_fts_sqlite(conn, tabla)
+                        creados.append(f'{tabla}_fts')
+        except Exception as e:
+            # SQLite sin FTS5 u otra instancia creando el índice al mismo tiempo
+            logger.warning(f"No se pudo crear el índice de texto de {tabla}: {e}")
+    _indices_texto.clear()
+    if creados:
+        logger.info(f"Índices de texto creados: {creados}")
+    return creados
+
+
+def _crear_fts_sqlite(conn, tabla):
+    """Tabla FTS5 de contenido externo sobre <tabla>.busqueda y sus triggers de sincronización"""
+    fts = f'{tabla}_fts'
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE {fts} USING fts5(busqueda, content='{tabla}', content_rowid='id')"
+    ))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabla} BEGIN
+            INSERT INTO {fts}(rowid, busqueda) VALUES (new.id, new.busqueda);
+        END"""))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabla} BEGIN
+            INSERT INTO {fts}({fts}, rowid, busqueda) VALUES ('delete', old.id, old.busqueda);
+        END"""))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF busqueda ON {tabla} BEGIN
+            INSERT INTO {fts}({fts}, rowid, busqueda) VALUES ('delete', old.id, old.busqueda);
+            INSERT INTO {fts}(rowid, busqueda) VALUES (new.id, new.busqueda);
+        END"""))
+    conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def _indice_texto(db, tabla):
+    """'mysql', 'sqlite' o None según el índice de texto disponible para la tabla"""
+    dialecto = db.get_bind().dialect.name
+    clave = (dialecto, tabla)
+    if clave not in _indices_texto:
+        disponible = None
+        try:
+            if dialecto == 'mysql' and _indice_fulltext_mysql(db, tabla):
+                disponible = 'mysql'
+            elif dialecto == 'sqlite' and _tabla_fts_sqlite(db, tabla):
+                disponible = 'sqlite'
+        except Exception as e:
+            logger.warning(f"No se pudo consultar el índice de texto de {tabla}: {e}")
+        _indices_texto[clave] = disponible
+    return _indices_texto[clave]
+
+
+def filtro_texto(db, modelo, termino):
+    """
+    Condiciones WHERE para buscar un texto en la clave normalizada del modelo.
+
+    Cada palabra del término debe aparecer en modelo.busqueda ("panaderia"
+    encuentra "Panadería"). Si la tabla tiene índice de texto completo se
+    agrega antes una condición que lo usa para reducir las filas candidatas.
+
+    Returns:
+        list: Condiciones para .where(*condiciones); vacía si no hay término.
+    """
+    palabras = normalizar_texto(termino).split()
+    if not palabras:
+        return []
+    condiciones = [modelo.busqueda.contains(palabra, autoescape=True) for palabra in palabras]
+
+    tabla = modelo.__tablename__
+    indice = _indice_texto(db, tabla)
+    tokens = [token for palabra in palabras for token in re.findall(r'[a-z0-9]+', palabra)]
+    if indice == 'mysql':
+        tokens = [t for t in tokens if len(t) >= LONGITUD_MINIMA_TOKEN and t not in PALABRAS_VACIAS_INNODB]
+        if tokens:
+            condiciones.insert(0, modelo.busqueda.match(' '.join(f'+{token}*' for token in tokens)))
+    elif indice == 'sqlite' and tokens:
+        candidatos = text(f"SELECT rowid FROM {tabla}_fts WHERE {tabla}_fts MATCH :texto_{tabla}").bindparams(
+            **{f'texto_{tabla}': ' '.join(f'"{token}"*' for token in tokens)}
+        ).columns(column('rowid', Integer))
+        condiciones.insert(0, modelo.id.in_(candidatos))
+    return condiciones
+
+
+# Columnas de origen y cálculo de las claves de cada tabla, para rellenar filas existentes
+_CLAVES_POR_TABLA = {
+    'clientes': (
+        ('nombre_comercial', 'razon_social', 'numero_identificacion'),
+        lambda fila: {'busqueda': clave_busqueda(fila.nombre_comercial, fila.razon_social,
+                                                 fila.numero_identificacion)},
+    ),
+    'productos': (
+        ('codigo', 'referencia_de_producto', 'categoria_linea', 'formulacion_grupo'),
+        lambda fila: claves_busqueda_producto(dict(fila._mapping)),
+    ),
+}
+
+
+def rellenar_claves_busqueda(engine, tamano_lote=1000):
+    """
+    Calcula las claves de búsqueda de las filas que no las tienen (filas
+    anteriores a las columnas o escritas por fuera de la aplicación).
+
+    Returns:
+        dict: {tabla: filas actualizadas}
+    """
+    actualizadas = {}
+    for tabla_nombre, (campos, calcular) in _CLAVES_POR_TABLA.items():
+        tabla = MODELOS_TEXTO[tabla_nombre].__table__
+        columnas_clave = [c for c in ('busqueda', 'linea_busqueda', 'grupo_busqueda') if c in tabla.c]
+        valores = {c: bindparam(f'_{c}') for c in columnas_clave}
+        # Conservar la fecha de modificación (no es una edición del registro)
+        valores['fecha_modificacion'] = tabla.c.fecha_modificacion
+        sentencia = update(tabla).where(tabla.c.id == bindparam('_id')).values(valores)
+        total = 0
+        while True:
+            with engine.begin() as conn:
+                filas = conn.execute(
+                    select(tabla.c.id, *[tabla.c[c] for c in campos])
+                    .where(tabla.c.busqueda.is_(None)).order_by(tabla.c.id).limit(tamano_lote)
+                ).all()
+                if filas:
+                    conn.execute(sentencia, [
+                        {'_id': fila.id, **{f'_{c}': v for c, v in calcular(fila).items()}}
+                        for fila in filas
+                    ])
+            total += len(filas)
+            if len(filas) < tamano_lote:
+                break
+        if total:
+            logger.info(f"Claves de búsqueda calculadas para {total} filas de {tabla_nombre}")
+        actualizadas[tabla_nombre] = total
+    return actualizadas
+
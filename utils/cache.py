@@ -0,0 +1,62 @@
+"""
+Caché en memoria con expiración por tiempo.
+
+Cada worker de gunicorn tiene su propia copia; sirve para datos de consulta
+costosa que pueden estar desactualizados unos segundos (conteos, listas de
+filtros).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheTTL:
+    """Diccionario acotado con expiración por entrada y descarte LRU"""
+
+    def __init__(self, ttl_segundos, max_entradas=256):
+        self.ttl = ttl_segundos
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, calcular):
+        """
+        Devuelve el valor cacheado de una clave o lo calcula si no existe o expiró.
+
+        Args:
+            clave: Clave hashable (por ejemplo una tupla con los filtros).
+            calcular: Función sin argumentos que produce el valor.
+        """
+        valor = self.leer(clave)
+        if valor is not None:
+            return valor
+
+        # Se calcula fuera del lock para no bloquear a otros hilos
+        valor = calcular()
+        self.guardar(clave, valor)
+        return valor
+
+    def leer(self, clave):
+        """Valor vigente de una clave o None"""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None and entrada[0] > time.monotonic():
+                self._datos.move_to_end(clave)
+                return entrada[1]
+        return None
+
+    def guardar(self, clave, valor):
+        """Guarda un valor, descartando las entradas menos usadas si se supera el máximo"""
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, clave=None):
+        """Elimina una clave o, sin argumentos, todo el contenido"""
+        with self._lock:
+            if clave is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(clave, None)
@@ -0,0 +1,102 @@
+"""
+Caché de respuestas HTTP para endpoints de solo lectura.
+
+Las respuestas se guardan por endpoint en una caché LRU con vigencia propia,
+con clave formada por la ruta, los parámetros de la URL (normalizados) y las
+versiones de las tablas de las que depende el endpoint (ver utils.versiones).
+Cuando cualquiera de esas tablas se modifica, su versión cambia y la
+siguiente petición se vuelve a calcular, en cualquier worker.
+
+Cada respuesta lleva ETag (hash del contenido) y Last-Modified (última
+modificación de sus tablas), de modo que el navegador revalida con
+If-None-Match / If-Modified-Since y recibe 304 sin cuerpo si nada cambió.
+"""
+import hashlib
+import logging
+import os
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+
+from utils.cache import CacheTTL
+from utils.versiones import versiones_vigentes
+
+logger = logging.getLogger(__name__)
+
+# Permite desactivar la caché de respuestas sin tocar el código
+CACHE_RESPUESTAS_ACTIVA = os.getenv('CACHE_RESPUESTAS', '1') != '0'
+
+# Cabeceras que no se guardan con la respuesta: se recalculan o son propias de cada petición
+CABECERAS_EXCLUIDAS = {'content-length', 'set-cookie', 'etag', 'last-modified', 'cache-control',
+                       'date', 'server-timing'}
+
+
+def _clave_peticion():
+    """Ruta y parámetros de la URL en orden estable (el orden de los parámetros no importa)"""
+    return request.path, tuple(sorted(request.args.items(multi=True)))
+
+
+def cache_respuesta(tablas, ttl=60, max_entradas=128, omitir_si=None):
+    """
+    Decorador que cachea la respuesta de una vista GET según las versiones de sus tablas.
+
+    Args:
+        tablas: Nombres de las tablas versionadas de las que depende la vista
+            ('productos', 'clientes', 'pedidos').
+        ttl: Vigencia máxima de cada respuesta en segundos, para datos que
+            cambian con el tiempo aunque las tablas no cambien (p. ej. "hoy").
+        max_entradas: Máximo de respuestas guardadas para esta vista (LRU).
+        omitir_si: Función opcional sin argumentos; si devuelve True la
+            petición no usa la caché (p. ej. modos de diagnóstico).
+    """
+    tablas = tuple(tablas)
+
+    def decorador(vista):
+        cache = CacheTTL(ttl, max_entradas)
+
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            # Los mensajes flash pendientes se muestran en el HTML: esa respuesta no se comparte
+            if (not CACHE_RESPUESTAS_ACTIVA or request.method != 'GET'
+                    or '_flashes' in session or (omitir_si and omitir_si())):
+                return vista(*args, **kwargs)
+
+            try:
+                estado = versiones_vigentes(tablas)
+            except Exception as e:
+                logger.warning(f"No se pudieron leer las versiones de {tablas}, se omite la caché: {e}")
+                return vista(*args, **kwargs)
+
+            versiones = tuple(estado[tabla][0] for tabla in tablas)
+            fechas = [estado[tabla][1] for tabla in tablas if estado[tabla][1] is not None]
+            clave = (_clave_peticion(), versiones)
+
+            entrada = cache.leer(clave)
+            if entrada is None:
+                respuesta = make_response(vista(*args, **kwargs))
+                # Solo se guardan respuestas completas y exitosas
+                if respuesta.status_code != 200 or respuesta.is_streamed:
+                    return respuesta
+                cuerpo = respuesta.get_data()
+                cabeceras = [(nombre, valor) for nombre, valor in respuesta.headers
+                             if nombre.lower() not in CABECERAS_EXCLUIDAS]
+                entrada = (cuerpo, cabeceras, hashlib.sha1(cuerpo).hexdigest()[:20])
+                cache.guardar(clave, entrada)
+                respuesta.headers['X-Cache'] = 'MISS'
+            else:
+                cuerpo, cabeceras, _ = entrada
+                respuesta = current_app.response_class(cuerpo, headers=cabeceras)
+                respuesta.headers['X-Cache'] = 'HIT'
+
+            respuesta.set_etag(entrada[2])
+            if fechas:
+                respuesta.last_modified = max(fechas)
+            # El navegador puede guardar la respuesta pero debe revalidarla en cada uso
+            respuesta.cache_control.private = True
+            respuesta.cache_control.no_cache = True
+            return respuesta.make_conditional(request)
+
+        envoltura.cache = cache
+        return envoltura
+
+    return decorador
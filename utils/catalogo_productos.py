@@ -0,0 +1,148 @@
+"""
+Caché versionada del catálogo de productos.
+
+Cada proceso guarda una instantánea inmutable del catálogo (lista de
+productos, mapa por id e índice de búsqueda) etiquetada con la versión de la
+tabla `productos` (ver utils.versiones). Toda escritura de productos llama a
+registrar_cambio_catalogo() en su transacción; los demás workers detectan el
+cambio de versión en su siguiente verificación y publican una instantánea
+nueva. Las peticiones concurrentes siempre leen una instantánea completa: la
+nueva solo reemplaza a la anterior cuando ya está construida.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from utils.busqueda_productos import IndiceProductos
+from utils.versiones import incrementar_version, version_vigente
+
+logger = logging.getLogger(__name__)
+
+TABLA_CATALOGO = 'productos'
+
+# Vigencia máxima de una instantánea aunque la versión no cambie (segundos)
+CATALOGO_DURACION = int(os.getenv('PRODUCTOS_CATALOGO_TTL', 6 * 3600))
+
+
+class CatalogoProductos:
+    """Instantánea inmutable del catálogo en una versión dada"""
+
+    __slots__ = ('version', 'productos', 'por_id', 'indice', 'creado_en', '_json')
+
+    def __init__(self, version, filas):
+        productos = tuple(
+            {
+                'id': fila.id,
+                'codigo': fila.codigo,
+                'referencia_de_producto': fila.referencia_de_producto,
+                'gramaje_g': fila.gramaje_g,
+                'formulacion_grupo': fila.formulacion_grupo,
+                'categoria_linea': fila.categoria_linea,
+                'presentacion1': fila.presentacion1,
+                'presentacion2': fila.presentacion2,
+            }
+            for fila in filas
+        )
+        self.version = version
+        self.productos = productos
+        self.por_id = MappingProxyType({p['id']: p for p in productos})
+        self.indice = IndiceProductos(filas)
+        self.creado_en = time.time()
+        self._json = None
+
+    def __len__(self):
+        return len(self.productos)
+
+    def vigente(self, version):
+        return self.version == version and (time.time() - self.creado_en) <= CATALOGO_DURACION
+
+    def contenido_json(self):
+        """
+        Catálogo serializado para /productos/api/catalogo.
+
+        Returns:
+            (cuerpo, cuerpo_gzip, huella): JSON en bytes, su versión comprimida
+            y un hash corto del contenido que sirve como ETag y para versionar
+            la URL. Se calcula una sola vez por instantánea.
+        """
+        contenido = self._json
+        if contenido is None:
+            cuerpo = json.dumps(self.productos, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            huella = hashlib.sha1(cuerpo).hexdigest()[:16]
+            contenido = (cuerpo, gzip.compress(cuerpo, compresslevel=6), huella)
+            self._json = contenido
+        return contenido
+
+    def huella(self):
+        return self.contenido_json()[2]
+
+
+_catalogo = None
+_catalogo_lock = threading.Lock()
+
+
+def _cargar_filas(db):
+    """Consulta solo las columnas que usan el catálogo y el índice"""
+    from models import Producto
+    return db.query(
+        Producto.id,
+        Producto.codigo,
+        Producto.referencia_de_producto,
+        Producto.gramaje_g,
+        Producto.formulacion_grupo,
+        Producto.categoria_linea,
+        Producto.presentacion1,
+        Producto.presentacion2
+    ).order_by(Producto.id).all()
+
+
+def _construir(db, version):
+    global _catalogo
+    inicio = time.time()
+    if db is None:
+        from config.database import db_config
+        db = db_config.get_session()
+        try:
+            filas = _cargar_filas(db)
+        finally:
+            db.close()
+    else:
+        filas = _cargar_filas(db)
+    catalogo = CatalogoProductos(version, filas)
+    _catalogo = catalogo
+
+    if os.getenv('FLASK_ENV') != 'production':
+        logger.info(f"Catálogo de productos v{version}: {len(catalogo)} productos en {(time.time() - inicio) * 1000:.1f} ms")
+    return catalogo
+
+
+def obtener_catalogo(db=None):
+    """
+    Instantánea vigente del catálogo.
+
+    Se reconstruye si la versión de la tabla cambió (por una escritura en
+    cualquier worker) o si superó CATALOGO_DURACION.
+    """
+    version = version_vigente(TABLA_CATALOGO)
+    catalogo = _catalogo
+    if catalogo is not None and catalogo.vigente(version):
+        return catalogo
+
+    with _catalogo_lock:
+        # Otro hilo pudo reconstruirlo mientras se esperaba el bloqueo
+        catalogo = _catalogo
+        if catalogo is not None and catalogo.vigente(version):
+            return catalogo
+        # La versión se lee antes que las filas: si hay una escritura en medio,
+        # la instantánea queda con una versión vieja y se reconstruye de nuevo
+        return _construir(db, version)
+
+
+def registrar_cambio_catalogo(db):
+    """Marca el catálogo como modificado en la transacción actual (llamar antes del commit)"""
+    incrementar_version(db, TABLA_CATALOGO)
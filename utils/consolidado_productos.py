@@ -0,0 +1,136 @@
+"""
+Consolidado de productos pedidos con subtotales jerárquicos.
+
+La base de datos agrupa el resumen diario (ver utils.resumen_diario) por
+categoría, formulación, referencia y presentación. Sobre esas filas, ya
+agregadas y acotadas por el tamaño del catálogo, un solo recorrido en orden
+produce la lista plana que muestran la vista HTML y el Excel: cada
+presentación seguida del subtotal de su formulación al cerrar el grupo y
+del total de su categoría al cerrar la categoría.
+"""
+from sqlalchemy import func
+
+from models import Producto, ResumenDiarioProducto
+from utils.fechas import leer_fecha
+from utils.helpers import normalizar_texto
+from utils.resumen_diario import asegurar_resumen_diario
+
+# Niveles de la jerarquía y texto para los valores vacíos
+NIVELES = ('categoria', 'formulacion', 'referencia', 'presentacion')
+SIN_VALOR = {
+    'categoria': 'Sin Categoría',
+    'formulacion': 'Sin Formulación',
+    'referencia': 'Sin Referencia',
+    'presentacion': 'Sin Presentación',
+}
+
+# Tipos de fila del consolidado
+FILA_PRODUCTO = 'producto'
+FILA_SUBTOTAL_FORMULACION = 'subtotal_formulacion'
+FILA_TOTAL_CATEGORIA = 'total_categoria'
+
+
+def consulta_consolidado(db, filtros):
+    """
+    Consulta agrupada por categoría, formulación, referencia y presentación.
+
+    Args:
+        db: Sesión de SQLAlchemy.
+        filtros: dict con estado, fecha_desde, fecha_hasta (AAAA-MM-DD, día de
+            creación del pedido), categoria y formulacion (prefijos sin
+            importar mayúsculas ni tildes).
+
+    Returns:
+        tuple: (query, errores) donde errores lista los filtros no válidos, que se ignoran.
+    """
+    asegurar_resumen_diario()
+    # El peso total se calcula con cantidad * gramaje_g del catálogo
+    query = db.query(
+        func.sum(ResumenDiarioProducto.cantidad).label('cantidad_total'),
+        func.sum(ResumenDiarioProducto.cantidad * Producto.gramaje_g).label('peso_total'),
+        ResumenDiarioProducto.presentacion.label('presentacion'),
+        Producto.referencia_de_producto,
+        Producto.formulacion_grupo,
+        Producto.categoria_linea
+    ).join(
+        Producto, ResumenDiarioProducto.producto_id == Producto.id
+    ).group_by(
+        Producto.categoria_linea,
+        Producto.formulacion_grupo,
+        Producto.referencia_de_producto,
+        ResumenDiarioProducto.presentacion
+    )
+
+    errores = []
+    if filtros.get('estado'):
+        query = query.filter(ResumenDiarioProducto.estado_pedido == filtros['estado'])
+    try:
+        fecha_desde = leer_fecha(filtros.get('fecha_desde'))
+        if fecha_desde:
+            query = query.filter(ResumenDiarioProducto.fecha >= fecha_desde)
+    except ValueError:
+        errores.append('Fecha desde inválida')
+    try:
+        fecha_hasta = leer_fecha(filtros.get('fecha_hasta'))
+        if fecha_hasta:
+            query = query.filter(ResumenDiarioProducto.fecha <= fecha_hasta)
+    except ValueError:
+        errores.append('Fecha hasta inválida')
+
+    # Claves normalizadas e indexadas: sin importar mayúsculas ni tildes
+    if filtros.get('categoria'):
+        query = query.filter(Producto.linea_busqueda.startswith(normalizar_texto(filtros['categoria']), autoescape=True))
+    if filtros.get('formulacion'):
+        query = query.filter(Producto.grupo_busqueda.startswith(normalizar_texto(filtros['formulacion']), autoescape=True))
+    return query, errores
+
+
+def consolidar(resultados):
+    """
+    Ordena las filas agrupadas y calcula los subtotales en un solo recorrido.
+
+    Args:
+        resultados: Filas de consulta_consolidado().
+
+    Returns:
+        dict: {'filas': [dict], 'total_cantidad': float, 'total_peso': float}
+            Cada fila tiene tipo (FILA_PRODUCTO, FILA_SUBTOTAL_FORMULACION o
+            FILA_TOTAL_CATEGORIA), los niveles de NIVELES, total_cantidad y
+            total_peso; las de subtotal llevan la formulación o categoría que cierran.
+    """
+    productos = sorted(
+        (
+            (
+                resultado.categoria_linea or SIN_VALOR['categoria'],
+                resultado.formulacion_grupo or SIN_VALOR['formulacion'],
+                resultado.referencia_de_producto or SIN_VALOR['referencia'],
+                resultado.presentacion or SIN_VALOR['presentacion'],
+            ),
+            resultado.cantidad_total or 0,
+            resultado.peso_total or 0,
+        )
+        for resultado in resultados
+    )
+
+    filas = []
+    formulacion = [0, 0]
+    categoria = [0, 0]
+    total = [0, 0]
+    for i, (niveles, cantidad, peso) in enumerate(productos):
+        filas.append(dict(zip(NIVELES, niveles), tipo=FILA_PRODUCTO, total_cantidad=cantidad, total_peso=peso))
+        for acumulado in (formulacion, categoria, total):
+            acumulado[0] += cantidad
+            acumulado[1] += peso
+
+        siguiente = productos[i + 1][0] if i + 1 < len(productos) else None
+        cierra_categoria = siguiente is None or siguiente[0] != niveles[0]
+        if cierra_categoria or siguiente[1] != niveles[1]:
+            filas.append({'tipo': FILA_SUBTOTAL_FORMULACION, 'categoria': niveles[0], 'formulacion': niveles[1],
+                          'total_cantidad': formulacion[0], 'total_peso': formulacion[1]})
+            formulacion = [0, 0]
+        if cierra_categoria:
+            filas.append({'tipo': FILA_TOTAL_CATEGORIA, 'categoria': niveles[0],
+                          'total_cantidad': categoria[0], 'total_peso': categoria[1]})
+            categoria = [0, 0]
+
+    return {'filas': filas, 'total_cantidad': total[0], 'total_peso': total[1]}
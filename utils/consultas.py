@@ -0,0 +1,150 @@
+"""
+Utilidades de consulta compartidas por las rutas: paginación por cursor
+(keyset), lectura por lotes de consultas grandes y escritura masiva con
+upsert.
+"""
+import base64
+import json
+
+from sqlalchemy import and_, or_, select, insert, update, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+
+def filtro_keyset(orden, valores):
+    """
+    Construye la condición "fila posterior al cursor" para un orden compuesto.
+
+    Args:
+        orden: Lista de tuplas (columna, descendente) en el mismo orden del ORDER BY.
+        valores: Valores de esas columnas en la última fila ya entregada.
+
+    Returns:
+        Expresión SQLAlchemy equivalente a (c1, c2, ...) > (v1, v2, ...)
+        respetando la dirección de cada columna.
+    """
+    condiciones = []
+    for i, ((columna, descendente), valor) in enumerate(zip(orden, valores)):
+        iguales = [c == v for (c, _), v in zip(orden[:i], valores[:i])]
+        avance = columna < valor if descendente else columna > valor
+        condiciones.append(and_(*iguales, avance))
+    return or_(*condiciones)
+
+
+def ordenar_keyset(query, orden):
+    """Aplica el ORDER BY correspondiente a un orden keyset"""
+    return query.order_by(*[c.desc() if descendente else c.asc() for c, descendente in orden])
+
+
+def codificar_cursor(valores):
+    """Cursor opaco para la URL con los valores de orden de la última fila entregada"""
+    crudo = json.dumps(list(valores), separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii').rstrip('=')
+
+
+def leer_cursor(cursor, columnas):
+    """Valores de un cursor de codificar_cursor(); ValueError si no es válido"""
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError('Cursor no válido')
+    if not isinstance(valores, list) or len(valores) != columnas:
+        raise ValueError('Cursor no válido')
+    return valores
+
+
+def iterar_por_lotes(query, orden, clave_fila, tamano_lote=500, session=None):
+    """
+    Recorre una consulta en lotes usando paginación por cursor.
+
+    Cada lote se obtiene con un WHERE sobre la última clave entregada, de modo
+    que el costo no crece con la profundidad como ocurre con OFFSET.
+
+    Args:
+        query: Consulta base con los filtros ya aplicados (sin ORDER BY ni LIMIT).
+        orden: Lista de tuplas (columna, descendente) que identifican cada fila.
+        clave_fila: Función que extrae de una fila los valores de las columnas de orden.
+        tamano_lote: Número de filas por consulta.
+        session: Si se indica, se liberan los objetos del lote anterior de la sesión
+                 para mantener acotada la memoria.
+
+    Yields:
+        list: Filas de cada lote.
+    """
+    query = ordenar_keyset(query, orden)
+    ultimo = None
+    while True:
+        consulta = query if ultimo is None else query.filter(filtro_keyset(orden, ultimo))
+        lote = consulta.limit(tamano_lote).all()
+        if not lote:
+            return
+        ultimo = clave_fila(lote[-1])
+        yield lote
+        if session is not None:
+            session.expunge_all()
+        if len(lote) < tamano_lote:
+            return
+
+
+def upsert_filas(db, tabla, filas, claves, actualizar):
+    """
+    Inserta filas o actualiza las existentes en una sola sentencia por lote.
+
+    Usa INSERT ... ON DUPLICATE KEY UPDATE en MySQL e INSERT ... ON CONFLICT en
+    SQLite; en otros motores consulta las claves existentes y separa inserts y
+    updates.
+
+    Args:
+        db: Sesión de SQLAlchemy (no se hace commit).
+        tabla: Tabla de SQLAlchemy (por ejemplo Producto.__table__).
+        filas: Lista de diccionarios, todos con las mismas columnas.
+        claves: Columnas de la restricción única que identifica cada fila.
+        actualizar: Columnas que se sobrescriben cuando la fila ya existe.
+    """
+    if not filas:
+        return
+    dialecto = db.get_bind().dialect.name
+
+    if dialecto == 'mysql':
+        stmt = mysql_insert(tabla)
+        stmt = stmt.on_duplicate_key_update({col: stmt.inserted[col] for col in actualizar})
+        db.execute(stmt, filas)
+    elif dialecto == 'sqlite':
+        stmt = sqlite_insert(tabla)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(claves),
+            set_={col: stmt.excluded[col] for col in actualizar}
+        )
+        db.execute(stmt, filas)
+    else:
+        columnas_clave = [tabla.c[col] for col in claves]
+        valores = [tuple(fila[col] for col in claves) for fila in filas]
+        existentes = set(db.execute(
+            select(*columnas_clave).where(tuple_(*columnas_clave).in_(valores))
+        ).all())
+        nuevas = [fila for fila, clave in zip(filas, valores) if clave not in existentes]
+        if nuevas:
+            db.execute(insert(tabla), nuevas)
+        for fila, clave in zip(filas, valores):
+            if clave in existentes:
+                db.execute(update(tabla).where(
+                    and_(*[c == v for c, v in zip(columnas_clave, clave)])
+                ).values({col: fila[col] for col in actualizar}))
+
+
+def valores_existentes(db, columna, valores, tamano_bloque=1000):
+    """
+    Subconjunto de valores que ya existen en una columna.
+
+    Reemplaza una consulta por valor con consultas IN de hasta tamano_bloque
+    valores cada una.
+
+    Returns:
+        set con los valores encontrados.
+    """
+    existentes = set()
+    valores = list(dict.fromkeys(v for v in valores if v is not None))
+    for i in range(0, len(valores), tamano_bloque):
+        bloque = valores[i:i + tamano_bloque]
+        existentes.update(v for (v,) in db.execute(select(columna).where(columna.in_(bloque))))
+    return existentes
@@ -0,0 +1,92 @@
+"""
+Utilidades para generar archivos Excel grandes con memoria acotada.
+
+Los libros se crean en modo de solo escritura de openpyxl, que vuelca las
+filas a disco a medida que se agregan, y la respuesta HTTP se envía leyendo
+el archivo temporal por partes.
+
+openpyxl se importa en las funciones que lo usan para no cargarlo al iniciar
+la aplicación (este módulo lo importan las rutas de trabajos y reportes).
+"""
+import os
+import tempfile
+
+from flask import Response
+
+MIMETYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Tamaño de cada parte enviada al cliente
+TAMANO_PARTE = 64 * 1024
+
+
+def crear_libro_streaming(titulo, anchos_columnas):
+    """Crea un libro de solo escritura con una hoja y anchos de columna fijos"""
+    import openpyxl
+    from openpyxl.utils import get_column_letter
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(titulo)
+    # Los anchos deben definirse antes de escribir la primera fila
+    for i, ancho in enumerate(anchos_columnas, 1):
+        ws.column_dimensions[get_column_letter(i)].width = ancho
+    return wb, ws
+
+
+def celda(ws, valor, font=None, fill=None, alignment=None):
+    """Crea una celda con estilo para una hoja de solo escritura"""
+    from openpyxl.cell import WriteOnlyCell
+
+    c = WriteOnlyCell(ws, value=valor)
+    if font is not None:
+        c.font = font
+    if fill is not None:
+        c.fill = fill
+    if alignment is not None:
+        c.alignment = alignment
+    return c
+
+
+def fila_banda(ws, texto, num_columnas, font=None, fill=None, alignment=None):
+    """Fila de encabezado de grupo: texto en la primera celda y el relleno en todas"""
+    primera = celda(ws, texto, font, fill, alignment)
+    return [primera] + [celda(ws, None, fill=fill) for _ in range(num_columnas - 1)]
+
+
+def guardar_libro_temporal(wb, prefijo='export_'):
+    """Guarda el libro en un archivo temporal y devuelve su ruta"""
+    fd, ruta = tempfile.mkstemp(prefix=prefijo, suffix='.xlsx')
+    os.close(fd)
+    try:
+        wb.save(ruta)
+    except Exception:
+        os.remove(ruta)
+        raise
+    return ruta
+
+
+def respuesta_archivo_por_partes(ruta, nombre_archivo, mimetype=MIMETYPE_XLSX, eliminar=True):
+    """
+    Envía un archivo en partes de tamaño fijo sin cargarlo completo en memoria.
+
+    Args:
+        ruta: Ruta del archivo a enviar.
+        nombre_archivo: Nombre sugerido para la descarga.
+        mimetype: Tipo de contenido de la respuesta.
+        eliminar: Si es True, el archivo se borra al terminar el envío.
+    """
+    def generar():
+        try:
+            with open(ruta, 'rb') as archivo:
+                while True:
+                    parte = archivo.read(TAMANO_PARTE)
+                    if not parte:
+                        break
+                    yield parte
+        finally:
+            if eliminar and os.path.exists(ruta):
+                os.remove(ruta)
+
+    response = Response(generar(), mimetype=mimetype, direct_passthrough=True)
+    response.headers['Content-Length'] = str(os.path.getsize(ruta))
+    response.headers['Content-Disposition'] = f'attachment; filename={nombre_archivo}'
+    return response
@@ -0,0 +1,148 @@
+"""
+Rangos de fechas en hora de Colombia para columnas DateTime guardadas en UTC.
+
+Los filtros de los reportes se expresan en días calendario de Colombia. Aquí
+esos días se convierten en límites semiabiertos [inicio, fin) en UTC, de modo
+que la columna se compara directamente (sin envolverla en DATE()) y la base
+de datos puede recorrer sus índices por rango.
+
+Colombia no tiene horario de verano (UTC-5 todo el año), así que las
+conversiones usan un desfase fijo en lugar de consultar la base de zonas
+horarias para cada valor.
+"""
+import datetime
+
+from sqlalchemy import func, text
+
+# Colombia no tiene horario de verano: UTC-5 todo el año
+DESFASE_COLOMBIA_HORAS = 5
+DESFASE_COLOMBIA = datetime.timedelta(hours=DESFASE_COLOMBIA_HORAS)
+ZONA_COLOMBIA = datetime.timezone(-DESFASE_COLOMBIA, '-05')
+
+# Directivas de strftime que dependen de la hora (las demás solo del día)
+_DIRECTIVAS_HORA = ('%H', '%I', '%M', '%S', '%f', '%p', '%X', '%c', '%z', '%Z')
+
+
+def leer_fecha(valor):
+    """
+    Convierte un texto AAAA-MM-DD en date.
+
+    Returns:
+        date o None si el valor viene vacío.
+
+    Raises:
+        ValueError: Si el texto no es una fecha válida.
+    """
+    if not valor:
+        return None
+    if isinstance(valor, datetime.date):
+        return valor
+    return datetime.datetime.strptime(valor, '%Y-%m-%d').date()
+
+
+def inicio_dia_utc(dia):
+    """Instante UTC (sin zona) en que empieza un día calendario de Colombia"""
+    return datetime.datetime.combine(dia, datetime.time.min) + DESFASE_COLOMBIA
+
+
+def limites_rango(desde=None, hasta=None):
+    """
+    Límites semiabiertos en UTC para los días de Colombia entre desde y hasta (incluidos).
+
+    Returns:
+        tuple: (inicio, fin) donde cada extremo puede ser None si no se indicó.
+    """
+    inicio = inicio_dia_utc(desde) if desde else None
+    fin = inicio_dia_utc(hasta + datetime.timedelta(days=1)) if hasta else None
+    return inicio, fin
+
+
+def filtro_rango_fechas(columna, desde=None, hasta=None):
+    """
+    Condiciones sargables columna >= inicio y columna < fin para un rango de días.
+
+    Args:
+        columna: Columna DateTime en UTC (por ejemplo Pedido.fecha_creacion).
+        desde: Primer día incluido (date) o None.
+        hasta: Último día incluido (date) o None.
+
+    Returns:
+        list: Condiciones para usar con query.filter(*condiciones).
+    """
+    inicio, fin = limites_rango(desde, hasta)
+    condiciones = []
+    if inicio is not None:
+        condiciones.append(columna >= inicio)
+    if fin is not None:
+        condiciones.append(columna < fin)
+    return condiciones
+
+
+def hoy_colombia():
+    """Fecha actual en Colombia"""
+    return dia_colombia(datetime.datetime.utcnow())
+
+
+def a_hora_colombia(fecha_utc):
+    """
+    Convierte un datetime a hora de Colombia (con zona).
+
+    Los valores sin zona se interpretan como UTC, que es como se guardan las
+    columnas DateTime de la aplicación.
+    """
+    if fecha_utc is None:
+        return None
+    if fecha_utc.tzinfo is None:
+        return (fecha_utc - DESFASE_COLOMBIA).replace(tzinfo=ZONA_COLOMBIA)
+    return fecha_utc.astimezone(ZONA_COLOMBIA)
+
+
+def dia_colombia(fecha_utc):
+    """Día calendario de Colombia de un datetime UTC sin zona"""
+    if fecha_utc is None:
+        return None
+    if not isinstance(fecha_utc, datetime.datetime):
+        return fecha_utc
+    if fecha_utc.tzinfo is None:
+        return (fecha_utc - DESFASE_COLOMBIA).date()
+    return fecha_utc.astimezone(ZONA_COLOMBIA).date()
+
+
+def formatear_fechas_colombia(valores, formato='%d/%m/%Y %H:%M'):
+    """
+    Convierte y formatea en lote una columna de datetimes UTC (para exportaciones).
+
+    Si el formato no incluye la hora, cada día se formatea una sola vez (los
+    pedidos de un mismo día comparten el texto). Los valores None quedan como ''.
+
+    Returns:
+        list: Textos en el mismo orden que los valores recibidos.
+    """
+    if any(directiva in formato for directiva in _DIRECTIVAS_HORA):
+        return [a_hora_colombia(valor).strftime(formato) if valor is not None else '' for valor in valores]
+
+    formateados = {None: ''}
+    resultado = []
+    for valor in valores:
+        dia = dia_colombia(valor)
+        texto = formateados.get(dia)
+        if texto is None:
+            texto = formateados[dia] = dia.strftime(formato)
+        resultado.append(texto)
+    return resultado
+
+
+def expresion_hora_colombia(columna, dialecto):
+    """Expresión SQL con la hora de Colombia (sin zona) de una columna DateTime en UTC"""
+    if dialecto == 'sqlite':
+        return func.datetime(columna, f'-{DESFASE_COLOMBIA_HORAS} hours')
+    if dialecto == 'mysql':
+        return func.date_sub(columna, text(f'INTERVAL {DESFASE_COLOMBIA_HORAS} HOUR'))
+    return columna - DESFASE_COLOMBIA
+
+
+def expresion_dia_colombia(columna, dialecto):
+    """Expresión SQL con el día de Colombia de una columna DateTime en UTC"""
+    if dialecto == 'sqlite':
+        return func.date(columna, f'-{DESFASE_COLOMBIA_HORAS} hours')
+    return func.date(expresion_hora_colombia(columna, dialecto))
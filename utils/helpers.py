@@ -1,4 +1,5 @@
 from datetime import datetime
+import unicodedata
 
 def get_current_year():
     """Obtiene el año actual"""
@@ -17,6 +18,38 @@ def safe_float(value, default=0.0):
     except (ValueError, TypeError):
         return default
 
+def normalizar_texto(valor):
+    """Normaliza un texto para búsquedas: minúsculas y sin tildes ("Línea" -> "linea")"""
+    if valor is None:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(valor))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+def clave_busqueda(*valores, largo=600):
+    """Texto normalizado de varios campos con el que se busca un registro (ver Cliente.busqueda)"""
+    partes = (normalizar_texto(valor) for valor in valores)
+    return ' | '.join(parte for parte in partes if parte)[:largo]
+
+def claves_busqueda_producto(valores):
+    """
+    Claves normalizadas de un producto a partir de sus campos (dict u objeto).
+
+    Solo incluye las claves cuyos campos de origen están presentes, para no
+    borrar la clave de un campo que no se está escribiendo.
+    """
+    if not isinstance(valores, dict):
+        valores = {campo: getattr(valores, campo) for campo in
+                   ('codigo', 'referencia_de_producto', 'categoria_linea', 'formulacion_grupo')}
+    claves = {}
+    if 'codigo' in valores and 'referencia_de_producto' in valores:
+        claves['busqueda'] = clave_busqueda(valores['codigo'], valores['referencia_de_producto'], largo=400)
+    if 'categoria_linea' in valores:
+        claves['linea_busqueda'] = normalizar_texto(valores['categoria_linea'])[:100]
+    if 'formulacion_grupo' in valores:
+        claves['grupo_busqueda'] = normalizar_texto(valores['formulacion_grupo'])[:100]
+    return claves
+
 def safe_int(value, default=0):
     """Convierte un valor a int de forma segura"""
     try:
@@ -0,0 +1,238 @@
+"""
+Importación masiva de clientes desde Excel.
+
+El DataFrame se normaliza y valida por columnas, los números de
+identificación repetidos en el archivo y los ya registrados se detectan con
+operaciones de conjunto (una consulta IN por bloque) y los clientes válidos se
+insertan por lotes, cada lote en su propia transacción.
+"""
+import datetime
+import logging
+import os
+import time
+
+import pandas as pd
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from models import Cliente
+from utils.consultas import valores_existentes
+from utils.helpers import DEPARTAMENTOS_CIUDADES
+from utils.versiones import incrementar_version
+from utils.importacion_productos import (
+    ResultadoImportacion,
+    Cronometro,
+    limpiar_texto,
+    TAMANO_LOTE,
+    TAMANO_CONSULTA_IN,
+)
+
+logger = logging.getLogger(__name__)
+
+# Encabezados aceptados (en minúsculas) y su columna en el modelo
+ALIAS_COLUMNAS = {
+    'nombre comercial': 'nombre_comercial',
+    'nombre comercial *': 'nombre_comercial',
+    'razón social': 'razon_social',
+    'razon social': 'razon_social',
+    'tipo identificación': 'tipo_identificacion',
+    'tipo identificacion': 'tipo_identificacion',
+    'número identificación': 'numero_identificacion',
+    'numero identificacion': 'numero_identificacion',
+    'teléfono': 'telefono',
+    'dirección': 'direccion',
+}
+
+COLUMNAS = ('nombre_comercial', 'razon_social', 'tipo_identificacion', 'numero_identificacion',
+            'email', 'telefono', 'direccion', 'ciudad', 'departamento')
+
+# Largo máximo de cada columna (según models.Cliente)
+LARGOS = {
+    'nombre_comercial': 255,
+    'razon_social': 255,
+    'tipo_identificacion': 50,
+    'numero_identificacion': 50,
+    'email': 255,
+    'telefono': 50,
+    'direccion': 255,
+    'ciudad': 100,
+    'departamento': 100,
+}
+
+
+def clave_texto(serie):
+    """Versión sin tildes, en minúsculas y con espacios simples de una columna de texto"""
+    return (serie.str.normalize('NFKD')
+            .str.encode('ascii', errors='ignore').str.decode('ascii')
+            .str.lower().str.replace(r'\s+', ' ', regex=True).str.strip())
+
+
+# Nombre oficial de cada departamento según su clave normalizada ("atlantico" -> "Atlántico")
+DEPARTAMENTOS_POR_CLAVE = dict(zip(
+    clave_texto(pd.Series(list(DEPARTAMENTOS_CIUDADES), dtype='string')),
+    DEPARTAMENTOS_CIUDADES,
+))
+
+
+def leer_excel_clientes(origen):
+    """Lee el Excel como texto para que los NIT numéricos no se conviertan en float"""
+    return pd.read_excel(origen, dtype=str)
+
+
+def _nit(valor):
+    return None if pd.isna(valor) else valor
+
+
+def preparar_clientes(df, resultado):
+    """
+    Normaliza y valida el DataFrame completo por columnas.
+
+    Args:
+        df: DataFrame leído del Excel.
+        resultado: ResultadoImportacion donde se registran los errores por fila.
+
+    Returns:
+        DataFrame con las filas válidas y la columna 'fila' con el número de
+        fila del Excel.
+
+    Raises:
+        ValueError: Si falta la columna "Nombre Comercial".
+    """
+    df = df.rename(columns=lambda c: str(c).strip().lower()).rename(columns=ALIAS_COLUMNAS)
+    if 'nombre_comercial' not in df.columns:
+        raise ValueError('La columna "Nombre Comercial" es obligatoria')
+
+    df = df.loc[:, ~df.columns.duplicated()]
+    presentes = [c for c in COLUMNAS if c in df.columns]
+    df = df[presentes].copy()
+    # Fila del Excel: el encabezado es la fila 1
+    df['fila'] = df.index + 2
+    for col in COLUMNAS:
+        df[col] = limpiar_texto(df[col]) if col in presentes else pd.Series(pd.NA, index=df.index, dtype='string')
+    df = df.dropna(how='all', subset=list(COLUMNAS))
+    resultado.total_filas = len(df)
+
+    departamento = df['departamento']
+    df['departamento'] = clave_texto(departamento).map(DEPARTAMENTOS_POR_CLAVE).astype('string')
+    ejemplos = ', '.join(list(DEPARTAMENTOS_CIUDADES)[:5])
+
+    # Validaciones por columna; cada fila se reporta con su primer error
+    validaciones = [
+        (df['nombre_comercial'].isna(), lambda f: 'El nombre comercial es obligatorio'),
+        (df['email'].notna() & ~df['email'].str.contains('@', regex=False),
+         lambda f: f"Email inválido: {f.email}"),
+        (departamento.notna() & df['departamento'].isna(),
+         lambda f: f'Departamento "{departamento[f.Index]}" no válido. Use uno de: {ejemplos}...'),
+    ]
+    for col, largo in LARGOS.items():
+        validaciones.append((df[col].str.len() > largo, lambda f, col=col, largo=largo: f"'{col}' supera {largo} caracteres."))
+
+    invalidas = pd.Series(False, index=df.index)
+    for mascara, mensaje in validaciones:
+        mascara = mascara.fillna(False).astype(bool) & ~invalidas
+        for fila in df[mascara].itertuples():
+            resultado.agregar_error(int(fila.fila), _nit(fila.numero_identificacion), mensaje(fila))
+        invalidas |= mascara
+    df = df[~invalidas]
+
+    # NIT repetidos en el archivo: se conserva la primera fila
+    con_nit = df['numero_identificacion'].notna()
+    repetidas = con_nit & df.duplicated('numero_identificacion', keep='first')
+    primera = df[con_nit].groupby('numero_identificacion')['fila'].transform('first').reindex(df.index)
+    for fila, nit, original in zip(df.loc[repetidas, 'fila'], df.loc[repetidas, 'numero_identificacion'],
+                                   primera[repetidas]):
+        resultado.agregar_error(int(fila), nit, f'Número de identificación repetido en el archivo (fila {int(original)})')
+    df = df[~repetidas]
+
+    # La razón social toma el nombre comercial cuando viene vacía
+    df['razon_social'] = df['razon_social'].fillna(df['nombre_comercial'])
+    return df
+
+
+def _filas_para_insertar(df, ahora):
+    """Convierte el DataFrame en diccionarios para el insert (vacíos como '' y NIT vacío como None)"""
+    datos = df[list(COLUMNAS)].astype(object)
+    datos = datos.where(df[list(COLUMNAS)].notna(), '')
+    filas = datos.to_dict('records')
+    for fila in filas:
+        # Varios clientes sin NIT no deben chocar con la restricción única
+        fila['numero_identificacion'] = fila['numero_identificacion'] or None
+        fila['fecha_creacion'] = ahora
+        fila['fecha_modificacion'] = ahora
+    return filas
+
+
+def importar_clientes(db, origen, tamano_lote=None, progreso=None):
+    """
+    Importa clientes nuevos desde un Excel (ruta, archivo subido o DataFrame).
+
+    Las filas cuyo número de identificación ya está registrado se reportan
+    como error y no se modifican. Cada lote se confirma por separado; si un
+    lote falla, sus filas se reintentan una a una para identificar las que
+    tienen error.
+
+    Args:
+        progreso: Callable opcional progreso(porcentaje, mensaje) para informar
+            el avance (lo usan los trabajos en segundo plano).
+
+    Returns:
+        ResultadoImportacion
+    """
+    tamano_lote = tamano_lote or TAMANO_LOTE
+    progreso = progreso or (lambda porcentaje, mensaje=None: None)
+    resultado = ResultadoImportacion('clientes', 'NIT')
+    inicio = time.perf_counter()
+    cronometro = Cronometro(resultado.tiempos)
+
+    df = origen if isinstance(origen, pd.DataFrame) else leer_excel_clientes(origen)
+    cronometro.etapa('lectura')
+    progreso(10, 'Archivo leído, validando filas')
+
+    df = preparar_clientes(df, resultado)
+    cronometro.etapa('validacion')
+    progreso(20, 'Filas validadas, consultando registros existentes')
+
+    existentes = valores_existentes(db, Cliente.numero_identificacion,
+                                    df['numero_identificacion'].dropna(), TAMANO_CONSULTA_IN)
+    registradas = df['numero_identificacion'].isin(existentes).fillna(False).astype(bool)
+    for fila, nit in df.loc[registradas, ['fila', 'numero_identificacion']].itertuples(index=False):
+        resultado.agregar_error(int(fila), nit, f'Ya existe un cliente con el número de identificación {nit}')
+    df = df[~registradas]
+    cronometro.etapa('consulta_existentes')
+    progreso(25, f'Guardando {len(df)} clientes')
+
+    tabla = Cliente.__table__
+    filas = _filas_para_insertar(df, datetime.datetime.utcnow())
+    numeros_fila = df['fila'].tolist()
+
+    for i in range(0, len(filas), tamano_lote):
+        lote = filas[i:i + tamano_lote]
+        try:
+            db.execute(insert(tabla), lote)
+            incrementar_version(db, 'clientes')
+            db.commit()
+            resultado.insertados += len(lote)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Lote de importación de clientes con errores, se reintenta fila por fila: {e}")
+            for fila, numero in zip(lote, numeros_fila[i:i + tamano_lote]):
+                try:
+                    db.execute(insert(tabla), [fila])
+                    incrementar_version(db, 'clientes')
+                    db.commit()
+                    resultado.insertados += 1
+                except IntegrityError:
+                    db.rollback()
+                    resultado.agregar_error(numero, fila['numero_identificacion'],
+                                            f"El número de identificación {fila['numero_identificacion']} ya está registrado")
+                except Exception as error_fila:
+                    db.rollback()
+                    resultado.agregar_error(numero, fila['numero_identificacion'], f'Error al guardar: {error_fila}')
+        progreso(25 + 75 * min(i + tamano_lote, len(filas)) // len(filas))
+    cronometro.etapa('escritura')
+    resultado.errores.sort(key=lambda e: e['fila'])
+
+    resultado.tiempos['total_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+    if os.getenv('FLASK_ENV') != 'production':
+        logger.info(f"Importación de clientes: {resultado.resumen()} {resultado.tiempos}")
+    return resultado
@@ -0,0 +1,289 @@
+"""
+Motor de importación masiva de productos desde Excel.
+
+La limpieza y validación se hacen por columnas con pandas, los códigos ya
+existentes se consultan de una vez y la escritura usa upsert por lotes, cada
+lote en su propia transacción. Lo usan tanto la ruta /productos/importar como
+business_logic.importar_productos_desde_excel.
+"""
+import datetime
+import logging
+import os
+import time
+
+import pandas as pd
+
+from models import Producto
+from utils.catalogo_productos import registrar_cambio_catalogo
+from utils.consultas import upsert_filas, valores_existentes
+from utils.helpers import claves_busqueda_producto
+
+logger = logging.getLogger(__name__)
+
+# Filas escritas por sentencia y por transacción
+TAMANO_LOTE = int(os.getenv('IMPORTACION_TAMANO_LOTE', 500))
+
+# Máximo de valores por consulta IN al buscar códigos existentes
+TAMANO_CONSULTA_IN = 1000
+
+# Encabezados alternativos aceptados (formato de la plantilla anterior)
+ALIAS_COLUMNAS = {
+    'Codigo': 'codigo',
+    'Referencia de Producto': 'referencia_de_producto',
+    'Gramaje (g)': 'gramaje_g',
+    'Formulacion/Grupo': 'formulacion_grupo',
+    'Categoria/Linea': 'categoria_linea',
+}
+
+COLUMNAS_REQUERIDAS = ('codigo', 'referencia_de_producto', 'gramaje_g', 'formulacion_grupo', 'categoria_linea')
+COLUMNAS_OPCIONALES = ('descripcion', 'presentacion1', 'presentacion2', 'precio_unitario', 'unidad_medida', 'estado')
+
+# Largo máximo de las columnas de texto (según models.Producto)
+LARGOS = {
+    'codigo': 100,
+    'referencia_de_producto': 255,
+    'formulacion_grupo': 100,
+    'categoria_linea': 100,
+    'presentacion1': 255,
+    'presentacion2': 255,
+    'unidad_medida': 20,
+}
+
+NOMBRES_COLUMNAS = {
+    'codigo': 'Codigo',
+    'referencia_de_producto': 'Referencia de Producto',
+    'gramaje_g': 'Gramaje (g)',
+}
+
+VALORES_ACTIVO = {'activo', '1', 'sí', 'si', 'true'}
+
+
+class ResultadoImportacion:
+    """Resultado de una importación: conteos, errores por fila y tiempos por etapa"""
+
+    def __init__(self, entidad='productos', etiqueta_clave='Código'):
+        self.entidad = entidad
+        self.etiqueta_clave = etiqueta_clave
+        self.total_filas = 0
+        self.insertados = 0
+        self.actualizados = 0
+        self.errores = []
+        self.tiempos = {}
+
+    def agregar_error(self, fila, codigo, mensaje):
+        self.errores.append({'fila': fila, 'codigo': codigo, 'mensaje': mensaje})
+
+    def mensajes_error(self):
+        """Errores en texto, uno por fila"""
+        mensajes = []
+        for error in self.errores:
+            if error['codigo']:
+                mensajes.append(f"Fila {error['fila']}, {self.etiqueta_clave} '{error['codigo']}': {error['mensaje']}")
+            else:
+                mensajes.append(f"Fila {error['fila']}: {error['mensaje']}")
+        return mensajes
+
+    def resumen(self):
+        """Mensaje corto con los conteos y la duración total"""
+        actualizados = f", {self.actualizados} actualizados" if self.actualizados else ''
+        return (f"{self.insertados} {self.entidad} nuevos{actualizados}"
+                f" y {len(self.errores)} filas con errores en {self.tiempos.get('total_ms', 0) / 1000:.2f} s")
+
+    def to_dict(self):
+        return {
+            'total_filas': self.total_filas,
+            'insertados': self.insertados,
+            'actualizados': self.actualizados,
+            'errores': self.errores,
+            'mensajes_error': self.mensajes_error(),
+            'resumen': self.resumen(),
+            'tiempos': self.tiempos,
+        }
+
+
+class Cronometro:
+    """Registra la duración de cada etapa en un diccionario"""
+
+    def __init__(self, tiempos):
+        self.tiempos = tiempos
+        self.marca = time.perf_counter()
+
+    def etapa(self, nombre):
+        ahora = time.perf_counter()
+        self.tiempos[f'{nombre}_ms'] = round((ahora - self.marca) * 1000, 2)
+        self.marca = ahora
+
+
+def leer_excel_productos(origen):
+    """Lee el Excel como texto para no alterar códigos numéricos (por ejemplo '0012')"""
+    return pd.read_excel(origen, dtype=str)
+
+
+def limpiar_texto(serie):
+    """Limpia una columna de texto: sin espacios en los extremos y vacíos como None"""
+    serie = serie.astype('string').str.strip()
+    return serie.mask(serie == '')
+
+
+def preparar_productos(df, resultado):
+    """
+    Normaliza y valida el DataFrame completo por columnas.
+
+    Args:
+        df: DataFrame leído del Excel.
+        resultado: ResultadoImportacion donde se registran los errores por fila.
+
+    Returns:
+        DataFrame con las filas válidas (una por código) y la columna 'fila'
+        con el número de fila del Excel.
+
+    Raises:
+        ValueError: Si falta alguna columna requerida.
+    """
+    df = df.rename(columns=lambda c: str(c).strip()).rename(columns=ALIAS_COLUMNAS)
+    for col in COLUMNAS_REQUERIDAS:
+        if col not in df.columns:
+            raise ValueError(f'Falta la columna requerida: {col}')
+
+    columnas = [c for c in COLUMNAS_REQUERIDAS + COLUMNAS_OPCIONALES if c in df.columns]
+    df = df[columnas].copy()
+    # Fila del Excel: el encabezado es la fila 1
+    df['fila'] = df.index + 2
+
+    for col in columnas:
+        if col not in ('gramaje_g', 'precio_unitario'):
+            df[col] = limpiar_texto(df[col])
+    df = df.dropna(how='all', subset=columnas)
+    resultado.total_filas = len(df)
+
+    gramaje_texto = limpiar_texto(df['gramaje_g'])
+    df['gramaje_g'] = pd.to_numeric(gramaje_texto, errors='coerce')
+    if 'precio_unitario' in df.columns:
+        df['precio_unitario'] = pd.to_numeric(limpiar_texto(df['precio_unitario']), errors='coerce').fillna(0.0)
+    if 'unidad_medida' in df.columns:
+        df['unidad_medida'] = df['unidad_medida'].fillna('unidad')
+    if 'estado' in df.columns:
+        # Sin valor se asume activo, igual que el valor por defecto del modelo
+        activo = df['estado'].isna() | df['estado'].str.lower().isin(VALORES_ACTIVO).fillna(False).astype(bool)
+        df['estado'] = activo.map({True: 'activo', False: 'inactivo'})
+
+    # Validaciones por columna; cada fila se reporta con su primer error
+    validaciones = [
+        (df['codigo'].isna(), "El campo 'Codigo' es obligatorio."),
+        (df['referencia_de_producto'].isna(), "El campo 'Referencia de Producto' es obligatorio."),
+        (gramaje_texto.isna(), "El campo 'Gramaje (g)' es obligatorio."),
+        (df['gramaje_g'].isna(), "Valor inválido para 'Gramaje (g)'. Debe ser un número."),
+        (df['gramaje_g'] <= 0, "El gramaje debe ser un número positivo."),
+    ]
+    for col, largo in LARGOS.items():
+        if col in df.columns:
+            nombre = NOMBRES_COLUMNAS.get(col, col)
+            validaciones.append((df[col].str.len() > largo, f"'{nombre}' supera {largo} caracteres."))
+
+    invalidas = pd.Series(False, index=df.index)
+    for mascara, mensaje in validaciones:
+        mascara = mascara.fillna(False).astype(bool) & ~invalidas
+        for fila, codigo in df.loc[mascara, ['fila', 'codigo']].itertuples(index=False):
+            resultado.agregar_error(int(fila), None if pd.isna(codigo) else codigo, mensaje)
+        invalidas |= mascara
+    df = df[~invalidas]
+
+    # Códigos repetidos en el archivo: se conserva la última fila
+    repetidas = df.duplicated('codigo', keep='last')
+    for fila, codigo in df.loc[repetidas, ['fila', 'codigo']].itertuples(index=False):
+        resultado.agregar_error(int(fila), codigo, 'Código repetido en el archivo; se usó la última fila.')
+    df = df[~repetidas]
+
+    resultado.errores.sort(key=lambda e: e['fila'])
+    return df
+
+
+def codigos_existentes(db, codigos):
+    """Códigos de la lista que ya existen en la base de datos (consultas IN por bloques)"""
+    return valores_existentes(db, Producto.codigo, codigos, TAMANO_CONSULTA_IN)
+
+
+def _filas_para_escribir(df, ahora):
+    """Convierte el DataFrame en diccionarios para el upsert (NaN como None)"""
+    columnas = [c for c in df.columns if c != 'fila']
+    datos = df[columnas].astype(object).where(df[columnas].notna(), None)
+    filas = datos.to_dict('records')
+    for fila in filas:
+        fila['fecha_modificacion'] = ahora
+        # Claves de búsqueda explícitas: el upsert también las actualiza en los productos existentes
+        fila.update(claves_busqueda_producto(fila))
+    return filas
+
+
+def importar_productos(db, origen, tamano_lote=None, progreso=None):
+    """
+    Importa productos desde un Excel (ruta, archivo subido o DataFrame).
+
+    Los productos nuevos se insertan y los existentes (mismo código) se
+    actualizan con las columnas presentes en el archivo. Cada lote se confirma
+    por separado; si un lote falla, sus filas se reintentan una a una para
+    identificar las que tienen error. Cada transacción incrementa la versión
+    del catálogo para que todos los workers lo refresquen.
+
+    Args:
+        progreso: Callable opcional progreso(porcentaje, mensaje) para informar
+            el avance (lo usan los trabajos en segundo plano).
+
+    Returns:
+        ResultadoImportacion
+    """
+    tamano_lote = tamano_lote or TAMANO_LOTE
+    progreso = progreso or (lambda porcentaje, mensaje=None: None)
+    resultado = ResultadoImportacion()
+    inicio = time.perf_counter()
+    cronometro = Cronometro(resultado.tiempos)
+
+    df = origen if isinstance(origen, pd.DataFrame) else leer_excel_productos(origen)
+    cronometro.etapa('lectura')
+    progreso(10, 'Archivo leído, validando filas')
+
+    df = preparar_productos(df, resultado)
+    cronometro.etapa('validacion')
+    progreso(20, 'Filas validadas, consultando registros existentes')
+
+    existentes = codigos_existentes(db, df['codigo'])
+    cronometro.etapa('consulta_existentes')
+    progreso(25, f'Guardando {len(df)} productos')
+
+    tabla = Producto.__table__
+    filas = _filas_para_escribir(df, datetime.datetime.utcnow())
+    numeros_fila = df['fila'].tolist()
+    actualizar = [c for c in filas[0] if c != 'codigo'] if filas else []
+
+    for i in range(0, len(filas), tamano_lote):
+        lote = filas[i:i + tamano_lote]
+        try:
+            upsert_filas(db, tabla, lote, ['codigo'], actualizar)
+            registrar_cambio_catalogo(db)
+            db.commit()
+            escritas = lote
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Lote de importación con errores, se reintenta fila por fila: {e}")
+            escritas = []
+            for fila, numero in zip(lote, numeros_fila[i:i + tamano_lote]):
+                try:
+                    upsert_filas(db, tabla, [fila], ['codigo'], actualizar)
+                    registrar_cambio_catalogo(db)
+                    db.commit()
+                    escritas.append(fila)
+                except Exception as error_fila:
+                    db.rollback()
+                    resultado.agregar_error(numero, fila['codigo'], f'Error al guardar: {error_fila}')
+        for fila in escritas:
+            if fila['codigo'] in existentes:
+                resultado.actualizados += 1
+            else:
+                resultado.insertados += 1
+        progreso(25 + 75 * min(i + tamano_lote, len(filas)) // len(filas))
+    cronometro.etapa('escritura')
+
+    resultado.tiempos['total_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+    if os.getenv('FLASK_ENV') != 'production':
+        logger.info(f"Importación de productos: {resultado.resumen()} {resultado.tiempos}")
+    return resultado
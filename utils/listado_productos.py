@@ -0,0 +1,129 @@
+"""
+Listado paginado de productos con conteos por grupo y línea.
+
+Las páginas se leen por cursor (keyset) y solo con las columnas que muestra
+el listado (sin la descripción ni objetos ORM), de modo que el tamaño de cada
+respuesta no depende del tamaño del catálogo. Los conteos de los filtros de
+grupo de formulación y línea salen de una sola consulta agrupada por
+(grupo, línea).
+"""
+from sqlalchemy import func, select
+
+from models import Producto
+from utils.busqueda_texto import filtro_texto
+from utils.consultas import codificar_cursor, filtro_keyset, leer_cursor, ordenar_keyset
+
+POR_PAGINA_PRODUCTOS = 100
+MAXIMO_POR_PAGINA_PRODUCTOS = 500
+
+# Columnas del listado y de /productos/api/filtrar
+COLUMNAS_LISTA = (
+    Producto.id, Producto.codigo, Producto.referencia_de_producto, Producto.gramaje_g,
+    Producto.formulacion_grupo, Producto.categoria_linea, Producto.presentacion1, Producto.presentacion2,
+)
+
+# Órdenes disponibles: columnas del keyset (el id desempata) y valores del cursor de una fila
+ORDENES_PRODUCTOS = {
+    'codigo': (
+        [(Producto.codigo, False), (Producto.id, False)],
+        lambda fila: (fila.codigo, fila.id),
+    ),
+    'referencia': (
+        [(Producto.referencia_de_producto, False), (Producto.id, False)],
+        lambda fila: (fila.referencia_de_producto, fila.id),
+    ),
+}
+
+
+def serializar_producto_lista(fila):
+    """Fila del listado en el formato JSON de /productos/api/filtrar"""
+    return {
+        'id': fila.id,
+        'codigo': fila.codigo,
+        'referencia_de_producto': fila.referencia_de_producto,
+        'gramaje_g': fila.gramaje_g,
+        'formulacion_grupo': fila.formulacion_grupo or '',
+        'categoria_linea': fila.categoria_linea or '',
+        'presentacion1': fila.presentacion1 or '',
+        'presentacion2': fila.presentacion2 or '',
+    }
+
+
+def facetas_productos(db, busqueda=None, grupo=None, linea=None):
+    """
+    Conteos de productos por grupo y por línea con una consulta agrupada.
+
+    El conteo de cada grupo respeta el filtro de línea (y viceversa), pero no
+    el de su propio campo, para que el filtro muestre cuántos productos
+    quedarían al cambiar de grupo.
+
+    Returns:
+        dict: {'grupos': [(grupo, total)], 'lineas': [(linea, total)], 'total': int}
+            total cuenta los productos que cumplen todos los filtros.
+    """
+    filas = db.execute(
+        select(Producto.formulacion_grupo, Producto.categoria_linea, func.count(Producto.id))
+        .where(*filtro_texto(db, Producto, busqueda))
+        .group_by(Producto.formulacion_grupo, Producto.categoria_linea)
+    ).all()
+
+    grupos, lineas, total = {}, {}, 0
+    for grupo_fila, linea_fila, cantidad in filas:
+        coincide_grupo = not grupo or grupo_fila == grupo
+        coincide_linea = not linea or linea_fila == linea
+        if grupo_fila and coincide_linea:
+            grupos[grupo_fila] = grupos.get(grupo_fila, 0) + cantidad
+        if linea_fila and coincide_grupo:
+            lineas[linea_fila] = lineas.get(linea_fila, 0) + cantidad
+        if coincide_grupo and coincide_linea:
+            total += cantidad
+    return {'grupos': sorted(grupos.items()), 'lineas': sorted(lineas.items()), 'total': total}
+
+
+def pagina_productos(db, busqueda=None, grupo=None, linea=None, orden='codigo', despues=None,
+                     limite=POR_PAGINA_PRODUCTOS, facetas=False):
+    """
+    Lee una página del listado de productos.
+
+    Args:
+        db: Sesión de SQLAlchemy.
+        busqueda: Palabras contenidas en el código o la referencia (sin importar
+            mayúsculas ni tildes, ver utils.busqueda_texto).
+        grupo, linea: Grupo de formulación y línea exactos.
+        orden: Clave de ORDENES_PRODUCTOS.
+        despues: Cursor de la última fila de la página anterior.
+        limite: Filas por página (hasta MAXIMO_POR_PAGINA_PRODUCTOS).
+        facetas: Si es True agrega los conteos de facetas_productos() y el total.
+
+    Returns:
+        dict: {'productos': [Row], 'siguiente': cursor o None,
+               'total': int o None, 'facetas': dict o None}
+
+    Raises:
+        ValueError: Si el orden o el cursor no son válidos.
+    """
+    if orden not in ORDENES_PRODUCTOS:
+        raise ValueError(f'Orden no válido: {orden}')
+    columnas_orden, clave_fila = ORDENES_PRODUCTOS[orden]
+    limite = min(max(int(limite or POR_PAGINA_PRODUCTOS), 1), MAXIMO_POR_PAGINA_PRODUCTOS)
+
+    filtros = filtro_texto(db, Producto, busqueda)
+    if grupo:
+        filtros.append(Producto.formulacion_grupo == grupo)
+    if linea:
+        filtros.append(Producto.categoria_linea == linea)
+
+    consulta = select(*COLUMNAS_LISTA).where(*filtros)
+    if despues:
+        consulta = consulta.where(filtro_keyset(columnas_orden, leer_cursor(despues, len(columnas_orden))))
+    filas = db.execute(ordenar_keyset(consulta, columnas_orden).limit(limite + 1)).all()
+
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    conteos = facetas_productos(db, busqueda, grupo, linea) if facetas else None
+    return {
+        'productos': filas,
+        'siguiente': codificar_cursor(clave_fila(filas[-1])) if hay_mas else None,
+        'total': conteos['total'] if conteos else None,
+        'facetas': conteos,
+    }
@@ -0,0 +1,205 @@
+"""
+Métricas del pool de conexiones a la base de datos.
+
+Se registran con eventos del pool de SQLAlchemy (checkout / checkin /
+conexiones nuevas), el tiempo de espera para obtener una conexión y los
+timeouts (con la clase de pool de clase_pool_medido) y los fallos del
+pre-ping. También, para cada petición HTTP, cuántas conexiones tomó del pool.
+Las exponen /metricas/bd (JSON) y /metrics (formato de texto de Prometheus)
+en routes/health.py.
+"""
+import threading
+import time
+
+from flask import g, has_app_context, has_request_context
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+# Esperas por una conexión a partir de las cuales se consideran lentas
+ESPERA_LENTA_SEGUNDOS = 0.1
+
+
+class MetricasPool:
+    """Contadores acumulados del pool de un engine (por proceso)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.inicio = time.time()
+        # Parámetros con los que se creó el pool (config.pool_bd.configuracion_pool)
+        self.configuracion = None
+        self.conexiones_creadas = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.en_uso = 0
+        self.maximo_en_uso = 0
+        self.invalidadas = 0
+        self.fallos_pre_ping = 0
+        # Espera para obtener una conexión del pool
+        self.esperas = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.esperas_lentas = 0
+        self.timeouts = 0
+        # Por petición HTTP
+        self.peticiones = 0
+        self.peticiones_con_bd = 0
+        self.checkouts_en_peticiones = 0
+        self.maximo_checkouts_peticion = 0
+
+    def registrar_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+            self.en_uso += 1
+            self.maximo_en_uso = max(self.maximo_en_uso, self.en_uso)
+        if has_request_context():
+            g._checkouts_bd = g.get('_checkouts_bd', 0) + 1
+
+    def registrar_checkin(self):
+        with self._lock:
+            self.checkins += 1
+            self.en_uso = max(0, self.en_uso - 1)
+
+    def registrar_conexion(self):
+        with self._lock:
+            self.conexiones_creadas += 1
+
+    def registrar_invalidacion(self):
+        with self._lock:
+            self.invalidadas += 1
+
+    def registrar_fallo_pre_ping(self):
+        with self._lock:
+            self.fallos_pre_ping += 1
+
+    def registrar_espera(self, segundos, timeout=False):
+        """Registra cuánto tardó el pool en entregar (o en negar) una conexión"""
+        with self._lock:
+            self.esperas += 1
+            self.espera_total += segundos
+            self.espera_maxima = max(self.espera_maxima, segundos)
+            if segundos >= ESPERA_LENTA_SEGUNDOS:
+                self.esperas_lentas += 1
+            if timeout:
+                self.timeouts += 1
+
+    def registrar_fin_peticion(self):
+        """Acumula las conexiones que tomó la petición actual (llamar en el teardown)"""
+        checkouts = g.pop('_checkouts_bd', 0) if has_app_context() else 0
+        with self._lock:
+            self.peticiones += 1
+            if checkouts:
+                self.peticiones_con_bd += 1
+                self.checkouts_en_peticiones += checkouts
+                self.maximo_checkouts_peticion = max(self.maximo_checkouts_peticion, checkouts)
+
+    def resumen(self, engine=None):
+        """Diccionario con los contadores y el estado actual del pool"""
+        with self._lock:
+            datos = {
+                'desde': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.inicio)),
+                'conexiones_creadas': self.conexiones_creadas,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'en_uso': self.en_uso,
+                'maximo_en_uso': self.maximo_en_uso,
+                'invalidadas': self.invalidadas,
+                'fallos_pre_ping': self.fallos_pre_ping,
+                'esperas': self.esperas,
+                'espera_total_ms': round(self.espera_total * 1000, 3),
+                'espera_promedio_ms': round(self.espera_total * 1000 / self.esperas, 3) if self.esperas else 0,
+                'espera_maxima_ms': round(self.espera_maxima * 1000, 3),
+                'esperas_lentas': self.esperas_lentas,
+                'timeouts': self.timeouts,
+                'peticiones': self.peticiones,
+                'peticiones_con_bd': self.peticiones_con_bd,
+                'checkouts_por_peticion': round(self.checkouts_en_peticiones / self.peticiones_con_bd, 3)
+                if self.peticiones_con_bd else 0,
+                'maximo_checkouts_peticion': self.maximo_checkouts_peticion,
+            }
+        if self.configuracion:
+            datos['configuracion'] = self.configuracion
+        if engine is not None:
+            pool = engine.pool
+            datos['pool'] = {
+                'clase': type(pool).__name__,
+                'estado': pool.status(),
+            }
+            for nombre in ('size', 'checkedout', 'overflow', 'checkedin'):
+                metodo = getattr(pool, nombre, None)
+                if callable(metodo):
+                    datos['pool'][nombre] = metodo()
+        return datos
+
+
+def clase_pool_medido(metricas):
+    """
+    Subclase de QueuePool que mide la espera por una conexión y los timeouts.
+
+    Se pasa como poolclass a create_engine; al recrearse el pool (dispose)
+    SQLAlchemy usa la misma clase, así que la medición se conserva.
+    """
+
+    class PoolMedido(QueuePool):
+        def _do_get(self):
+            inicio = time.perf_counter()
+            try:
+                entrada = super()._do_get()
+            except exc.TimeoutError:
+                metricas.registrar_espera(time.perf_counter() - inicio, timeout=True)
+                raise
+            metricas.registrar_espera(time.perf_counter() - inicio)
+            return entrada
+
+    return PoolMedido
+
+
+def _registrar_error(metricas, contexto):
+    if getattr(contexto, 'is_pre_ping', False):
+        metricas.registrar_fallo_pre_ping()
+
+
+def instrumentar_engine(engine, metricas):
+    """Registra los eventos del pool de un engine en las métricas"""
+    event.listen(engine, 'connect', lambda *args: metricas.registrar_conexion())
+    event.listen(engine, 'checkout', lambda *args: metricas.registrar_checkout())
+    event.listen(engine, 'checkin', lambda *args: metricas.registrar_checkin())
+    event.listen(engine, 'invalidate', lambda *args: metricas.registrar_invalidacion())
+    event.listen(engine, 'handle_error', lambda contexto: _registrar_error(metricas, contexto))
+
+
+def _linea_metrica(nombre, tipo, ayuda, valor):
+    return f"# HELP {nombre} {ayuda}\n# TYPE {nombre} {tipo}\n{nombre} {valor}\n"
+
+
+def formato_prometheus(datos, prefijo='florezcook_bd'):
+    """Convierte el resumen de MetricasPool al formato de texto de Prometheus"""
+    metricas = [
+        ('conexiones_creadas_total', 'counter', 'Conexiones nuevas abiertas', datos['conexiones_creadas']),
+        ('checkouts_total', 'counter', 'Conexiones tomadas del pool', datos['checkouts']),
+        ('checkins_total', 'counter', 'Conexiones devueltas al pool', datos['checkins']),
+        ('en_uso', 'gauge', 'Conexiones en uso ahora', datos['en_uso']),
+        ('maximo_en_uso', 'gauge', 'Máximo de conexiones en uso a la vez', datos['maximo_en_uso']),
+        ('invalidadas_total', 'counter', 'Conexiones invalidadas', datos['invalidadas']),
+        ('fallos_pre_ping_total', 'counter', 'Conexiones muertas detectadas por el pre-ping', datos['fallos_pre_ping']),
+        ('espera_segundos_sum', 'counter', 'Tiempo total esperando una conexión', datos['espera_total_ms'] / 1000),
+        ('espera_segundos_count', 'counter', 'Veces que se pidió una conexión al pool', datos['esperas']),
+        ('espera_maxima_segundos', 'gauge', 'Mayor espera por una conexión', datos['espera_maxima_ms'] / 1000),
+        ('esperas_lentas_total', 'counter',
+         f'Esperas por una conexión de {ESPERA_LENTA_SEGUNDOS}s o más', datos['esperas_lentas']),
+        ('timeouts_total', 'counter', 'Peticiones de conexión que agotaron pool_timeout', datos['timeouts']),
+        ('peticiones_total', 'counter', 'Peticiones HTTP atendidas', datos['peticiones']),
+        ('peticiones_con_bd_total', 'counter', 'Peticiones HTTP que usaron la base de datos', datos['peticiones_con_bd']),
+    ]
+    pool = datos.get('pool', {})
+    for nombre, ayuda in (('size', 'Tamaño configurado del pool'),
+                          ('checkedout', 'Conexiones prestadas por el pool'),
+                          ('overflow', 'Conexiones de overflow abiertas'),
+                          ('checkedin', 'Conexiones libres en el pool')):
+        if nombre in pool:
+            metricas.append((f'pool_{nombre}', 'gauge', ayuda, pool[nombre]))
+    configuracion = datos.get('configuracion') or {}
+    if 'max_overflow' in configuracion:
+        metricas.append(('pool_max_overflow', 'gauge', 'Máximo de conexiones de overflow',
+                         configuracion['max_overflow']))
+    return ''.join(_linea_metrica(f'{prefijo}_{nombre}', tipo, ayuda, valor)
+                   for nombre, tipo, ayuda, valor in metricas)
@@ -0,0 +1,165 @@
+"""
+Motor de indicadores: carga una sola vez por request los hechos del período
+(pedidos, resumen diario de productos, catálogo y resumen de clientes) y
+registra el tiempo de cada consulta para poder compararlo con el esquema
+anterior.
+"""
+import time
+
+from sqlalchemy import func, case, and_, exists
+
+from models import Cliente, Producto, Pedido, PedidoProducto, ResumenDiarioProducto
+from utils.resumen_diario import asegurar_resumen_diario
+from utils.fechas import filtro_rango_fechas
+
+
+class MotorIndicadores:
+    """
+    Conjunto de datos compartido por todos los indicadores de un período.
+
+    Cada conjunto se consulta la primera vez que se usa y se reutiliza en
+    el resto de indicadores del mismo request.
+    """
+
+    def __init__(self, session, fecha_inicio, fecha_fin):
+        self.session = session
+        self.fecha_inicio = fecha_inicio
+        self.fecha_fin = fecha_fin
+        self.tiempos = []
+        self._datos = {}
+
+    def _filtro_periodo(self):
+        """Pedidos creados entre el día inicial y el día final (hora de Colombia), ambos completos"""
+        return and_(*filtro_rango_fechas(Pedido.fecha_creacion, self.fecha_inicio, self.fecha_fin))
+
+    def _cargar(self, nombre, consulta, *argumentos):
+        """
+        Ejecuta la consulta una sola vez por nombre y argumentos y registra su duración.
+
+        Los argumentos que cambian el resultado (límite, IDs) forman parte de
+        la clave: con otros argumentos la consulta se vuelve a ejecutar.
+        """
+        clave = (nombre, argumentos)
+        if clave not in self._datos:
+            inicio = time.perf_counter()
+            filas = consulta()
+            self.tiempos.append({
+                'consulta': nombre,
+                'ms': round((time.perf_counter() - inicio) * 1000, 2),
+                'filas': len(filas)
+            })
+            self._datos[clave] = filas
+        return self._datos[clave]
+
+    @property
+    def pedidos(self):
+        """Una fila por pedido del período con las columnas usadas por los indicadores"""
+        return self._cargar('pedidos', lambda: self.session.query(
+            Pedido.id,
+            Pedido.fecha_creacion,
+            Pedido.cliente_id,
+            Pedido.estado_pedido_general,
+            Pedido.despacho_tipo,
+            Pedido.despacho_horario_atencion,
+            Pedido.despacho_sede,
+            Pedido.departamento_entrega,
+            Pedido.ciudad_entrega,
+            case(
+                (and_(Pedido.observaciones_despacho.isnot(None), Pedido.observaciones_despacho != ''), 1),
+                else_=0
+            ).label('tiene_comentarios'),
+            exists().where(PedidoProducto.pedido_id == Pedido.id).label('tiene_items')
+        ).filter(self._filtro_periodo()).all())
+
+    @property
+    def resumen(self):
+        """Resumen diario del período por día, producto, estado del ítem y departamento"""
+        asegurar_resumen_diario()
+        return self._cargar('resumen', lambda: self.session.query(
+            ResumenDiarioProducto.fecha,
+            ResumenDiarioProducto.producto_id,
+            ResumenDiarioProducto.estado_item,
+            ResumenDiarioProducto.departamento,
+            func.sum(ResumenDiarioProducto.cantidad).label('cantidad'),
+            func.sum(ResumenDiarioProducto.peso_total_g).label('peso'),
+            func.sum(ResumenDiarioProducto.lineas).label('lineas')
+        ).filter(
+            ResumenDiarioProducto.fecha >= self.fecha_inicio,
+            ResumenDiarioProducto.fecha <= self.fecha_fin
+        ).group_by(
+            ResumenDiarioProducto.fecha,
+            ResumenDiarioProducto.producto_id,
+            ResumenDiarioProducto.estado_item,
+            ResumenDiarioProducto.departamento
+        ).all())
+
+    @property
+    def productos(self):
+        """Catálogo completo con las columnas necesarias para los indicadores"""
+        return self._cargar('productos', lambda: self.session.query(
+            Producto.id,
+            Producto.codigo,
+            Producto.referencia_de_producto,
+            Producto.formulacion_grupo,
+            Producto.categoria_linea,
+            Producto.gramaje_g,
+            Producto.estado
+        ).all())
+
+    @property
+    def clientes_resumen(self):
+        """Conteo de clientes por tipo de identificación y departamento, incluyendo nuevos"""
+        return self._cargar('clientes_resumen', lambda: self.session.query(
+            Cliente.tipo_identificacion,
+            Cliente.departamento,
+            func.count(Cliente.id).label('total'),
+            func.sum(case(
+                (and_(*filtro_rango_fechas(Cliente.fecha_creacion, self.fecha_inicio, self.fecha_fin)), 1),
+                else_=0
+            )).label('nuevos')
+        ).group_by(Cliente.tipo_identificacion, Cliente.departamento).all())
+
+    def top_clientes(self, limite=10):
+        """Clientes con más pedidos en el período y los productos que compraron"""
+        return self._cargar('top_clientes', lambda: self.session.query(
+            Cliente.nombre_comercial,
+            Cliente.numero_identificacion,
+            func.count(func.distinct(Pedido.id)).label('pedidos'),
+            func.sum(PedidoProducto.cantidad).label('productos')
+        ).join(
+            Pedido, Pedido.cliente_id == Cliente.id
+        ).join(
+            PedidoProducto, PedidoProducto.pedido_id == Pedido.id
+        ).filter(self._filtro_periodo()).group_by(
+            Cliente.id,
+            Cliente.nombre_comercial,
+            Cliente.numero_identificacion
+        ).order_by(func.count(func.distinct(Pedido.id)).desc()).limit(limite).all(), limite)
+
+    def pedidos_por_producto(self, ids):
+        """Número de pedidos distintos del período para un grupo acotado de productos"""
+        ids = tuple(sorted(set(ids)))
+        if not ids:
+            return {}
+        filas = self._cargar('pedidos_por_producto', lambda: self.session.query(
+            PedidoProducto.producto_id,
+            func.count(func.distinct(PedidoProducto.pedido_id)).label('pedidos')
+        ).join(
+            Pedido, PedidoProducto.pedido_id == Pedido.id
+        ).filter(
+            self._filtro_periodo(),
+            PedidoProducto.producto_id.in_(ids)
+        ).group_by(PedidoProducto.producto_id).all(), ids)
+        return {fila.producto_id: fila.pedidos for fila in filas}
+
+    @property
+    def total_consultas(self):
+        return len(self.tiempos)
+
+    @property
+    def total_ms(self):
+        return round(sum(t['ms'] for t in self.tiempos), 2)
+
+    def server_timing(self):
+        """Valor para la cabecera Server-Timing con el detalle de cada consulta"""
+        return ', '.join(f"{t['consulta']};dur={t['ms']}" for t in self.tiempos)
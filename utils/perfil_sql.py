@@ -0,0 +1,205 @@
+"""
+Perfil de SQL por petición (opcional, PERFIL_SQL=1).
+
+Cuenta las consultas de cada petición HTTP, el tiempo de ejecución de sus
+sentencias (cursor.execute) y las filas leídas, y marca como N+1 las
+sentencias idénticas que se repiten con parámetros distintos (p. ej. cargar
+la relación de cada fila de un listado por separado). El resultado se agrega a la respuesta:
+
+    Server-Timing: sql;dur=12.3;desc="18 consultas, 240 filas"
+    X-SQL-Consultas: 18
+    X-SQL-N-Mas-1: 1
+
+y se guarda en un historial circular que muestra /debug/perfil-sql.
+
+Con PERFIL_SQL desactivado no se registra ningún evento ni hook, así que no
+agrega costo a las peticiones.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from flask import g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+PERFIL_SQL_ACTIVO = os.getenv('PERFIL_SQL', '0') == '1'
+# Repeticiones de una misma sentencia con parámetros distintos para considerarla N+1
+UMBRAL_N_MAS_1 = int(os.getenv('PERFIL_SQL_UMBRAL_N_MAS_1', 5))
+# Peticiones que guarda el historial de /debug/perfil-sql
+TAMANO_HISTORIAL = int(os.getenv('PERFIL_SQL_HISTORIAL', 200))
+# Largo máximo de la sentencia guardada en el historial
+LARGO_SENTENCIA = 300
+
+_historial = deque(maxlen=TAMANO_HISTORIAL)
+_lock_historial = threading.Lock()
+_eventos_registrados = False
+
+
+class PerfilPeticion:
+    """Consultas ejecutadas durante una petición"""
+
+    __slots__ = ('consultas', 'segundos', 'filas', 'sentencias', 'inicio')
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+        self.filas = 0
+        # sentencia -> [repeticiones, segundos, parámetros distintos]
+        self.sentencias = {}
+        self.inicio = time.perf_counter()
+
+    def registrar(self, sentencia, parametros, segundos):
+        self.consultas += 1
+        self.segundos += segundos
+        datos = self.sentencias.get(sentencia)
+        if datos is None:
+            datos = self.sentencias[sentencia] = [0, 0.0, set()]
+        datos[0] += 1
+        datos[1] += segundos
+        try:
+            datos[2].add(repr(parametros))
+        except Exception:
+            pass
+
+    def n_mas_1(self):
+        """Sentencias repetidas con parámetros distintos al menos UMBRAL_N_MAS_1 veces"""
+        return sorted((
+            {
+                'sentencia': ' '.join(sentencia.split())[:LARGO_SENTENCIA],
+                'repeticiones': repeticiones,
+                'ms': round(segundos * 1000, 2),
+            }
+            for sentencia, (repeticiones, segundos, parametros) in self.sentencias.items()
+            if repeticiones >= UMBRAL_N_MAS_1 and len(parametros) > 1
+        ), key=lambda s: -s['repeticiones'])
+
+
+class _CursorContador:
+    """Envuelve el cursor DBAPI de un SELECT para contar las filas que se leen"""
+
+    __slots__ = ('_cursor', '_perfil')
+
+    def __init__(self, cursor, perfil):
+        self._cursor = cursor
+        self._perfil = perfil
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        if fila is not None:
+            self._perfil.filas += 1
+        return fila
+
+    def fetchmany(self, *args, **kwargs):
+        filas = self._cursor.fetchmany(*args, **kwargs)
+        self._perfil.filas += len(filas)
+        return filas
+
+    def fetchall(self):
+        filas = self._cursor.fetchall()
+        self._perfil.filas += len(filas)
+        return filas
+
+    def __iter__(self):
+        for fila in self._cursor:
+            self._perfil.filas += 1
+            yield fila
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+
+def _perfil_actual():
+    return g.get('_perfil_sql') if has_request_context() else None
+
+
+def _antes_de_ejecutar(conn, cursor, sentencia, parametros, contexto, executemany):
+    if _perfil_actual() is not None:
+        conn.info.setdefault('_perfil_sql_inicio', []).append(time.perf_counter())
+
+
+def _despues_de_ejecutar(conn, cursor, sentencia, parametros, contexto, executemany):
+    perfil = _perfil_actual()
+    inicios = conn.info.get('_perfil_sql_inicio')
+    if perfil is None or not inicios:
+        return
+    perfil.registrar(sentencia, parametros, time.perf_counter() - inicios.pop())
+    # Solo los SELECT devuelven filas; el resultado se arma después de este evento
+    if contexto is not None and cursor.description is not None:
+        contexto.cursor = _CursorContador(cursor, perfil)
+
+
+def _iniciar_perfil():
+    g._perfil_sql = PerfilPeticion()
+
+
+def _agregar_perfil(response):
+    perfil = g.pop('_perfil_sql', None)
+    if perfil is None or request.endpoint == 'perfil_sql':
+        return response
+
+    ms = round(perfil.segundos * 1000, 2)
+    n_mas_1 = perfil.n_mas_1()
+    metrica = f'sql;dur={ms};desc="{perfil.consultas} consultas, {perfil.filas} filas"'
+    existente = response.headers.get('Server-Timing')
+    response.headers['Server-Timing'] = f'{existente}, {metrica}' if existente else metrica
+    response.headers['X-SQL-Consultas'] = str(perfil.consultas)
+    response.headers['X-SQL-N-Mas-1'] = str(len(n_mas_1))
+
+    if n_mas_1:
+        logger.warning(f"Posible N+1 en {request.method} {request.path}: "
+                       f"{n_mas_1[0]['repeticiones']}× {n_mas_1[0]['sentencia'][:120]}")
+
+    with _lock_historial:
+        _historial.append({
+            'fecha': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'metodo': request.method,
+            'ruta': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'estado': response.status_code,
+            'duracion_ms': round((time.perf_counter() - perfil.inicio) * 1000, 2),
+            'consultas': perfil.consultas,
+            'sql_ms': ms,
+            'filas': perfil.filas,
+            'n_mas_1': n_mas_1,
+        })
+    return response
+
+
+def _ver_historial():
+    """Últimas peticiones perfiladas (la más reciente primero); ?n_mas_1=1 filtra las sospechosas"""
+    with _lock_historial:
+        entradas = list(reversed(_historial))
+    if request.args.get('n_mas_1'):
+        entradas = [e for e in entradas if e['n_mas_1']]
+    limite = request.args.get('limite', type=int)
+    if limite:
+        entradas = entradas[:limite]
+    return jsonify({'activo': True, 'umbral_n_mas_1': UMBRAL_N_MAS_1,
+                    'capacidad': TAMANO_HISTORIAL, 'peticiones': entradas})
+
+
+def instalar_perfil_sql(app):
+    """
+    Instala el perfil de SQL en la aplicación si PERFIL_SQL=1.
+
+    Los eventos se registran a nivel de Engine (una sola vez por proceso) para
+    no forzar la creación del engine en el arranque rápido.
+    """
+    global _eventos_registrados
+    if not PERFIL_SQL_ACTIVO:
+        return False
+
+    if not _eventos_registrados:
+        event.listen(Engine, 'before_cursor_execute', _antes_de_ejecutar)
+        event.listen(Engine, 'after_cursor_execute', _despues_de_ejecutar)
+        _eventos_registrados = True
+
+    app.before_request(_iniciar_perfil)
+    app.after_request(_agregar_perfil)
+    app.add_url_rule('/debug/perfil-sql', 'perfil_sql', _ver_historial)
+    return True
@@ -0,0 +1,315 @@
+"""
+Plan de producción materializado por día de entrega.
+
+La tabla plan_produccion acumula cantidad, peso y número de líneas por día
+de entrega del ítem (fecha_de_entrega_item), producto y presentación, solo
+de los pedidos que no están cancelados. Igual que el resumen diario (ver
+utils.resumen_diario), las escrituras de pedidos aplican la diferencia de su
+aporte dentro de la misma transacción: crear, editar, cancelar o eliminar un
+pedido toca únicamente las filas de sus días de entrega.
+
+La clave única empieza por la fecha de entrega, de modo que consultar una
+ventana de días lee un rango del índice: el costo depende de los días y
+productos de la ventana, no del histórico de pedidos.
+"""
+import logging
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy import delete, func, insert, select
+
+from models import Pedido, PedidoProducto, PlanProduccion, Producto
+from utils.fechas import hoy_colombia, leer_fecha
+from utils.resumen_diario import COLUMNAS_MEDIDA, LARGO_PRESENTACION, filas_diferencia, sumar_filas
+from utils.versiones import construir_una_vez
+
+logger = logging.getLogger(__name__)
+
+# Columnas que identifican una fila del plan
+COLUMNAS_CLAVE_PLAN = ('fecha_entrega', 'producto_id', 'presentacion')
+
+# Estados de pedido que no se producen
+ESTADOS_FUERA_DEL_PLAN = ('Cancelado',)
+
+# Ventana por defecto y máxima de las consultas del plan (en días)
+DIAS_PLAN = 7
+MAXIMO_DIAS_PLAN = 92
+
+
+def en_plan(pedido):
+    """Indica si los ítems del pedido cuentan en el plan de producción"""
+    return pedido.estado_pedido_general not in ESTADOS_FUERA_DEL_PLAN
+
+
+def aportes_plan(pedido, items=None):
+    """
+    Calcula el aporte de un pedido al plan de producción.
+
+    Args:
+        pedido: Pedido (o cabecera con estado_pedido_general).
+        items: Ítems a considerar; por defecto los de la relación pedido.items.
+
+    Returns:
+        dict: {(fecha_entrega, producto_id, presentacion): [cantidad, peso_total_g, lineas]}
+    """
+    if not en_plan(pedido):
+        return {}
+    aportes = defaultdict(lambda: [0, 0.0, 0])
+    for item in (pedido.items if items is None else items):
+        # Sin producto o sin fecha de entrega el ítem no se puede programar
+        if item.producto_id is None or item.fecha_de_entrega_item is None:
+            continue
+        clave = (item.fecha_de_entrega_item, item.producto_id,
+                 (item.comentarios_item or '')[:LARGO_PRESENTACION])
+        aporte = aportes[clave]
+        aporte[0] += item.cantidad or 0
+        aporte[1] += item.peso_total_g_item or 0
+        aporte[2] += 1
+    return dict(aportes)
+
+
+def registrar_cambio_plan(db, antes=None, despues=None):
+    """
+    Aplica al plan la diferencia entre el aporte anterior y el nuevo de un pedido.
+
+    Se ejecuta en la transacción de la sesión recibida y acompaña siempre a
+    utils.resumen_diario.registrar_cambio_pedido(), que es quien incrementa la
+    versión de la tabla de pedidos.
+
+    Args:
+        db: Sesión de SQLAlchemy.
+        antes: Aporte del pedido antes del cambio (vacío si es nuevo).
+        despues: Aporte del pedido después del cambio (vacío si se canceló o eliminó).
+    """
+    filas = filas_diferencia(antes, despues, COLUMNAS_CLAVE_PLAN)
+    if not filas:
+        return
+
+    sumar_filas(db, PlanProduccion, COLUMNAS_CLAVE_PLAN, filas)
+
+    # Las claves que se quedaron sin líneas se retiran
+    db.execute(delete(PlanProduccion).where(
+        PlanProduccion.fecha_entrega.in_({fila['fecha_entrega'] for fila in filas}),
+        PlanProduccion.lineas <= 0
+    ))
+
+
+def _consulta_plan(desde=None, hasta=None, pedido_ids=None, incluir_fuera=False):
+    """SELECT agrupado que produce el plan a partir de pedido_productos"""
+    consulta = select(
+        PedidoProducto.fecha_de_entrega_item,
+        PedidoProducto.producto_id,
+        func.coalesce(func.substr(PedidoProducto.comentarios_item, 1, LARGO_PRESENTACION), ''),
+        func.coalesce(func.sum(PedidoProducto.cantidad), 0),
+        func.coalesce(func.sum(PedidoProducto.peso_total_g_item), 0),
+        func.count(PedidoProducto.id)
+    ).join(
+        Pedido, PedidoProducto.pedido_id == Pedido.id
+    ).where(
+        PedidoProducto.producto_id.isnot(None),
+        PedidoProducto.fecha_de_entrega_item.isnot(None)
+    )
+    if not incluir_fuera:
+        # Los pedidos sin estado cuentan (en_plan() también los incluye)
+        consulta = consulta.where(func.coalesce(Pedido.estado_pedido_general, '').notin_(ESTADOS_FUERA_DEL_PLAN))
+    if desde:
+        consulta = consulta.where(PedidoProducto.fecha_de_entrega_item >= desde)
+    if hasta:
+        consulta = consulta.where(PedidoProducto.fecha_de_entrega_item <= hasta)
+    if pedido_ids is not None:
+        consulta = consulta.where(PedidoProducto.pedido_id.in_(pedido_ids))
+    return consulta.group_by(*list(consulta.selected_columns)[:len(COLUMNAS_CLAVE_PLAN)])
+
+
+def aportes_plan_pedidos(db, pedido_ids, incluir_fuera=False):
+    """
+    Aporte conjunto de varios pedidos al plan, agregado en la base de datos.
+
+    Args:
+        db: Sesión de SQLAlchemy.
+        pedido_ids: IDs de los pedidos.
+        incluir_fuera: True para contar también los pedidos en ESTADOS_FUERA_DEL_PLAN
+            (su aporte si pasan a un estado que sí se produce).
+
+    Returns:
+        dict: {(fecha_entrega, producto_id, presentacion): [cantidad, peso_total_g, lineas]}
+    """
+    if not pedido_ids:
+        return {}
+    aportes = {}
+    consulta = _consulta_plan(pedido_ids=pedido_ids, incluir_fuera=incluir_fuera)
+    for fecha, producto_id, presentacion, cantidad, peso, lineas in db.execute(consulta):
+        # SQLite puede devolver la fecha como texto
+        if isinstance(fecha, str):
+            fecha = date.fromisoformat(fecha)
+        aportes[(fecha, producto_id, presentacion)] = [cantidad, float(peso), lineas]
+    return aportes
+
+
+def reconstruir_plan_produccion(db, desde=None, hasta=None):
+    """
+    Recalcula el plan desde los ítems de pedido, completo o para un rango de días de entrega.
+
+    No confirma la transacción: el llamador decide cuándo hacer commit.
+
+    Returns:
+        int: Número de filas del plan en el rango reconstruido.
+    """
+    tabla = PlanProduccion.__table__
+    borrar = delete(tabla)
+    if desde:
+        borrar = borrar.where(tabla.c.fecha_entrega >= desde)
+    if hasta:
+        borrar = borrar.where(tabla.c.fecha_entrega <= hasta)
+    db.execute(borrar)
+
+    resultado = db.execute(insert(tabla).from_select(
+        list(COLUMNAS_CLAVE_PLAN + COLUMNAS_MEDIDA), _consulta_plan(desde, hasta)
+    ))
+    return resultado.rowcount
+
+
+# Fila de versiones_tablas que indica que el plan ya se construyó desde los pedidos
+MARCA_CONSTRUIDO = 'construido:plan_produccion'
+
+# Se verifica una sola vez por proceso que el plan ya fue construido
+_plan_verificado = False
+_plan_lock = threading.Lock()
+
+
+def construir_plan_produccion(engine):
+    """
+    Reconstruye el plan completo si todavía no está marcado como construido.
+
+    Lo ejecuta la migración (config.migraciones.verificar_esquema), igual que
+    utils.resumen_diario.construir_resumen_diario().
+
+    Returns:
+        int con las filas construidas, o None si ya estaba construido.
+    """
+    return construir_una_vez(engine, MARCA_CONSTRUIDO, reconstruir_plan_produccion)
+
+
+def asegurar_plan_produccion():
+    """Construye el plan si la migración todavía no lo hizo (una verificación por proceso)"""
+    global _plan_verificado
+    if _plan_verificado:
+        return
+    with _plan_lock:
+        if _plan_verificado:
+            return
+        from config.database import db_config
+        try:
+            filas = construir_plan_produccion(db_config.engine)
+        except Exception as e:
+            # Otro proceso pudo construirlo al mismo tiempo; se verifica de nuevo en la próxima lectura
+            logger.warning(f"No se pudo construir el plan de producción: {e}")
+            return
+        if filas is not None:
+            logger.info(f"Plan de producción construido: {filas} filas")
+        _plan_verificado = True
+
+
+def ventana_plan(desde=None, hasta=None):
+    """
+    Normaliza la ventana de días de entrega pedida.
+
+    Por defecto va de hoy (en Colombia) a DIAS_PLAN - 1 días después; si solo
+    llega una de las fechas la otra se completa con el mismo largo.
+
+    Returns:
+        tuple: (desde, hasta) como date.
+
+    Raises:
+        ValueError: Si una fecha no es válida, el rango está invertido o supera MAXIMO_DIAS_PLAN.
+    """
+    desde, hasta = leer_fecha(desde), leer_fecha(hasta)
+    if desde is None:
+        desde = hoy_colombia() if hasta is None else hasta - timedelta(days=DIAS_PLAN - 1)
+    if hasta is None:
+        hasta = desde + timedelta(days=DIAS_PLAN - 1)
+    if hasta < desde:
+        raise ValueError('La fecha final es anterior a la inicial')
+    if (hasta - desde).days + 1 > MAXIMO_DIAS_PLAN:
+        raise ValueError(f'La ventana no puede superar {MAXIMO_DIAS_PLAN} días')
+    return desde, hasta
+
+
+def consulta_plan(desde, hasta):
+    """
+    Consulta del plan para los días de entrega entre desde y hasta (inclusive).
+
+    Lee el rango del índice por fecha de entrega y une cada fila con su
+    producto por clave primaria.
+    """
+    return select(
+        PlanProduccion.fecha_entrega, PlanProduccion.producto_id,
+        Producto.codigo, Producto.referencia_de_producto,
+        Producto.formulacion_grupo, Producto.categoria_linea,
+        PlanProduccion.presentacion, PlanProduccion.cantidad,
+        PlanProduccion.peso_total_g, PlanProduccion.lineas
+    ).join(
+        Producto, PlanProduccion.producto_id == Producto.id
+    ).where(
+        PlanProduccion.fecha_entrega >= desde,
+        PlanProduccion.fecha_entrega <= hasta
+    ).order_by(
+        PlanProduccion.fecha_entrega, Producto.formulacion_grupo,
+        Producto.referencia_de_producto, PlanProduccion.presentacion
+    )
+
+
+def consultar_plan(db, desde, hasta):
+    """
+    Filas del plan para los días de entrega entre desde y hasta (inclusive).
+
+    Returns:
+        list: Rows con fecha_entrega, producto_id, codigo, referencia_de_producto,
+            formulacion_grupo, categoria_linea, presentacion, cantidad, peso_total_g y lineas,
+            ordenadas por día, grupo, referencia y presentación.
+    """
+    asegurar_plan_produccion()
+    return db.execute(consulta_plan(desde, hasta)).all()
+
+
+def totales_plan(filas):
+    """
+    Agrupa las filas de consultar_plan() por día y suma el período por producto y presentación.
+
+    Returns:
+        dict: {'dias': [{'fecha', 'cantidad', 'peso_total_g', 'productos': [dict]}],
+               'productos': [dict] con los totales del período}
+    """
+    dias, periodo = {}, {}
+    for fila in filas:
+        producto = {
+            'producto_id': fila.producto_id,
+            'codigo': fila.codigo,
+            'referencia_de_producto': fila.referencia_de_producto,
+            'formulacion_grupo': fila.formulacion_grupo or '',
+            'categoria_linea': fila.categoria_linea or '',
+            'presentacion': fila.presentacion,
+            'cantidad': fila.cantidad,
+            'peso_total_g': round(fila.peso_total_g, 2),
+            'lineas': fila.lineas,
+        }
+        fecha = fila.fecha_entrega.isoformat() if isinstance(fila.fecha_entrega, date) else fila.fecha_entrega
+        dia = dias.setdefault(fecha, {'fecha': fecha, 'cantidad': 0, 'peso_total_g': 0.0, 'productos': []})
+        dia['productos'].append(producto)
+        dia['cantidad'] += fila.cantidad
+        dia['peso_total_g'] += fila.peso_total_g
+
+        total = periodo.setdefault((fila.producto_id, fila.presentacion), dict(producto, cantidad=0,
+                                                                              peso_total_g=0.0, lineas=0))
+        total['cantidad'] += fila.cantidad
+        total['peso_total_g'] += fila.peso_total_g
+        total['lineas'] += fila.lineas
+
+    for dia in dias.values():
+        dia['peso_total_g'] = round(dia['peso_total_g'], 2)
+    productos = sorted(periodo.values(), key=lambda p: (p['formulacion_grupo'], p['referencia_de_producto'] or '',
+                                                         p['presentacion']))
+    for producto in productos:
+        producto['peso_total_g'] = round(producto['peso_total_g'], 2)
+    return {'dias': list(dias.values()), 'productos': productos}
@@ -0,0 +1,209 @@
+"""
+Consultas del reporte de pedidos y de su exportación a Excel.
+
+Las rutas y `gestionar_bd.py explicar-consultas` (y sus pruebas) usan las
+mismas funciones, de modo que el plan de ejecución revisado es el de las
+consultas que de verdad se ejecutan.
+
+El Excel agrupa los pedidos por nombre de cliente. Ordenar todos los pedidos
+por ese nombre (una expresión sobre dos tablas) no lo resuelve ningún índice:
+cada lote por cursor volvería a ordenar todos los pedidos filtrados. En su
+lugar, los nombres de los clientes se ordenan una sola vez con una consulta
+agrupada y los pedidos se leen por cliente: los clientes con pocos pedidos se
+juntan en lotes que se ordenan en memoria y los que tienen más de un lote se
+recorren por cursor sobre (fecha_creacion, id), que sirve el índice
+(cliente_id, fecha_creacion).
+"""
+from collections import namedtuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+
+from models import Cliente, Pedido, PedidoProducto
+from utils.consultas import filtro_keyset, iterar_por_lotes, ordenar_keyset
+from utils.fechas import filtro_rango_fechas, leer_fecha
+
+# Orden del reporte de pedidos: más recientes primero, id como desempate
+ORDEN_REPORTE_PEDIDOS = [(Pedido.fecha_creacion, True), (Pedido.id, True)]
+POR_PAGINA_REPORTE_PEDIDOS = 20
+
+# Tamaño de lote para leer pedidos durante la exportación
+LOTE_EXPORTACION_PEDIDOS = 200
+
+# Cliente del Excel: nombre del grupo, clientes registrados con ese nombre,
+# si incluye pedidos sin cliente registrado y cantidad de pedidos
+GrupoCliente = namedtuple('GrupoCliente', 'nombre cliente_ids sin_registro pedidos')
+
+
+def consulta_pedidos_filtrada(db, filtros):
+    """
+    Pedidos con los filtros del reporte.
+
+    Los pedidos sin fecha de creación (datos antiguos) no se incluyen: el
+    reporte y la exportación se recorren por cursor sobre (fecha_creacion, id)
+    y un NULL no se puede comparar ni ordenar junto con las fechas.
+
+    Args:
+        db: Sesión de SQLAlchemy.
+        filtros: dict con fecha_desde, fecha_hasta (AAAA-MM-DD, día de creación
+            en hora de Colombia), estado y cliente_id ('todos' no filtra).
+
+    Returns:
+        tuple: (query, errores) donde errores lista los filtros no válidos, que se ignoran.
+    """
+    query = db.query(Pedido).filter(Pedido.fecha_creacion.isnot(None))
+    errores = []
+    for campo, limite, error in (('fecha_desde', 'desde', 'Fecha desde inválida'),
+                                 ('fecha_hasta', 'hasta', 'Fecha hasta inválida')):
+        try:
+            fecha = leer_fecha(filtros.get(campo))
+            if fecha:
+                query = query.filter(*filtro_rango_fechas(Pedido.fecha_creacion, **{limite: fecha}))
+        except ValueError:
+            errores.append(error)
+
+    if filtros.get('estado'):
+        query = query.filter(Pedido.estado_pedido_general == filtros['estado'])
+
+    cliente_id = filtros.get('cliente_id')
+    if cliente_id and cliente_id != 'todos':
+        try:
+            query = query.filter(Pedido.cliente_id == int(cliente_id))
+        except ValueError:
+            errores.append('ID de cliente inválido')
+    return query, errores
+
+
+def consulta_pagina_pedidos(query, limite, cursor=None, hacia_atras=False):
+    """
+    Página del reporte por cursor: WHERE (fecha_creacion, id) < cursor en lugar de OFFSET.
+
+    Args:
+        query: Resultado de consulta_pedidos_filtrada().
+        limite: Filas a leer.
+        cursor: Valores (fecha_creacion, id) del borde de la página actual.
+        hacia_atras: Lee la página anterior, en orden inverso (hay que invertir el resultado).
+    """
+    orden = ORDEN_REPORTE_PEDIDOS
+    if hacia_atras:
+        orden = [(columna, not descendente) for columna, descendente in orden]
+    if cursor is not None:
+        query = query.filter(filtro_keyset(orden, cursor))
+    query = query.options(joinedload(Pedido.cliente_asociado), selectinload(Pedido.items))
+    return ordenar_keyset(query, orden).limit(limite)
+
+
+def clave_cliente_exportacion():
+    """Nombre con el que se agrupan los pedidos en el Excel (igual criterio que la vista)"""
+    return func.coalesce(
+        Cliente.nombre_comercial,
+        func.nullif(Pedido.nombre_cliente_ingresado, ''),
+        'Cliente no registrado'
+    )
+
+
+def _pedidos_exportables(query):
+    """Pedidos con al menos un producto, unidos a su cliente"""
+    return query.outerjoin(
+        Cliente, Pedido.cliente_id == Cliente.id
+    ).filter(
+        # Solo pedidos con al menos un producto (antes: join + distinct)
+        Pedido.items.any(PedidoProducto.producto_id.isnot(None))
+    )
+
+
+def consulta_clientes_exportacion(query):
+    """Nombre, cliente_id y cantidad de pedidos del Excel, agrupados y en orden de nombre"""
+    clave = clave_cliente_exportacion()
+    return _pedidos_exportables(query).with_entities(
+        clave.label('nombre'), Pedido.cliente_id, func.count(Pedido.id)
+    ).group_by(clave, Pedido.cliente_id).order_by(clave)
+
+
+def clientes_exportacion(query):
+    """
+    Clientes del Excel en orden de nombre, con una sola consulta agrupada.
+
+    Args:
+        query: Consulta de Pedido con los filtros ya aplicados.
+
+    Returns:
+        list[GrupoCliente] ordenada como la base de datos ordena los nombres.
+    """
+    grupos = {}
+    for nombre, cliente_id, pedidos in consulta_clientes_exportacion(query):
+        cliente_ids, sin_registro, total = grupos.get(nombre, ((), False, 0))
+        if cliente_id is None:
+            sin_registro = True
+        else:
+            cliente_ids += (cliente_id,)
+        grupos[nombre] = (cliente_ids, sin_registro, total + pedidos)
+    return [GrupoCliente(nombre, *datos) for nombre, datos in grupos.items()]
+
+
+def _filtro_grupos(grupos):
+    """Pedidos de uno o varios grupos: por nombre y por cliente_id (que usa el índice)"""
+    cliente_ids = [cliente_id for grupo in grupos for cliente_id in grupo.cliente_ids]
+    miembros = [Pedido.cliente_id.in_(cliente_ids)] if cliente_ids else []
+    if any(grupo.sin_registro for grupo in grupos):
+        miembros.append(Pedido.cliente_id.is_(None))
+    return and_(clave_cliente_exportacion().in_([grupo.nombre for grupo in grupos]), or_(*miembros))
+
+
+def consulta_pedidos_exportacion(query, grupos):
+    """Pedidos de los grupos indicados con cliente, ítems y productos precargados (sin orden)"""
+    return _pedidos_exportables(query).options(
+        contains_eager(Pedido.cliente_asociado),
+        selectinload(Pedido.items).joinedload(PedidoProducto.producto_asociado)
+    ).add_columns(clave_cliente_exportacion().label('cliente_nombre')).filter(_filtro_grupos(grupos))
+
+
+def iterar_pedidos_exportacion(query, grupos, tamano_lote=LOTE_EXPORTACION_PEDIDOS, session=None):
+    """
+    Recorre los pedidos del Excel en lotes, agrupados por cliente.
+
+    Dentro de cada cliente los pedidos van del más reciente al más antiguo.
+    Ningún lote tiene más de tamano_lote pedidos, así que la memoria usada no
+    depende de la cantidad exportada.
+
+    Args:
+        query: Consulta de Pedido con los filtros ya aplicados.
+        grupos: Resultado de clientes_exportacion() para la misma consulta.
+        tamano_lote: Pedidos por consulta.
+        session: Si se indica, se liberan los objetos del lote anterior.
+
+    Yields:
+        list: Filas (pedido, cliente_nombre) con ítems y productos precargados.
+    """
+    def leer_juntos(pendientes):
+        posicion = {grupo.nombre: i for i, grupo in enumerate(pendientes)}
+        lote = consulta_pedidos_exportacion(query, pendientes).all()
+        # Más recientes primero y luego, sin perder ese orden, por cliente
+        lote.sort(key=lambda fila: (fila[0].fecha_creacion, fila[0].id), reverse=True)
+        lote.sort(key=lambda fila: posicion[fila.cliente_nombre])
+        return lote
+
+    def lotes():
+        pendientes = []
+        en_pendientes = 0
+        for grupo in grupos:
+            if pendientes and en_pendientes + grupo.pedidos > tamano_lote:
+                yield leer_juntos(pendientes)
+                pendientes, en_pendientes = [], 0
+            if grupo.pedidos <= tamano_lote:
+                pendientes.append(grupo)
+                en_pendientes += grupo.pedidos
+                continue
+            # Cliente con más de un lote: se recorre solo, por cursor
+            yield from iterar_por_lotes(
+                consulta_pedidos_exportacion(query, [grupo]), ORDEN_REPORTE_PEDIDOS,
+                clave_fila=lambda fila: (fila[0].fecha_creacion, fila[0].id),
+                tamano_lote=tamano_lote
+            )
+        if pendientes:
+            yield leer_juntos(pendientes)
+
+    for lote in lotes():
+        yield lote
+        if session is not None:
+            session.expunge_all()
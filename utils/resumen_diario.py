@@ -0,0 +1,287 @@
+"""
+Resumen diario materializado de los ítems de pedido.
+
+La tabla resumen_diario_productos acumula cantidad, peso y número de líneas
+por día de creación del pedido (en hora de Colombia), producto, presentación, estado del pedido,
+estado del ítem y departamento de entrega. Las escrituras de pedidos aplican
+la diferencia de su aporte dentro de la misma transacción, de modo que los
+reportes agregan filas por día en lugar de recorrer todos los ítems.
+"""
+import logging
+import threading
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import func, select, insert, delete, and_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import Pedido, PedidoProducto, ResumenDiarioProducto
+from utils.fechas import dia_colombia, expresion_dia_colombia, filtro_rango_fechas
+from utils.versiones import construir_una_vez, incrementar_version
+
+logger = logging.getLogger(__name__)
+
+# Columnas que identifican una fila del resumen
+COLUMNAS_CLAVE = ('fecha', 'producto_id', 'presentacion', 'estado_pedido', 'estado_item', 'departamento')
+COLUMNAS_MEDIDA = ('cantidad', 'peso_total_g', 'lineas')
+
+# Largo de las columnas de texto de la clave
+LARGO_PRESENTACION = 150
+LARGO_ESTADO = 50
+LARGO_DEPARTAMENTO = 100
+
+
+def _texto(valor, largo):
+    """Normaliza un texto de la clave: sin nulos y recortado al largo de la columna"""
+    return (valor or '')[:largo]
+
+
+def clave_item(pedido, item):
+    """Clave del resumen a la que aporta un ítem de pedido"""
+    return (
+        dia_colombia(pedido.fecha_creacion),
+        item.producto_id,
+        _texto(item.comentarios_item, LARGO_PRESENTACION),
+        _texto(pedido.estado_pedido_general, LARGO_ESTADO),
+        _texto(item.estado_del_pedido_item, LARGO_ESTADO),
+        _texto(pedido.departamento_entrega, LARGO_DEPARTAMENTO)
+    )
+
+
+def aportes_pedido(pedido, items=None):
+    """
+    Calcula el aporte de un pedido al resumen.
+
+    Args:
+        pedido: Pedido con fecha de creación asignada.
+        items: Ítems a considerar; por defecto los de la relación pedido.items.
+
+    Returns:
+        dict: {clave: [cantidad, peso_total_g, lineas]}
+    """
+    aportes = defaultdict(lambda: [0, 0.0, 0])
+    if pedido.fecha_creacion is None:
+        return {}
+    for item in (pedido.items if items is None else items):
+        # Los ítems sin producto no aparecen en ningún reporte por producto
+        if item.producto_id is None:
+            continue
+        aporte = aportes[clave_item(pedido, item)]
+        aporte[0] += item.cantidad or 0
+        aporte[1] += item.peso_total_g_item or 0
+        aporte[2] += 1
+    return dict(aportes)
+
+
+def registrar_cambio_pedido(db, antes=None, despues=None):
+    """
+    Aplica al resumen la diferencia entre el aporte anterior y el nuevo de un pedido.
+
+    Se ejecuta en la transacción de la sesión recibida: el resumen se confirma
+    o se revierte junto con el pedido. También incrementa la versión de la
+    tabla de pedidos, que invalida las respuestas cacheadas que dependen de ella.
+
+    Args:
+        db: Sesión de SQLAlchemy.
+        antes: Aporte del pedido antes del cambio (vacío si es nuevo).
+        despues: Aporte del pedido después del cambio (vacío si se eliminó).
+    """
+    incrementar_version(db, 'pedidos')
+
+    filas = filas_diferencia(antes, despues, COLUMNAS_CLAVE)
+    if not filas:
+        return
+
+    sumar_filas(db, ResumenDiarioProducto, COLUMNAS_CLAVE, filas)
+
+    # Las claves que se quedaron sin líneas se retiran
+    db.execute(delete(ResumenDiarioProducto).where(
+        ResumenDiarioProducto.fecha.in_({fila['fecha'] for fila in filas}),
+        ResumenDiarioProducto.lineas <= 0
+    ))
+
+
+def filas_diferencia(antes, despues, columnas_clave):
+    """
+    Filas con la diferencia (despues - antes) de dos aportes, sin las claves que no cambian.
+
+    Returns:
+        list: dicts con las columnas de la clave y de COLUMNAS_MEDIDA.
+    """
+    deltas = {}
+    for signo, aportes in ((-1, antes or {}), (1, despues or {})):
+        for clave, valores in aportes.items():
+            delta = deltas.setdefault(clave, [0, 0.0, 0])
+            for i, valor in enumerate(valores):
+                delta[i] += signo * valor
+
+    return [
+        dict(zip(tuple(columnas_clave) + COLUMNAS_MEDIDA, clave + tuple(delta)))
+        for clave, delta in deltas.items() if delta[0] or delta[2] or abs(delta[1]) > 1e-9
+    ]
+
+
+def sumar_filas(db, modelo, columnas_clave, filas):
+    """Suma las medidas de cada fila a su clave en la tabla del modelo, creándola si no existe"""
+    tabla = modelo.__table__
+    dialecto = db.get_bind().dialect.name
+
+    if dialecto == 'mysql':
+        stmt = mysql_insert(tabla)
+        stmt = stmt.on_duplicate_key_update(
+            {col: tabla.c[col] + stmt.inserted[col] for col in COLUMNAS_MEDIDA}
+        )
+        db.execute(stmt, filas)
+    elif dialecto == 'sqlite':
+        stmt = sqlite_insert(tabla)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(columnas_clave),
+            set_={col: tabla.c[col] + stmt.excluded[col] for col in COLUMNAS_MEDIDA}
+        )
+        db.execute(stmt, filas)
+    else:
+        for fila in filas:
+            condicion = and_(*[tabla.c[col] == fila[col] for col in columnas_clave])
+            resultado = db.execute(
+                tabla.update().where(condicion).values(
+                    {col: tabla.c[col] + fila[col] for col in COLUMNAS_MEDIDA}
+                )
+            )
+            if resultado.rowcount == 0:
+                db.execute(insert(tabla).values(**fila))
+
+
+def _consulta_reconstruccion(dialecto, desde=None, hasta=None, pedido_ids=None):
+    """SELECT agrupado que produce el resumen a partir de pedido_productos"""
+    dia = expresion_dia_colombia(Pedido.fecha_creacion, dialecto)
+    consulta = select(
+        dia,
+        PedidoProducto.producto_id,
+        func.coalesce(func.substr(PedidoProducto.comentarios_item, 1, LARGO_PRESENTACION), ''),
+        func.coalesce(Pedido.estado_pedido_general, ''),
+        func.coalesce(PedidoProducto.estado_del_pedido_item, ''),
+        func.coalesce(Pedido.departamento_entrega, ''),
+        func.coalesce(func.sum(PedidoProducto.cantidad), 0),
+        func.coalesce(func.sum(PedidoProducto.peso_total_g_item), 0),
+        func.count(PedidoProducto.id)
+    ).join(
+        Pedido, PedidoProducto.pedido_id == Pedido.id
+    ).where(
+        PedidoProducto.producto_id.isnot(None),
+        Pedido.fecha_creacion.isnot(None),
+        *filtro_rango_fechas(Pedido.fecha_creacion, desde, hasta)
+    )
+    if pedido_ids is not None:
+        consulta = consulta.where(Pedido.id.in_(pedido_ids))
+    return consulta.group_by(*list(consulta.selected_columns)[:len(COLUMNAS_CLAVE)])
+
+
+def aportes_pedidos(db, pedido_ids):
+    """
+    Aporte conjunto de varios pedidos al resumen, agregado en la base de datos.
+
+    Equivale a sumar aportes_pedido() de cada pedido sin cargar los pedidos ni
+    sus ítems: una sola consulta agrupada por clave.
+
+    Returns:
+        dict: {clave: [cantidad, peso_total_g, lineas]}
+    """
+    if not pedido_ids:
+        return {}
+    consulta = _consulta_reconstruccion(db.get_bind().dialect.name, pedido_ids=pedido_ids)
+    aportes = {}
+    for fecha, *resto, cantidad, peso, lineas in db.execute(consulta):
+        # SQLite devuelve date() como texto
+        if isinstance(fecha, str):
+            fecha = date.fromisoformat(fecha)
+        aportes[(fecha, *resto)] = [cantidad, float(peso), lineas]
+    return aportes
+
+
+def cambiar_estado_aportes(aportes, estado_pedido=None, estado_item=None):
+    """
+    Traslada un aporte a las claves con otro estado de pedido y/o de ítem.
+
+    Sirve para calcular el aporte "después" de un cambio de estado masivo sin
+    volver a consultar: solo cambian esas dos partes de la clave.
+    """
+    nuevos = defaultdict(lambda: [0, 0.0, 0])
+    for (fecha, producto_id, presentacion, estado_p, estado_i, departamento), valores in aportes.items():
+        clave = (
+            fecha, producto_id, presentacion,
+            estado_p if estado_pedido is None else _texto(estado_pedido, LARGO_ESTADO),
+            estado_i if estado_item is None else _texto(estado_item, LARGO_ESTADO),
+            departamento
+        )
+        acumulado = nuevos[clave]
+        for i, valor in enumerate(valores):
+            acumulado[i] += valor
+    return dict(nuevos)
+
+
+def reconstruir_resumen_diario(db, desde=None, hasta=None):
+    """
+    Recalcula el resumen desde los ítems de pedido, completo o para un rango de días.
+
+    No confirma la transacción: el llamador decide cuándo hacer commit.
+
+    Returns:
+        int: Número de filas del resumen en el rango reconstruido.
+    """
+    tabla = ResumenDiarioProducto.__table__
+    borrar = delete(tabla)
+    if desde:
+        borrar = borrar.where(tabla.c.fecha >= desde)
+    if hasta:
+        borrar = borrar.where(tabla.c.fecha <= hasta)
+    db.execute(borrar)
+    incrementar_version(db, 'pedidos')
+
+    resultado = db.execute(insert(tabla).from_select(
+        list(COLUMNAS_CLAVE + COLUMNAS_MEDIDA),
+        _consulta_reconstruccion(db.get_bind().dialect.name, desde, hasta)
+    ))
+    return resultado.rowcount
+
+
+# Fila de versiones_tablas que indica que el resumen ya se construyó desde los pedidos
+MARCA_CONSTRUIDO = 'construido:resumen_diario'
+
+# Se verifica una sola vez por proceso que el resumen ya fue construido
+_resumen_verificado = False
+_resumen_lock = threading.Lock()
+
+
+def construir_resumen_diario(engine):
+    """
+    Reconstruye el resumen completo si todavía no está marcado como construido.
+
+    Lo ejecuta la migración (config.migraciones.verificar_esquema). No basta
+    con que la tabla tenga filas: los pedidos escritos antes de construirlo
+    solo suman su propio aporte y dejarían fuera el histórico.
+
+    Returns:
+        int con las filas construidas, o None si ya estaba construido.
+    """
+    return construir_una_vez(engine, MARCA_CONSTRUIDO, reconstruir_resumen_diario)
+
+
+def asegurar_resumen_diario():
+    """Construye el resumen si la migración todavía no lo hizo (una verificación por proceso)"""
+    global _resumen_verificado
+    if _resumen_verificado:
+        return
+    with _resumen_lock:
+        if _resumen_verificado:
+            return
+        from config.database import db_config
+        try:
+            filas = construir_resumen_diario(db_config.engine)
+        except Exception as e:
+            # Otro proceso pudo construirlo al mismo tiempo; se verifica de nuevo en la próxima lectura
+            logger.warning(f"No se pudo construir el resumen diario: {e}")
+            return
+        if filas is not None:
+            logger.info(f"Resumen diario construido: {filas} filas")
+        _resumen_verificado = True
@@ -1,18 +1,11 @@
 """
 Filtros personalizados para las plantillas Jinja2
 """
-import pytz
-from datetime import datetime
+from utils.fechas import a_hora_colombia
 
 def utc_to_colombia(utc_dt):
-    """Convertir datetime UTC a hora de Colombia"""
-    if utc_dt is None:
-        return None
-    colombia_tz = pytz.timezone('America/Bogota')
-    if utc_dt.tzinfo is None:
-        # Si no tiene timezone, asumimos que es UTC
-        utc_dt = pytz.UTC.localize(utc_dt)
-    return utc_dt.astimezone(colombia_tz)
+    """Convertir datetime UTC a hora de Colombia (desfase fijo UTC-5; sin zona se asume UTC)"""
+    return a_hora_colombia(utc_dt)
 
 def strftime(value, format='%d/%m/%Y %H:%M'):
     """Formatear fecha con strftime"""
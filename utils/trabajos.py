@@ -0,0 +1,344 @@
+"""
+Trabajos en segundo plano para importaciones y exportaciones largas.
+
+Cada trabajo se registra en la tabla `trabajos` y se ejecuta en un pool de
+hilos local del proceso, de modo que la petición HTTP responde de inmediato
+con el id del trabajo y el worker de gunicorn queda libre. El estado y el
+progreso se consultan en /trabajos/<id> y el archivo generado (si lo hay) se
+descarga en /trabajos/<id>/descargar.
+
+Con varias instancias detrás del balanceador, la consulta y la descarga
+pueden llegar a una instancia distinta de la que ejecutó el trabajo. Por eso
+el archivo generado se copia por partes a la tabla `trabajos_archivos` al
+terminar, y el directorio local (TRABAJOS_DIRECTORIO) solo guarda el archivo
+subido y el resultado mientras el trabajo se ejecuta.
+
+La cola es el pool de hilos del proceso: si la instancia se detiene (por
+ejemplo al reducir instancias), sus trabajos pendientes y en proceso se
+pierden. Cada proceso actualiza fecha_latido de sus trabajos activos cada
+INTERVALO_LATIDO segundos, y un trabajo activo sin latido durante
+LATIDO_MAXIMO segundos se marca como error al consultarlo, desde cualquier
+instancia; el usuario debe volver a lanzarlo.
+"""
+import datetime
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, insert, select, update
+from werkzeug.utils import secure_filename
+
+from config.database import db_config
+from models import ParteArchivoTrabajo, Trabajo
+
+logger = logging.getLogger(__name__)
+
+# Trabajos que se ejecutan a la vez en cada proceso
+MAX_HILOS = int(os.getenv('TRABAJOS_MAX_HILOS', 2))
+
+# Directorio donde se guardan los archivos subidos y los resultados
+DIRECTORIO = os.getenv('TRABAJOS_DIRECTORIO', os.path.join(tempfile.gettempdir(), 'florezcook_trabajos'))
+
+# Horas que se conservan los trabajos terminados y sus archivos
+RETENCION_HORAS = int(os.getenv('TRABAJOS_RETENCION_HORAS', 24))
+
+# Segundos entre latidos de los trabajos activos y sin latido para darlos por perdidos
+INTERVALO_LATIDO = int(os.getenv('TRABAJOS_INTERVALO_LATIDO', 30))
+LATIDO_MAXIMO = int(os.getenv('TRABAJOS_LATIDO_MAXIMO', 300))
+
+# Tamaño de cada parte del archivo guardada en trabajos_archivos (menor que max_allowed_packet)
+TAMANO_PARTE_ARCHIVO = 1024 * 1024
+
+PENDIENTE = 'pendiente'
+EN_PROCESO = 'en_proceso'
+COMPLETADO = 'completado'
+ERROR = 'error'
+ESTADOS_ACTIVOS = (PENDIENTE, EN_PROCESO)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Trabajos pendientes o en proceso de este proceso (los que reciben latido)
+_activos = set()
+_activos_lock = threading.Lock()
+
+
+def _proceso_actual():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _obtener_pool():
+    """Pool de hilos del proceso (se crea con el primer trabajo)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=MAX_HILOS, thread_name_prefix='trabajo')
+                threading.Thread(target=_latir, name='trabajos-latido', daemon=True).start()
+    return _pool
+
+
+def _latir():
+    """Marca periódicamente como vivos los trabajos activos del proceso"""
+    while True:
+        time.sleep(INTERVALO_LATIDO)
+        with _activos_lock:
+            ids = list(_activos)
+        if not ids:
+            continue
+        try:
+            with db_config.engine.begin() as conn:
+                conn.execute(update(Trabajo.__table__).where(Trabajo.id.in_(ids))
+                             .values(fecha_latido=datetime.datetime.utcnow()))
+        except Exception as e:
+            logger.warning(f"No se pudo registrar el latido de los trabajos: {e}")
+
+
+def _actualizar(trabajo_id, **valores):
+    """Actualiza la fila del trabajo en una transacción propia, fuera de la sesión del trabajo"""
+    with db_config.engine.begin() as conn:
+        conn.execute(update(Trabajo.__table__).where(Trabajo.id == trabajo_id).values(**valores))
+
+
+def directorio_trabajo(trabajo_id):
+    """Directorio de archivos de un trabajo (se crea si no existe)"""
+    ruta = os.path.join(DIRECTORIO, trabajo_id)
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+
+class ContextoTrabajo:
+    """Lo que recibe la función de un trabajo para informar progreso y adjuntar archivos"""
+
+    def __init__(self, trabajo_id):
+        self.id = trabajo_id
+        self.directorio = directorio_trabajo(trabajo_id)
+        self.ruta_archivo = None
+        self.nombre_archivo = None
+        self._ultimo_progreso = None
+
+    def progreso(self, porcentaje, mensaje=None):
+        """Registra el avance (0 a 100); solo escribe si el porcentaje cambió"""
+        porcentaje = max(0, min(100, int(porcentaje)))
+        if porcentaje == self._ultimo_progreso and mensaje is None:
+            return
+        self._ultimo_progreso = porcentaje
+        valores = {'progreso': porcentaje}
+        if mensaje is not None:
+            valores['mensaje'] = mensaje[:255]
+        _actualizar(self.id, **valores)
+
+    def ruta(self, nombre):
+        """Ruta dentro del directorio del trabajo"""
+        return os.path.join(self.directorio, nombre)
+
+    def adjuntar_archivo(self, ruta, nombre_descarga):
+        """Marca un archivo como resultado descargable del trabajo"""
+        self.ruta_archivo = ruta
+        self.nombre_archivo = nombre_descarga
+
+
+def _guardar_archivo(trabajo_id, ruta):
+    """Copia el archivo generado a trabajos_archivos en partes de TAMANO_PARTE_ARCHIVO"""
+    with db_config.engine.begin() as conn, open(ruta, 'rb') as archivo:
+        numero = 0
+        while True:
+            parte = archivo.read(TAMANO_PARTE_ARCHIVO)
+            if not parte:
+                break
+            conn.execute(insert(ParteArchivoTrabajo.__table__),
+                         {'trabajo_id': trabajo_id, 'numero': numero, 'contenido': parte})
+            numero += 1
+
+
+def _ejecutar(trabajo_id, funcion, args, kwargs):
+    contexto = ContextoTrabajo(trabajo_id)
+    db = db_config.get_session()
+    try:
+        ahora = datetime.datetime.utcnow()
+        _actualizar(trabajo_id, estado=EN_PROCESO, fecha_inicio=ahora, fecha_latido=ahora)
+        resultado = funcion(db, contexto, *args, **kwargs)
+        if contexto.ruta_archivo:
+            _guardar_archivo(trabajo_id, contexto.ruta_archivo)
+        _actualizar(
+            trabajo_id,
+            estado=COMPLETADO,
+            progreso=100,
+            resultado=json.dumps(resultado, default=str) if resultado is not None else None,
+            ruta_archivo=contexto.ruta_archivo,
+            nombre_archivo=contexto.nombre_archivo,
+            fecha_fin=datetime.datetime.utcnow(),
+        )
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Error en el trabajo {trabajo_id}")
+        _actualizar(trabajo_id, estado=ERROR, mensaje=str(e)[:255], fecha_fin=datetime.datetime.utcnow())
+    finally:
+        with _activos_lock:
+            _activos.discard(trabajo_id)
+        db.close()
+        # La sesión es por hilo y los hilos del pool se reutilizan
+        db_config.remove_session()
+        # El resultado ya está en la base: no se conservan archivos en la instancia
+        shutil.rmtree(os.path.join(DIRECTORIO, trabajo_id), ignore_errors=True)
+
+
+def nuevo_id_trabajo():
+    """Id para un trabajo nuevo (uuid4 en hexadecimal)"""
+    return uuid.uuid4().hex
+
+
+def encolar_trabajo(tipo, funcion, *args, trabajo_id=None, **kwargs):
+    """
+    Registra un trabajo y lo envía al pool de hilos.
+
+    Args:
+        tipo: Nombre del tipo de trabajo (por ejemplo 'importar_productos').
+        funcion: Callable funcion(db, contexto, *args, **kwargs). Recibe su
+            propia sesión y un ContextoTrabajo; lo que devuelva se guarda como
+            resultado en JSON.
+        trabajo_id: Id ya reservado con nuevo_id_trabajo() (por ejemplo si se
+            guardó antes un archivo en su directorio).
+
+    Returns:
+        str: Id del trabajo.
+    """
+    trabajo_id = trabajo_id or nuevo_id_trabajo()
+    db = db_config.get_session()
+    try:
+        limpiar_trabajos_antiguos(db)
+        db.add(Trabajo(id=trabajo_id, tipo=tipo, estado=PENDIENTE, progreso=0, proceso=_proceso_actual(),
+                       fecha_latido=datetime.datetime.utcnow()))
+        db.commit()
+    finally:
+        db.close()
+
+    with _activos_lock:
+        _activos.add(trabajo_id)
+    _obtener_pool().submit(_ejecutar, trabajo_id, funcion, args, kwargs)
+    return trabajo_id
+
+
+def guardar_archivo_subido(archivo, trabajo_id):
+    """Guarda un archivo subido en el directorio del trabajo (la petición termina antes que el trabajo)"""
+    nombre = secure_filename(archivo.filename or '') or 'archivo'
+    ruta = os.path.join(directorio_trabajo(trabajo_id), nombre)
+    archivo.save(ruta)
+    return ruta
+
+
+def _proceso_terminado(proceso):
+    """Indica si el proceso que tomó un trabajo ya no existe (solo se puede saber en el mismo host)"""
+    if not proceso or ':' not in proceso:
+        return False
+    host, pid = proceso.rsplit(':', 1)
+    if host != socket.gethostname():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (ValueError, PermissionError):
+        return False
+    return False
+
+
+def _trabajo_perdido(trabajo):
+    """Indica si un trabajo activo ya no lo ejecuta ningún proceso"""
+    if _proceso_terminado(trabajo.proceso):
+        return True
+    latido = trabajo.fecha_latido or trabajo.fecha_creacion
+    return latido is not None and \
+        (datetime.datetime.utcnow() - latido).total_seconds() > LATIDO_MAXIMO
+
+
+def estado_trabajo(db, trabajo_id):
+    """
+    Estado de un trabajo como diccionario para la API.
+
+    Los trabajos activos cuyo proceso ya terminó (por ejemplo tras reiniciar
+    gunicorn) o que dejaron de recibir latido (la instancia se detuvo) se
+    marcan como error.
+
+    Returns:
+        dict o None si el trabajo no existe.
+    """
+    trabajo = db.get(Trabajo, trabajo_id)
+    if trabajo is None:
+        return None
+
+    if trabajo.estado in ESTADOS_ACTIVOS and _trabajo_perdido(trabajo):
+        trabajo.estado = ERROR
+        trabajo.mensaje = 'El trabajo se interrumpió porque el proceso que lo ejecutaba terminó'
+        trabajo.fecha_fin = datetime.datetime.utcnow()
+        db.commit()
+
+    return {
+        'id': trabajo.id,
+        'tipo': trabajo.tipo,
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'mensaje': trabajo.mensaje,
+        'resultado': json.loads(trabajo.resultado) if trabajo.resultado else None,
+        'tiene_archivo': bool(trabajo.nombre_archivo),
+        'fecha_creacion': trabajo.fecha_creacion.isoformat() if trabajo.fecha_creacion else None,
+        'fecha_inicio': trabajo.fecha_inicio.isoformat() if trabajo.fecha_inicio else None,
+        'fecha_fin': trabajo.fecha_fin.isoformat() if trabajo.fecha_fin else None,
+    }
+
+
+def tamano_archivo_trabajo(db, trabajo_id):
+    """Tamaño en bytes del archivo guardado de un trabajo (0 si no tiene)"""
+    return db.scalar(
+        select(func.coalesce(func.sum(func.length(ParteArchivoTrabajo.contenido)), 0))
+        .where(ParteArchivoTrabajo.trabajo_id == trabajo_id)
+    )
+
+
+def partes_archivo_trabajo(trabajo_id):
+    """
+    Generador con las partes del archivo de un trabajo, en orden.
+
+    Lee una parte por consulta con una conexión propia, para no cargar el
+    archivo completo en memoria y poder usarse en una respuesta por partes
+    después de cerrar la sesión de la petición.
+    """
+    numero = 0
+    while True:
+        with db_config.engine.connect() as conn:
+            parte = conn.execute(
+                select(ParteArchivoTrabajo.contenido).where(
+                    ParteArchivoTrabajo.trabajo_id == trabajo_id,
+                    ParteArchivoTrabajo.numero == numero
+                )
+            ).scalar()
+        if parte is None:
+            return
+        yield parte
+        numero += 1
+
+
+def limpiar_trabajos_antiguos(db, horas=None):
+    """Elimina los trabajos terminados hace más de `horas` y sus archivos"""
+    limite = datetime.datetime.utcnow() - datetime.timedelta(hours=horas or RETENCION_HORAS)
+    antiguos = db.query(Trabajo.id).filter(
+        Trabajo.fecha_creacion < limite,
+        Trabajo.estado.notin_(ESTADOS_ACTIVOS)
+    ).all()
+    if not antiguos:
+        return 0
+    ids = [trabajo_id for (trabajo_id,) in antiguos]
+    for trabajo_id in ids:
+        shutil.rmtree(os.path.join(DIRECTORIO, trabajo_id), ignore_errors=True)
+    # SQLite no aplica el ON DELETE CASCADE sin PRAGMA foreign_keys
+    db.query(ParteArchivoTrabajo).filter(ParteArchivoTrabajo.trabajo_id.in_(ids)).delete(synchronize_session=False)
+    db.query(Trabajo).filter(Trabajo.id.in_(ids)).delete(synchronize_session=False)
+    db.commit()
+    return len(ids)
@@ -0,0 +1,175 @@
+"""
+Versiones de datos por tabla para invalidar cachés entre workers.
+
+Cada escritura sobre una tabla cacheada llama a incrementar_version() con su
+sesión. La versión se incrementa después del commit, en una transacción corta
+aparte: si se actualizara la fila dentro de la transacción de la escritura,
+todas las escrituras de pedidos quedarían en fila esperando el bloqueo de la
+misma fila de versiones_tablas hasta el commit de la anterior. Quien lea la
+versión nueva ya ve los datos confirmados. Los procesos comparan la versión
+de su caché con la de la base de datos (una lectura por clave primaria, como
+máximo cada VERSIONES_VERIFICACION_SEGUNDOS) y reconstruyen la caché solo si
+cambió.
+
+La misma tabla guarda las marcas de las tablas derivadas (resumen diario,
+plan de producción) que ya se construyeron completas desde los pedidos: ver
+construir_una_vez().
+"""
+import datetime
+import logging
+import os
+import threading
+import time
+
+from flask import has_request_context
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import VersionTabla
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre lecturas de la versión en cada proceso
+VERIFICACION_SEGUNDOS = float(os.getenv('VERSIONES_VERIFICACION_SEGUNDOS', 2))
+
+_tabla = VersionTabla.__table__
+
+# nombre -> (version, fecha_modificacion, momento de la lectura)
+_vistas = {}
+_lock = threading.Lock()
+
+
+def incrementar_version(db, nombre):
+    """
+    Marca la tabla como modificada en la transacción actual (no hace commit).
+
+    La versión se incrementa cuando la sesión confirma la transacción (ver
+    _incrementar_versiones_confirmadas); si la transacción se revierte no
+    cambia.
+    """
+    db.info.setdefault('versiones_modificadas', set()).add(nombre)
+
+
+def _incrementar(conexion, nombre, ahora):
+    """Incrementa la versión de una tabla; si la fila no existe, se crea con versión 1"""
+    resultado = conexion.execute(
+        update(_tabla).where(_tabla.c.nombre == nombre)
+        .values(version=_tabla.c.version + 1, fecha_modificacion=ahora)
+    )
+    if resultado.rowcount == 0:
+        try:
+            with conexion.begin_nested():
+                conexion.execute(insert(_tabla).values(nombre=nombre, version=1, fecha_modificacion=ahora))
+        except IntegrityError:
+            # Otro proceso creó la fila al mismo tiempo
+            conexion.execute(
+                update(_tabla).where(_tabla.c.nombre == nombre)
+                .values(version=_tabla.c.version + 1, fecha_modificacion=ahora)
+            )
+
+
+def construir_una_vez(engine, marca, construir):
+    """
+    Construye una tabla derivada completa si todavía no tiene su marca en versiones_tablas.
+
+    construir(db) se ejecuta con una sesión propia (nunca la de la petición) y
+    la marca se inserta en la misma transacción: si la construcción falla no
+    queda marca y se vuelve a intentar la próxima vez. Si dos procesos
+    construyen a la vez, el segundo falla al insertar la marca y revierte.
+
+    Args:
+        engine: Engine de la base de datos.
+        marca: Nombre de la fila que marca la tabla como construida.
+        construir: Callable construir(db) que devuelve el número de filas.
+
+    Returns:
+        int con las filas construidas, o None si la tabla ya estaba construida.
+    """
+    with Session(engine) as db:
+        if db.get(VersionTabla, marca) is not None:
+            return None
+        filas = construir(db)
+        db.execute(insert(_tabla).values(nombre=marca, version=1, fecha_modificacion=datetime.datetime.utcnow()))
+        db.commit()
+        return filas
+
+
+@event.listens_for(Session, 'after_commit')
+def _incrementar_versiones_confirmadas(sesion):
+    nombres = sesion.info.pop('versiones_modificadas', None)
+    if not nombres:
+        return
+    # Transacción propia y breve: la de la escritura ya se confirmó
+    engine = sesion.get_bind(VersionTabla).engine
+    ahora = datetime.datetime.utcnow()
+    try:
+        with engine.begin() as conexion:
+            # Siempre en el mismo orden para no cruzar bloqueos entre procesos
+            for nombre in sorted(nombres):
+                _incrementar(conexion, nombre, ahora)
+    except Exception as e:
+        logger.error(f"Error incrementando las versiones de {sorted(nombres)}: {e}")
+    # Este proceso vuelve a leer la versión en la próxima consulta
+    with _lock:
+        for nombre in nombres:
+            _vistas.pop(nombre, None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_versiones_modificadas(sesion):
+    sesion.info.pop('versiones_modificadas', None)
+
+
+def leer_versiones(conexion, nombres):
+    """
+    Versiones actuales de varias tablas.
+
+    Returns:
+        {nombre: (version, fecha_modificacion)}; (0, None) si no existe la fila.
+    """
+    filas = conexion.execute(
+        select(_tabla.c.nombre, _tabla.c.version, _tabla.c.fecha_modificacion)
+        .where(_tabla.c.nombre.in_(list(nombres)))
+    ).all()
+    versiones = dict.fromkeys(nombres, (0, None))
+    versiones.update({nombre: (version, fecha) for nombre, version, fecha in filas})
+    return versiones
+
+
+def versiones_vigentes(nombres):
+    """
+    Versiones de varias tablas vistas por este proceso ({nombre: (version, fecha_modificacion)}).
+
+    Se consulta la base de datos como máximo cada VERIFICACION_SEGUNDOS, en
+    una sola lectura para todas las tablas vencidas; entre consultas se
+    devuelve el último valor leído.
+    """
+    ahora = time.monotonic()
+    resultado = {}
+    vencidas = []
+    for nombre in nombres:
+        vista = _vistas.get(nombre)
+        if vista is not None and ahora - vista[2] < VERIFICACION_SEGUNDOS:
+            resultado[nombre] = vista[:2]
+        else:
+            vencidas.append(nombre)
+
+    if vencidas:
+        from config.database import db_config
+        if has_request_context():
+            # Dentro de una petición se usa su conexión en lugar de tomar otra del pool
+            leidas = leer_versiones(db_config.get_session(), vencidas)
+        else:
+            with db_config.engine.connect() as conexion:
+                leidas = leer_versiones(conexion, vencidas)
+        with _lock:
+            for nombre, (version, fecha) in leidas.items():
+                _vistas[nombre] = (version, fecha, ahora)
+        resultado.update(leidas)
+    return resultado
+
+
+def version_vigente(nombre):
+    """Versión de una tabla vista por este proceso (ver versiones_vigentes)"""
+    return versiones_vigentes((nombre,))[nombre][0]